@@ -0,0 +1,27 @@
+"""add vector index type to system settings
+
+Revision ID: h7c4a1e30f65
+Revises: 16e7379fb456
+Create Date: 2026-03-02 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'h7c4a1e30f65'
+down_revision: Union[str, None] = '16e7379fb456'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('system_settings', sa.Column('vector_index_type', sa.String(length=20), nullable=True, comment="'flat', 'ivf' vagy 'hnsw' – FAISS index típus a küszöb felett"))
+    op.add_column('system_settings', sa.Column('vector_index_promote_threshold', sa.Integer(), nullable=True, comment='Ennyi vektor felett vált a flat index IVF/HNSW-re'))
+
+
+def downgrade() -> None:
+    op.drop_column('system_settings', 'vector_index_promote_threshold')
+    op.drop_column('system_settings', 'vector_index_type')
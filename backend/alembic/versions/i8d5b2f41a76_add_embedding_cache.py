@@ -0,0 +1,38 @@
+"""add embedding cache
+
+Revision ID: i8d5b2f41a76
+Revises: h7c4a1e30f65
+Create Date: 2026-03-04 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'i8d5b2f41a76'
+down_revision: Union[str, None] = 'h7c4a1e30f65'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('embedding_cache',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('text_hash', sa.String(length=64), nullable=False),
+        sa.Column('provider', sa.String(length=50), nullable=False),
+        sa.Column('model', sa.String(length=255), nullable=False),
+        sa.Column('dimension', sa.Integer(), nullable=False),
+        sa.Column('vector', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('last_used_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('text_hash', 'provider', 'model', 'dimension', name='uq_embedding_cache_key'),
+    )
+    op.create_index('ix_embedding_cache_last_used_at', 'embedding_cache', ['last_used_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_embedding_cache_last_used_at', table_name='embedding_cache')
+    op.drop_table('embedding_cache')
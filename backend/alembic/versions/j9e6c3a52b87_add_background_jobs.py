@@ -0,0 +1,62 @@
+"""add background jobs
+
+Revision ID: j9e6c3a52b87
+Revises: i8d5b2f41a76
+Create Date: 2026-03-05 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'j9e6c3a52b87'
+down_revision: Union[str, None] = 'i8d5b2f41a76'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('background_jobs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('document_id', sa.Integer(), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('progress', sa.Integer(), nullable=True),
+        sa.Column('total', sa.Integer(), nullable=True),
+        sa.Column('message', sa.String(length=500), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('max_attempts', sa.Integer(), nullable=True),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=True),
+        sa.Column('queued_at', sa.DateTime(), nullable=True),
+        sa.Column('run_after', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_background_jobs_kind', 'background_jobs', ['kind'])
+    op.create_index('ix_background_jobs_status', 'background_jobs', ['status'])
+
+    op.add_column('ai_knowledge_log', sa.Column('job_id', sa.Integer(), nullable=True))
+    op.add_column('ai_knowledge_log', sa.Column('queue_wait_ms', sa.Integer(), nullable=True))
+    op.add_column('ai_knowledge_log', sa.Column('run_ms', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_ai_knowledge_log_job_id', 'ai_knowledge_log', 'background_jobs',
+        ['job_id'], ['id'], ondelete='SET NULL',
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('fk_ai_knowledge_log_job_id', 'ai_knowledge_log', type_='foreignkey')
+    op.drop_column('ai_knowledge_log', 'run_ms')
+    op.drop_column('ai_knowledge_log', 'queue_wait_ms')
+    op.drop_column('ai_knowledge_log', 'job_id')
+    op.drop_index('ix_background_jobs_status', table_name='background_jobs')
+    op.drop_index('ix_background_jobs_kind', table_name='background_jobs')
+    op.drop_table('background_jobs')
@@ -0,0 +1,40 @@
+"""add attachment blobs
+
+Revision ID: l1a8e5c74d09
+Revises: k0f7d4b63c98
+Create Date: 2026-03-07 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'l1a8e5c74d09'
+down_revision: Union[str, None] = 'k0f7d4b63c98'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('attachment_blobs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('file_path', sa.String(length=1000), nullable=False),
+        sa.Column('file_size', sa.Integer(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('content_hash'),
+    )
+
+    # Existing attachments keep their own files (content_hash NULL)
+    op.add_column('email_attachments', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_email_attachments_content_hash', 'email_attachments', ['content_hash'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_email_attachments_content_hash', table_name='email_attachments')
+    op.drop_column('email_attachments', 'content_hash')
+    op.drop_table('attachment_blobs')
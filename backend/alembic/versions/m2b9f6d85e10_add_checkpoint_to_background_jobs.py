@@ -0,0 +1,25 @@
+"""add checkpoint to background jobs
+
+Revision ID: m2b9f6d85e10
+Revises: l1a8e5c74d09
+Create Date: 2026-03-08 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'm2b9f6d85e10'
+down_revision: Union[str, None] = 'l1a8e5c74d09'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('background_jobs', sa.Column('checkpoint', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('background_jobs', 'checkpoint')
@@ -0,0 +1,25 @@
+"""add ttft to chat messages
+
+Revision ID: n3c0a7e96f21
+Revises: m2b9f6d85e10
+Create Date: 2026-03-10 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'n3c0a7e96f21'
+down_revision: Union[str, None] = 'm2b9f6d85e10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_messages', sa.Column('ttft_ms', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('chat_messages', 'ttft_ms')
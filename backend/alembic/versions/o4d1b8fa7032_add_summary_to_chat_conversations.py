@@ -0,0 +1,27 @@
+"""add summary to chat conversations
+
+Revision ID: o4d1b8fa7032
+Revises: n3c0a7e96f21
+Create Date: 2026-03-11 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'o4d1b8fa7032'
+down_revision: Union[str, None] = 'n3c0a7e96f21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_conversations', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('chat_conversations', sa.Column('summary_through_id', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('chat_conversations', 'summary_through_id')
+    op.drop_column('chat_conversations', 'summary')
@@ -0,0 +1,47 @@
+"""add llm response cache
+
+Revision ID: p5e2c9ab8143
+Revises: o4d1b8fa7032
+Create Date: 2026-03-12 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'p5e2c9ab8143'
+down_revision: Union[str, None] = 'o4d1b8fa7032'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('llm_response_cache',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('key_hash', sa.String(length=64), nullable=False),
+        sa.Column('provider', sa.String(length=50), nullable=False),
+        sa.Column('model', sa.String(length=255), nullable=False),
+        sa.Column('system_hash', sa.String(length=64), nullable=False),
+        sa.Column('messages_hash', sa.String(length=64), nullable=False),
+        sa.Column('response', sa.Text(), nullable=False),
+        sa.Column('input_tokens', sa.Integer(), nullable=True),
+        sa.Column('output_tokens', sa.Integer(), nullable=True),
+        sa.Column('hit_count', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('last_used_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('key_hash', name='uq_llm_response_cache_key_hash'),
+    )
+    op.create_index('ix_llm_response_cache_last_used_at', 'llm_response_cache', ['last_used_at'])
+    op.create_index('ix_llm_response_cache_expires_at', 'llm_response_cache', ['expires_at'])
+    op.add_column('token_usage', sa.Column('cache_hit', sa.Boolean(), server_default=sa.false(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('token_usage', 'cache_hit')
+    op.drop_index('ix_llm_response_cache_expires_at', table_name='llm_response_cache')
+    op.drop_index('ix_llm_response_cache_last_used_at', table_name='llm_response_cache')
+    op.drop_table('llm_response_cache')
@@ -0,0 +1,27 @@
+"""add worker to background jobs
+
+Revision ID: q6f3d0bc9254
+Revises: p5e2c9ab8143
+Create Date: 2026-03-13 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'q6f3d0bc9254'
+down_revision: Union[str, None] = 'p5e2c9ab8143'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('background_jobs', sa.Column('worker_id', sa.String(length=64), nullable=True))
+    op.add_column('background_jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('background_jobs', 'heartbeat_at')
+    op.drop_column('background_jobs', 'worker_id')
@@ -12,10 +12,87 @@ class Settings(BaseSettings):
     OPENROUTER_API_KEY: str = ""
     OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
 
+    # Pooled AI provider HTTP clients
+    OLLAMA_MAX_CONNECTIONS: int = 8
+    OPENROUTER_MAX_CONNECTIONS: int = 32
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    OLLAMA_EMBED_CONCURRENCY: int = 4
+
+    # How long Ollama keeps a model loaded after a request ("30m", seconds,
+    # -1 = forever; empty = Ollama's default of 5 minutes)
+    OLLAMA_KEEP_ALIVE: str = "30m"
+
+    # Chat prompt token budget (context_packer): Ollama's context window (sent
+    # as num_ctx; OpenRouter models report theirs), used for OpenRouter models
+    # missing from the models list; tokens kept free for the answer; and the
+    # share of the rest the RAG context gets ahead of the history
+    OLLAMA_CONTEXT_LENGTH: int = 8192
+    DEFAULT_CONTEXT_LENGTH: int = 8192
+    CHAT_ANSWER_RESERVE_TOKENS: int = 1024
+    CHAT_RAG_BUDGET_SHARE: float = 0.6
+
+    # Rolling chat summary (chat_memory): once this many messages are not in the
+    # conversation's summary, all but the newest few are folded into it (0 = off)
+    CHAT_SUMMARY_TRIGGER_MESSAGES: int = 12
+    CHAT_SUMMARY_KEEP_MESSAGES: int = 4
+
+    # Bulk AI chat calls (email categorization): requests in flight per
+    # provider, and an OpenRouter token bucket (requests/minute, burst size)
+    OLLAMA_CHAT_CONCURRENCY: int = 2
+    OPENROUTER_CHAT_CONCURRENCY: int = 8
+    OPENROUTER_REQUESTS_PER_MINUTE: float = 120.0
+    OPENROUTER_BURST: int = 10
+
+    # Persistent embedding cache: max entries (0 = unlimited), eviction "lru" or "fifo"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 500000
+    EMBEDDING_CACHE_EVICTION: str = "lru"
+
+    # Persistent LLM response cache (summaries, quick guides, ideas): entry
+    # lifetime in seconds (0 = no expiry), max entries (0 = unlimited)
+    LLM_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    LLM_CACHE_MAX_ENTRIES: int = 2000
+
+    # Background job queue (indexing, reindex): worker tasks and attempts per job
+    JOB_WORKERS: int = 2
+    JOB_MAX_ATTEMPTS: int = 3
+
+    # Text extraction (PDF/DOCX/XLSX) in worker processes: pool size, per-file
+    # timeout and address-space cap per worker (0 = no cap; not enforced on Windows)
+    EXTRACTION_WORKERS: int = 4
+    EXTRACTION_TIMEOUT_SECONDS: float = 120.0
+    EXTRACTION_MEMORY_LIMIT_MB: int = 1024
+
+    # PST import: parser worker processes (folders are shared out between
+    # them) and messages deduplicated, inserted and committed per batch
+    PST_IMPORT_WORKERS: int = 4
+    PST_IMPORT_BATCH_SIZE: int = 500
+    # Attachment blobs without a database row are deleted by the daily sweep
+    # only once untouched this long (a running import may still claim them)
+    ATTACHMENT_ORPHAN_GRACE_SECONDS: int = 24 * 3600
+
+    # Email categorization: results committed per batch
+    EMAIL_CATEGORIZE_BATCH_SIZE: int = 50
+    # Emails packed into one AI prompt (categorization, auto-link); 1 = one request per email
+    EMAIL_AI_PROMPT_BATCH_SIZE: int = 10
+
+    # Email auto-link embedding pre-match (cosine similarity): a best task at
+    # least this similar, and this far ahead of the runner-up, is linked without
+    # the LLM; otherwise the LLM chooses from the shortlist of best tasks
+    EMAIL_LINK_MATCH_THRESHOLD: float = 0.8
+    EMAIL_LINK_MATCH_MARGIN: float = 0.05
+    EMAIL_LINK_SHORTLIST_SIZE: int = 5
+
+    # Chat WebSocket streaming, for clients that ask for coalesced frames:
+    # buffered tokens are sent after this many ms or once this many chars
+    CHAT_STREAM_COALESCE_MS: int = 30
+    CHAT_STREAM_COALESCE_CHARS: int = 64
+
     UPLOAD_DIR: str = str(Path(__file__).resolve().parent.parent.parent.parent / "storage" / "uploads")
     KNOWLEDGE_DIR: str = str(Path(__file__).resolve().parent.parent.parent.parent / "storage" / "knowledge")
     SCRIPTS_DIR: str = str(Path(__file__).resolve().parent.parent.parent.parent / "storage" / "scripts")
     SCRIPT_OUTPUTS_DIR: str = str(Path(__file__).resolve().parent.parent.parent.parent / "storage" / "script_outputs")
+    EXTRACTED_TEXT_DIR: str = str(Path(__file__).resolve().parent.parent.parent.parent / "storage" / "extracted_text")
+    FULLTEXT_INDEX_PATH: str = str(Path(__file__).resolve().parent.parent.parent.parent / "storage" / "fulltext" / "documents.db")
     FAISS_INDEX_DIR: str = str(Path(__file__).resolve().parent.parent.parent.parent / "storage" / "faiss_index")
     EMAIL_ATTACHMENTS_DIR: str = str(Path(__file__).resolve().parent.parent.parent.parent / "storage" / "emails")
 
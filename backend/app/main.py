@@ -22,8 +22,13 @@ from app.routers import (
     websocket_router,
     subtasks,
     rag_debug,
+    jobs,
 )
 from app.services.scheduler import init_scheduler, shutdown_scheduler
+from app.services.http_clients import open_http_clients, close_http_clients
+from app.services.job_queue import start_workers, stop_workers
+from app.services.fulltext_index import schedule_sync as schedule_fulltext_sync
+from app.services.text_extraction import shutdown_extraction_pool
 
 
 @asynccontextmanager
@@ -31,8 +36,14 @@ async def lifespan(app: FastAPI):
     """Lifespan context manager for startup/shutdown events."""
     # Startup
     init_scheduler()
+    await open_http_clients()
+    await start_workers()
+    schedule_fulltext_sync()
     yield
     # Shutdown
+    await stop_workers()
+    await close_http_clients()
+    shutdown_extraction_pool()
     shutdown_scheduler()
 
 
@@ -68,6 +79,7 @@ def create_app() -> FastAPI:
         tokens,
         subtasks,
         rag_debug,
+        jobs,
     ]
 
     for module in routers:
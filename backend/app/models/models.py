@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Float, ForeignKey, Enum as SAEnum
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Float, ForeignKey, LargeBinary, UniqueConstraint, Enum as SAEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -143,6 +143,7 @@ class Document(Base):
     file_path = Column(String(1000), nullable=False)
     file_type = Column(String(10))
     file_size = Column(Integer)
+    content_hash = Column(String(64), index=True)  # sha256 of the file (extracted-text store key)
     category = Column(String(255))
     summary = Column(Text)  # AI-generated summary
     is_knowledge = Column(Boolean, default=False)
@@ -168,6 +169,22 @@ class DocumentChunk(Base):
     document = relationship("Document", back_populates="chunks")
 
 
+# --- Embedding cache (content-addressed, per provider/model/dimension) ---
+class EmbeddingCache(Base):
+    __tablename__ = "embedding_cache"
+    __table_args__ = (
+        UniqueConstraint("text_hash", "provider", "model", "dimension", name="uq_embedding_cache_key"),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    text_hash = Column(String(64), nullable=False)  # sha256 of the normalized chunk text
+    provider = Column(String(50), nullable=False)
+    model = Column(String(255), nullable=False)
+    dimension = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # float32 bytes
+    created_at = Column(DateTime, server_default=func.now())
+    last_used_at = Column(DateTime, server_default=func.now(), index=True)
+
+
 # --- Emails ---
 class Email(Base):
     __tablename__ = "emails"
@@ -200,11 +217,23 @@ class EmailAttachment(Base):
     file_path = Column(String(1000))
     file_size = Column(Integer)
     content_type = Column(String(255))
+    content_hash = Column(String(64), index=True)  # sha256 of the blob at file_path
     created_at = Column(DateTime, server_default=func.now())
 
     email = relationship("Email", back_populates="attachments")
 
 
+# --- Attachment blobs (content-addressed, shared by identical attachments) ---
+class AttachmentBlob(Base):
+    __tablename__ = "attachment_blobs"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    content_hash = Column(String(64), nullable=False, unique=True)
+    file_path = Column(String(1000), nullable=False)
+    file_size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)  # EmailAttachment rows pointing at the blob
+    created_at = Column(DateTime, server_default=func.now())
+
+
 class EmailTaskLink(Base):
     __tablename__ = "email_task_links"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -224,6 +253,9 @@ class ChatConversation(Base):
     title = Column(String(500))
     ai_provider = Column(String(20), default="ollama")
     model_name = Column(String(255))
+    # Running summary of the older messages (ids up to summary_through_id), sent instead of them
+    summary = Column(Text, nullable=True)
+    summary_through_id = Column(Integer, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
@@ -237,6 +269,7 @@ class ChatMessage(Base):
     role = Column(String(20), nullable=False)
     content = Column(Text, nullable=False)
     tokens_used = Column(Integer, default=0)
+    ttft_ms = Column(Integer, nullable=True)  # Streamed answers: time to first token
     created_at = Column(DateTime, server_default=func.now())
 
     conversation = relationship("ChatConversation", back_populates="messages")
@@ -296,7 +329,27 @@ class TokenUsage(Base):
     input_tokens = Column(Integer, default=0)
     output_tokens = Column(Integer, default=0)
     cost = Column(Float, default=0.0)
+    cache_hit = Column(Boolean, default=False)  # answered from llm_response_cache: tokens saved, no cost
+    created_at = Column(DateTime, server_default=func.now())
+
+
+# --- LLM response cache (per provider/model/system prompt/messages) ---
+class LLMResponseCache(Base):
+    __tablename__ = "llm_response_cache"
+    __table_args__ = (UniqueConstraint("key_hash", name="uq_llm_response_cache_key_hash"),)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    key_hash = Column(String(64), nullable=False)  # sha256 of the four parts below
+    provider = Column(String(50), nullable=False)
+    model = Column(String(255), nullable=False)
+    system_hash = Column(String(64), nullable=False)
+    messages_hash = Column(String(64), nullable=False)
+    response = Column(Text, nullable=False)
+    input_tokens = Column(Integer, default=0)
+    output_tokens = Column(Integer, default=0)
+    hit_count = Column(Integer, default=0)
     created_at = Column(DateTime, server_default=func.now())
+    last_used_at = Column(DateTime, index=True)
+    expires_at = Column(DateTime, index=True)  # NULL: no expiry
 
 
 # --- Audit Log ---
@@ -334,11 +387,40 @@ class AIKnowledgeLog(Base):
     chunks_processed = Column(Integer, default=0)
     status = Column(String(20), default="pending")
     error_message = Column(Text)
+    job_id = Column(Integer, ForeignKey("background_jobs.id", ondelete="SET NULL"))
+    queue_wait_ms = Column(Integer)
+    run_ms = Column(Integer)
     created_at = Column(DateTime, server_default=func.now())
 
     document = relationship("Document")
 
 
+# --- Background Jobs (persistent queue, worked off by app.services.job_queue) ---
+class BackgroundJob(Base):
+    __tablename__ = "background_jobs"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(50), nullable=False, index=True)
+    status = Column(String(20), default="queued", index=True)  # queued, running, completed, failed, cancelled
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="SET NULL"))
+    payload = Column(Text)  # JSON
+    result = Column(Text)  # JSON
+    checkpoint = Column(Text)  # JSON: where an interrupted run stopped (resumable handlers)
+    progress = Column(Integer, default=0)
+    total = Column(Integer, default=0)
+    message = Column(String(500))
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    cancel_requested = Column(Boolean, default=False)
+    queued_at = Column(DateTime)
+    run_after = Column(DateTime)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    worker_id = Column(String(64))  # process running the job (job_queue.WORKER_ID)
+    heartbeat_at = Column(DateTime)  # last sign of life of that process
+    created_at = Column(DateTime, server_default=func.now())
+
+
 # --- AI Personality Change Log ---
 class PersonalityChangeLog(Base):
     __tablename__ = "personality_change_log"
@@ -380,6 +462,16 @@ class SystemSettings(Base):
         default=1024,
         comment="Az embedding vektor dimenziója"
     )
+    vector_index_type = Column(
+        String(20),
+        default="flat",
+        comment="'flat', 'ivf' vagy 'hnsw' – FAISS index típus a küszöb felett"
+    )
+    vector_index_promote_threshold = Column(
+        Integer,
+        default=100000,
+        comment="Ennyi vektor felett vált a flat index IVF/HNSW-re"
+    )
 
     # ── Ollama Settings ──
     ollama_url = Column(
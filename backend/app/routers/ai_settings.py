@@ -293,6 +293,9 @@ def get_knowledge_log(
             error_message=log.error_message,
             created_at=log.created_at,
             document_filename=doc.original_filename if doc else None,
+            job_id=log.job_id,
+            queue_wait_ms=log.queue_wait_ms,
+            run_ms=log.run_ms,
         ))
 
     return result
@@ -333,7 +336,7 @@ def get_knowledge_stats(db: Session = Depends(get_db)):
 
     # Get FAISS index stats
     faiss_index = get_faiss_index()
-    total_vectors = faiss_index.index.ntotal if faiss_index.index else 0
+    total_vectors = faiss_index.get_stats()["total_vectors"]
 
     # Get last update time
     last_log = db.query(AIKnowledgeLog).order_by(desc(AIKnowledgeLog.created_at)).first()
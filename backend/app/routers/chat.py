@@ -4,7 +4,6 @@ from pydantic import BaseModel
 from typing import Optional, List, AsyncGenerator
 from sqlalchemy.orm import Session
 import json
-import httpx
 
 from app.core.database import get_db
 from app.models.models import ChatConversation, ChatMessage, AppSetting, AIPersonality
@@ -18,15 +17,20 @@ from app.schemas.schemas import (
 from app.services.ai_service import (
     send_chat_message,
     get_ai_settings,
-    send_chat_message_with_provider,
+    chat_with_target,
     save_token_usage,
     estimate_tokens,
-    DEFAULT_OLLAMA_URL,
-    DEFAULT_OLLAMA_MODEL,
+    ollama_chat_messages,
+    ollama_request_options,
+    resolve_chat_target,
     DEFAULT_OPENROUTER_URL,
     DEFAULT_OPENROUTER_MODEL,
 )
 from app.services.rag_service import search_similar_chunks
+from app.services.http_clients import get_http_client, provider_timeout
+from app.services.chat_stream import TokenCoalescer, negotiate_coalescing, relay_stream
+from app.services.context_packer import context_length, pack_context
+from app.services.chat_memory import schedule_summary, summary_prompt
 
 router = APIRouter(prefix="/chat")
 
@@ -100,6 +104,7 @@ def build_message_history(
     db: Session,
     conversation_id: int,
     context_size: Optional[int] = None,
+    after_message_id: Optional[int] = None,
 ) -> list:
     """Build message history for AI context with context size limit.
 
@@ -107,6 +112,7 @@ def build_message_history(
         db: Database session
         conversation_id: ID of the conversation
         context_size: Max number of messages to include (None = use settings)
+        after_message_id: Only messages after this one (the ones not in the conversation's summary)
 
     Returns:
         List of message dicts with role and content
@@ -114,10 +120,13 @@ def build_message_history(
     if context_size is None:
         context_size = get_context_size(db)
 
-    # Get messages ordered by creation time, limited to context size
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.conversation_id == conversation_id
-    ).order_by(ChatMessage.created_at.desc()).limit(context_size).all()
+    query = db.query(ChatMessage).filter(ChatMessage.conversation_id == conversation_id)
+    if after_message_id:
+        query = query.filter(ChatMessage.id > after_message_id)
+
+    # Get messages ordered by creation time (id breaks ties within a second),
+    # limited to context size
+    messages = query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(context_size).all()
 
     # Reverse to get chronological order
     messages = list(reversed(messages))
@@ -259,20 +268,28 @@ async def send_message(
     db.refresh(user_message)
 
     # Build message history with context size limit from settings
-    message_history = build_message_history(db, conv_id)
+    message_history = build_message_history(db, conv_id, after_message_id=conversation.summary_through_id)
 
     # Get system prompt from personality settings (request.system_prompt can override)
     provider = conversation.ai_provider or "ollama"
-    system_prompt = request.system_prompt or get_personality_system_prompt(db, provider)
+    personality_prompt = request.system_prompt or get_personality_system_prompt(db, provider)
 
     # Get AI response using conversation's provider and model
     try:
-        response_text, input_tokens, output_tokens = await send_chat_message_with_provider(
-            messages=message_history,
+        target = resolve_chat_target(db, provider=provider, model_name=conversation.model_name or "")
+        system_prompt, message_history, _usage = await pack_turn(
+            target, personality_prompt, False, False, message_history, [], conversation.summary
+        )
+        response_text, input_tokens, output_tokens, cost_usd = await chat_with_target(
+            target, message_history, system_prompt
+        )
+        save_token_usage(
             db=db,
-            provider=provider,
-            model_name=conversation.model_name or "",
-            system_prompt=system_prompt,
+            provider=target["provider"],
+            model_name=target["model"],
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cost=cost_usd,
         )
     except Exception as e:
         # Rollback user message on failure
@@ -297,6 +314,9 @@ async def send_message(
     db.refresh(assistant_message)
     db.refresh(user_message)
 
+    # Fold older messages into the conversation's summary once there are enough
+    schedule_summary(db, conversation)
+
     return SendMessageResponse(
         user_message=ChatMessageResponse.model_validate(user_message),
         assistant_message=ChatMessageResponse.model_validate(assistant_message),
@@ -355,6 +375,57 @@ Ha van dokumentum kontextus, azt elsősorban használd és hivatkozz a forrásra
 Ha nincs megfelelő kontextus, akkor válaszolhatsz az általános tudásod alapján."""
 
 
+def turn_system_prompt(personality_prompt: Optional[str], use_rag: bool, documents_only: bool) -> str:
+    """System prompt of a turn: fixed instructions only (see ``turn_messages``)."""
+    if documents_only:
+        # Strict mode (only reached with context): only answer from documents
+        return STRICT_RAG_SYSTEM_PROMPT
+    if use_rag:
+        # Normal RAG mode, also for the turns that find no context
+        if personality_prompt:
+            return f"{personality_prompt}\n\n{NORMAL_RAG_SYSTEM_PROMPT}"
+        return NORMAL_RAG_SYSTEM_PROMPT
+    return personality_prompt or "Te egy segítőkész AI asszisztens vagy."
+
+
+def turn_messages(message_history: list, rag_context: str = "") -> list:
+    """Messages for a turn, laid out so the prompt prefix repeats.
+
+    The system prompt only holds fixed instructions and the RAG context,
+    which changes every turn, goes with the current question at the end.
+    The system prompt and the earlier turns then come out the same each
+    turn, so the model server can reuse what it computed for them (Ollama's
+    KV cache, provider-side prompt caching) and only evaluate the new turn.
+    """
+    messages = list(message_history)
+    if rag_context and messages and messages[-1]["role"] == "user":
+        messages[-1] = {"role": "user", "content": f"{rag_context}\n\n{messages[-1]['content']}"}
+    return messages
+
+
+async def pack_turn(
+    target: dict,
+    personality_prompt: Optional[str],
+    use_rag: bool,
+    documents_only: bool,
+    message_history: list,
+    rag_chunks: list,
+    summary: Optional[str] = None,
+) -> tuple:
+    """Prompt of a turn packed into the model's context window (``context_packer``).
+
+    ``summary`` is the conversation's running summary of the messages
+    before ``message_history`` (``chat_memory``); it goes in the system prompt.
+
+    Returns (system_prompt, messages, budget usage).
+    """
+    system_prompt = turn_system_prompt(personality_prompt, use_rag, documents_only)
+    if summary:
+        system_prompt = f"{system_prompt}\n\n{summary_prompt(summary)}"
+    history, chunks, usage = pack_context(await context_length(target), system_prompt, message_history, rag_chunks)
+    return system_prompt, turn_messages(history, format_rag_context(chunks) if chunks else ""), usage
+
+
 async def build_rag_context(query: str, db: Session, documents_only: bool = False) -> tuple:
     """Build RAG context from similar document chunks.
 
@@ -379,82 +450,75 @@ async def build_rag_context(query: str, db: Session, documents_only: bool = Fals
         if not relevant_chunks:
             return "", False, results  # Return raw results for debugging
 
-        context_parts = ["\n\nDOKUMENTUM KONTEXTUS (KIZÁRÓLAG ez alapján válaszolj):"]
-        context_parts.append("=" * 50)
-        for i, chunk in enumerate(relevant_chunks, 1):
-            filename = chunk.get("document_filename", "Ismeretlen")
-            content = chunk.get("content", "")
-            score = chunk.get("score", 0)
-            context_parts.append(f"\n[Részlet {i} - {filename} (relevancia: {score:.2f})]\n{content}")
-        context_parts.append("\n" + "=" * 50)
-        context_parts.append("KONTEXTUS VÉGE - Válaszolj KIZÁRÓLAG a fenti információk alapján!")
-
-        return "\n".join(context_parts), True, relevant_chunks
+        return format_rag_context(relevant_chunks), True, relevant_chunks
     except Exception as e:
         print(f"RAG context error: {e}")
         return "", False, []
 
 
+def format_rag_context(chunks: list) -> str:
+    """The RAG context given to the model, from document chunks."""
+    context_parts = ["\n\nDOKUMENTUM KONTEXTUS (KIZÁRÓLAG ez alapján válaszolj):"]
+    context_parts.append("=" * 50)
+    for i, chunk in enumerate(chunks, 1):
+        filename = chunk.get("document_filename", "Ismeretlen")
+        content = chunk.get("content", "")
+        score = chunk.get("score", 0)
+        context_parts.append(f"\n[Részlet {i} - {filename} (relevancia: {score:.2f})]\n{content}")
+    context_parts.append("\n" + "=" * 50)
+    context_parts.append("KONTEXTUS VÉGE - Válaszolj KIZÁRÓLAG a fenti információk alapján!")
+    return "\n".join(context_parts)
+
+
 async def stream_ollama_response(
     messages: list,
     ollama_url: str,
     model: str,
     system_prompt: Optional[str] = None,
-) -> AsyncGenerator[str, None]:
-    """Stream response from Ollama token by token.
+) -> AsyncGenerator[dict, None]:
+    """Stream response from Ollama (``/api/chat``) token by token.
 
-    Yields JSON strings with format: {"token": "...", "done": false}
-    Final message: {"done": true, "input_tokens": ..., "output_tokens": ...}
+    Yields {"token": "...", "done": False}
+    Final event: {"done": True, "input_tokens": ..., "output_tokens": ...}
     """
-    # Build the prompt from messages
-    prompt_parts = []
-    if system_prompt:
-        prompt_parts.append(f"System: {system_prompt}\n\n")
-
-    for msg in messages:
-        role = msg.get("role", "user")
-        content = msg.get("content", "")
-        if role == "user":
-            prompt_parts.append(f"User: {content}\n")
-        elif role == "assistant":
-            prompt_parts.append(f"Assistant: {content}\n")
-
-    full_prompt = "".join(prompt_parts)
-    input_tokens = estimate_tokens(full_prompt)
+    chat_messages = ollama_chat_messages(messages, system_prompt)
+    input_tokens = estimate_tokens("".join(m["content"] for m in chat_messages))
     output_text = ""
 
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        async with client.stream(
-            "POST",
-            f"{ollama_url}/api/generate",
-            json={
-                "model": model,
-                "prompt": full_prompt,
-                "stream": True,
-            }
-        ) as response:
-            async for line in response.aiter_lines():
-                if not line:
-                    continue
-                try:
-                    data = json.loads(line)
-                    token = data.get("response", "")
-                    done = data.get("done", False)
-                    output_text += token
-
-                    if done:
-                        # Final message with token counts
-                        output_tokens = data.get("eval_count", estimate_tokens(output_text))
-                        final_input = data.get("prompt_eval_count", input_tokens)
-                        yield json.dumps({
-                            "done": True,
-                            "input_tokens": final_input,
-                            "output_tokens": output_tokens,
-                        })
-                    else:
-                        yield json.dumps({"token": token, "done": False})
-                except json.JSONDecodeError:
-                    continue
+    client = get_http_client("ollama")
+    async with client.stream(
+        "POST",
+        f"{ollama_url}/api/chat",
+        timeout=provider_timeout("ollama", 120.0),
+        json={
+            "model": model,
+            "messages": chat_messages,
+            "stream": True,
+            **ollama_request_options(),
+        }
+    ) as response:
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+                token = data.get("message", {}).get("content", "")
+                done = data.get("done", False)
+                output_text += token
+
+                if done:
+                    # Final message with token counts
+                    output_tokens = data.get("eval_count", estimate_tokens(output_text))
+                    final_input = data.get("prompt_eval_count", input_tokens)
+                    yield {
+                        "done": True,
+                        "input_tokens": final_input,
+                        "output_tokens": output_tokens,
+                    }
+                else:
+                    yield {"token": token, "done": False}
+            except json.JSONDecodeError:
+                continue
 
 
 async def stream_openrouter_response(
@@ -462,11 +526,11 @@ async def stream_openrouter_response(
     api_key: str,
     model: str,
     system_prompt: Optional[str] = None,
-) -> AsyncGenerator[str, None]:
+) -> AsyncGenerator[dict, None]:
     """Stream response from OpenRouter token by token.
 
-    Yields JSON strings with format: {"token": "...", "done": false}
-    Final message: {"done": true, "input_tokens": ..., "output_tokens": ...}
+    Yields {"token": "...", "done": False}
+    Final event: {"done": True, "input_tokens": ..., "output_tokens": ...}
     """
     api_messages = []
     if system_prompt:
@@ -481,45 +545,46 @@ async def stream_openrouter_response(
     output_text = ""
     input_tokens = estimate_tokens(str(api_messages))
 
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        async with client.stream(
-            "POST",
-            f"{DEFAULT_OPENROUTER_URL}/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": model,
-                "messages": api_messages,
-                "stream": True,
-            }
-        ) as response:
-            async for line in response.aiter_lines():
-                if not line or not line.startswith("data: "):
-                    continue
-
-                data_str = line[6:]  # Remove "data: " prefix
-                if data_str == "[DONE]":
-                    output_tokens = estimate_tokens(output_text)
-                    yield json.dumps({
-                        "done": True,
-                        "input_tokens": input_tokens,
-                        "output_tokens": output_tokens,
-                    })
-                    break
-
-                try:
-                    data = json.loads(data_str)
-                    choices = data.get("choices", [])
-                    if choices:
-                        delta = choices[0].get("delta", {})
-                        token = delta.get("content", "")
-                        if token:
-                            output_text += token
-                            yield json.dumps({"token": token, "done": False})
-                except json.JSONDecodeError:
-                    continue
+    client = get_http_client("openrouter")
+    async with client.stream(
+        "POST",
+        f"{DEFAULT_OPENROUTER_URL}/chat/completions",
+        timeout=provider_timeout("openrouter", 120.0),
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        },
+        json={
+            "model": model,
+            "messages": api_messages,
+            "stream": True,
+        }
+    ) as response:
+        async for line in response.aiter_lines():
+            if not line or not line.startswith("data: "):
+                continue
+
+            data_str = line[6:]  # Remove "data: " prefix
+            if data_str == "[DONE]":
+                output_tokens = estimate_tokens(output_text)
+                yield {
+                    "done": True,
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                }
+                break
+
+            try:
+                data = json.loads(data_str)
+                choices = data.get("choices", [])
+                if choices:
+                    delta = choices[0].get("delta", {})
+                    token = delta.get("content", "")
+                    if token:
+                        output_text += token
+                        yield {"token": token, "done": False}
+            except json.JSONDecodeError:
+                continue
 
 
 @router.websocket("/conversations/{conv_id}/stream")
@@ -528,6 +593,8 @@ async def stream_message(websocket: WebSocket, conv_id: int):
 
     Protocol:
     1. Client sends: {"content": "user message", "use_rag": true/false}
+       The first message may add "coalesce": true (or {"interval_ms": .., "max_chars": ..})
+       for fewer, larger token frames; the server confirms with {"coalesce": {...}}
     2. Server streams: {"token": "...", "done": false}
     3. Server finishes: {"done": true, "input_tokens": ..., "output_tokens": ..., "message_id": ...}
     """
@@ -548,6 +615,8 @@ async def stream_message(websocket: WebSocket, conv_id: int):
             await websocket.close()
             return
 
+        coalescing = None
+        first_message = True
         while True:
             # Wait for message from client
             try:
@@ -555,6 +624,14 @@ async def stream_message(websocket: WebSocket, conv_id: int):
             except WebSocketDisconnect:
                 break
 
+            # Frame coalescing is negotiated once per connection
+            if first_message:
+                first_message = False
+                coalescing = negotiate_coalescing(data)
+                if coalescing:
+                    await websocket.send_json({"coalesce": coalescing})
+            coalescer = TokenCoalescer(websocket.send_text, coalescing)
+
             content = data.get("content", "").strip()
             use_rag = data.get("use_rag", True)
             documents_only = data.get("documents_only", False)
@@ -575,13 +652,13 @@ async def stream_message(websocket: WebSocket, conv_id: int):
             db.refresh(user_message)
 
             # Build message history with context size limit
-            message_history = build_message_history(db, conv_id)
+            message_history = build_message_history(db, conv_id, after_message_id=conversation.summary_through_id)
 
             # Build RAG context if enabled
-            rag_context = ""
+            rag_chunks = []
             has_context = False
             if use_rag or documents_only:
-                rag_context, has_context, _raw_results = await build_rag_context(content, db, documents_only)
+                _rag_context, has_context, rag_chunks = await build_rag_context(content, db, documents_only)
 
             # FORCED RAG MODE: If documents_only and no context found,
             # do NOT send to LLM - return fixed message directly
@@ -597,81 +674,58 @@ async def stream_message(websocket: WebSocket, conv_id: int):
                 db.add(assistant_message)
                 db.commit()
                 db.refresh(assistant_message)
-                # Stream the fixed message token-by-token for consistent UX
-                for word in forced_response.split(" "):
-                    await websocket.send_text(json.dumps({"token": word + " ", "done": False}))
-                await websocket.send_text(json.dumps({
+                if coalescing:
+                    # All of it is at hand: one frame
+                    await coalescer.add(forced_response)
+                else:
+                    # Stream the fixed message token-by-token for consistent UX
+                    for word in forced_response.split(" "):
+                        await coalescer.add(word + " ")
+                await coalescer.send({
                     "done": True,
                     "input_tokens": 0,
                     "output_tokens": 0,
                     "user_message_id": user_message.id,
                     "assistant_message_id": assistant_message.id,
-                }))
+                })
                 continue
 
-            # Get settings and provider
-            settings = get_ai_settings(db)
+            # Get provider, model and connection settings
             provider = conversation.ai_provider or "ollama"
+            try:
+                target = resolve_chat_target(db, provider, conversation.model_name)
+            except ValueError as e:
+                # OpenRouter API kulcs nincs beállítva
+                await websocket.send_json({"error": str(e)})
+                continue
+            model = target["model"]
 
             # Get system prompt from personality settings
             personality_prompt = get_personality_system_prompt(db, provider)
 
-            # Build system prompt based on mode
-            if documents_only and has_context:
-                # Strict mode with context: only answer from documents
-                system_prompt = f"{STRICT_RAG_SYSTEM_PROMPT}\n\n{rag_context}"
-            elif has_context:
-                # Normal RAG mode with context found
-                system_prompt = f"{NORMAL_RAG_SYSTEM_PROMPT}\n\n{rag_context}"
-                if personality_prompt:
-                    system_prompt = f"{personality_prompt}\n\n{system_prompt}"
-            else:
-                # No RAG or no context - use personality or default
-                system_prompt = personality_prompt or "Te egy segítőkész AI asszisztens vagy."
-
             try:
-                full_response = ""
-                input_tokens = 0
-                output_tokens = 0
+                system_prompt, message_history, context_usage = await pack_turn(
+                    target, personality_prompt, use_rag, documents_only, message_history, rag_chunks if has_context else [],
+                    conversation.summary,
+                )
 
                 if provider == "openrouter":
-                    api_key = settings.get("openrouter_api_key")
-                    if not api_key:
-                        await websocket.send_json({"error": "OpenRouter API kulcs nincs beállítva."})
-                        continue
-
-                    model = conversation.model_name or settings.get("openrouter_model") or DEFAULT_OPENROUTER_MODEL
-
-                    async for chunk in stream_openrouter_response(
+                    events = stream_openrouter_response(
                         messages=message_history,
-                        api_key=api_key,
+                        api_key=target["api_key"],
                         model=model,
                         system_prompt=system_prompt,
-                    ):
-                        data = json.loads(chunk)
-                        if data.get("done"):
-                            input_tokens = data.get("input_tokens", 0)
-                            output_tokens = data.get("output_tokens", 0)
-                        else:
-                            full_response += data.get("token", "")
-                        await websocket.send_text(chunk)
+                    )
                 else:
-                    ollama_url = settings.get("ollama_url") or settings.get("ollama_base_url") or DEFAULT_OLLAMA_URL
-                    model = conversation.model_name or settings.get("ollama_model") or DEFAULT_OLLAMA_MODEL
-
-                    async for chunk in stream_ollama_response(
+                    events = stream_ollama_response(
                         messages=message_history,
-                        ollama_url=ollama_url,
+                        ollama_url=target["ollama_url"],
                         model=model,
                         system_prompt=system_prompt,
-                    ):
-                        data = json.loads(chunk)
-                        if data.get("done"):
-                            input_tokens = data.get("input_tokens", 0)
-                            output_tokens = data.get("output_tokens", 0)
-                        else:
-                            full_response += data.get("token", "")
-                        await websocket.send_text(chunk)
+                    )
+
+                full_response, input_tokens, output_tokens, ttft = await relay_stream(events, coalescer)
+                ttft_ms = round(ttft * 1000) if ttft is not None else None
 
                 # Save assistant message
                 assistant_message = ChatMessage(
@@ -679,6 +733,7 @@ async def stream_message(websocket: WebSocket, conv_id: int):
                     role="assistant",
                     content=full_response,
                     tokens_used=output_tokens,
+                    ttft_ms=ttft_ms,
                 )
                 db.add(assistant_message)
 
@@ -699,6 +754,9 @@ async def stream_message(websocket: WebSocket, conv_id: int):
                     cost=0.0,  # Cost tracking handled separately for OpenRouter
                 )
 
+                # Fold older messages into the conversation's summary once there are enough
+                schedule_summary(db, conversation)
+
                 # Send final message with IDs
                 await websocket.send_json({
                     "done": True,
@@ -706,6 +764,8 @@ async def stream_message(websocket: WebSocket, conv_id: int):
                     "assistant_message_id": assistant_message.id,
                     "input_tokens": input_tokens,
                     "output_tokens": output_tokens,
+                    "ttft_ms": ttft_ms,
+                    "context": context_usage,
                 })
 
             except Exception as e:
@@ -750,11 +810,11 @@ async def send_message_with_rag(
     db.refresh(user_message)
 
     # Build message history with context size limit
-    message_history = build_message_history(db, conv_id)
+    message_history = build_message_history(db, conv_id, after_message_id=conversation.summary_through_id)
 
     # Build RAG context
     documents_only = request.documents_only or False
-    rag_context, has_context, _raw = await build_rag_context(request.content, db, documents_only)
+    _rag_context, has_context, rag_chunks = await build_rag_context(request.content, db, documents_only)
 
     # FORCED RAG MODE: If documents_only and no context, return fixed message
     if documents_only and not has_context:
@@ -780,26 +840,23 @@ async def send_message_with_rag(
     # Get system prompt from personality settings (request.system_prompt can override)
     personality_prompt = request.system_prompt or get_personality_system_prompt(db, provider)
 
-    # Build system prompt based on mode
-    if documents_only and has_context:
-        system_prompt = f"{STRICT_RAG_SYSTEM_PROMPT}\n\n{rag_context}"
-    elif has_context:
-        # Normal RAG mode with context found
-        system_prompt = f"{NORMAL_RAG_SYSTEM_PROMPT}\n\n{rag_context}"
-        if personality_prompt:
-            system_prompt = f"{personality_prompt}\n\n{system_prompt}"
-    else:
-        # No RAG or no context - use personality or default
-        system_prompt = personality_prompt or "Te egy segítőkész AI asszisztens vagy."
-
     # Get AI response
     try:
-        response_text, input_tokens, output_tokens = await send_chat_message_with_provider(
-            messages=message_history,
+        target = resolve_chat_target(db, provider=provider, model_name=conversation.model_name or "")
+        system_prompt, message_history, _usage = await pack_turn(
+            target, personality_prompt, True, documents_only, message_history, rag_chunks if has_context else [],
+            conversation.summary,
+        )
+        response_text, input_tokens, output_tokens, cost_usd = await chat_with_target(
+            target, message_history, system_prompt
+        )
+        save_token_usage(
             db=db,
-            provider=provider,
-            model_name=conversation.model_name or "",
-            system_prompt=system_prompt,
+            provider=target["provider"],
+            model_name=target["model"],
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cost=cost_usd,
         )
     except Exception as e:
         db.delete(user_message)
@@ -822,6 +879,9 @@ async def send_message_with_rag(
     db.refresh(assistant_message)
     db.refresh(user_message)
 
+    # Fold older messages into the conversation's summary once there are enough
+    schedule_summary(db, conversation)
+
     return SendMessageResponse(
         user_message=ChatMessageResponse.model_validate(user_message),
         assistant_message=ChatMessageResponse.model_validate(assistant_message),
@@ -3,6 +3,7 @@ from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from typing import List, Optional
+import asyncio
 import os
 import uuid
 import shutil
@@ -11,8 +12,15 @@ import json
 
 from app.core.database import get_db
 from app.models.models import Document, DocumentChunk
-from app.schemas.schemas import DocumentResponse, DocumentUpdate, DocumentPreviewResponse, DocumentSearchResult, DocumentSummaryResponse
+from app.schemas.schemas import DocumentResponse, KnowledgeToggleResponse, DocumentUpdate, DocumentPreviewResponse, DocumentSearchResult, DocumentSummaryResponse
 from app.routers.websocket_router import broadcast_notification
+from app.services import fulltext_index
+from app.services.text_store import (
+    content_hash,
+    get_document_text,
+    get_document_text_async,
+    invalidate_unused,
+)
 
 router = APIRouter(prefix="/documents")
 
@@ -31,132 +39,6 @@ MAX_VERSIONS = 2
 ALLOWED_EXTENSIONS = {".pdf", ".docx", ".xlsx", ".txt"}
 
 
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text content from a PDF file."""
-    try:
-        from PyPDF2 import PdfReader
-        reader = PdfReader(file_path)
-        text_parts = []
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                text_parts.append(text)
-        return "\n\n".join(text_parts)
-    except Exception as e:
-        return f"[Hiba a PDF olvasásakor: {str(e)}]"
-
-
-def extract_text_from_docx(file_path: str) -> str:
-    """Extract text content from a DOCX file."""
-    try:
-        from docx import Document as DocxDocument
-        doc = DocxDocument(file_path)
-        paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
-        return "\n\n".join(paragraphs)
-    except Exception as e:
-        return f"[Hiba a DOCX olvasásakor: {str(e)}]"
-
-
-def extract_text_from_xlsx(file_path: str) -> tuple:
-    """Extract content from an XLSX file as both text and table data."""
-    try:
-        from openpyxl import load_workbook
-        wb = load_workbook(file_path, data_only=True)
-
-        text_parts = []
-        all_table_data = []
-
-        for sheet_name in wb.sheetnames:
-            sheet = wb[sheet_name]
-            text_parts.append(f"--- Munkalap: {sheet_name} ---")
-
-            sheet_data = []
-            for row in sheet.iter_rows(values_only=True):
-                row_values = [str(cell) if cell is not None else "" for cell in row]
-                if any(v.strip() for v in row_values):
-                    sheet_data.append(row_values)
-                    text_parts.append("\t".join(row_values))
-
-            if sheet_data:
-                all_table_data.extend(sheet_data)
-
-        return "\n".join(text_parts), all_table_data
-    except Exception as e:
-        return f"[Hiba az XLSX olvasásakor: {str(e)}]", None
-
-
-def extract_text_from_txt(file_path: str) -> str:
-    """Read text content from a TXT file."""
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            return f.read()
-    except UnicodeDecodeError:
-        try:
-            with open(file_path, "r", encoding="latin-1") as f:
-                return f.read()
-        except Exception as e:
-            return f"[Hiba a TXT olvasásakor: {str(e)}]"
-    except Exception as e:
-        return f"[Hiba a TXT olvasásakor: {str(e)}]"
-
-
-def extract_document_content(file_path: str, file_type: str) -> tuple:
-    """Extract content from a document based on its type.
-
-    Returns (text_content, table_data) where table_data is only set for XLSX files.
-    """
-    if not os.path.exists(file_path):
-        return None, None
-
-    file_type = file_type.lower() if file_type else ""
-
-    if file_type == "pdf":
-        return extract_text_from_pdf(file_path), None
-    elif file_type == "docx":
-        return extract_text_from_docx(file_path), None
-    elif file_type == "xlsx":
-        return extract_text_from_xlsx(file_path)
-    elif file_type == "txt":
-        return extract_text_from_txt(file_path), None
-    else:
-        return None, None
-
-
-def highlight_search_matches(text: str, query: str) -> list:
-    """Find and highlight search matches in text.
-
-    Returns a list of SearchMatch objects with line numbers and highlighted text.
-    """
-    if not text or not query:
-        return []
-
-    query_lower = query.lower()
-    lines = text.split("\n")
-    matches = []
-
-    for line_num, line in enumerate(lines, start=1):
-        if query_lower in line.lower():
-            # Find all match positions and create highlighted version
-            highlighted = line
-            start_idx = 0
-            while True:
-                pos = highlighted.lower().find(query_lower, start_idx)
-                if pos == -1:
-                    break
-                # Insert highlight markers
-                match_text = highlighted[pos:pos + len(query)]
-                highlighted = highlighted[:pos] + f"**{match_text}**" + highlighted[pos + len(query):]
-                start_idx = pos + len(query) + 4  # Account for added markers
-
-            matches.append({
-                "line_number": line_num,
-                "text": line.strip(),
-                "highlighted_text": highlighted.strip()
-            })
-
-    return matches
-
-
 def get_file_extension(filename: str) -> str:
     """Extract file extension from filename."""
     if not filename:
@@ -261,6 +143,10 @@ async def upload_document(
             existing_doc.parent_id = existing_doc.id
             db.commit()
 
+        # The replaced content is no longer previewed or searched
+        invalidate_unused(db, existing_doc.content_hash)
+        fulltext_index.remove_document(existing_doc.id)
+
     # Generate unique filename
     file_ext = get_file_extension(file.filename)
     unique_filename = f"{uuid.uuid4()}{file_ext}"
@@ -278,6 +164,7 @@ async def upload_document(
         file_path=file_path,
         file_type=file_ext.lstrip(".") if file_ext else None,
         file_size=len(content),
+        content_hash=content_hash(content),
         category=category if category else (existing_doc.category if existing_doc else None),
         is_knowledge=is_knowledge_base if not existing_doc else existing_doc.is_knowledge,
         version=new_version,
@@ -287,6 +174,13 @@ async def upload_document(
     db.commit()
     db.refresh(document)
 
+    # Extract the text once; preview, search, summarize and indexing reuse it
+    try:
+        text_content, _ = await get_document_text_async(document, db)
+        await asyncio.to_thread(fulltext_index.index_document, document.id, document.content_hash, text_content)
+    except Exception as e:
+        print(f"[Documents] Szöveg kinyerése feltöltéskor sikertelen: {e}")
+
     return document
 
 
@@ -340,28 +234,32 @@ def search_documents(
     results = []
 
     if content_search:
-        # Search within document content
-        all_docs = db.query(Document).filter(
-            Document.parent_id.is_(None)  # Only current versions
-        ).order_by(Document.created_at.desc()).limit(100).all()
-
-        for doc in all_docs:
-            text_content, _ = extract_document_content(doc.file_path, doc.file_type)
-
-            if text_content:
-                matches = highlight_search_matches(text_content, q)
-
-                if matches:
-                    results.append({
-                        "id": doc.id,
-                        "original_filename": doc.original_filename,
-                        "file_type": doc.file_type,
-                        "file_size": doc.file_size,
-                        "category": doc.category,
-                        "created_at": doc.created_at,
-                        "matches": matches[:10],  # Limit matches per document
-                        "match_count": len(matches)
-                    })
+        # Ranked hits from the full-text index, narrowed to current versions
+        hits = fulltext_index.search(q, limit=50)
+        hit_docs = {
+            doc.id: doc
+            for doc in db.query(Document).filter(
+                Document.id.in_([hit["document_id"] for hit in hits]),
+                Document.parent_id.is_(None)  # Only current versions
+            ).all()
+        } if hits else {}
+
+        for hit in hits:
+            doc = hit_docs.get(hit["document_id"])
+            if doc is None or not hit["matches"]:
+                continue
+            results.append({
+                "id": doc.id,
+                "original_filename": doc.original_filename,
+                "file_type": doc.file_type,
+                "file_size": doc.file_size,
+                "category": doc.category,
+                "created_at": doc.created_at,
+                "matches": hit["matches"],
+                "match_count": hit["match_count"],
+                "score": hit["score"],
+                "snippet": hit["snippet"],
+            })
 
         # Also include filename matches that weren't found in content search
         filename_match_ids = {r["id"] for r in results}
@@ -449,7 +347,7 @@ def preview_document(doc_id: int, db: Session = Depends(get_db)):
         )
 
     # For other types, extract content
-    text_content, table_data = extract_document_content(document.file_path, file_type)
+    text_content, table_data = get_document_text(document, db)
 
     if text_content and text_content.startswith("[Hiba"):
         return DocumentPreviewResponse(
@@ -591,6 +489,15 @@ def delete_document(doc_id: int, db: Session = Depends(get_db)):
     if os.path.exists(document.file_path):
         os.remove(document.file_path)
 
+    # Drop its vectors and cached chunk texts from the RAG index
+    if document.is_knowledge:
+        from app.services.rag_service import remove_document_vectors
+        remove_document_vectors(doc_id, db)
+
+    # Drop its stored text unless another document has the same content
+    invalidate_unused(db, document.content_hash, exclude_id=doc_id)
+    fulltext_index.remove_document(doc_id)
+
     # Delete database record
     db.delete(document)
     db.commit()
@@ -629,106 +536,59 @@ def delete_document_chunks(document_id: int, db: Session):
     db.commit()
 
 
-@router.post("/{doc_id}/toggle-knowledge", response_model=DocumentResponse)
-async def toggle_knowledge(doc_id: int, db: Session = Depends(get_db)):
+@router.post("/{doc_id}/toggle-knowledge", response_model=KnowledgeToggleResponse)
+def toggle_knowledge(doc_id: int, db: Session = Depends(get_db)):
     """Toggle the is_knowledge flag for a document.
 
-    When adding to knowledge base:
+    The flag changes immediately; the indexing work runs as a background
+    job (see /jobs/{job_id}, progress via the "job.progress" WebSocket event).
+
+    When adding to knowledge base, the job:
     - Extracts text from document
     - Creates chunks using hybrid chunking (semantic + 500 token limit)
     - Generates embeddings with Ollama
     - Updates FAISS index and stores chunks in DocumentChunk table
 
-    When removing from knowledge base:
+    When removing from knowledge base, the job:
     - Deletes all document chunks from DB and FAISS index
     """
-    from app.services.rag_service import index_document, remove_document_from_index
-    from app.models.models import AIKnowledgeLog
+    from app.services.job_queue import enqueue_job
 
     document = db.query(Document).filter(Document.id == doc_id).first()
 
     if not document:
         raise HTTPException(status_code=404, detail="Dokumentum nem található")
 
-    # Toggle the flag
+    # Toggle the flag (committed together with the job)
     new_state = not document.is_knowledge
     document.is_knowledge = new_state
 
-    if new_state:
-        # Adding to knowledge base - index document with RAG pipeline
-        chunks_created, error = await index_document(document, db)
-        if error and chunks_created == 0:
-            # Rollback if complete failure
-            document.is_knowledge = False
-            db.commit()
-            # Log failed attempt
-            log_entry = AIKnowledgeLog(
-                document_id=doc_id,
-                action="added",
-                chunks_processed=0,
-                status="failed",
-                error_message=error,
-            )
-            db.add(log_entry)
-            db.commit()
-            raise HTTPException(status_code=500, detail=error)
-
-        # Log successful addition
-        log_entry = AIKnowledgeLog(
-            document_id=doc_id,
-            action="added",
-            chunks_processed=chunks_created,
-            status="completed" if not error else "partial",
-            error_message=error,
-        )
-        db.add(log_entry)
-    else:
-        # Get chunk count before removal for logging
-        chunk_count = db.query(DocumentChunk).filter(DocumentChunk.document_id == doc_id).count()
-
-        # Removing from knowledge base - delete from index
-        await remove_document_from_index(doc_id, db)
-
-        # Log removal
-        log_entry = AIKnowledgeLog(
-            document_id=doc_id,
-            action="removed",
-            chunks_processed=chunk_count,
-            status="completed",
-        )
-        db.add(log_entry)
-
-    db.commit()
+    job = enqueue_job(
+        db,
+        "index_document" if new_state else "remove_document",
+        document_id=doc_id,
+    )
     db.refresh(document)
 
-    # Send notification for document knowledge base processing
-    if new_state:
-        await broadcast_notification(
-            message=f"'{document.original_filename}' hozzáadva a tudásbázishoz",
-            level="success",
-            title="Dokumentum feldolgozás kész",
-            action_url="/knowledge"
-        )
-    else:
-        await broadcast_notification(
-            message=f"'{document.original_filename}' eltávolítva a tudásbázisból",
-            level="info",
-            title="Dokumentum eltávolítva",
-            action_url="/knowledge"
-        )
-
-    return document
+    return KnowledgeToggleResponse.model_validate(document).model_copy(
+        update={"job_id": job.id, "job_status": job.status}
+    )
 
 
 @router.post("/{doc_id}/summarize", response_model=DocumentSummaryResponse)
-async def summarize_document(doc_id: int, db: Session = Depends(get_db)):
+async def summarize_document(
+    doc_id: int,
+    bypass_cache: bool = Query(False, description="Generate a new summary even if a cached one exists"),
+    db: Session = Depends(get_db),
+):
     """Generate AI summary for a document.
 
     Uses the configured AI provider (Ollama or OpenRouter) to generate
     a summary of the document content. The summary is stored in the
-    document's summary field.
+    document's summary field. Unchanged content with the same model is
+    answered from the LLM response cache unless ``bypass_cache`` is set.
     """
-    from app.services.ai_service import get_ai_settings, send_chat_message
+    from app.services.llm_cache import cached_chat_message
 
     document = db.query(Document).filter(Document.id == doc_id).first()
 
@@ -736,7 +596,7 @@ async def summarize_document(doc_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Dokumentum nem található")
 
     # Extract document content
-    text_content, _ = extract_document_content(document.file_path, document.file_type)
+    text_content, _ = await get_document_text_async(document, db)
 
     if not text_content:
         raise HTTPException(
@@ -771,10 +631,11 @@ Készítsd el az összefoglalót magyar nyelven!"""
 
     try:
         # Generate summary using AI
-        summary_text, _, _ = await send_chat_message(
+        summary_text, _, _ = await cached_chat_message(
             messages=[{"role": "user", "content": user_message}],
             db=db,
             system_prompt=system_prompt,
+            bypass_cache=bypass_cache,
         )
 
         # Save summary to document
@@ -820,16 +681,21 @@ def get_rag_stats(db: Session = Depends(get_db)):
 
 
 @router.post("/rag/reindex")
-async def reindex_knowledge_base(db: Session = Depends(get_db)):
+def reindex_knowledge_base(db: Session = Depends(get_db)):
     """Reindex all documents marked as knowledge base.
 
     This will regenerate chunks and embeddings for all is_knowledge=true documents.
     Useful for rebuilding the index after model changes or data corruption.
+    Runs as a background job; the statistics end up in the job's result.
     """
-    from app.services.rag_service import reindex_all_knowledge_documents
+    from app.services.job_queue import enqueue_job
 
-    result = await reindex_all_knowledge_documents(db)
-    return result
+    job = enqueue_job(db, "reindex_all")
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "message": "Újraindexelés sorba állítva",
+    }
 
 
 @router.post("/rag/search")
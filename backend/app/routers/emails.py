@@ -1,32 +1,30 @@
 import os
 import uuid
-import asyncio
-import json
-import re
 from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from sqlalchemy.orm import Session
 
 from fastapi.responses import FileResponse
 from app.core.database import get_db
 from app.core.config import settings
-from app.models.models import Email, EmailAttachment, EmailTaskLink, AppSetting, ProcessInstance, ProcessType
+from app.models.models import Email, EmailAttachment, EmailTaskLink, AppSetting, ProcessInstance, ProcessType, BackgroundJob
 from app.schemas.schemas import (
     EmailResponse,
     EmailWithAttachments,
     PSTImportResult,
-    EmailCategorizationResult,
-    EmailCategorizationItem,
     EmailImportanceUpdate,
     EmailTaskLinkCreate,
     EmailTaskLinkResponse,
     EmailTaskLinkBrief,
     EmailAutoLinkItem,
     EmailAutoLinkResult,
+    BackgroundJobResponse,
 )
-from app.routers.websocket_router import broadcast, broadcast_notification
-from app.services.ai_service import send_chat_message
+from app.services.email_jobs import pst_import_result
+from app.services.email_linking import confident_match, match_tasks, monthly_tasks, prematched_first, suggest_links
+from app.services.job_queue import FINISHED_STATUSES, enqueue_job, job_to_dict, requeue_job
+from app.services.pst_import import save_upload, send_progress
 
 router = APIRouter(prefix="/emails")
 
@@ -192,7 +190,7 @@ def update_email_importance(
 
 @router.get("/{email_id}/attachments/{attachment_id}/download")
 def download_attachment(email_id: int, attachment_id: int, db: Session = Depends(get_db)):
-    """Download an email attachment."""
+    """Download an email attachment (Range requests are answered with 206 Partial Content)."""
     attachment = db.query(EmailAttachment).filter(
         EmailAttachment.id == attachment_id,
         EmailAttachment.email_id == email_id
@@ -210,307 +208,21 @@ def download_attachment(email_id: int, attachment_id: int, db: Session = Depends
     )
 
 
-async def send_progress(event_type: str, data: dict):
-    """Helper to send progress updates."""
-    try:
-        await broadcast(event_type, data)
-    except Exception:
-        pass  # Ignore broadcast errors
-
-
-def extract_message_id_from_headers(headers: str) -> Optional[str]:
-    """Extract Message-ID from email headers."""
-    if not headers:
-        return None
-    for line in headers.split('\n'):
-        if line.lower().startswith('message-id:'):
-            return line.split(':', 1)[1].strip()
-    return None
-
-
-def process_pst_message(message, db: Session) -> dict:
-    """Process a single PST message and return result info."""
-    result = {"imported": False, "skipped": False, "error": None, "subject": ""}
-
-    try:
-        # Get message ID for deduplication
-        message_id = None
-        try:
-            headers = message.get_transport_headers()
-            message_id = extract_message_id_from_headers(headers)
-        except Exception:
-            pass
-
-        # Generate a unique ID if none found
-        if not message_id:
-            message_id = f"pst-import-{uuid.uuid4()}"
-
-        # Check for duplicates
-        existing = db.query(Email).filter(Email.message_id == message_id).first()
-        if existing:
-            result["skipped"] = True
-            result["subject"] = message.subject or "(no subject)"
-            return result
-
-        # Extract email data
-        subject = message.subject or ""
-        result["subject"] = subject
-
-        sender = ""
-        try:
-            sender = message.sender_name or ""
-            if message.sender_email_address:
-                sender = f"{sender} <{message.sender_email_address}>" if sender else message.sender_email_address
-        except Exception:
-            pass
-
-        recipients = ""
-        try:
-            recipient_list = []
-            for j in range(message.get_number_of_recipients()):
-                recipient = message.get_recipient(j)
-                if recipient:
-                    name = recipient.name or ""
-                    email_addr = recipient.email_address or ""
-                    if name and email_addr:
-                        recipient_list.append(f"{name} <{email_addr}>")
-                    elif email_addr:
-                        recipient_list.append(email_addr)
-                    elif name:
-                        recipient_list.append(name)
-            recipients = ", ".join(recipient_list)
-        except Exception:
-            pass
-
-        body = ""
-        try:
-            body = message.plain_text_body or ""
-            if not body:
-                body = message.html_body or ""
-        except Exception:
-            pass
-
-        received_date = None
-        try:
-            received_date = message.delivery_time
-        except Exception:
-            pass
-
-        # Create email record
-        email = Email(
-            message_id=message_id,
-            subject=subject[:1000] if subject else None,
-            sender=sender[:500] if sender else None,
-            recipients=recipients if recipients else None,
-            body=body if body else None,
-            received_date=received_date,
-            importance="Közepes",
-            is_read=False,
-        )
-        db.add(email)
-        db.flush()
-
-        # Process attachments
-        try:
-            for k in range(message.get_number_of_attachments()):
-                attachment = message.get_attachment(k)
-                if attachment:
-                    filename = attachment.name or f"attachment_{k}"
-                    # Sanitize filename
-                    safe_filename = "".join(c for c in filename if c.isalnum() or c in "._- ")
-                    if not safe_filename:
-                        safe_filename = f"attachment_{k}"
-
-                    # Create unique filepath
-                    unique_name = f"{uuid.uuid4()}_{safe_filename}"
-                    file_path = os.path.join(settings.EMAIL_ATTACHMENTS_DIR, unique_name)
-
-                    # Save attachment
-                    try:
-                        data = attachment.read_buffer(attachment.get_size())
-                        if data:
-                            with open(file_path, 'wb') as f:
-                                f.write(data)
-
-                            # Create attachment record
-                            email_attachment = EmailAttachment(
-                                email_id=email.id,
-                                filename=filename[:500],
-                                file_path=file_path,
-                                file_size=len(data),
-                                content_type=attachment.mime_type or "application/octet-stream"
-                            )
-                            db.add(email_attachment)
-                    except Exception as e:
-                        result["error"] = f"Attachment error for '{filename}': {str(e)}"
-        except Exception as e:
-            result["error"] = f"Attachment processing error: {str(e)}"
-
-        result["imported"] = True
-
-    except Exception as e:
-        result["error"] = f"Message processing error: {str(e)}"
-
-    return result
-
-
-def collect_messages_from_folder(folder) -> list:
-    """Recursively collect all messages from a folder and its subfolders."""
-    messages = []
-
-    # Get messages from current folder
-    for i in range(folder.get_number_of_sub_messages()):
-        messages.append(folder.get_sub_message(i))
-
-    # Get messages from subfolders
-    for i in range(folder.get_number_of_sub_folders()):
-        messages.extend(collect_messages_from_folder(folder.get_sub_folder(i)))
-
-    return messages
-
-
-async def process_pst_file(pst_path: str, db: Session) -> PSTImportResult:
-    """Process a PST file and import emails with deduplication."""
-    try:
-        import pypff
-    except ImportError:
-        return PSTImportResult(
-            success=False,
-            total_emails=0,
-            imported=0,
-            skipped=0,
-            errors=["pypff library not installed"]
-        )
-
-    result = {
-        "total": 0,
-        "imported": 0,
-        "skipped": 0,
-        "errors": []
-    }
-
-    # Ensure email attachments directory exists
-    os.makedirs(settings.EMAIL_ATTACHMENTS_DIR, exist_ok=True)
-
-    try:
-        pst_file = pypff.file()
-        pst_file.open(pst_path)
-
-        # Get root folder
-        root = pst_file.get_root_folder()
-
-        # Collect all messages first
-        all_messages = collect_messages_from_folder(root)
-        total_emails = len(all_messages)
-        result["total"] = total_emails
-
-        # Broadcast initial progress
-        await send_progress("pst_import.progress", {
-            "status": "processing",
-            "current": 0,
-            "total": total_emails,
-            "imported": 0,
-            "skipped": 0,
-            "message": "Starting import..."
-        })
-
-        # Process each message
-        for idx, message in enumerate(all_messages):
-            msg_result = process_pst_message(message, db)
-
-            if msg_result["imported"]:
-                result["imported"] += 1
-            elif msg_result["skipped"]:
-                result["skipped"] += 1
-
-            if msg_result["error"]:
-                result["errors"].append(msg_result["error"])
-
-            # Broadcast progress every 10 emails or on skip
-            if (idx + 1) % 10 == 0 or msg_result["skipped"]:
-                status_msg = f"Skipped duplicate: {msg_result['subject'][:50]}" if msg_result["skipped"] else f"Importing: {msg_result['subject'][:50]}..."
-                await send_progress("pst_import.progress", {
-                    "status": "processing",
-                    "current": idx + 1,
-                    "total": total_emails,
-                    "imported": result["imported"],
-                    "skipped": result["skipped"],
-                    "message": status_msg
-                })
-
-            # Yield control periodically
-            if (idx + 1) % 50 == 0:
-                await asyncio.sleep(0)
-
-        pst_file.close()
-        db.commit()
-
-        # Broadcast completion
-        await send_progress("pst_import.progress", {
-            "status": "completed",
-            "current": total_emails,
-            "total": total_emails,
-            "imported": result["imported"],
-            "skipped": result["skipped"],
-            "message": f"Import completed: {result['imported']} imported, {result['skipped']} skipped"
-        })
-
-        # Send notification for PST import completion
-        if result["imported"] > 0:
-            await broadcast_notification(
-                message=f"PST import kész: {result['imported']} email importálva",
-                level="success",
-                title="PST Import kész",
-                action_url="/emails"
-            )
-
-    except Exception as e:
-        db.rollback()
-        result["errors"].append(f"PST processing error: {str(e)}")
-        await send_progress("pst_import.progress", {
-            "status": "error",
-            "current": 0,
-            "total": 0,
-            "imported": 0,
-            "skipped": 0,
-            "message": f"Error: {str(e)}"
-        })
-
-        # Send error notification
-        await broadcast_notification(
-            message=f"PST import hiba: {str(e)[:100]}",
-            level="error",
-            title="PST Import hiba"
-        )
-
-    # Clean up uploaded PST file
-    try:
-        os.remove(pst_path)
-    except Exception:
-        pass
-
-    return PSTImportResult(
-        success=len(result["errors"]) == 0,
-        total_emails=result["total"],
-        imported=result["imported"],
-        skipped=result["skipped"],
-        errors=result["errors"][:10]  # Limit error messages
-    )
-
-
-def get_email_auto_categorize_setting(db: Session) -> bool:
-    """Check if email auto-categorization is enabled."""
-    setting = db.query(AppSetting).filter(AppSetting.key == "email_auto_categorize").first()
-    return setting.value == "true" if setting else False
-
-
-@router.post("/import-pst", response_model=PSTImportResult)
+@router.post("/import-pst", response_model=BackgroundJobResponse)
 async def import_pst(
     file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = None,
     db: Session = Depends(get_db)
 ):
-    """Import emails from a PST file with duplicate detection."""
+    """Import emails from a PST file with duplicate detection.
+
+    The upload is saved and a ``pst_import`` job is queued and returned at
+    once (see /jobs/{job_id}); progress streams as "pst_import.progress"
+    WebSocket events, the PSTImportResult is at GET /import-pst/{job_id}.
+    The job is checkpointed with every batch commit: if it stops early
+    (``resumable`` in the result, or the server restarted meanwhile), the
+    archive is kept and the import can be continued with
+    POST /import-pst/{job_id}/resume.
+    """
     if not file.filename.lower().endswith('.pst'):
         raise HTTPException(status_code=400, detail="Only PST files are accepted")
 
@@ -519,81 +231,56 @@ async def import_pst(
     temp_path = os.path.join(settings.UPLOAD_DIR, f"pst_import_{uuid.uuid4()}.pst")
 
     try:
-        content = await file.read()
-        with open(temp_path, 'wb') as f:
-            f.write(content)
+        # Chunked copy: the archive is never held in memory as a whole
+        await save_upload(file, temp_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save uploaded file: {str(e)}")
 
-    # Process the PST file
-    result = await process_pst_file(temp_path, db)
-
-    # Check if auto-categorization is enabled and we imported emails
-    if result.imported > 0 and get_email_auto_categorize_setting(db):
-        # Trigger auto-categorization for newly imported emails
-        await send_progress("pst_import.progress", {
-            "status": "categorizing",
-            "current": result.total_emails,
-            "total": result.total_emails,
-            "imported": result.imported,
-            "skipped": result.skipped,
-            "message": "Automatikus AI kategorizálás indítása..."
-        })
-        # Call auto-categorize for uncategorized emails
-        await auto_categorize(email_ids=None, db=db)
+    # With auto-categorization on, the finished job queues the categorization of the new emails
+    job = enqueue_job(db, "pst_import", payload={"pst_path": temp_path, "filename": file.filename})
+    return job_to_dict(job)
 
-    return result
+
+def get_pst_import_job(db: Session, job_id: int) -> BackgroundJob:
+    job = db.query(BackgroundJob).filter(
+        BackgroundJob.id == job_id,
+        BackgroundJob.kind == "pst_import"
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import feladat nem található")
+    return job
 
 
-IMPORTANCE_LEVELS = ["Kritikus", "Magas", "Közepes", "Alacsony"]
+@router.get("/import-pst/{job_id}", response_model=PSTImportResult)
+def get_pst_import(job_id: int, db: Session = Depends(get_db)):
+    """Result of a PST import; while it runs, what its checkpoint recorded so far."""
+    return pst_import_result(get_pst_import_job(db, job_id))
 
 
-def parse_ai_categorization_response(response_text: str) -> tuple[str, str]:
-    """Parse AI response to extract importance level and reason.
+@router.post("/import-pst/{job_id}/resume", response_model=BackgroundJobResponse)
+def resume_pst_import(job_id: int, db: Session = Depends(get_db)):
+    """Resume an interrupted PST import from its checkpoint.
 
-    Returns:
-        Tuple of (importance, reason)
+    Returns the requeued job at once (see /jobs/{job_id}); progress keeps
+    flowing through the "pst_import.progress" WebSocket event. Messages
+    imported before are not read again.
     """
-    importance = "Közepes"  # Default
-    reason = response_text.strip()
+    job = get_pst_import_job(db, job_id)
 
-    # Try to parse JSON format first
-    try:
-        # Look for JSON in the response
-        json_match = re.search(r'\{[^}]+\}', response_text, re.DOTALL)
-        if json_match:
-            data = json.loads(json_match.group())
-            if "importance" in data or "fontosság" in data or "fontossag" in data:
-                imp = data.get("importance") or data.get("fontosság") or data.get("fontossag", "")
-                if imp:
-                    # Normalize to Hungarian importance levels
-                    imp_lower = imp.lower()
-                    if "kritikus" in imp_lower or "critical" in imp_lower:
-                        importance = "Kritikus"
-                    elif "magas" in imp_lower or "high" in imp_lower:
-                        importance = "Magas"
-                    elif "közepes" in imp_lower or "kozepes" in imp_lower or "medium" in imp_lower:
-                        importance = "Közepes"
-                    elif "alacsony" in imp_lower or "low" in imp_lower:
-                        importance = "Alacsony"
-            if "reason" in data or "indok" in data or "indoklás" in data or "indoklas" in data:
-                reason = data.get("reason") or data.get("indok") or data.get("indoklás") or data.get("indoklas", reason)
-            return importance, reason
-    except (json.JSONDecodeError, AttributeError):
-        pass
-
-    # Try to extract from plain text
-    response_lower = response_text.lower()
-    for level in IMPORTANCE_LEVELS:
-        if level.lower() in response_lower:
-            importance = level
-            break
-
-    return importance, reason
-
-
-@router.post("/auto-categorize", response_model=EmailCategorizationResult)
-async def auto_categorize(
+    if job.status not in FINISHED_STATUSES:
+        raise HTTPException(status_code=400, detail="Az import még folyamatban van")
+
+    result = pst_import_result(job)
+    if not result.resumable:
+        detail = "Az import már befejeződött" if job.status == "completed" else "A PST fájl már nem elérhető"
+        raise HTTPException(status_code=400, detail=detail)
+
+    job = requeue_job(db, job)
+    return job_to_dict(job)
+
+
+@router.post("/auto-categorize", response_model=BackgroundJobResponse)
+def auto_categorize(
     email_ids: Optional[List[int]] = Query(None, description="Specific email IDs to categorize. If not provided, categorizes all uncategorized emails."),
     db: Session = Depends(get_db)
 ):
@@ -606,105 +293,13 @@ async def auto_categorize(
     - Alacsony: Low priority emails
 
     Each categorization includes an AI-generated reason explaining the decision.
+    Runs as a ``categorize_emails`` background job and returns it at once;
+    progress (with emails per minute) streams as "email_categorization.progress"
+    WebSocket events, the final EmailCategorizationResult is the job's result.
     """
-    result = {
-        "success": True,
-        "total_processed": 0,
-        "categorized": 0,
-        "errors": [],
-        "results": []
-    }
-
-    # Get emails to categorize
-    query = db.query(Email)
-    if email_ids:
-        query = query.filter(Email.id.in_(email_ids))
-    else:
-        # Only categorize emails without AI importance reason (uncategorized)
-        query = query.filter(Email.ai_importance_reason.is_(None))
-
-    emails = query.limit(50).all()  # Limit to 50 emails per batch
-    result["total_processed"] = len(emails)
-
-    if not emails:
-        return EmailCategorizationResult(**result)
-
-    # Broadcast start
-    await send_progress("email_categorization.progress", {
-        "status": "processing",
-        "current": 0,
-        "total": len(emails),
-        "message": "AI kategorizálás indítása..."
-    })
-
-    system_prompt = """Te egy email elemző asszisztens vagy. A feladatod az email tartalom alapján meghatározni a fontossági szintet.
-
-Fontossági szintek:
-- Kritikus: Sürgős, azonnali beavatkozást igényel (pl. határidők, kritikus hibák, sürgős kérések)
-- Magas: Fontos, de nem sürgős (pl. fontos projektek, döntések, vezetői kommunikáció)
-- Közepes: Normál prioritású emailek (pl. rutin kommunikáció, információk)
-- Alacsony: Nem sürgős (pl. hírlevelek, tájékoztatók, promóciók)
-
-Válaszolj CSAK JSON formátumban:
-{"importance": "SZINT", "reason": "Rövid indoklás magyarul"}"""
-
-    for idx, email in enumerate(emails):
-        try:
-            # Build email content for AI
-            email_content = f"""Tárgy: {email.subject or '(Nincs tárgy)'}
-Feladó: {email.sender or 'Ismeretlen'}
-Tartalom: {(email.body or '')[:2000]}"""  # Limit body length
-
-            messages = [{"role": "user", "content": email_content}]
-
-            # Call AI service
-            response_text, _, _ = await send_chat_message(
-                messages=messages,
-                db=db,
-                system_prompt=system_prompt
-            )
-
-            # Parse response
-            importance, reason = parse_ai_categorization_response(response_text)
-
-            # Update email
-            email.importance = importance
-            email.ai_importance_reason = reason
-            db.commit()
-
-            result["categorized"] += 1
-            result["results"].append(EmailCategorizationItem(
-                email_id=email.id,
-                importance=importance,
-                ai_importance_reason=reason
-            ))
-
-            # Broadcast progress
-            await send_progress("email_categorization.progress", {
-                "status": "processing",
-                "current": idx + 1,
-                "total": len(emails),
-                "message": f"Feldolgozva: {email.subject[:50] if email.subject else '(Nincs tárgy)'}..."
-            })
-
-            # Yield control
-            if (idx + 1) % 5 == 0:
-                await asyncio.sleep(0)
-
-        except Exception as e:
-            error_msg = f"Hiba az email ({email.id}) kategorizálásakor: {str(e)}"
-            result["errors"].append(error_msg)
-
-    # Broadcast completion
-    await send_progress("email_categorization.progress", {
-        "status": "completed",
-        "current": len(emails),
-        "total": len(emails),
-        "message": f"Kategorizálás befejezve: {result['categorized']} email feldolgozva"
-    })
-
-    result["success"] = len(result["errors"]) == 0
-    return EmailCategorizationResult(**result)
+    payload = {"email_ids": email_ids} if email_ids else None
+    job = enqueue_job(db, "categorize_emails", payload=payload, max_attempts=1)
+    return job_to_dict(job)
 
 
 def get_email_auto_link_mode_setting(db: Session) -> str:
@@ -713,67 +308,6 @@ def get_email_auto_link_mode_setting(db: Session) -> str:
     return setting.value if setting and setting.value in ("auto", "approval") else "approval"
 
 
-def parse_ai_link_response(response_text: str, available_tasks: list) -> tuple[int | None, float, str]:
-    """Parse AI response to extract task ID, confidence score, and reason.
-
-    Returns:
-        Tuple of (process_instance_id, confidence, reason)
-    """
-    process_instance_id = None
-    confidence = 0.0
-    reason = response_text.strip()
-
-    # Create a mapping of task names to IDs
-    task_map = {task["name"].lower(): task["id"] for task in available_tasks}
-
-    # Try to parse JSON format first
-    try:
-        json_match = re.search(r'\{[^}]+\}', response_text, re.DOTALL)
-        if json_match:
-            data = json.loads(json_match.group())
-
-            # Get task name or ID
-            task_name = data.get("task_name") or data.get("feladat") or data.get("process") or ""
-            task_id = data.get("task_id") or data.get("process_instance_id")
-
-            if task_id and isinstance(task_id, int):
-                # Verify task ID exists in available tasks
-                if any(t["id"] == task_id for t in available_tasks):
-                    process_instance_id = task_id
-            elif task_name:
-                # Match by name
-                task_name_lower = task_name.lower()
-                for name, tid in task_map.items():
-                    if task_name_lower in name or name in task_name_lower:
-                        process_instance_id = tid
-                        break
-
-            # Get confidence
-            conf = data.get("confidence") or data.get("bizonyosság") or data.get("bizonyossag") or 0.0
-            if isinstance(conf, (int, float)):
-                confidence = float(conf)
-                if confidence > 1:
-                    confidence = confidence / 100.0  # Convert percentage to 0-1
-                confidence = max(0.0, min(1.0, confidence))
-
-            # Get reason
-            reason = data.get("reason") or data.get("indok") or data.get("indoklás") or reason
-
-            return process_instance_id, confidence, reason
-    except (json.JSONDecodeError, AttributeError):
-        pass
-
-    # Try to find task name in plain text
-    response_lower = response_text.lower()
-    for name, tid in task_map.items():
-        if name in response_lower:
-            process_instance_id = tid
-            confidence = 0.3  # Low confidence for plain text match
-            break
-
-    return process_instance_id, confidence, reason
-
-
 @router.post("/auto-link", response_model=EmailAutoLinkResult)
 async def auto_link(
     email_ids: Optional[List[int]] = Query(None, description="Specific email IDs to link. If not provided, processes all unlinked emails."),
@@ -783,6 +317,9 @@ async def auto_link(
 
     The AI analyzes email content and matches it with appropriate process instances
     based on subject, sender, and content. Each link includes a confidence score (0-1).
+    Emails that clearly match a task by embedding similarity are linked without
+    an LLM call (their similarity is the confidence); for the others the LLM
+    chooses among the most similar tasks.
 
     The behavior depends on the 'email_auto_link_mode' setting:
     - 'auto': Automatically create links for matches with confidence >= 0.7
@@ -792,6 +329,7 @@ async def auto_link(
         "success": True,
         "total_processed": 0,
         "linked": 0,
+        "matched_by_embedding": 0,
         "errors": [],
         "results": []
     }
@@ -818,34 +356,20 @@ async def auto_link(
     from datetime import datetime
     now = datetime.now()
 
-    tasks = db.query(ProcessInstance).filter(
-        ProcessInstance.year == now.year,
-        ProcessInstance.month == now.month
-    ).all()
-
-    if not tasks:
-        result["errors"].append("Nincs elérhető havi feladat az aktuális hónapban")
-        result["success"] = False
-        return EmailAutoLinkResult(**result)
-
-    # Build task list for AI context
-    available_tasks = []
-    for task in tasks:
-        process_type = db.query(ProcessType).filter(ProcessType.id == task.process_type_id).first()
-        if process_type:
-            available_tasks.append({
-                "id": task.id,
-                "name": process_type.name,
-                "description": process_type.description or ""
-            })
+    available_tasks = monthly_tasks(db, now.year, now.month)
 
     if not available_tasks:
-        result["errors"].append("Nincs folyamat típus az aktuális feladatokhoz")
+        has_tasks = db.query(ProcessInstance.id).filter(
+            ProcessInstance.year == now.year,
+            ProcessInstance.month == now.month
+        ).first()
+        result["errors"].append(
+            "Nincs folyamat típus az aktuális feladatokhoz" if has_tasks
+            else "Nincs elérhető havi feladat az aktuális hónapban"
+        )
         result["success"] = False
         return EmailAutoLinkResult(**result)
 
-    task_list_text = "\n".join([f"- ID: {t['id']}, Név: {t['name']}" + (f", Leírás: {t['description'][:100]}" if t['description'] else "") for t in available_tasks])
-
     # Broadcast start
     await send_progress("email_auto_link.progress", {
         "status": "processing",
@@ -854,86 +378,67 @@ async def auto_link(
         "message": "AI email-feladat összerendelés indítása..."
     })
 
-    system_prompt = f"""Te egy email elemző asszisztens vagy. A feladatod az email tartalom alapján megtalálni a megfelelő havi feladatot.
-
-Elérhető feladatok:
-{task_list_text}
-
-Elemezd az email tartalmát (tárgy, feladó, szöveg) és válaszd ki a legmegfelelőbb feladatot.
-Ha nem találsz megfelelő feladatot, állítsd a confidence értéket 0-ra.
-
-Válaszolj CSAK JSON formátumban:
-{{"task_id": SZÁM, "task_name": "FELADAT_NÉV", "confidence": 0.0-1.0, "reason": "Rövid indoklás magyarul"}}
-
-Példa válasz:
-{{"task_id": 5, "task_name": "Számlázás", "confidence": 0.85, "reason": "Az email számla mellékletről szól"}}"""
-
-    for idx, email in enumerate(emails):
-        try:
-            # Build email content for AI
-            email_content = f"""Tárgy: {email.subject or '(Nincs tárgy)'}
-Feladó: {email.sender or 'Ismeretlen'}
-Tartalom: {(email.body or '')[:1500]}"""
-
-            messages = [{"role": "user", "content": email_content}]
-
-            # Call AI service
-            response_text, _, _ = await send_chat_message(
-                messages=messages,
-                db=db,
-                system_prompt=system_prompt
-            )
-
-            # Parse response
-            process_instance_id, confidence, reason = parse_ai_link_response(response_text, available_tasks)
+    # Embedding pre-match: clear matches skip the LLM, the rest get a shortlist
+    rows = [(email.id, email.subject, email.sender, email.body) for email in emails]
+    candidates = await match_tasks(db, rows, available_tasks)
+    result["matched_by_embedding"] = sum(1 for email in emails if confident_match(candidates.get(email.id, [])))
+    rows = prematched_first(rows, candidates)
+    emails_by_id = {email.id: email for email in emails}
+
+    existing_links = {tuple(link) for link in db.query(EmailTaskLink.email_id, EmailTaskLink.process_instance_id).filter(
+        EmailTaskLink.email_id.in_([email.id for email in emails])
+    ).all()}
+    task_names = {t["id"]: t["name"] for t in available_tasks}
+
+    # Several emails per AI request: the task list is sent once per batch
+    # (clear matches come first and need no request)
+    prompt_size = max(1, settings.EMAIL_AI_PROMPT_BATCH_SIZE)
+    processed = 0
+    for start in range(0, len(emails), prompt_size):
+        chunk = rows[start:start + prompt_size]
+        suggestions = await suggest_links(db, chunk, available_tasks, candidates)
+
+        for email_id, _, _, _ in chunk:
+            email = emails_by_id[email_id]
+            processed += 1
+            suggestion = suggestions.get(email.id)
+            if isinstance(suggestion, Exception):
+                error_msg = f"Hiba az email ({email.id}) összerendelésekor: {str(suggestion)}"
+                result["errors"].append(error_msg)
+                continue
+
+            process_instance_id, confidence, reason = suggestion
 
             # Only link if we have a match and confidence is high enough (for auto mode)
-            if process_instance_id and confidence >= 0.5:
-                # Check if link already exists
-                existing = db.query(EmailTaskLink).filter(
-                    EmailTaskLink.email_id == email.id,
-                    EmailTaskLink.process_instance_id == process_instance_id
-                ).first()
-
-                if not existing:
-                    # Get task name for result
-                    task_name = next((t["name"] for t in available_tasks if t["id"] == process_instance_id), "Ismeretlen")
-
-                    # In auto mode with high confidence, create the link
-                    if auto_link_mode == "auto" and confidence >= 0.7:
-                        link = EmailTaskLink(
-                            email_id=email.id,
-                            process_instance_id=process_instance_id,
-                            ai_confidence=confidence
-                        )
-                        db.add(link)
-                        db.commit()
-                        result["linked"] += 1
-
-                    # Add to results (for both modes)
-                    result["results"].append(EmailAutoLinkItem(
+            if process_instance_id and confidence >= 0.5 and (email.id, process_instance_id) not in existing_links:
+                # In auto mode with high confidence, create the link
+                if auto_link_mode == "auto" and confidence >= 0.7:
+                    db.add(EmailTaskLink(
                         email_id=email.id,
                         process_instance_id=process_instance_id,
-                        process_name=task_name,
-                        confidence=confidence,
-                        reason=reason
+                        ai_confidence=confidence
                     ))
+                    existing_links.add((email.id, process_instance_id))
+                    result["linked"] += 1
+
+                # Add to results (for both modes)
+                result["results"].append(EmailAutoLinkItem(
+                    email_id=email.id,
+                    process_instance_id=process_instance_id,
+                    process_name=task_names.get(process_instance_id, "Ismeretlen"),
+                    confidence=confidence,
+                    reason=reason
+                ))
 
             # Broadcast progress
             await send_progress("email_auto_link.progress", {
                 "status": "processing",
-                "current": idx + 1,
+                "current": processed,
                 "total": len(emails),
                 "message": f"Feldolgozva: {email.subject[:50] if email.subject else '(Nincs tárgy)'}..."
             })
 
-            # Yield control
-            if (idx + 1) % 5 == 0:
-                await asyncio.sleep(0)
-
-        except Exception as e:
-            error_msg = f"Hiba az email ({email.id}) összerendelésekor: {str(e)}"
-            result["errors"].append(error_msg)
+        db.commit()
 
     # Broadcast completion
     await send_progress("email_auto_link.progress", {
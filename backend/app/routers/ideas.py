@@ -12,7 +12,7 @@ from app.schemas.schemas import (
     IdeaResponse,
     ProcessTypeResponse,
 )
-from app.services.ai_service import send_chat_message
+from app.services.llm_cache import cached_chat_message
 from app.routers.websocket_router import broadcast_notification
 
 router = APIRouter(prefix="/ideas")
@@ -306,6 +306,7 @@ async def generate_ideas(
     analyze_documents: bool = Query(True, description="Analyze recent documents for ideas"),
     analyze_emails: bool = Query(True, description="Analyze recent emails for ideas"),
     max_ideas: int = Query(5, description="Maximum number of ideas to generate", ge=1, le=10),
+    bypass_cache: bool = Query(False, description="Ask the AI even if a cached answer exists"),
     db: Session = Depends(get_db)
 ):
     """Generate workflow improvement ideas using AI.
@@ -315,7 +316,9 @@ async def generate_ideas(
     - Recent emails (if analyze_emails=True)
 
     And generates improvement suggestions based on patterns, inefficiencies,
-    or opportunities found in the data.
+    or opportunities found in the data. The same context with the same
+    model is answered from the LLM response cache unless ``bypass_cache``
+    is set.
     """
     # Collect context for AI analysis
     context_parts = []
@@ -400,10 +403,11 @@ Generálj konkrét, megvalósítható javaslatokat JSON formátumban!"""
     messages = [{"role": "user", "content": user_message}]
 
     try:
-        response_text, _, _ = await send_chat_message(
+        response_text, _, _ = await cached_chat_message(
             messages=messages,
             db=db,
             system_prompt=system_prompt,
+            bypass_cache=bypass_cache,
         )
 
         # Parse AI response
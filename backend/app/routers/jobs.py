@@ -0,0 +1,61 @@
+"""Background job status and cancellation (indexing and reindex jobs)."""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.core.database import get_db
+from app.models.models import BackgroundJob
+from app.schemas.schemas import BackgroundJobResponse
+from app.services.job_queue import FINISHED_STATUSES, cancel_job, job_to_dict
+
+router = APIRouter(prefix="/jobs")
+
+
+@router.get("", response_model=List[BackgroundJobResponse])
+def list_jobs(
+    status: Optional[str] = Query(None, description="Filter by status: queued, running, completed, failed, cancelled"),
+    kind: Optional[str] = Query(None, description="Filter by job kind, e.g. index_document"),
+    document_id: Optional[int] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+):
+    """List background jobs, newest first."""
+    query = db.query(BackgroundJob).order_by(BackgroundJob.id.desc())
+
+    if status:
+        query = query.filter(BackgroundJob.status == status)
+    if kind:
+        query = query.filter(BackgroundJob.kind == kind)
+    if document_id is not None:
+        query = query.filter(BackgroundJob.document_id == document_id)
+
+    return [job_to_dict(job) for job in query.limit(limit).all()]
+
+
+@router.get("/{job_id}", response_model=BackgroundJobResponse)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    """Get the status, progress and result of a background job."""
+    job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Feladat nem található")
+
+    return job_to_dict(job)
+
+
+@router.post("/{job_id}/cancel", response_model=BackgroundJobResponse)
+async def cancel_background_job(job_id: int, db: Session = Depends(get_db)):
+    """Cancel a job.
+
+    A queued job is cancelled immediately; a running job stops at its next
+    progress checkpoint.
+    """
+    job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Feladat nem található")
+
+    if job.status in FINISHED_STATUSES:
+        raise HTTPException(status_code=400, detail="A feladat már befejeződött")
+
+    job = await cancel_job(db, job)
+    return job_to_dict(job)
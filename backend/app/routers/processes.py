@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session, joinedload
 from typing import List
@@ -105,11 +107,17 @@ def delete_process(process_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/{task_id}/generate-guide", response_model=GenerateGuideResponse)
-async def generate_guide(task_id: int, db: Session = Depends(get_db)):
+async def generate_guide(
+    task_id: int,
+    bypass_cache: bool = Query(False, description="Generate a new guide even if a cached one exists"),
+    db: Session = Depends(get_db),
+):
     """Generate an AI-powered quick guide draft for a task.
 
     Reads the uploaded process description documents and generates a summary.
-    The result is stored in the quick_guide_ai_draft field.
+    The result is stored in the quick_guide_ai_draft field. Unchanged
+    documents with the same model are answered from the LLM response cache
+    unless ``bypass_cache`` is set.
     """
     # Get the task with its files
     task = db.query(ProcessInstance).options(
@@ -131,7 +139,7 @@ async def generate_guide(task_id: int, db: Session = Depends(get_db)):
         for file_link in task.files:
             if file_link.document:
                 doc = file_link.document
-                content = extract_text_from_file(doc.file_path, doc.file_type)
+                content = await asyncio.to_thread(extract_text_from_file, doc.file_path, doc.file_type)
                 if content and not content.startswith("["):
                     document_contents.append(f"--- {doc.original_filename} ---\n{content}")
 
@@ -160,6 +168,7 @@ async def generate_guide(task_id: int, db: Session = Depends(get_db)):
             document_content=combined_content,
             process_name=task.process_type.name,
             db=db,
+            bypass_cache=bypass_cache,
         )
 
         # Save the draft to the task
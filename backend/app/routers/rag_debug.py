@@ -8,6 +8,7 @@ from pydantic import BaseModel
 from app.core.database import get_db
 from app.models.models import Document, DocumentChunk
 from app.services.rag_service import search_similar_chunks, get_faiss_index, estimate_tokens
+from app.services.embedding_service import clear_query_embedding_cache, get_embedding_settings, get_query_cache_stats
 
 router = APIRouter(prefix="/rag-debug")
 
@@ -37,6 +38,9 @@ class RAGIndexStatus(BaseModel):
     total_vectors: int
     faiss_dimension: Optional[int]
     indexed_docs: List[DocumentIndexInfo]
+    index_type: Optional[str] = None
+    index_tier: Dict[str, Any] = {}
+    persistence: Dict[str, Any] = {}
 
 
 class SearchResult(BaseModel):
@@ -44,6 +48,7 @@ class SearchResult(BaseModel):
     query: str
     results_count: int
     results: List[Dict[str, Any]]
+    query_cache: Dict[str, Any] = {}
 
 
 @router.get("/status", response_model=RAGIndexStatus)
@@ -72,8 +77,8 @@ def get_rag_status(db: Session = Depends(get_db)):
             is_indexed=chunk_count > 0
         ))
 
-    # Get FAISS index stats
-    faiss_index = get_faiss_index()
+    # Get FAISS index stats (of the active embedding dimension)
+    faiss_index = get_faiss_index(dimension=get_embedding_settings(db)["dimension"])
     faiss_stats = faiss_index.get_stats()
 
     return RAGIndexStatus(
@@ -83,9 +88,24 @@ def get_rag_status(db: Session = Depends(get_db)):
         total_vectors=faiss_stats.get("total_vectors", 0),
         faiss_dimension=faiss_stats.get("dimension"),
         indexed_docs=indexed_docs,
+        index_type=faiss_stats.get("index_type"),
+        index_tier=faiss_stats.get("index_tier", {}),
+        persistence=faiss_stats.get("persistence", {}),
     )
 
 
+@router.post("/checkpoint")
+def checkpoint_index(db: Session = Depends(get_db)):
+    """Write a fresh FAISS snapshot and truncate the write-ahead log.
+
+    Checkpoints the index of the active embedding dimension. Returns the
+    persistence timings (load, last WAL append, checkpoint).
+    """
+    faiss_index = get_faiss_index(dimension=get_embedding_settings(db)["dimension"])
+    faiss_index.checkpoint()
+    return faiss_index.get_stats()["persistence"]
+
+
 @router.get("/chunks/{document_id}", response_model=List[ChunkInfo])
 def get_document_chunks(
     document_id: int,
@@ -157,9 +177,23 @@ async def test_rag_search(
         query=query,
         results_count=len(filtered_results),
         results=filtered_results,
+        query_cache=get_query_cache_stats(),
     )
 
 
+@router.get("/query-cache")
+def get_query_cache():
+    """Query-embedding cache statistics (hit rate, size, TTL)."""
+    return get_query_cache_stats()
+
+
+@router.delete("/query-cache")
+def clear_query_cache():
+    """Drop all cached query embeddings."""
+    clear_query_embedding_cache()
+    return get_query_cache_stats()
+
+
 @router.get("/embedding-model")
 def get_embedding_model_info(db: Session = Depends(get_db)):
     """Get information about the embedding model being used."""
@@ -209,18 +243,21 @@ async def reindex_single_document(
 
 
 @router.post("/reindex-all")
-async def reindex_all_documents(db: Session = Depends(get_db)):
+def reindex_all_documents(db: Session = Depends(get_db)):
     """Force reindex all knowledge base documents.
 
-    This can take a while for large documents.
+    Queued as a background job (this can take a while for large documents);
+    poll /jobs/{job_id} or listen for "job.progress" WebSocket events.
     """
-    from app.services.rag_service import reindex_all_knowledge_documents
+    from app.services.job_queue import enqueue_job
 
     try:
-        result = await reindex_all_knowledge_documents(db)
+        job = enqueue_job(db, "reindex_all")
         return {
             "success": True,
-            **result,
+            "job_id": job.id,
+            "status": job.status,
+            "message": "Újraindexelés sorba állítva",
         }
     except Exception as e:
         return {
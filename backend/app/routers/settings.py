@@ -2,10 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from typing import Optional
-import httpx
 
 from app.core.database import get_db
 from app.models.models import AppSetting, SystemSettings
+from app.services.http_clients import get_http_client, provider_timeout
 from app.services.embedding_config import (
     EMBEDDING_MODELS,
     get_model_dimension,
@@ -23,6 +23,11 @@ class EmbeddingSettingsRequest(BaseModel):
     openrouter_api_key: Optional[str] = None
 
 
+class VectorIndexSettingsRequest(BaseModel):
+    index_type: str                          # "flat", "ivf" vagy "hnsw"
+    promote_threshold: Optional[int] = None  # vektorszám, ami felett vált
+
+
 class EmbeddingSettingsResponse(BaseModel):
     provider: str
     model: str
@@ -94,6 +99,8 @@ def get_embedding_settings(db: Session = Depends(get_db)):
         "dimension": settings.embedding_dimension,
         "has_openrouter_key": bool(settings.openrouter_api_key),
         "ollama_url": settings.ollama_url,
+        "vector_index_type": settings.vector_index_type or "flat",
+        "vector_index_promote_threshold": settings.vector_index_promote_threshold or 100000,
         "available_models": EMBEDDING_MODELS,
     }
 
@@ -150,6 +157,10 @@ async def update_embedding_settings(
 
     db.commit()
 
+    if reindex_required:
+        from app.services.embedding_service import clear_query_embedding_cache
+        clear_query_embedding_cache()
+
     return {
         "message": "Beállítások mentve!",
         "provider": request.provider,
@@ -167,6 +178,54 @@ async def update_embedding_settings(
     }
 
 
+# ── PUT: FAISS index típus (flat / IVF / HNSW) ──
+
+@router.put("/embedding/vector-index")
+def update_vector_index_settings(
+    request: VectorIndexSettingsRequest,
+    db: Session = Depends(get_db),
+):
+    """
+    FAISS index típus és váltási küszöb módosítása.
+    Az átépítés a háttérben fut, a keresés közben is elérhető.
+    """
+    from app.services.rag_service import VECTOR_INDEX_TYPES, get_faiss_index
+
+    if request.index_type not in VECTOR_INDEX_TYPES:
+        raise HTTPException(
+            400,
+            f"Ismeretlen index típus: {request.index_type}. "
+            f"Elérhető: {list(VECTOR_INDEX_TYPES)}",
+        )
+    if request.promote_threshold is not None and request.promote_threshold < 1:
+        raise HTTPException(400, "A küszöbnek legalább 1-nek kell lennie!")
+
+    settings = db.query(SystemSettings).first()
+    if not settings:
+        settings = SystemSettings()
+        db.add(settings)
+
+    settings.vector_index_type = request.index_type
+    if request.promote_threshold is not None:
+        settings.vector_index_promote_threshold = request.promote_threshold
+    db.commit()
+    db.refresh(settings)
+
+    faiss_index = get_faiss_index(dimension=settings.embedding_dimension)
+    faiss_index.configure(
+        settings.vector_index_type, settings.vector_index_promote_threshold
+    )
+    stats = faiss_index.get_stats()
+
+    return {
+        "message": "Beállítások mentve!",
+        "index_type": settings.vector_index_type,
+        "promote_threshold": settings.vector_index_promote_threshold,
+        "active_index_type": stats["index_type"],
+        "rebuilding": stats["index_tier"]["rebuilding"],
+    }
+
+
 # ── POST: OpenRouter API kulcs tesztelése ──
 
 @router.post("/embedding/test-openrouter")
@@ -176,20 +235,21 @@ async def test_openrouter_key(
 ):
     """OpenRouter API kulcs tesztelése egy próba embedding-gel."""
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.post(
-                "https://api.openrouter.ai/api/v1/embeddings",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "http://localhost",
-                    "X-Title": "Workflow Manager",
-                },
-                json={
-                    "model": "openai/text-embedding-3-small",
-                    "input": "test",
-                },
-            )
+        client = get_http_client("openrouter")
+        response = await client.post(
+            "https://api.openrouter.ai/api/v1/embeddings",
+            timeout=provider_timeout("openrouter", 10.0),
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+                "HTTP-Referer": "http://localhost",
+                "X-Title": "Workflow Manager",
+            },
+            json={
+                "model": "openai/text-embedding-3-small",
+                "input": "test",
+            },
+        )
 
         if response.status_code == 200:
             return {"status": "ok", "message": "✅ OpenRouter API kulcs érvényes!"}
@@ -214,8 +274,11 @@ async def check_ollama_models(db: Session = Depends(get_db)):
     ollama_url = settings.ollama_url if settings else "http://localhost:11434"
 
     try:
-        async with httpx.AsyncClient(timeout=5) as client:
-            response = await client.get(f"{ollama_url}/api/tags")
+        client = get_http_client("ollama")
+        response = await client.get(
+            f"{ollama_url}/api/tags",
+            timeout=provider_timeout("ollama", 5.0),
+        )
 
         if response.status_code != 200:
             return {"status": "error", "message": "Ollama nem elérhető"}
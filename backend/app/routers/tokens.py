@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+from sqlalchemy import func, extract, case
 from datetime import datetime, timedelta
 from typing import Optional, List
 from pydantic import BaseModel
@@ -11,6 +11,9 @@ from app.models.models import TokenUsage, AppSetting
 
 router = APIRouter(prefix="/tokens")
 
+# Requests the model answered: cache hits (llm_cache) saved their tokens, not spent them
+NOT_CACHED = TokenUsage.cache_hit.isnot(True)
+
 
 # === Pydantic Schemas ===
 
@@ -50,6 +53,7 @@ class CostBreakdown(BaseModel):
     output_tokens: int
     calculated_cost: float
     actual_cost: float
+    cached_requests: int = 0
 
 
 class CostResponse(BaseModel):
@@ -59,6 +63,8 @@ class CostResponse(BaseModel):
     total_tokens: int
     total_requests: int
     avg_cost_per_request: float
+    cached_requests: int = 0  # answered from the LLM response cache (cost 0)
+    cached_tokens: int = 0
     breakdown: List[CostBreakdown]
     currency: str = "USD"
 
@@ -181,6 +187,7 @@ def daily_usage(
     ).filter(
         TokenUsage.created_at >= start,
         TokenUsage.created_at <= end,
+        NOT_CACHED,
     )
 
     if provider:
@@ -228,6 +235,7 @@ def monthly_usage(
     ).filter(
         TokenUsage.created_at >= extended_start,
         TokenUsage.created_at <= end,
+        NOT_CACHED,
     )
 
     if provider:
@@ -273,6 +281,7 @@ def usage_by_model(
     ).filter(
         TokenUsage.created_at >= start,
         TokenUsage.created_at <= end,
+        NOT_CACHED,
     ).group_by(
         TokenUsage.model_name,
         TokenUsage.provider,
@@ -304,12 +313,17 @@ def get_cost(
     """Get cost calculation with breakdown."""
     start, end = parse_date_range(start_date, end_date)
 
+    # Cache hits are reported separately: the tokens they saved, at no cost
+    cached = TokenUsage.cache_hit.is_(True)
+
     # Get totals
     totals = db.query(
-        func.coalesce(func.sum(TokenUsage.input_tokens), 0).label("input"),
-        func.coalesce(func.sum(TokenUsage.output_tokens), 0).label("output"),
+        func.coalesce(func.sum(case((cached, 0), else_=TokenUsage.input_tokens)), 0).label("input"),
+        func.coalesce(func.sum(case((cached, 0), else_=TokenUsage.output_tokens)), 0).label("output"),
         func.coalesce(func.sum(TokenUsage.cost), 0.0).label("cost"),
-        func.count(TokenUsage.id).label("count"),
+        func.coalesce(func.sum(case((cached, 0), else_=1)), 0).label("count"),
+        func.coalesce(func.sum(case((cached, 1), else_=0)), 0).label("cached_count"),
+        func.coalesce(func.sum(case((cached, TokenUsage.input_tokens + TokenUsage.output_tokens), else_=0)), 0).label("cached_tokens"),
     ).filter(
         TokenUsage.created_at >= start,
         TokenUsage.created_at <= end,
@@ -319,14 +333,17 @@ def get_cost(
     total_output = int(totals.output) if totals else 0
     total_cost = float(totals.cost) if totals else 0.0
     total_count = int(totals.count) if totals else 0
+    cached_count = int(totals.cached_count) if totals else 0
+    cached_tokens = int(totals.cached_tokens) if totals else 0
 
     # Get breakdown by provider and model
     breakdown_data = db.query(
         TokenUsage.provider,
         TokenUsage.model_name,
-        func.sum(TokenUsage.input_tokens).label("input_tokens"),
-        func.sum(TokenUsage.output_tokens).label("output_tokens"),
+        func.sum(case((cached, 0), else_=TokenUsage.input_tokens)).label("input_tokens"),
+        func.sum(case((cached, 0), else_=TokenUsage.output_tokens)).label("output_tokens"),
         func.sum(TokenUsage.cost).label("cost"),
+        func.sum(case((cached, 1), else_=0)).label("cached_requests"),
     ).filter(
         TokenUsage.created_at >= start,
         TokenUsage.created_at <= end,
@@ -336,7 +353,7 @@ def get_cost(
     ).all()
 
     breakdown = []
-    for provider, model_name, input_tokens, output_tokens, actual_cost in breakdown_data:
+    for provider, model_name, input_tokens, output_tokens, actual_cost, cached_requests in breakdown_data:
         input_t = int(input_tokens or 0)
         output_t = int(output_tokens or 0)
         actual = float(actual_cost or 0)
@@ -358,6 +375,7 @@ def get_cost(
             output_tokens=output_t,
             calculated_cost=round(calculated, 6),
             actual_cost=round(actual, 6),
+            cached_requests=int(cached_requests or 0),
         ))
 
     avg_cost = total_cost / total_count if total_count > 0 else 0.0
@@ -369,6 +387,8 @@ def get_cost(
         total_tokens=total_input + total_output,
         total_requests=total_count,
         avg_cost_per_request=round(avg_cost, 6),
+        cached_requests=cached_count,
+        cached_tokens=cached_tokens,
         breakdown=breakdown,
         currency="USD",
     )
@@ -391,6 +411,7 @@ def get_ollama_stats(
         TokenUsage.created_at >= start,
         TokenUsage.created_at <= end,
         TokenUsage.provider == "ollama",
+        NOT_CACHED,
     ).first()
 
     return OllamaStats(
@@ -464,3 +485,11 @@ def get_cost_rates(db: Session = Depends(get_db)):
             pass
 
     return rates
+
+
+@router.get("/cache-stats")
+def get_llm_cache_stats(db: Session = Depends(get_db)):
+    """Get LLM response cache statistics (summaries, quick guides, ideas)."""
+    from app.services.llm_cache import get_cache_stats
+
+    return get_cache_stats(db)
@@ -186,3 +186,8 @@ async def broadcast_pst_import_progress(
         "status": status,
         "percentage": round((progress / total * 100) if total > 0 else 0, 1)
     })
+
+
+async def broadcast_job_progress(job: dict):
+    """Broadcast a background job's state (queued, running, progress, result)."""
+    await manager.broadcast("job.progress", job)
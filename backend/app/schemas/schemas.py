@@ -211,6 +211,12 @@ class DocumentResponse(DocumentBase):
         from_attributes = True
 
 
+class KnowledgeToggleResponse(DocumentResponse):
+    """Document after toggling is_knowledge, with the queued indexing job."""
+    job_id: Optional[int] = None
+    job_status: Optional[str] = None
+
+
 # --- Email Schemas ---
 class EmailBase(BaseModel):
     message_id: Optional[str] = None
@@ -260,6 +266,7 @@ class EmailAttachmentResponse(BaseModel):
     file_path: Optional[str] = None
     file_size: Optional[int] = None
     content_type: Optional[str] = None
+    content_hash: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -297,6 +304,11 @@ class PSTImportResult(BaseModel):
     imported: int
     skipped: int
     errors: List[str] = []
+    peak_rss_mb: Optional[float] = None  # highest resident memory of the server process during the import
+    worker_peak_rss_mb: Optional[float] = None  # highest resident memory of a parser worker
+    attachment_bytes_saved: int = 0  # disk space not used thanks to shared attachment blobs
+    job_id: Optional[int] = None  # the pst_import background job
+    resumable: bool = False  # stopped with messages left: POST /emails/import-pst/{job_id}/resume
 
 
 # --- Email Categorization Schemas ---
@@ -312,6 +324,7 @@ class EmailCategorizationResult(BaseModel):
     categorized: int
     errors: List[str] = []
     results: List[EmailCategorizationItem] = []
+    emails_per_minute: Optional[float] = None
 
 
 class EmailImportanceUpdate(BaseModel):
@@ -359,6 +372,7 @@ class ChatMessageCreate(ChatMessageBase):
 class ChatMessageResponse(ChatMessageBase):
     id: int
     conversation_id: int
+    ttft_ms: Optional[int] = None
     created_at: datetime
 
     class Config:
@@ -366,6 +380,7 @@ class ChatMessageResponse(ChatMessageBase):
 
 
 class ChatConversationWithMessages(ChatConversationResponse):
+    summary: Optional[str] = None
     messages: List[ChatMessageResponse] = []
 
 
@@ -753,6 +768,8 @@ class DocumentSearchResult(BaseModel):
     created_at: datetime
     matches: List[SearchMatch] = []
     match_count: int = 0
+    score: Optional[float] = None  # full-text rank (BM25), content hits only
+    snippet: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -796,6 +813,7 @@ class EmailAutoLinkResult(BaseModel):
     success: bool
     total_processed: int
     linked: int
+    matched_by_embedding: int = 0
     errors: List[str] = []
     results: List[EmailAutoLinkItem] = []
 
@@ -888,11 +906,36 @@ class AIKnowledgeLogResponse(AIKnowledgeLogBase):
     id: int
     created_at: datetime
     document_filename: Optional[str] = None
+    job_id: Optional[int] = None
+    queue_wait_ms: Optional[int] = None
+    run_ms: Optional[int] = None
 
     class Config:
         from_attributes = True
 
 
+# --- Background Job Schemas ---
+class BackgroundJobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    document_id: Optional[int] = None
+    progress: int = 0
+    total: int = 0
+    percentage: float = 0.0
+    message: Optional[str] = None
+    error: Optional[str] = None
+    result: Optional[dict] = None
+    attempts: int = 0
+    max_attempts: int
+    cancel_requested: bool = False
+    queue_wait_ms: Optional[int] = None
+    run_ms: Optional[int] = None
+    queued_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
 # --- Knowledge Base Statistics ---
 class KnowledgeBaseStats(BaseModel):
     total_documents: int
@@ -0,0 +1,76 @@
+"""Client-side limits for bulk AI provider calls.
+
+- ``chat_concurrency``: requests in flight at once per provider
+  (``OLLAMA_CHAT_CONCURRENCY``, ``OPENROUTER_CHAT_CONCURRENCY``). A local
+  Ollama serves few requests in parallel; OpenRouter serves many.
+- ``rate_limiter``: a token bucket per provider that has a request rate
+  limit (OpenRouter: ``OPENROUTER_REQUESTS_PER_MINUTE``, bursts of
+  ``OPENROUTER_BURST``), shared by every caller in the process.
+- ``retry_after_seconds``: how long to wait after a 429 response.
+"""
+import asyncio
+import time
+from typing import Callable, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+
+class TokenBucket:
+    """Allow ``rate`` acquisitions per second on average, in bursts of up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: int, clock: Callable[[], float] = time.monotonic, sleep=asyncio.sleep):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.capacity)
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await self._sleep((1 - self._tokens) / self.rate)
+
+    def penalize(self, seconds: float):
+        """Hand out no token for ``seconds`` (the provider answered 429)."""
+        self._refill()
+        self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+
+_buckets: Dict[str, TokenBucket] = {}
+
+
+def chat_concurrency(provider: str) -> int:
+    if provider == "openrouter":
+        return max(1, settings.OPENROUTER_CHAT_CONCURRENCY)
+    return max(1, settings.OLLAMA_CHAT_CONCURRENCY)
+
+
+def rate_limiter(provider: str) -> Optional[TokenBucket]:
+    """The provider's shared token bucket (None: no rate limit)."""
+    if provider != "openrouter" or settings.OPENROUTER_REQUESTS_PER_MINUTE <= 0:
+        return None
+    bucket = _buckets.get(provider)
+    rate = settings.OPENROUTER_REQUESTS_PER_MINUTE / 60.0
+    if bucket is None or bucket.rate != rate or bucket.capacity != max(1, settings.OPENROUTER_BURST):
+        bucket = _buckets[provider] = TokenBucket(rate, settings.OPENROUTER_BURST)
+    return bucket
+
+
+def retry_after_seconds(response: httpx.Response, attempt: int) -> float:
+    """The Retry-After header of a 429 response, else exponential backoff."""
+    try:
+        return max(0.0, float(response.headers.get("retry-after", "")))
+    except ValueError:
+        return float(2 ** attempt)
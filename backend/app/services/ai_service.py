@@ -3,7 +3,9 @@ import httpx
 from typing import Optional, Tuple, Dict, List, Any
 from sqlalchemy.orm import Session
 
+from app.core.config import settings as app_settings
 from app.models.models import AppSetting, TokenUsage
+from app.services.http_clients import get_http_client, provider_timeout
 
 
 # Default settings
@@ -61,24 +63,25 @@ async def fetch_openrouter_models(api_key: str, force_refresh: bool = False) ->
         return list(_openrouter_models_cache.values())
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"{DEFAULT_OPENROUTER_URL}/models",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
+        client = get_http_client("openrouter")
+        response = await client.get(
+            f"{DEFAULT_OPENROUTER_URL}/models",
+            timeout=provider_timeout("openrouter", 30.0),
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            }
+        )
+        response.raise_for_status()
+        data = response.json()
 
-            models = data.get("data", [])
+        models = data.get("data", [])
 
-            # Update cache
-            _openrouter_models_cache = {m["id"]: m for m in models}
-            _openrouter_cache_timestamp = current_time
+        # Update cache
+        _openrouter_models_cache = {m["id"]: m for m in models}
+        _openrouter_cache_timestamp = current_time
 
-            return models
+        return models
 
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 401:
@@ -109,6 +112,15 @@ def get_model_pricing(model_id: str) -> Dict[str, float]:
     return {"prompt_price": 0.0, "completion_price": 0.0}
 
 
+def get_model_context_length(model_id: str) -> Optional[int]:
+    """Context length (tokens) of an OpenRouter model from the models cache, if known."""
+    model = _openrouter_models_cache.get(model_id)
+    if not model:
+        return None
+    length = model.get("context_length") or (model.get("top_provider") or {}).get("context_length")
+    return int(length) if length else None
+
+
 def calculate_cost(
     model_id: str,
     input_tokens: int,
@@ -182,15 +194,7 @@ async def test_openrouter_connection(api_key: str) -> Dict[str, Any]:
         }
 
 
-async def generate_guide_with_ollama(
-    document_content: str,
-    process_name: str,
-    ollama_url: str = DEFAULT_OLLAMA_URL,
-    model: str = DEFAULT_OLLAMA_MODEL,
-) -> str:
-    """Generate a quick guide using Ollama."""
-
-    system_prompt = """Te egy segítokész asszisztens vagy, aki folyamatleírások alapján rövid,
+QUICK_GUIDE_SYSTEM_PROMPT = """Te egy segítokész asszisztens vagy, aki folyamatleírások alapján rövid,
     lényegre törő gyors útmutatókat készít magyar nyelven. Az útmutató legyen:
     - Tömör és áttekinthető
     - Lépésről lépésre vezesse végig a felhasználót
@@ -198,152 +202,70 @@ async def generate_guide_with_ollama(
     - Emeld ki a fontos információkat
     - Maximum 500 szó"""
 
-    user_prompt = f"""A következő dokumentum(ok) alapján készíts egy gyors útmutatót a "{process_name}" folyamathoz.
 
-Dokumentum tartalma:
-{document_content}
-
-Készítsd el a gyors útmutatót magyar nyelven!"""
-
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        response = await client.post(
-            f"{ollama_url}/api/generate",
-            json={
-                "model": model,
-                "prompt": user_prompt,
-                "system": system_prompt,
-                "stream": False,
-            }
-        )
-        response.raise_for_status()
-        result = response.json()
-        return result.get("response", "")
-
-
-async def generate_guide_with_openrouter(
-    document_content: str,
-    process_name: str,
-    api_key: str,
-    model: str = DEFAULT_OPENROUTER_MODEL,
-) -> str:
-    """Generate a quick guide using OpenRouter."""
-
-    system_prompt = """Te egy segítokész asszisztens vagy, aki folyamatleírások alapján rövid,
-    lényegre törő gyors útmutatókat készít magyar nyelven. Az útmutató legyen:
-    - Tömör és áttekinthető
-    - Lépésről lépésre vezesse végig a felhasználót
-    - Használj számozott listát a lépésekhez
-    - Emeld ki a fontos információkat
-    - Maximum 500 szó"""
-
-    user_prompt = f"""A következő dokumentum(ok) alapján készíts egy gyors útmutatót a "{process_name}" folyamathoz.
+def quick_guide_prompt(document_content: str, process_name: str) -> str:
+    """The user message asking for a quick guide of ``process_name``."""
+    return f"""A következő dokumentum(ok) alapján készíts egy gyors útmutatót a "{process_name}" folyamathoz.
 
 Dokumentum tartalma:
 {document_content}
 
 Készítsd el a gyors útmutatót magyar nyelven!"""
 
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        response = await client.post(
-            f"{DEFAULT_OPENROUTER_URL}/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-            }
-        )
-        response.raise_for_status()
-        result = response.json()
-        return result.get("choices", [{}])[0].get("message", {}).get("content", "")
-
 
 async def generate_quick_guide(
     document_content: str,
     process_name: str,
     db: Session,
+    bypass_cache: bool = False,
 ) -> str:
     """Generate a quick guide using the configured AI provider.
 
+    The same documents, process and model give the cached guide (see
+    ``app.services.llm_cache``) unless ``bypass_cache`` is set.
+
     Args:
         document_content: The content of the uploaded documents
         process_name: The name of the process type
-        db: Database session for fetching settings
+        db: Database session for settings, the response cache and token tracking
+        bypass_cache: Generate a new guide even if a cached one exists
 
     Returns:
         Generated quick guide text
     """
-    settings = get_ai_settings(db)
+    from app.services.llm_cache import cached_chat_message
 
-    provider = settings.get("ai_provider", "ollama")
-
-    if provider == "openrouter":
-        api_key = settings.get("openrouter_api_key")
-        if not api_key:
-            raise ValueError("OpenRouter API kulcs nincs beállítva. Kérjük, állítsa be a Beállítások oldalon.")
-
-        model = settings.get("openrouter_model", DEFAULT_OPENROUTER_MODEL)
-        return await generate_guide_with_openrouter(
-            document_content=document_content,
-            process_name=process_name,
-            api_key=api_key,
-            model=model,
-        )
-    else:
-        # Default to Ollama
-        ollama_url = settings.get("ollama_url", DEFAULT_OLLAMA_URL)
-        model = settings.get("ollama_model", DEFAULT_OLLAMA_MODEL)
-        return await generate_guide_with_ollama(
-            document_content=document_content,
-            process_name=process_name,
-            ollama_url=ollama_url,
-            model=model,
-        )
+    guide, _, _ = await cached_chat_message(
+        messages=[{"role": "user", "content": quick_guide_prompt(document_content, process_name)}],
+        db=db,
+        system_prompt=QUICK_GUIDE_SYSTEM_PROMPT,
+        bypass_cache=bypass_cache,
+    )
+    return guide
 
 
 def extract_text_from_file(file_path: str, file_type: Optional[str]) -> str:
     """Extract text content from a file.
 
-    Supports: txt, md, pdf (basic), docx (basic)
+    Supports: txt, md, pdf, docx, xlsx. Extracted text comes from the
+    persistent text store (app.services.text_store), so a file is only
+    parsed once.
     """
+    from app.services.text_store import get_file_text
+
     if not file_type:
         return ""
 
     file_type = file_type.lower()
 
     try:
-        if file_type in ("txt", "md", "markdown"):
+        if file_type in ("md", "markdown"):
             with open(file_path, "r", encoding="utf-8") as f:
                 return f.read()
 
-        elif file_type == "pdf":
-            # Try to use PyPDF2 if available
-            try:
-                from PyPDF2 import PdfReader
-                reader = PdfReader(file_path)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-                return text
-            except ImportError:
-                return "[PDF fájl - szöveg kinyerés nem támogatott. Telepítse a PyPDF2 csomagot.]"
-
-        elif file_type in ("docx", "doc"):
-            # Try to use python-docx if available
-            try:
-                from docx import Document
-                doc = Document(file_path)
-                text = ""
-                for para in doc.paragraphs:
-                    text += para.text + "\n"
-                return text
-            except ImportError:
-                return "[DOCX fájl - szöveg kinyerés nem támogatott. Telepítse a python-docx csomagot.]"
+        elif file_type in ("txt", "pdf", "docx", "doc", "xlsx"):
+            text, _ = get_file_text(file_path, "docx" if file_type == "doc" else file_type)
+            return text or ""
 
         else:
             return f"[{file_type.upper()} fájl - szöveg kinyerés nem támogatott ehhez a formátumhoz.]"
@@ -366,45 +288,48 @@ async def test_ollama_connection(
         Dict with success status, message, and model info
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            # First check if Ollama is running by getting version/tags
-            tags_response = await client.get(f"{ollama_url}/api/tags")
-            tags_response.raise_for_status()
-            tags_data = tags_response.json()
-
-            available_models = [m.get("name", "") for m in tags_data.get("models", [])]
-
-            # Check if the specified model is available
-            model_available = any(model in m or m in model for m in available_models)
-
-            if not model_available and available_models:
-                return {
-                    "success": True,
-                    "message": f"Ollama kapcsolódva, de a '{model}' modell nincs telepítve.",
-                    "available_models": available_models,
-                    "model_available": False,
-                }
-
-            # Try a simple generation to verify the model works
-            if model_available:
-                test_response = await client.post(
-                    f"{ollama_url}/api/generate",
-                    json={
-                        "model": model,
-                        "prompt": "Hi",
-                        "stream": False,
-                    },
-                    timeout=30.0,
-                )
-                test_response.raise_for_status()
+        client = get_http_client("ollama")
+        # First check if Ollama is running by getting version/tags
+        tags_response = await client.get(
+            f"{ollama_url}/api/tags",
+            timeout=provider_timeout("ollama", 10.0),
+        )
+        tags_response.raise_for_status()
+        tags_data = tags_response.json()
 
+        available_models = [m.get("name", "") for m in tags_data.get("models", [])]
+
+        # Check if the specified model is available
+        model_available = any(model in m or m in model for m in available_models)
+
+        if not model_available and available_models:
             return {
                 "success": True,
-                "message": "Ollama kapcsolat sikeres!",
+                "message": f"Ollama kapcsolódva, de a '{model}' modell nincs telepítve.",
                 "available_models": available_models,
-                "model_available": model_available,
+                "model_available": False,
             }
 
+        # Try a simple generation to verify the model works
+        if model_available:
+            test_response = await client.post(
+                f"{ollama_url}/api/generate",
+                json={
+                    "model": model,
+                    "prompt": "Hi",
+                    "stream": False,
+                },
+                timeout=provider_timeout("ollama", 30.0),
+            )
+            test_response.raise_for_status()
+
+        return {
+            "success": True,
+            "message": "Ollama kapcsolat sikeres!",
+            "available_models": available_models,
+            "model_available": model_available,
+        }
+
     except httpx.ConnectError:
         return {
             "success": False,
@@ -449,6 +374,7 @@ def save_token_usage(
     input_tokens: int,
     output_tokens: int,
     cost: float = 0.0,
+    cache_hit: bool = False,
 ) -> TokenUsage:
     """Save token usage to the database.
 
@@ -459,6 +385,7 @@ def save_token_usage(
         input_tokens: Number of input tokens
         output_tokens: Number of output tokens
         cost: Cost in USD (default 0 for local models)
+        cache_hit: Answered from the LLM response cache (tokens saved, not spent)
 
     Returns:
         Created TokenUsage record
@@ -469,6 +396,7 @@ def save_token_usage(
         input_tokens=input_tokens,
         output_tokens=output_tokens,
         cost=cost,
+        cache_hit=cache_hit,
     )
     db.add(usage)
     db.commit()
@@ -476,6 +404,42 @@ def save_token_usage(
     return usage
 
 
+def ollama_request_options() -> Dict[str, Any]:
+    """``keep_alive`` and ``num_ctx`` for Ollama generation requests.
+
+    ``OLLAMA_KEEP_ALIVE`` keeps the model loaded between turns;
+    ``OLLAMA_CONTEXT_LENGTH`` is the context window the prompts are packed
+    for (see ``context_packer``). Every request sends the same window, as
+    a different one makes Ollama reload the model.
+    """
+    options: Dict[str, Any] = {}
+    keep_alive = (app_settings.OLLAMA_KEEP_ALIVE or "").strip()
+    if keep_alive:  # empty: Ollama's own default (5 minutes)
+        try:
+            options["keep_alive"] = int(keep_alive)  # seconds; -1 = until the server stops
+        except ValueError:
+            options["keep_alive"] = keep_alive  # a duration such as "30m"
+    if app_settings.OLLAMA_CONTEXT_LENGTH > 0:
+        options["options"] = {"num_ctx": app_settings.OLLAMA_CONTEXT_LENGTH}
+    return options
+
+
+def ollama_chat_messages(messages: list, system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
+    """Messages for Ollama's ``/api/chat``: the system prompt first, then the history.
+
+    Ollama keeps the previous prompt's KV cache and only evaluates what
+    follows the common prefix, so the system prompt and the earlier turns
+    should come out the same every turn (see ``turn_messages`` in the chat
+    router).
+    """
+    chat_messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+    for msg in messages:
+        role = msg.get("role", "user")
+        if role in ("user", "assistant", "system"):
+            chat_messages.append({"role": role, "content": msg.get("content", "")})
+    return chat_messages
+
+
 async def chat_with_ollama(
     messages: list,
     ollama_url: str = DEFAULT_OLLAMA_URL,
@@ -493,51 +457,40 @@ async def chat_with_ollama(
     Returns:
         Tuple of (response_text, input_tokens, output_tokens)
     """
-    # Build the prompt from messages
-    prompt_parts = []
-    if system_prompt:
-        prompt_parts.append(f"System: {system_prompt}\n\n")
-
-    for msg in messages:
-        role = msg.get("role", "user")
-        content = msg.get("content", "")
-        if role == "user":
-            prompt_parts.append(f"User: {content}\n")
-        elif role == "assistant":
-            prompt_parts.append(f"Assistant: {content}\n")
-
-    full_prompt = "".join(prompt_parts)
+    chat_messages = ollama_chat_messages(messages, system_prompt)
 
     # Estimate input tokens
-    input_tokens = estimate_tokens(full_prompt)
-
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        response = await client.post(
-            f"{ollama_url}/api/generate",
-            json={
-                "model": model,
-                "prompt": full_prompt,
-                "stream": False,
-            }
-        )
-        response.raise_for_status()
-        result = response.json()
+    input_tokens = estimate_tokens("".join(m["content"] for m in chat_messages))
+
+    client = get_http_client("ollama")
+    response = await client.post(
+        f"{ollama_url}/api/chat",
+        timeout=provider_timeout("ollama", 120.0),
+        json={
+            "model": model,
+            "messages": chat_messages,
+            "stream": False,
+            **ollama_request_options(),
+        }
+    )
+    response.raise_for_status()
+    result = response.json()
 
-        response_text = result.get("response", "")
+    response_text = result.get("message", {}).get("content", "")
 
-        # Get actual token counts from Ollama if available, otherwise estimate
-        eval_count = result.get("eval_count", 0)
-        prompt_eval_count = result.get("prompt_eval_count", 0)
+    # Get actual token counts from Ollama if available, otherwise estimate
+    eval_count = result.get("eval_count", 0)
+    prompt_eval_count = result.get("prompt_eval_count", 0)
 
-        if eval_count > 0:
-            output_tokens = eval_count
-        else:
-            output_tokens = estimate_tokens(response_text)
+    if eval_count > 0:
+        output_tokens = eval_count
+    else:
+        output_tokens = estimate_tokens(response_text)
 
-        if prompt_eval_count > 0:
-            input_tokens = prompt_eval_count
+    if prompt_eval_count > 0:
+        input_tokens = prompt_eval_count
 
-        return response_text, input_tokens, output_tokens
+    return response_text, input_tokens, output_tokens
 
 
 async def chat_with_openrouter(
@@ -567,32 +520,89 @@ async def chat_with_openrouter(
             "content": msg.get("content", ""),
         })
 
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        response = await client.post(
-            f"{DEFAULT_OPENROUTER_URL}/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": model,
-                "messages": api_messages,
-            }
-        )
-        response.raise_for_status()
-        result = response.json()
+    client = get_http_client("openrouter")
+    response = await client.post(
+        f"{DEFAULT_OPENROUTER_URL}/chat/completions",
+        timeout=provider_timeout("openrouter", 120.0),
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        },
+        json={
+            "model": model,
+            "messages": api_messages,
+        }
+    )
+    response.raise_for_status()
+    result = response.json()
+
+    response_text = result.get("choices", [{}])[0].get("message", {}).get("content", "")
+
+    # Get token usage from OpenRouter response
+    usage = result.get("usage", {})
+    input_tokens = usage.get("prompt_tokens", estimate_tokens(str(api_messages)))
+    output_tokens = usage.get("completion_tokens", estimate_tokens(response_text))
 
-        response_text = result.get("choices", [{}])[0].get("message", {}).get("content", "")
+    # Calculate cost based on model pricing
+    cost_usd = calculate_cost(model, input_tokens, output_tokens)
 
-        # Get token usage from OpenRouter response
-        usage = result.get("usage", {})
-        input_tokens = usage.get("prompt_tokens", estimate_tokens(str(api_messages)))
-        output_tokens = usage.get("completion_tokens", estimate_tokens(response_text))
+    return response_text, input_tokens, output_tokens, cost_usd
+
+
+def resolve_chat_target(
+    db: Session,
+    provider: Optional[str] = None,
+    model_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Provider, model and connection settings for chat calls.
+
+    Read once from the AI settings, so bulk callers (email categorization)
+    do not query them per message. ``provider``/``model_name`` override
+    the configured ones.
+    """
+    settings = get_ai_settings(db)
+    provider = provider or settings.get("ai_provider", "ollama")
+
+    if provider == "openrouter":
+        api_key = settings.get("openrouter_api_key")
+        if not api_key:
+            raise ValueError("OpenRouter API kulcs nincs beállítva.")
+
+        # Support both openrouter_model and openrouter_default_model keys
+        model = model_name or settings.get("openrouter_model") or settings.get("openrouter_default_model") or DEFAULT_OPENROUTER_MODEL
+        return {"provider": provider, "model": model, "api_key": api_key}
+
+    # Default to Ollama
+    ollama_url = settings.get("ollama_url") or settings.get("ollama_base_url") or DEFAULT_OLLAMA_URL
+    model = model_name or settings.get("ollama_model", DEFAULT_OLLAMA_MODEL)
+    return {"provider": provider, "model": model, "ollama_url": ollama_url}
+
+
+async def chat_with_target(
+    target: Dict[str, Any],
+    messages: list,
+    system_prompt: Optional[str] = None,
+) -> Tuple[str, int, int, float]:
+    """Send chat messages to a ``resolve_chat_target`` target (no database access).
 
-        # Calculate cost based on model pricing
-        cost_usd = calculate_cost(model, input_tokens, output_tokens)
+    Returns:
+        Tuple of (response_text, input_tokens, output_tokens, cost_usd)
+    """
+    if target["provider"] == "openrouter":
+        return await chat_with_openrouter(
+            messages=messages,
+            api_key=target["api_key"],
+            model=target["model"],
+            system_prompt=system_prompt,
+        )
 
-        return response_text, input_tokens, output_tokens, cost_usd
+    response_text, input_tokens, output_tokens = await chat_with_ollama(
+        messages=messages,
+        ollama_url=target["ollama_url"],
+        model=target["model"],
+        system_prompt=system_prompt,
+    )
+    return response_text, input_tokens, output_tokens, 0.0  # Local Ollama is free
 
 
 async def send_chat_message(
@@ -610,40 +620,14 @@ async def send_chat_message(
     Returns:
         Tuple of (response_text, input_tokens, output_tokens)
     """
-    settings = get_ai_settings(db)
-    provider = settings.get("ai_provider", "ollama")
-    cost_usd = 0.0
-
-    if provider == "openrouter":
-        api_key = settings.get("openrouter_api_key")
-        if not api_key:
-            raise ValueError("OpenRouter API kulcs nincs beállítva.")
-
-        # Support both openrouter_model and openrouter_default_model keys
-        model = settings.get("openrouter_model") or settings.get("openrouter_default_model") or DEFAULT_OPENROUTER_MODEL
-        response_text, input_tokens, output_tokens, cost_usd = await chat_with_openrouter(
-            messages=messages,
-            api_key=api_key,
-            model=model,
-            system_prompt=system_prompt,
-        )
-    else:
-        # Default to Ollama
-        ollama_url = settings.get("ollama_url") or settings.get("ollama_base_url") or DEFAULT_OLLAMA_URL
-        model = settings.get("ollama_model", DEFAULT_OLLAMA_MODEL)
-        response_text, input_tokens, output_tokens = await chat_with_ollama(
-            messages=messages,
-            ollama_url=ollama_url,
-            model=model,
-            system_prompt=system_prompt,
-        )
-        cost_usd = 0.0  # Local Ollama is free
+    target = resolve_chat_target(db)
+    response_text, input_tokens, output_tokens, cost_usd = await chat_with_target(target, messages, system_prompt)
 
     # Save token usage with cost
     save_token_usage(
         db=db,
-        provider=provider,
-        model_name=model,
+        provider=target["provider"],
+        model_name=target["model"],
         input_tokens=input_tokens,
         output_tokens=output_tokens,
         cost=cost_usd,
@@ -671,38 +655,14 @@ async def send_chat_message_with_provider(
     Returns:
         Tuple of (response_text, input_tokens, output_tokens)
     """
-    settings = get_ai_settings(db)
-    cost_usd = 0.0
-
-    if provider == "openrouter":
-        api_key = settings.get("openrouter_api_key")
-        if not api_key:
-            raise ValueError("OpenRouter API kulcs nincs beállítva.")
-
-        model = model_name or settings.get("openrouter_model") or settings.get("openrouter_default_model") or DEFAULT_OPENROUTER_MODEL
-        response_text, input_tokens, output_tokens, cost_usd = await chat_with_openrouter(
-            messages=messages,
-            api_key=api_key,
-            model=model,
-            system_prompt=system_prompt,
-        )
-    else:
-        # Default to Ollama
-        ollama_url = settings.get("ollama_url") or settings.get("ollama_base_url") or DEFAULT_OLLAMA_URL
-        model = model_name or settings.get("ollama_model", DEFAULT_OLLAMA_MODEL)
-        response_text, input_tokens, output_tokens = await chat_with_ollama(
-            messages=messages,
-            ollama_url=ollama_url,
-            model=model,
-            system_prompt=system_prompt,
-        )
-        cost_usd = 0.0  # Local Ollama is free
+    target = resolve_chat_target(db, provider=provider, model_name=model_name)
+    response_text, input_tokens, output_tokens, cost_usd = await chat_with_target(target, messages, system_prompt)
 
     # Save token usage with cost
     save_token_usage(
         db=db,
         provider=provider,
-        model_name=model,
+        model_name=target["model"],
         input_tokens=input_tokens,
         output_tokens=output_tokens,
         cost=cost_usd,
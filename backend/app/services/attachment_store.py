@@ -0,0 +1,111 @@
+"""Content-addressed store of email attachment files.
+
+Each distinct attachment is stored once, at a path derived from the
+SHA-256 of its content (``<root>/<hash[:2]>/<hash[2:4]>/<hash>``), so the
+same PDF attached to 200 emails takes the disk space of one.
+``EmailAttachment.file_path`` points at the shared blob; the
+``attachment_blobs`` table counts the attachments referencing each blob.
+
+Blobs are written in chunks to a temp file under ``<root>/tmp`` while the
+hash is computed, then renamed into place (or dropped if the blob exists
+already), so readers never see a partial file. This module only uses the
+standard library: PST parser workers write blobs, the DB writer keeps
+the reference counts (see ``pst_import``).
+
+A blob gets its ``attachment_blobs`` row only when the DB writer commits
+the attachment, some time after a worker wrote (or reused) the file, and
+imports may run side by side. So blob files are never deleted right away
+for lacking a row: ``sweep_orphan_blobs`` (``pst_import``) removes those
+untouched for a grace period. Reusing a blob refreshes its mtime.
+"""
+import hashlib
+import os
+import re
+import time
+import uuid
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+
+_HASH_NAME = re.compile(r"[0-9a-f]{64}")
+
+
+def blob_path(root: str, content_hash: str) -> str:
+    return os.path.join(root, content_hash[:2], content_hash[2:4], content_hash)
+
+
+def write_blob(root: str, read_chunk: Callable[[int], bytes], size: int,
+               chunk_size: int = CHUNK_SIZE) -> Optional[Tuple[str, str, int]]:
+    """Stream ``size`` bytes from ``read_chunk`` into the store.
+
+    Returns (content_hash, blob_path, bytes_written), or None if nothing
+    was read.
+    """
+    if not size:
+        return None
+
+    tmp_dir = os.path.join(root, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            while written < size:
+                data = read_chunk(min(chunk_size, size - written))
+                if not data:
+                    break
+                digest.update(data)
+                f.write(data)
+                written += len(data)
+        if not written:
+            os.remove(tmp_path)
+            return None
+
+        content_hash = digest.hexdigest()
+        path = blob_path(root, content_hash)
+        try:
+            os.utime(path)  # stored already: same content, same path; claimed again
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        return content_hash, path, written
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def iter_stale_files(root: str, grace_seconds: float) -> Iterator[Tuple[Optional[str], str]]:
+    """Blob files and leftover temp files not modified for ``grace_seconds``.
+
+    Yields (content_hash, path) for blobs and (None, path) for temp files.
+    """
+    cutoff = time.time() - grace_seconds
+    for path, _, names in os.walk(root):
+        in_tmp = os.path.relpath(path, root) == "tmp"
+        for name in names:
+            if not in_tmp and not _HASH_NAME.fullmatch(name):
+                continue  # not a blob (files from before the blob store)
+            file_path = os.path.join(path, name)
+            try:
+                if os.path.getmtime(file_path) >= cutoff:
+                    continue
+            except OSError:
+                continue
+            if in_tmp:
+                yield None, file_path
+            elif file_path == blob_path(root, name):
+                yield name, file_path
+
+
+def remove_blobs(paths: Iterable[str]):
+    """Delete blob files (callers check that no attachment references them)."""
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,113 @@
+"""Rolling summary of long chat conversations.
+
+Every turn used to resend the conversation's last ``chat_context_size``
+messages, so the input tokens per turn grew with the conversation. Once
+``CHAT_SUMMARY_TRIGGER_MESSAGES`` messages have piled up since the last
+summary, the chat endpoints queue a ``summarize_conversation`` job. It
+folds all but the newest ``CHAT_SUMMARY_KEEP_MESSAGES`` of them into the
+conversation's running summary (``ChatConversation.summary``) with the
+conversation's own provider and model. From then on the prompt carries
+the summary instead of those messages (``build_message_history`` starts
+after ``summary_through_id``), so a turn's input stays between the keep
+and the trigger count of messages plus the summary.
+
+The summarization requests are recorded in ``TokenUsage`` like any other.
+"""
+import json
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import BackgroundJob, ChatConversation, ChatMessage
+from app.services.ai_service import send_chat_message_with_provider
+from app.services.job_queue import JobContext, JobFailed, enqueue_job, register_job_handler
+
+# Characters of one message in the transcript sent for summarizing
+TRANSCRIPT_MESSAGE_CHARS = 4000
+
+SUMMARY_SYSTEM_PROMPT = """Egy felhasználó és egy AI asszisztens beszélgetésének futó összefoglalóját vezeted.
+Megkapod az eddigi összefoglalót (ha van) és az azóta váltott üzeneteket. Írd meg az új összefoglalót,
+amely az eddigit és az új üzeneteket is magában foglalja.
+
+- Őrizd meg a tényeket, számokat, neveket, döntéseket, a felhasználó kéréseit és a nyitott kérdéseket.
+- Hagyd el az udvariassági formulákat és az ismétléseket.
+- Legfeljebb 250 szó, magyarul, csak az összefoglaló szövegét add vissza."""
+
+
+def summary_prompt(summary: Optional[str]) -> str:
+    """What the summary adds to a turn's system prompt."""
+    return f"A beszélgetés korábbi részének összefoglalója:\n{summary}" if summary else ""
+
+
+def _unsummarized(db: Session, conversation: ChatConversation):
+    query = db.query(ChatMessage).filter(ChatMessage.conversation_id == conversation.id)
+    if conversation.summary_through_id:
+        query = query.filter(ChatMessage.id > conversation.summary_through_id)
+    return query
+
+
+def schedule_summary(db: Session, conversation: ChatConversation) -> Optional[BackgroundJob]:
+    """Queue a ``summarize_conversation`` job if enough messages piled up (and none is pending)."""
+    trigger = settings.CHAT_SUMMARY_TRIGGER_MESSAGES
+    if trigger <= 0 or _unsummarized(db, conversation).count() < trigger:
+        return None
+    payload = {"conversation_id": conversation.id}
+    pending = db.query(BackgroundJob.id).filter(
+        BackgroundJob.kind == "summarize_conversation",
+        BackgroundJob.status.in_(("queued", "running")),
+        BackgroundJob.payload == json.dumps(payload),
+    ).first()
+    if pending:
+        return None
+    return enqueue_job(db, "summarize_conversation", payload=payload, max_attempts=2)
+
+
+async def summarize_conversation(db: Session, conversation: ChatConversation) -> Dict[str, Any]:
+    """Fold the older unsummarized messages into the running summary."""
+    messages = _unsummarized(db, conversation).order_by(ChatMessage.id).all()
+    keep = max(0, settings.CHAT_SUMMARY_KEEP_MESSAGES)
+    fold = messages[:max(0, len(messages) - keep)]
+    # The kept messages start with a question, not with an answer cut off from it
+    while fold and fold[-1].role == "user":
+        fold.pop()
+    if not fold:
+        return {"summarized_messages": 0}
+
+    transcript = "\n\n".join(
+        f"{'Felhasználó' if m.role == 'user' else 'Asszisztens'}: {m.content[:TRANSCRIPT_MESSAGE_CHARS]}"
+        for m in fold
+    )
+    prompt = f"Eddigi összefoglaló:\n{conversation.summary}\n\n" if conversation.summary else ""
+    prompt += f"Új üzenetek:\n{transcript}"
+    summary, input_tokens, output_tokens = await send_chat_message_with_provider(
+        messages=[{"role": "user", "content": prompt}],
+        db=db,
+        provider=conversation.ai_provider or "ollama",
+        model_name=conversation.model_name or "",
+        system_prompt=SUMMARY_SYSTEM_PROMPT,
+    )
+    summary = summary.strip()
+    if not summary:
+        raise ValueError("Üres összefoglaló")
+
+    conversation.summary = summary
+    conversation.summary_through_id = fold[-1].id
+    db.commit()
+    return {
+        "summarized_messages": len(fold),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+    }
+
+
+# ── summarize_conversation ──
+
+async def run_summarize_conversation(ctx: JobContext) -> Dict[str, Any]:
+    conversation = ctx.db.get(ChatConversation, ctx.payload["conversation_id"])
+    if conversation is None:
+        raise JobFailed("A beszélgetés már nem létezik")
+    return await summarize_conversation(ctx.db, conversation)
+
+
+register_job_handler("summarize_conversation", run_summarize_conversation)
@@ -0,0 +1,136 @@
+"""Token frames of the chat WebSocket stream.
+
+Providers stream a token at a time (50-100 a second per conversation).
+By default every token goes to the client as its own frame,
+``{"token": "...", "done": false}``, as the protocol always did. A client
+that sends ``"coalesce": true`` (or ``{"interval_ms": .., "max_chars": ..}``)
+in its first message gets the tokens coalesced: a frame is sent once the
+buffered text is ``max_chars`` long or its first token is ``interval_ms``
+old (defaults ``CHAT_STREAM_COALESCE_MS`` / ``CHAT_STREAM_COALESCE_CHARS``).
+The frames look the same, only the tokens are longer, so a client that
+concatenates them needs no change. The server confirms the settings with
+a ``{"coalesce": {...}}`` frame.
+"""
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+MAX_COALESCE_MS = 1000
+MAX_COALESCE_CHARS = 4096
+
+
+def negotiate_coalescing(first_message: Dict[str, Any]) -> Optional[Dict[str, int]]:
+    """The coalescing settings a client asked for (clamped), or None for a frame per token."""
+    requested = first_message.get("coalesce")
+    if not requested:
+        return None
+    if not isinstance(requested, dict):
+        requested = {}
+
+    def clamp(key: str, default: int, upper: int) -> int:
+        try:
+            return max(0, min(upper, int(requested.get(key, default))))
+        except (TypeError, ValueError):
+            return default
+
+    return {
+        "interval_ms": clamp("interval_ms", settings.CHAT_STREAM_COALESCE_MS, MAX_COALESCE_MS),
+        "max_chars": clamp("max_chars", settings.CHAT_STREAM_COALESCE_CHARS, MAX_COALESCE_CHARS),
+    }
+
+
+class TokenCoalescer:
+    """Sends tokens as ``{"token": ..., "done": false}`` frames, several per frame when coalescing."""
+
+    def __init__(self, send_text: Callable[[str], Awaitable[None]], coalescing: Optional[Dict[str, int]] = None):
+        self._send_text = send_text
+        self.coalescing = coalescing
+        self._interval = coalescing["interval_ms"] / 1000 if coalescing else 0.0
+        self._max_chars = max(1, coalescing["max_chars"]) if coalescing else 1
+        self._parts: List[str] = []
+        self._size = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timed_flush: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.frames = 0
+
+    async def add(self, token: str):
+        if not token:
+            return
+        self._parts.append(token)
+        self._size += len(token)
+        if self._size >= self._max_chars or self._interval <= 0:
+            await self.flush()
+        elif self._timer is None:
+            # The buffer's first token: send it at the latest after the interval
+            self._timer = asyncio.get_running_loop().call_later(self._interval, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._timed_flush = asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:  # one sender at a time, in order
+            if not self._parts:
+                return
+            text = "".join(self._parts)
+            self._parts.clear()
+            self._size = 0
+            self.frames += 1
+            await self._send_text(json.dumps({"token": text, "done": False}))
+
+    async def send(self, frame: Dict[str, Any]):
+        """Send a non-token frame (after the buffered tokens)."""
+        await self.close()
+        await self._send_text(json.dumps(frame))
+
+    async def close(self):
+        """Send what is buffered (before the caller's done frame)."""
+        await self.flush()
+        if self._timed_flush is not None:
+            await self._timed_flush
+            self._timed_flush = None
+
+
+async def relay_stream(
+    events: AsyncIterator[Dict[str, Any]], coalescer: TokenCoalescer
+) -> Tuple[str, int, int, Optional[float]]:
+    """Send a provider stream's tokens to the client.
+
+    ``events`` are ``{"token": ...}`` dicts and a final ``{"done": True,
+    "input_tokens": .., "output_tokens": ..}``. Without coalescing the
+    final event is forwarded as well, as before.
+
+    Returns (full_response, input_tokens, output_tokens, time to first
+    token in seconds or None). The provider request is made when
+    ``events`` is first iterated, so the time includes it.
+    """
+    parts: List[str] = []
+    input_tokens = output_tokens = 0
+    done = None
+    started = time.perf_counter()
+    ttft = None
+    try:
+        async for event in events:
+            if event.get("done"):
+                done = event
+                input_tokens = event.get("input_tokens", 0)
+                output_tokens = event.get("output_tokens", 0)
+            else:
+                token = event.get("token", "")
+                if ttft is None and token:
+                    ttft = time.perf_counter() - started
+                parts.append(token)
+                await coalescer.add(token)
+    finally:
+        # Tokens already received go out before a done or error frame
+        await coalescer.close()
+    if done is not None and coalescer.coalescing is None:
+        await coalescer.send(done)
+    return "".join(parts), input_tokens, output_tokens, ttft
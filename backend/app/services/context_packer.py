@@ -0,0 +1,132 @@
+"""Token budget of a chat turn's prompt.
+
+A turn's prompt is the system prompt, the RAG context (document chunks)
+and the conversation history ending with the question. ``pack_context``
+fits them into the model's context window (``context_length``) less
+``CHAT_ANSWER_RESERVE_TOKENS`` kept free for the answer:
+
+- the system prompt and the question always go in;
+- the RAG chunks get up to ``CHAT_RAG_BUDGET_SHARE`` of the rest (more if
+  the history needs less), best score first; the first one that does not
+  fit is cut short if a useful part of it fits, the ones after it are
+  dropped;
+- the history gets what is left, newest message first; the older ones
+  are dropped.
+
+Token counts are ``estimate_tokens`` estimates.
+"""
+from typing import Any, Dict, List, Tuple
+
+from app.core.config import settings
+from app.services.ai_service import estimate_tokens, fetch_openrouter_models, get_model_context_length
+
+# Tokens of the RAG context's heading and closing lines, of a chunk's
+# "[Részlet i - file (relevancia: x)]" line and of a message's role markers
+RAG_FRAME_TOKENS = 70
+CHUNK_FRAME_TOKENS = 12
+MESSAGE_FRAME_TOKENS = 4
+# A chunk is only cut short if at least this much of it fits
+MIN_CHUNK_TOKENS = 64
+# estimate_tokens' characters per token
+CHARS_PER_TOKEN = 3.5
+
+
+async def context_length(target: Dict[str, Any]) -> int:
+    """Context window of a ``resolve_chat_target`` target, in tokens.
+
+    OpenRouter models report theirs in the models list (cached for an
+    hour); Ollama's is ``OLLAMA_CONTEXT_LENGTH``, which is also sent as
+    ``num_ctx``.
+    """
+    if target["provider"] == "openrouter":
+        length = get_model_context_length(target["model"])
+        if length is None and target.get("api_key"):
+            try:
+                await fetch_openrouter_models(target["api_key"])
+                length = get_model_context_length(target["model"])
+            except ValueError as e:
+                print(f"[ContextPacker] OpenRouter modellista hiba: {e}")
+        return length or settings.DEFAULT_CONTEXT_LENGTH
+    return settings.OLLAMA_CONTEXT_LENGTH or settings.DEFAULT_CONTEXT_LENGTH
+
+
+def message_tokens(message: Dict[str, Any]) -> int:
+    return estimate_tokens(message.get("content", "")) + MESSAGE_FRAME_TOKENS
+
+
+def chunk_tokens(chunk: Dict[str, Any]) -> int:
+    return estimate_tokens(chunk.get("document_filename", "") + chunk.get("content", "")) + CHUNK_FRAME_TOKENS
+
+
+def _cut_chunk(chunk: Dict[str, Any], tokens: int) -> Dict[str, Any]:
+    content = chunk.get("content", "")[: int(tokens * CHARS_PER_TOKEN)]
+    return {**chunk, "content": content.rstrip() + " […]", "truncated": True}
+
+
+def pack_context(
+    context_length: int,
+    system_prompt: str,
+    history: List[Dict[str, Any]],
+    chunks: List[Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, int]]:
+    """Choose the history messages and RAG chunks that fit the budget.
+
+    ``history`` ends with the question; ``chunks`` are RAG search results
+    (``content``, ``document_filename``, ``score``).
+
+    Returns (history, chunks, usage); usage has the context length, the
+    budget, the tokens used per part and what was dropped or cut short.
+    """
+    reserve = min(settings.CHAT_ANSWER_RESERVE_TOKENS, context_length // 4)
+    budget = context_length - reserve
+    system = estimate_tokens(system_prompt)
+    earlier, question = history[:-1], history[-1:]
+    question_tokens = sum(message_tokens(m) for m in question)
+    available = max(0, budget - system - question_tokens)
+
+    # RAG chunks, best first, within their share (or whatever the history leaves)
+    wanted_by_history = sum(message_tokens(m) for m in earlier)
+    rag_budget = max(int(available * settings.CHAT_RAG_BUDGET_SHARE), available - wanted_by_history)
+    packed_chunks: List[Dict[str, Any]] = []
+    rag = RAG_FRAME_TOKENS
+    truncated = 0
+    for chunk in sorted(chunks, key=lambda c: c.get("score", 0), reverse=True):
+        cost = chunk_tokens(chunk)
+        room = rag_budget - rag
+        if cost <= room:
+            packed_chunks.append(chunk)
+            rag += cost
+            continue
+        if room - CHUNK_FRAME_TOKENS >= MIN_CHUNK_TOKENS:
+            packed_chunks.append(_cut_chunk(chunk, room - CHUNK_FRAME_TOKENS))
+            rag += room
+            truncated = 1
+        break
+    if not packed_chunks:
+        rag = 0
+
+    # History, newest first, in what is left
+    room = available - rag
+    kept = 0
+    history_tokens = 0
+    for message in reversed(earlier):
+        cost = message_tokens(message)
+        if cost > room:
+            break
+        room -= cost
+        history_tokens += cost
+        kept += 1
+    packed_history = earlier[len(earlier) - kept:] + question
+
+    usage = {
+        "context_length": context_length,
+        "budget": budget,
+        "used": system + rag + history_tokens + question_tokens,
+        "system": system,
+        "rag": rag,
+        "history": history_tokens + question_tokens,
+        "dropped_messages": len(earlier) - kept,
+        "dropped_chunks": len(chunks) - len(packed_chunks),
+        "truncated_chunks": truncated,
+    }
+    return packed_history, packed_chunks, usage
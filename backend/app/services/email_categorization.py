@@ -0,0 +1,352 @@
+"""AI email importance categorization.
+
+``categorize_emails`` runs the LLM calls concurrently: a feeder loads the
+emails in chunks onto a bounded queue, ``chat_concurrency(provider)``
+workers call the provider (OpenRouter calls also take a token from the
+provider's rate limiter, and a 429 answer is retried after its
+Retry-After), and the caller's coroutine collects the results. Each call
+categorizes ``EMAIL_AI_PROMPT_BATCH_SIZE`` emails (see ``email_prompts``);
+emails missing from a batched reply are sent again one by one. Results
+are written ``EMAIL_CATEGORIZE_BATCH_SIZE`` at a time, email updates and
+token usage rows in one commit, so the session is only used between
+awaits, never by two coroutines at once.
+
+Progress goes out as ``email_categorization.progress`` WebSocket events
+(with the emails per minute so far), at most about once a second and
+after every batch commit.
+"""
+import asyncio
+import json
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import AppSetting, Email, TokenUsage
+from app.services.ai_limits import TokenBucket, chat_concurrency, rate_limiter, retry_after_seconds
+from app.services.ai_service import chat_with_target, resolve_chat_target
+from app.services.email_prompts import EmailRow, batch_email_prompt, email_prompt, parse_batch_reply
+
+IMPORTANCE_LEVELS = ["Kritikus", "Magas", "Közepes", "Alacsony"]
+
+_IMPORTANCE_LEVELS_TEXT = """Fontossági szintek:
+- Kritikus: Sürgős, azonnali beavatkozást igényel (pl. határidők, kritikus hibák, sürgős kérések)
+- Magas: Fontos, de nem sürgős (pl. fontos projektek, döntések, vezetői kommunikáció)
+- Közepes: Normál prioritású emailek (pl. rutin kommunikáció, információk)
+- Alacsony: Nem sürgős (pl. hírlevelek, tájékoztatók, promóciók)"""
+
+CATEGORIZATION_SYSTEM_PROMPT = f"""Te egy email elemző asszisztens vagy. A feladatod az email tartalom alapján meghatározni a fontossági szintet.
+
+{_IMPORTANCE_LEVELS_TEXT}
+
+Válaszolj CSAK JSON formátumban:
+{{"importance": "SZINT", "reason": "Rövid indoklás magyarul"}}"""
+
+CATEGORIZATION_BATCH_SYSTEM_PROMPT = f"""Te egy email elemző asszisztens vagy. Több emailt kapsz, mindegyiket az azonosítójával (Email ID). A feladatod minden email tartalma alapján meghatározni a fontossági szintet.
+
+{_IMPORTANCE_LEVELS_TEXT}
+
+Válaszolj CSAK egy JSON tömbbel, minden emailhez egy elemmel:
+[{{"email_id": ID, "importance": "SZINT", "reason": "Rövid indoklás magyarul"}}]"""
+
+# Characters of the body sent to the model (less per email in a batched prompt)
+BODY_PROMPT_CHARS = 2000
+BATCH_BODY_PROMPT_CHARS = 1000
+# Retries of a call answered with 429 Too Many Requests
+MAX_RATE_LIMIT_RETRIES = 3
+# Seconds between progress events while a batch fills up
+PROGRESS_INTERVAL_SECONDS = 1.0
+# The result is stored on the job row: keep it small
+MAX_RESULT_ITEMS = 50
+MAX_RESULT_ERRORS = 10
+
+
+def auto_categorize_enabled(db: Session) -> bool:
+    """Check if email auto-categorization is enabled."""
+    setting = db.query(AppSetting).filter(AppSetting.key == "email_auto_categorize").first()
+    return setting.value == "true" if setting else False
+
+
+def parse_ai_categorization_response(response_text: str) -> tuple[str, str]:
+    """Parse AI response to extract importance level and reason.
+
+    Returns:
+        Tuple of (importance, reason)
+    """
+    importance = "Közepes"  # Default
+    reason = response_text.strip()
+
+    # Try to parse JSON format first
+    try:
+        # Look for JSON in the response
+        json_match = re.search(r'\{[^}]+\}', response_text, re.DOTALL)
+        if json_match:
+            return categorization_from_dict(json.loads(json_match.group()), reason)
+    except (json.JSONDecodeError, AttributeError):
+        pass
+
+    # Try to extract from plain text
+    response_lower = response_text.lower()
+    for level in IMPORTANCE_LEVELS:
+        if level.lower() in response_lower:
+            importance = level
+            break
+
+    return importance, reason
+
+
+def categorization_from_dict(data: dict, reason: str = "") -> tuple[str, str]:
+    """(importance, reason) from a parsed JSON answer."""
+    importance = "Közepes"  # Default
+    if "importance" in data or "fontosság" in data or "fontossag" in data:
+        imp = data.get("importance") or data.get("fontosság") or data.get("fontossag", "")
+        if imp:
+            # Normalize to Hungarian importance levels
+            imp_lower = imp.lower()
+            if "kritikus" in imp_lower or "critical" in imp_lower:
+                importance = "Kritikus"
+            elif "magas" in imp_lower or "high" in imp_lower:
+                importance = "Magas"
+            elif "közepes" in imp_lower or "kozepes" in imp_lower or "medium" in imp_lower:
+                importance = "Közepes"
+            elif "alacsony" in imp_lower or "low" in imp_lower:
+                importance = "Alacsony"
+    if "reason" in data or "indok" in data or "indoklás" in data or "indoklas" in data:
+        reason = data.get("reason") or data.get("indok") or data.get("indoklás") or data.get("indoklas", reason)
+    return importance, reason
+
+
+def emails_per_minute(done: int, seconds: float) -> Optional[float]:
+    return round(done / seconds * 60, 1) if done and seconds > 0 else None
+
+
+async def _send_progress(data: dict):
+    from app.routers.websocket_router import broadcast
+
+    try:
+        await broadcast("email_categorization.progress", data)
+    except Exception:
+        pass  # Ignore broadcast errors
+
+
+async def _chat(target: Dict[str, Any], bucket: Optional[TokenBucket], content: str, system_prompt: str):
+    """One model call, waiting for the rate limiter and retrying 429s."""
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        if bucket is not None:
+            await bucket.acquire()
+        try:
+            return await chat_with_target(
+                target,
+                [{"role": "user", "content": content}],
+                system_prompt=system_prompt,
+            )
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+                raise
+            delay = retry_after_seconds(e.response, attempt)
+            if bucket is not None:
+                bucket.penalize(delay)  # holds back the other workers too
+            else:
+                await asyncio.sleep(delay)
+
+
+def _usage(target: Dict[str, Any], reply) -> Dict[str, Any]:
+    _, input_tokens, output_tokens, cost = reply
+    return {
+        "provider": target["provider"],
+        "model_name": target["model"],
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cost": cost,
+    }
+
+
+async def _categorize_chunk(target: Dict[str, Any], bucket: Optional[TokenBucket], rows: List[EmailRow]):
+    """Categorize ``rows`` with one batched call, and the emails its reply misses one by one.
+
+    Returns ({email_id: (importance, reason) or the exception}, token usage rows).
+    """
+    outcomes: Dict[int, Any] = {}
+    usages: List[Dict[str, Any]] = []
+    if len(rows) > 1:
+        try:
+            reply = await _chat(target, bucket, batch_email_prompt(rows, BATCH_BODY_PROMPT_CHARS), CATEGORIZATION_BATCH_SYSTEM_PROMPT)
+            usages.append(_usage(target, reply))
+            for email_id, data in parse_batch_reply(reply[0], [row[0] for row in rows]).items():
+                outcomes[email_id] = categorization_from_dict(data)
+        except Exception as e:
+            print(f"[EmailCategorization] Csoportos kérés hiba, emailenkénti feldolgozás: {e}")
+
+    for email_id, subject, sender, body in rows:
+        if email_id in outcomes:
+            continue
+        try:
+            reply = await _chat(target, bucket, email_prompt(subject, sender, body, BODY_PROMPT_CHARS), CATEGORIZATION_SYSTEM_PROMPT)
+            usages.append(_usage(target, reply))
+            outcomes[email_id] = parse_ai_categorization_response(reply[0])
+        except Exception as e:
+            outcomes[email_id] = e
+    return outcomes, usages
+
+
+def _select_email_ids(db: Session, email_ids: Optional[List[int]]) -> List[int]:
+    query = db.query(Email.id)
+    if email_ids:
+        query = query.filter(Email.id.in_(email_ids))
+    else:
+        # Only categorize emails without AI importance reason (uncategorized)
+        query = query.filter(Email.ai_importance_reason.is_(None))
+    return [email_id for (email_id,) in query.order_by(Email.id).all()]
+
+
+async def categorize_emails(
+    db: Session,
+    email_ids: Optional[List[int]] = None,
+    progress: Optional[Callable[[int, Optional[int], Optional[str]], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """Categorize the given emails (default: every uncategorized one).
+
+    ``progress(done, total, message)`` is awaited after every batch
+    commit (the job's ``JobContext.progress``; it may raise to stop).
+    Returns the fields of ``EmailCategorizationResult``; ``results`` and
+    ``errors`` list at most the first ``MAX_RESULT_ITEMS`` /
+    ``MAX_RESULT_ERRORS`` entries.
+    """
+    ids = _select_email_ids(db, email_ids)
+    total = len(ids)
+    result = {
+        "success": True,
+        "total_processed": total,
+        "categorized": 0,
+        "errors": [],
+        "results": [],
+        "emails_per_minute": None,
+    }
+    started = time.perf_counter()
+    done = 0
+    failed = 0
+
+    async def report(status: str, message: str):
+        result["emails_per_minute"] = emails_per_minute(done, time.perf_counter() - started)
+        await _send_progress({
+            "status": status,
+            "current": done,
+            "total": total,
+            "categorized": result["categorized"],
+            "emails_per_minute": result["emails_per_minute"],
+            "message": message,
+        })
+
+    if not ids:
+        await report("completed", "Nincs kategorizálandó email")
+        return result
+
+    try:
+        target = resolve_chat_target(db)
+    except Exception as e:
+        await report("error", str(e))
+        raise
+
+    batch_size = max(1, settings.EMAIL_CATEGORIZE_BATCH_SIZE)
+    prompt_size = max(1, settings.EMAIL_AI_PROMPT_BATCH_SIZE)
+    concurrency = min(chat_concurrency(target["provider"]), -(-total // prompt_size))
+    bucket = rate_limiter(target["provider"])
+    pending: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    finished: asyncio.Queue = asyncio.Queue()
+
+    async def feed():
+        try:
+            for start in range(0, total, batch_size):
+                chunk = ids[start:start + batch_size]
+                rows = (
+                    db.query(Email.id, Email.subject, Email.sender, Email.body)
+                    .filter(Email.id.in_(chunk))
+                    .all()
+                )
+                rows = [tuple(row) for row in rows]
+                for i in range(0, len(rows), prompt_size):
+                    await pending.put(rows[i:i + prompt_size])
+                for email_id in set(chunk) - {row[0] for row in rows}:
+                    await finished.put((email_id, None, []))  # deleted meanwhile
+        except Exception as e:
+            await finished.put((None, e, []))
+        finally:
+            for _ in range(concurrency):
+                await pending.put(None)
+
+    async def work():
+        while True:
+            rows = await pending.get()
+            if rows is None:
+                return
+            outcomes, chunk_usages = await _categorize_chunk(target, bucket, rows)
+            for email_id, _, _, _ in rows:
+                await finished.put((email_id, outcomes[email_id], chunk_usages))
+                chunk_usages = []  # counted once per chunk
+
+    updates: List[Dict[str, Any]] = []
+    usages: List[Dict[str, Any]] = []
+
+    def commit_batch():
+        if updates:
+            db.execute(update(Email), updates)  # bulk UPDATE by primary key
+        if usages:
+            db.execute(insert(TokenUsage), usages)
+        db.commit()
+        updates.clear()
+        usages.clear()
+
+    tasks = [asyncio.create_task(feed())] + [asyncio.create_task(work()) for _ in range(concurrency)]
+    try:
+        await report("processing", "AI kategorizálás indítása...")
+        last_report = time.perf_counter()
+        while done < total:
+            email_id, outcome, call_usages = await finished.get()
+            if email_id is None:
+                raise outcome
+            done += 1
+            usages.extend(call_usages)
+
+            if isinstance(outcome, Exception):
+                failed += 1
+                if len(result["errors"]) < MAX_RESULT_ERRORS:
+                    result["errors"].append(f"Hiba az email ({email_id}) kategorizálásakor: {outcome}")
+            elif outcome is not None:
+                importance, reason = outcome
+                updates.append({"id": email_id, "importance": importance, "ai_importance_reason": reason})
+                result["categorized"] += 1
+                if len(result["results"]) < MAX_RESULT_ITEMS:
+                    result["results"].append({
+                        "email_id": email_id,
+                        "importance": importance,
+                        "ai_importance_reason": reason,
+                    })
+
+            if len(updates) >= batch_size or done == total:
+                commit_batch()
+                message = f"Feldolgozva: {done}/{total} email"
+                await report("processing", message)
+                last_report = time.perf_counter()
+                if progress is not None:
+                    await progress(done, total, message)
+            elif time.perf_counter() - last_report >= PROGRESS_INTERVAL_SECONDS:
+                await report("processing", f"Feldolgozva: {done}/{total} email")
+                last_report = time.perf_counter()
+    except Exception as e:
+        db.rollback()
+        await report("error", str(e) or "A kategorizálás megszakadt")
+        raise
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if failed > len(result["errors"]):
+        result["errors"].append(f"...és további {failed - len(result['errors'])} hiba")
+    result["success"] = failed == 0
+    await report("completed", f"Kategorizálás befejezve: {result['categorized']} email feldolgozva")
+    return result
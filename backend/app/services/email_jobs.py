@@ -0,0 +1,87 @@
+"""Background job handlers for emails.
+
+- ``pst_import``: import a PST archive. The job's checkpoint records how
+  far every work unit got, so an import interrupted by a restart, a
+  crashed worker or a cancellation continues where it stopped. When
+  auto-categorization is on, a finished import queues a
+  ``categorize_emails`` job for the new emails.
+- ``categorize_emails``: AI importance categorization (see
+  ``email_categorization``). Not checkpointed: by default it picks the
+  emails that have no AI reason yet, which is where a rerun continues.
+"""
+import json
+import os
+from typing import Any, Dict
+
+from app.models.models import BackgroundJob
+from app.schemas.schemas import EmailCategorizationResult, PSTImportResult
+from app.services.email_categorization import auto_categorize_enabled, categorize_emails
+from app.services.job_queue import FINISHED_STATUSES, JobContext, JobFailed, enqueue_job, register_job_handler
+from app.services.pst_import import checkpoint_complete, new_checkpoint, process_pst_file, send_progress
+
+
+# ── pst_import ──
+
+async def run_pst_import(ctx: JobContext) -> Dict[str, Any]:
+    pst_path = ctx.payload["pst_path"]
+    if not os.path.exists(pst_path):
+        raise JobFailed("A PST fájl már nem elérhető")
+
+    result = await process_pst_file(
+        pst_path,
+        ctx.db,
+        checkpoint=ctx.checkpoint or None,
+        on_checkpoint=ctx.set_checkpoint,
+        progress=ctx.progress,
+    )
+    if result.resumable:
+        # Failed, not retried: the same error would recur; resuming is the user's call
+        raise JobFailed(result.errors[-1] if result.errors else "Az import nem fejeződött be")
+
+    if result.imported > 0 and auto_categorize_enabled(ctx.db):
+        await send_progress("pst_import.progress", {
+            "status": "categorizing",
+            "current": result.total_emails,
+            "total": result.total_emails,
+            "imported": result.imported,
+            "skipped": result.skipped,
+            "message": "Automatikus AI kategorizálás indítása..."
+        })
+        enqueue_job(ctx.db, "categorize_emails", max_attempts=1)
+    return result.model_dump()
+
+
+def pst_import_result(job: BackgroundJob) -> PSTImportResult:
+    """Result of a ``pst_import`` job; for an unfinished one, what its checkpoint recorded."""
+    if job.status == "completed" and job.result:
+        return PSTImportResult(**{**json.loads(job.result), "job_id": job.id})
+
+    checkpoint = {**new_checkpoint(), **(json.loads(job.checkpoint) if job.checkpoint else {})}
+    pst_path = json.loads(job.payload)["pst_path"] if job.payload else None
+    errors = ([job.error] if job.error else []) + checkpoint["errors"]
+    return PSTImportResult(
+        success=False,
+        total_emails=checkpoint["total"],
+        imported=checkpoint["imported"],
+        skipped=checkpoint["skipped"],
+        errors=errors[:10],
+        attachment_bytes_saved=checkpoint["attachment_bytes_saved"],
+        job_id=job.id,
+        resumable=(
+            job.status in FINISHED_STATUSES
+            and not checkpoint_complete(checkpoint)
+            and pst_path is not None
+            and os.path.exists(pst_path)
+        ),
+    )
+
+
+# ── categorize_emails ──
+
+async def run_email_categorization(ctx: JobContext) -> Dict[str, Any]:
+    result = await categorize_emails(ctx.db, email_ids=ctx.payload.get("email_ids"), progress=ctx.progress)
+    return EmailCategorizationResult(**result).model_dump()
+
+
+register_job_handler("pst_import", run_pst_import)
+register_job_handler("categorize_emails", run_email_categorization)
@@ -0,0 +1,264 @@
+"""AI suggestions linking emails to the current month's tasks.
+
+Emails are pre-matched by embedding similarity first (``match_tasks``):
+task names/descriptions and email subjects/bodies are embedded with
+``generate_embeddings_batch`` (cached, so the tasks cost nothing after
+the first run) and compared by cosine similarity. An email whose best
+task scores at least ``EMAIL_LINK_MATCH_THRESHOLD``, and leads the
+runner-up by ``EMAIL_LINK_MATCH_MARGIN``, is linked without the LLM; the
+similarity is its confidence. The ambiguous ones go to the LLM with their
+``EMAIL_LINK_SHORTLIST_SIZE`` best candidates instead of the whole task
+list. Without embeddings (provider down) every email goes to the LLM with
+every task.
+
+The system prompt lists the tasks, so it is by far the largest part of a
+request. The auto-link endpoint passes ``suggest_links``
+``EMAIL_AI_PROMPT_BATCH_SIZE`` emails at a time: they go in one request
+(see ``email_prompts``), and the emails a batched reply misses in one
+request each. Every request records its token usage
+(``send_chat_message``).
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import ProcessInstance, ProcessType
+from app.services.ai_service import send_chat_message
+from app.services.email_prompts import EmailRow, batch_email_prompt, email_prompt, parse_batch_reply
+from app.services.embedding_service import generate_embeddings_batch
+
+# Characters of the body sent to the model (less per email in a batched prompt)
+BODY_PROMPT_CHARS = 1500
+BATCH_BODY_PROMPT_CHARS = 1000
+# Characters of the body embedded for the pre-match
+EMBED_BODY_CHARS = 1000
+
+# (process_instance_id, cosine similarity), best first
+Candidates = List[Tuple[int, float]]
+
+
+def monthly_tasks(db: Session, year: int, month: int) -> List[dict]:
+    """The month's process instances with their type's name and description (one query)."""
+    rows = (
+        db.query(ProcessInstance.id, ProcessType.name, ProcessType.description)
+        .join(ProcessType, ProcessType.id == ProcessInstance.process_type_id)
+        .filter(ProcessInstance.year == year, ProcessInstance.month == month)
+        .order_by(ProcessInstance.id)
+        .all()
+    )
+    return [{"id": task_id, "name": name, "description": description or ""} for task_id, name, description in rows]
+
+
+def _normalized(vectors: List[List[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+async def match_tasks(db: Session, rows: Sequence[EmailRow], available_tasks: List[dict]) -> Dict[int, Candidates]:
+    """Best ``EMAIL_LINK_SHORTLIST_SIZE`` tasks per email by embedding similarity.
+
+    Emails without an embedding are left out; if embedding fails
+    altogether the result is empty.
+    """
+    if not rows or not available_tasks:
+        return {}
+
+    texts = [f"{t['name']}\n{t['description']}" for t in available_tasks]
+    texts += [f"{subject or ''}\n{(body or '')[:EMBED_BODY_CHARS]}" for _, subject, _, body in rows]
+    try:
+        vectors = await generate_embeddings_batch(texts, db)
+    except Exception as e:
+        print(f"[EmailLinking] Embedding hiba, előszűrés nélkül: {e}")
+        return {}
+
+    tasks = [(t["id"], v) for t, v in zip(available_tasks, vectors) if v]
+    emails = [(row[0], v) for row, v in zip(rows, vectors[len(available_tasks):]) if v]
+    if not tasks or not emails:
+        return {}
+
+    task_ids = [task_id for task_id, _ in tasks]
+    scores = _normalized([v for _, v in emails]) @ _normalized([v for _, v in tasks]).T
+    k = max(1, settings.EMAIL_LINK_SHORTLIST_SIZE)
+    candidates = {}
+    for (email_id, _), row_scores in zip(emails, scores):
+        best = np.argsort(-row_scores)[:k]
+        candidates[email_id] = [(task_ids[i], float(row_scores[i])) for i in best]
+    return candidates
+
+
+def confident_match(candidates: Candidates) -> Optional[Tuple[int, float]]:
+    """(task id, confidence) if the best candidate is clear enough to skip the LLM."""
+    if not candidates:
+        return None
+    task_id, score = candidates[0]
+    runner_up = candidates[1][1] if len(candidates) > 1 else -1.0
+    if score >= settings.EMAIL_LINK_MATCH_THRESHOLD and score - runner_up >= settings.EMAIL_LINK_MATCH_MARGIN:
+        return task_id, round(min(1.0, score), 3)
+    return None
+
+
+def task_list_text(available_tasks: List[dict]) -> str:
+    return "\n".join([f"- ID: {t['id']}, Név: {t['name']}" + (f", Leírás: {t['description'][:100]}" if t['description'] else "") for t in available_tasks])
+
+
+def link_system_prompt(task_list: str) -> str:
+    return f"""Te egy email elemző asszisztens vagy. A feladatod az email tartalom alapján megtalálni a megfelelő havi feladatot.
+
+Elérhető feladatok:
+{task_list}
+
+Elemezd az email tartalmát (tárgy, feladó, szöveg) és válaszd ki a legmegfelelőbb feladatot.
+Ha nem találsz megfelelő feladatot, állítsd a confidence értéket 0-ra.
+
+Válaszolj CSAK JSON formátumban:
+{{"task_id": SZÁM, "task_name": "FELADAT_NÉV", "confidence": 0.0-1.0, "reason": "Rövid indoklás magyarul"}}
+
+Példa válasz:
+{{"task_id": 5, "task_name": "Számlázás", "confidence": 0.85, "reason": "Az email számla mellékletről szól"}}"""
+
+
+def link_batch_system_prompt(task_list: str) -> str:
+    return f"""Te egy email elemző asszisztens vagy. Több emailt kapsz, mindegyiket az azonosítójával (Email ID). A feladatod minden emailhez megtalálni a megfelelő havi feladatot.
+
+Elérhető feladatok:
+{task_list}
+
+Elemezd minden email tartalmát (tárgy, feladó, szöveg) és válaszd ki a legmegfelelőbb feladatot.
+Ha egy emailhez nem találsz megfelelő feladatot, állítsd a confidence értéket 0-ra.
+
+Válaszolj CSAK egy JSON tömbbel, minden emailhez egy elemmel:
+[{{"email_id": ID, "task_id": SZÁM, "task_name": "FELADAT_NÉV", "confidence": 0.0-1.0, "reason": "Rövid indoklás magyarul"}}]"""
+
+
+def parse_ai_link_response(response_text: str, available_tasks: list) -> tuple[int | None, float, str]:
+    """Parse AI response to extract task ID, confidence score, and reason.
+
+    Returns:
+        Tuple of (process_instance_id, confidence, reason)
+    """
+    reason = response_text.strip()
+
+    # Try to parse JSON format first
+    try:
+        json_match = re.search(r'\{[^}]+\}', response_text, re.DOTALL)
+        if json_match:
+            return link_from_dict(json.loads(json_match.group()), available_tasks, reason)
+    except (json.JSONDecodeError, AttributeError):
+        pass
+
+    # Try to find task name in plain text
+    task_map = {task["name"].lower(): task["id"] for task in available_tasks}
+    response_lower = response_text.lower()
+    for name, tid in task_map.items():
+        if name in response_lower:
+            return tid, 0.3, reason  # Low confidence for plain text match
+
+    return None, 0.0, reason
+
+
+def link_from_dict(data: dict, available_tasks: list, reason: str = "") -> tuple[int | None, float, str]:
+    """(process_instance_id, confidence, reason) from a parsed JSON answer."""
+    process_instance_id = None
+    confidence = 0.0
+
+    # Create a mapping of task names to IDs
+    task_map = {task["name"].lower(): task["id"] for task in available_tasks}
+
+    # Get task name or ID
+    task_name = data.get("task_name") or data.get("feladat") or data.get("process") or ""
+    task_id = data.get("task_id") or data.get("process_instance_id")
+
+    if task_id and isinstance(task_id, int):
+        # Verify task ID exists in available tasks
+        if any(t["id"] == task_id for t in available_tasks):
+            process_instance_id = task_id
+    elif task_name:
+        # Match by name
+        task_name_lower = task_name.lower()
+        for name, tid in task_map.items():
+            if task_name_lower in name or name in task_name_lower:
+                process_instance_id = tid
+                break
+
+    # Get confidence
+    conf = data.get("confidence") or data.get("bizonyosság") or data.get("bizonyossag") or 0.0
+    if isinstance(conf, (int, float)):
+        confidence = float(conf)
+        if confidence > 1:
+            confidence = confidence / 100.0  # Convert percentage to 0-1
+        confidence = max(0.0, min(1.0, confidence))
+
+    # Get reason
+    reason = data.get("reason") or data.get("indok") or data.get("indoklás") or reason
+
+    return process_instance_id, confidence, reason
+
+
+def prematched_first(rows: Sequence[EmailRow], candidates: Dict[int, Candidates]) -> List[EmailRow]:
+    """``rows`` with the confident matches first, so prompt batches hold only emails the LLM has to decide."""
+    return sorted(rows, key=lambda row: confident_match(candidates.get(row[0], [])) is None)
+
+
+async def suggest_links(
+    db: Session,
+    rows: Sequence[EmailRow],
+    available_tasks: List[dict],
+    candidates: Optional[Dict[int, Candidates]] = None,
+) -> Dict[int, Any]:
+    """Task suggestion for a batch of emails.
+
+    Emails with a confident embedding match (``candidates``) need no
+    request; the rest go in one request, listing only their candidate
+    tasks, plus one per email the reply misses.
+
+    Returns {email_id: (process_instance_id, confidence, reason) or the exception}.
+    """
+    candidates = candidates or {}
+    outcomes: Dict[int, Any] = {}
+    for email_id, _, _, _ in rows:
+        match = confident_match(candidates.get(email_id, []))
+        if match:
+            task_id, confidence = match
+            outcomes[email_id] = (task_id, confidence, f"Tartalmi hasonlóság alapján ({confidence:.2f})")
+
+    rows = [row for row in rows if row[0] not in outcomes]
+    if not rows:
+        return outcomes
+
+    # The shortlists of the emails asked about (every task for an email without one)
+    if all(row[0] in candidates for row in rows):
+        shortlisted = {task_id for row in rows for task_id, _ in candidates[row[0]]}
+        available_tasks = [t for t in available_tasks if t["id"] in shortlisted]
+    task_list = task_list_text(available_tasks)
+
+    if len(rows) > 1:
+        try:
+            response_text, _, _ = await send_chat_message(
+                messages=[{"role": "user", "content": batch_email_prompt(rows, BATCH_BODY_PROMPT_CHARS)}],
+                db=db,
+                system_prompt=link_batch_system_prompt(task_list),
+            )
+            for email_id, data in parse_batch_reply(response_text, [row[0] for row in rows]).items():
+                outcomes[email_id] = link_from_dict(data, available_tasks)
+        except Exception as e:
+            print(f"[EmailLinking] Csoportos kérés hiba, emailenkénti feldolgozás: {e}")
+
+    system_prompt = link_system_prompt(task_list)
+    for email_id, subject, sender, body in rows:
+        if email_id in outcomes:
+            continue
+        try:
+            response_text, _, _ = await send_chat_message(
+                messages=[{"role": "user", "content": email_prompt(subject, sender, body, BODY_PROMPT_CHARS)}],
+                db=db,
+                system_prompt=system_prompt,
+            )
+            outcomes[email_id] = parse_ai_link_response(response_text, available_tasks)
+        except Exception as e:
+            outcomes[email_id] = e
+    return outcomes
@@ -0,0 +1,59 @@
+"""Email prompts for the AI features, one email or several per request.
+
+A batched request lists several emails, each under its id, and asks for
+a JSON array with one object per email keyed by ``email_id``. The system
+prompt (for auto-linking it holds the whole task list) is then sent once
+per batch instead of once per email. ``parse_batch_reply`` returns what
+it could match; callers send the emails it missed one by one.
+"""
+import json
+import re
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+# (email_id, subject, sender, body)
+EmailRow = Tuple[int, Optional[str], Optional[str], Optional[str]]
+
+
+def email_prompt(subject: Optional[str], sender: Optional[str], body: Optional[str], body_chars: int) -> str:
+    return f"""Tárgy: {subject or '(Nincs tárgy)'}
+Feladó: {sender or 'Ismeretlen'}
+Tartalom: {(body or '')[:body_chars]}"""
+
+
+def batch_email_prompt(emails: Sequence[EmailRow], body_chars: int) -> str:
+    parts = []
+    for email_id, subject, sender, body in emails:
+        parts.append(f"### Email ID: {email_id}\n{email_prompt(subject, sender, body, body_chars)}")
+    return "\n\n".join(parts)
+
+
+def _json_array(text: str) -> Optional[list]:
+    text = re.sub(r"```(?:json)?", "", text)
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, list) else None
+
+
+def parse_batch_reply(response_text: str, email_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """Per-email result objects of a batched reply, by email id.
+
+    Items with an unknown or missing ``email_id`` are ignored; an
+    unparsable reply gives an empty dict.
+    """
+    wanted = set(email_ids)
+    results: Dict[int, Dict[str, Any]] = {}
+    for item in _json_array(response_text) or []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            email_id = int(item.get("email_id", item.get("id")))
+        except (TypeError, ValueError):
+            continue
+        if email_id in wanted and email_id not in results:
+            results[email_id] = item
+    return results
@@ -0,0 +1,184 @@
+"""
+PERZISZTENS EMBEDDING CACHE
+Chunk szöveg → embedding vektor, az adatbázisban (embedding_cache tábla).
+
+Kulcs: sha256(normalizált szöveg) + provider + modell + dimenzió,
+így újraindexeléskor csak a megváltozott chunk-okat kell újra embeddelni.
+Méretkorlát és kilakoltatás: EMBEDDING_CACHE_MAX_ENTRIES /
+EMBEDDING_CACHE_EVICTION ("lru" = legrégebben használt, "fifo" = legrégebbi).
+"""
+
+import hashlib
+import unicodedata
+from typing import Dict, Iterable, List
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app.core.config import settings
+from app.models.models import EmbeddingCache
+
+# Ennyi kulcsot kérdez le / töröl egy IN (...) feltételben
+LOOKUP_CHUNK_SIZE = 500
+
+# Folyamat-szintű számlálók (get_index_stats mutatja)
+_stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+
+# ══════════════════════════════════════════
+# KULCS
+# ══════════════════════════════════════════
+
+def normalize_text(text: str) -> str:
+    """Unicode NFC + whitespace összevonás — a formázás nem számít."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text: str) -> str:
+    """A normalizált szöveg SHA-256 hash-e (hex)."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+# ══════════════════════════════════════════
+# OLVASÁS / ÍRÁS
+# ══════════════════════════════════════════
+
+def get_cached_embeddings(
+    db: Session,
+    hashes: Iterable[str],
+    provider: str,
+    model: str,
+    dimension: int,
+) -> Dict[str, List[float]]:
+    """
+    Cache-elt vektorok a megadott hash-ekhez (a hiányzók kimaradnak).
+    LRU módban frissíti a találatok last_used_at mezőjét.
+    """
+    hashes = list(dict.fromkeys(hashes))
+    found: Dict[str, List[float]] = {}
+    hit_ids = []
+
+    try:
+        for i in range(0, len(hashes), LOOKUP_CHUNK_SIZE):
+            rows = db.query(EmbeddingCache.id, EmbeddingCache.text_hash, EmbeddingCache.vector).filter(
+                EmbeddingCache.provider == provider,
+                EmbeddingCache.model == model,
+                EmbeddingCache.dimension == dimension,
+                EmbeddingCache.text_hash.in_(hashes[i : i + LOOKUP_CHUNK_SIZE]),
+            ).all()
+            for row_id, row_hash, vector in rows:
+                found[row_hash] = np.frombuffer(vector, dtype=np.float32).tolist()
+                hit_ids.append(row_id)
+
+        if hit_ids and settings.EMBEDDING_CACHE_EVICTION == "lru":
+            for i in range(0, len(hit_ids), LOOKUP_CHUNK_SIZE):
+                db.query(EmbeddingCache).filter(
+                    EmbeddingCache.id.in_(hit_ids[i : i + LOOKUP_CHUNK_SIZE])
+                ).update({EmbeddingCache.last_used_at: func.now()}, synchronize_session=False)
+            db.commit()
+
+    except Exception as e:
+        # A cache hibája nem akaszthatja meg az indexelést
+        print(f"[EmbeddingCache] Olvasási hiba: {e}")
+        db.rollback()
+        found = {}
+
+    _stats["hits"] += len(found)
+    _stats["misses"] += len(hashes) - len(found)
+    return found
+
+
+def store_embeddings(
+    db: Session,
+    embeddings: Dict[str, List[float]],
+    provider: str,
+    model: str,
+    dimension: int,
+):
+    """Új vektorok mentése (hash → vektor), majd kilakoltatás a méretkorlátig."""
+    rows = [
+        EmbeddingCache(
+            text_hash=h,
+            provider=provider,
+            model=model,
+            dimension=dimension,
+            vector=np.asarray(vector, dtype=np.float32).tobytes(),
+        )
+        for h, vector in embeddings.items()
+        if vector and len(vector) == dimension
+    ]
+    if not rows:
+        return
+
+    try:
+        with db.begin_nested():
+            db.add_all(rows)
+        db.commit()
+        _stats["stored"] += len(rows)
+    except IntegrityError:
+        # Párhuzamos indexelés már beírta ugyanazt a kulcsot (a savepoint visszagörgetve)
+        return
+    except Exception as e:
+        print(f"[EmbeddingCache] Írási hiba: {e}")
+        db.rollback()
+        return
+
+    evict(db)
+
+
+def evict(db: Session):
+    """A legrégebbi (fifo) / legrégebben használt (lru) bejegyzések törlése a korlát fölött."""
+    max_entries = settings.EMBEDDING_CACHE_MAX_ENTRIES
+    if max_entries <= 0:
+        return
+
+    try:
+        excess = db.query(EmbeddingCache).count() - max_entries
+        if excess <= 0:
+            return
+
+        order = (
+            EmbeddingCache.last_used_at
+            if settings.EMBEDDING_CACHE_EVICTION == "lru"
+            else EmbeddingCache.created_at
+        )
+        ids = [
+            row_id for (row_id,) in db.query(EmbeddingCache.id)
+            .order_by(order, EmbeddingCache.id)
+            .limit(excess)
+            .all()
+        ]
+        for i in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+            db.query(EmbeddingCache).filter(
+                EmbeddingCache.id.in_(ids[i : i + LOOKUP_CHUNK_SIZE])
+            ).delete(synchronize_session=False)
+        db.commit()
+        _stats["evicted"] += len(ids)
+
+    except Exception as e:
+        print(f"[EmbeddingCache] Kilakoltatási hiba: {e}")
+        db.rollback()
+
+
+# ══════════════════════════════════════════
+# STATISZTIKA
+# ══════════════════════════════════════════
+
+def get_cache_stats(db: Session) -> dict:
+    """Találat/hiány számlálók és a cache mérete."""
+    lookups = _stats["hits"] + _stats["misses"]
+    try:
+        entries = db.query(EmbeddingCache).count()
+    except Exception:
+        db.rollback()
+        entries = None
+
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / lookups, 3) if lookups else None,
+        "entries": entries,
+        "max_entries": settings.EMBEDDING_CACHE_MAX_ENTRIES,
+        "eviction": settings.EMBEDDING_CACHE_EVICTION,
+    }
@@ -4,12 +4,18 @@ Egy függvény, ami automatikusan a megfelelő provider-t használja.
 Támogatja: Ollama (lokális) és OpenRouter (API).
 """
 
+import asyncio
+import time
 import httpx
 import numpy as np
-from typing import List, Optional
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
 
+from app.core.config import settings as app_settings
+from app.services.embedding_cache import get_cached_embeddings, store_embeddings, text_hash
 from app.services.embedding_config import get_model_dimension
+from app.services.http_clients import get_http_client, provider_timeout
 
 
 # ══════════════════════════════════════════
@@ -53,13 +59,47 @@ async def generate_embeddings_batch(
     texts: List[str],
     db: Session,
     batch_size: int = 32,
+    concurrency: Optional[int] = None,
 ) -> List[Optional[List[float]]]:
     """
-    Több szöveg → embedding vektorok.
+    Több szöveg → embedding vektorok, a bemenet sorrendjében.
+    Először a perzisztens embedding cache-t nézi (szöveg hash + provider +
+    modell + dimenzió), a provider-t csak a hiányzó szövegekre hívja.
     OpenRouter-nál batch-ben küldi (gyorsabb + olcsóbb).
-    Ollama-nál egyenként (batch nem támogatott).
+    Ollama-nál az /api/embed batch végpontot használja; régebbi szervernél
+    párhuzamosan, egyenként (legfeljebb `concurrency` kérés egyszerre).
+    A sikertelen szövegek helyén None áll.
     """
     settings = get_embedding_settings(db)
+    cache_key = (settings["provider"], settings["model"], settings["dimension"])
+
+    hashes = [text_hash(text) for text in texts]
+    embeddings = get_cached_embeddings(db, hashes, *cache_key)
+
+    # Csak a hiányzó (és egyedi) szövegek mennek a provider-hez
+    missing: Dict[str, str] = {}
+    for h, text in zip(hashes, texts):
+        if h not in embeddings:
+            missing.setdefault(h, text)
+
+    if missing:
+        fresh = await _generate_uncached_batch(
+            list(missing.values()), settings, batch_size, concurrency
+        )
+        new_embeddings = {h: emb for h, emb in zip(missing, fresh) if emb}
+        store_embeddings(db, new_embeddings, *cache_key)
+        embeddings.update(new_embeddings)
+
+    return [embeddings.get(h) for h in hashes]
+
+
+async def _generate_uncached_batch(
+    texts: List[str],
+    settings: dict,
+    batch_size: int,
+    concurrency: Optional[int],
+) -> List[Optional[List[float]]]:
+    """Provider hívás cache nélkül (a bemenet sorrendjében)."""
     provider = settings["provider"]
 
     if provider == "openrouter":
@@ -71,16 +111,85 @@ async def generate_embeddings_batch(
             batch_size=batch_size,
         )
     else:
-        # Ollama: egyenként
-        results = []
-        for text in texts:
-            emb = await _generate_ollama(
-                text=text,
-                model=settings["model"],
-                ollama_url=settings["ollama_url"],
-            )
-            results.append(emb)
-        return results
+        return await _generate_ollama_batch(
+            texts=texts,
+            model=settings["model"],
+            ollama_url=settings["ollama_url"],
+            batch_size=batch_size,
+            concurrency=concurrency or app_settings.OLLAMA_EMBED_CONCURRENCY,
+        )
+
+
+# ══════════════════════════════════════════
+# KERESÉSI KÉRDÉSEK EMBEDDING CACHE (memóriában, TTL + LRU)
+# ══════════════════════════════════════════
+
+QUERY_CACHE_MAX_ENTRIES = 512
+QUERY_CACHE_TTL_SECONDS = 6 * 3600
+
+# (provider, modell, dimenzió, szöveg hash) → (lejárat, vektor)
+_query_cache: "OrderedDict[Tuple[str, str, int, str], Tuple[float, List[float]]]" = OrderedDict()
+_query_cache_settings: Optional[Tuple[str, str, int]] = None
+_query_cache_stats = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0}
+
+
+async def generate_query_embedding(
+    query: str,
+    db: Session,
+) -> Optional[List[float]]:
+    """
+    Keresési kérdés → embedding, memória cache-sel.
+
+    Az ismétlődő kérdések ("hogyan kell…") nem mennek újra a provider-hez.
+    Ha a provider/modell/dimenzió megváltozik, a cache kiürül.
+    """
+    global _query_cache_settings
+
+    settings = get_embedding_settings(db)
+    active = (settings["provider"], settings["model"], settings["dimension"])
+    if _query_cache_settings != active:
+        if _query_cache_settings is not None:
+            clear_query_embedding_cache()
+        _query_cache_settings = active
+
+    key = (*active, text_hash(query))
+    now = time.monotonic()
+    entry = _query_cache.get(key)
+    if entry is not None:
+        expires_at, embedding = entry
+        if expires_at > now:
+            _query_cache.move_to_end(key)
+            _query_cache_stats["hits"] += 1
+            return embedding
+        del _query_cache[key]
+        _query_cache_stats["expired"] += 1
+
+    _query_cache_stats["misses"] += 1
+    embedding = await generate_embedding(query, db)
+    if embedding:
+        _query_cache[key] = (now + QUERY_CACHE_TTL_SECONDS, embedding)
+        while len(_query_cache) > QUERY_CACHE_MAX_ENTRIES:
+            _query_cache.popitem(last=False)
+    return embedding
+
+
+def clear_query_embedding_cache():
+    """Kérdés-embedding cache ürítése (pl. embedding beállítás váltáskor)."""
+    if _query_cache:
+        _query_cache_stats["invalidations"] += 1
+    _query_cache.clear()
+
+
+def get_query_cache_stats() -> dict:
+    """Kérdés-embedding cache találati arány és méret."""
+    lookups = _query_cache_stats["hits"] + _query_cache_stats["misses"]
+    return {
+        **_query_cache_stats,
+        "hit_rate": round(_query_cache_stats["hits"] / lookups, 3) if lookups else None,
+        "entries": len(_query_cache),
+        "max_entries": QUERY_CACHE_MAX_ENTRIES,
+        "ttl_seconds": QUERY_CACHE_TTL_SECONDS,
+    }
 
 
 # ══════════════════════════════════════════
@@ -94,17 +203,18 @@ async def _generate_ollama(
 ) -> Optional[List[float]]:
     """Ollama embedding generálás (lokális)."""
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{ollama_url}/api/embeddings",
-                json={
-                    "model": model,
-                    "prompt": text,
-                },
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result.get("embedding")
+        client = get_http_client("ollama")
+        response = await client.post(
+            f"{ollama_url}/api/embeddings",
+            timeout=provider_timeout("ollama", 60.0),
+            json={
+                "model": model,
+                "prompt": text,
+            },
+        )
+        response.raise_for_status()
+        result = response.json()
+        return result.get("embedding")
 
     except httpx.TimeoutException:
         print(f"[Ollama] Timeout: {model}")
@@ -114,6 +224,78 @@ async def _generate_ollama(
         return None
 
 
+# Ollama szerverenként: támogatja-e az /api/embed batch végpontot (0.3.4+)
+_ollama_batch_support: Dict[str, bool] = {}
+
+
+async def _generate_ollama_batch(
+    texts: List[str],
+    model: str = "bge-m3",
+    ollama_url: str = "http://localhost:11434",
+    batch_size: int = 32,
+    concurrency: int = 4,
+) -> List[Optional[List[float]]]:
+    """
+    Ollama BATCH embedding — az /api/embed végpont `input: [...]` listát fogad.
+
+    - Egy batch = egy kérés; a batch-ek párhuzamosan mennek (semaphore)
+    - Ha a szerver nem ismeri az /api/embed-et (404) → egyenként, párhuzamosan
+    - Ha egy batch hibára fut → csak azt a batch-et küldi újra egyenként,
+      így egy rossz szöveg nem viszi magával a többit
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def embed_one(text: str) -> Optional[List[float]]:
+        async with semaphore:
+            return await _generate_ollama(text=text, model=model, ollama_url=ollama_url)
+
+    async def embed_batch(batch: List[str]) -> List[Optional[List[float]]]:
+        if _ollama_batch_support.get(ollama_url, True):
+            async with semaphore:
+                embeddings = await _request_ollama_embed(batch, model, ollama_url)
+            if embeddings is not None:
+                return embeddings
+        return await asyncio.gather(*(embed_one(text) for text in batch))
+
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+    results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+    return [embedding for batch in results for embedding in batch]
+
+
+async def _request_ollama_embed(
+    batch: List[str],
+    model: str,
+    ollama_url: str,
+) -> Optional[List[List[float]]]:
+    """Egy /api/embed hívás. None, ha a batch-et egyenként kell újrapróbálni."""
+    try:
+        client = get_http_client("ollama")
+        response = await client.post(
+            f"{ollama_url}/api/embed",
+            timeout=provider_timeout("ollama", 120.0),
+            json={
+                "model": model,
+                "input": batch,
+            },
+        )
+        if response.status_code == 404 and "model" not in response.text.lower():
+            # Régi Ollama: nincs /api/embed végpont
+            print(f"[Ollama] /api/embed nem támogatott ({ollama_url}), egyenkénti mód")
+            _ollama_batch_support[ollama_url] = False
+            return None
+        response.raise_for_status()
+        embeddings = response.json().get("embeddings") or []
+        if len(embeddings) != len(batch):
+            print(f"[Ollama Batch] Hibás válasz: {len(embeddings)} embedding {len(batch)} szövegre")
+            return None
+        _ollama_batch_support[ollama_url] = True
+        return embeddings
+
+    except Exception as e:
+        print(f"[Ollama Batch] Hiba: {e}")
+        return None
+
+
 # ══════════════════════════════════════════
 # OPENROUTER PROVIDER
 # ══════════════════════════════════════════
@@ -128,23 +310,24 @@ async def _generate_openrouter(
         raise ValueError("OpenRouter API kulcs nincs beállítva!")
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                "https://api.openrouter.ai/api/v1/embeddings",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "http://localhost",  # OpenRouter prefers this
-                    "X-Title": "Workflow Manager",
-                },
-                json={
-                    "model": model,
-                    "input": text,
-                },
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result["data"][0]["embedding"]
+        client = get_http_client("openrouter")
+        response = await client.post(
+            "https://api.openrouter.ai/api/v1/embeddings",
+            timeout=provider_timeout("openrouter", 30.0),
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+                "HTTP-Referer": "http://localhost",  # OpenRouter prefers this
+                "X-Title": "Workflow Manager",
+            },
+            json={
+                "model": model,
+                "input": text,
+            },
+        )
+        response.raise_for_status()
+        result = response.json()
+        return result["data"][0]["embedding"]
 
     except httpx.TimeoutException:
         print(f"[OpenRouter] Timeout: {model}")
@@ -177,29 +360,30 @@ async def _generate_openrouter_batch(
         batch = texts[i : i + batch_size]
 
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    "https://api.openrouter.ai/api/v1/embeddings",
-                    headers={
-                        "Authorization": f"Bearer {api_key}",
-                        "Content-Type": "application/json",
-                        "HTTP-Referer": "http://localhost",
-                        "X-Title": "Workflow Manager",
-                    },
-                    json={
-                        "model": model,
-                        "input": batch,
-                    },
-                )
-                response.raise_for_status()
-                result = response.json()
-
-                # Az OpenRouter indexelve adja vissza
-                batch_embeddings = [None] * len(batch)
-                for item in result["data"]:
-                    batch_embeddings[item["index"]] = item["embedding"]
-
-                all_embeddings.extend(batch_embeddings)
+            client = get_http_client("openrouter")
+            response = await client.post(
+                "https://api.openrouter.ai/api/v1/embeddings",
+                timeout=provider_timeout("openrouter", 60.0),
+                headers={
+                    "Authorization": f"Bearer {api_key}",
+                    "Content-Type": "application/json",
+                    "HTTP-Referer": "http://localhost",
+                    "X-Title": "Workflow Manager",
+                },
+                json={
+                    "model": model,
+                    "input": batch,
+                },
+            )
+            response.raise_for_status()
+            result = response.json()
+
+            # Az OpenRouter indexelve adja vissza
+            batch_embeddings = [None] * len(batch)
+            for item in result["data"]:
+                batch_embeddings[item["index"]] = item["embedding"]
+
+            all_embeddings.extend(batch_embeddings)
 
         except Exception as e:
             print(f"[OpenRouter Batch] Hiba: {e}")
@@ -226,6 +410,8 @@ def get_embedding_settings(db: Session) -> dict:
             "dimension": 1024,
             "ollama_url": "http://localhost:11434",
             "openrouter_api_key": None,
+            "index_type": "flat",
+            "index_promote_threshold": 100000,
         }
 
     return {
@@ -234,4 +420,6 @@ def get_embedding_settings(db: Session) -> dict:
         "dimension": settings.embedding_dimension,
         "ollama_url": settings.ollama_url,
         "openrouter_api_key": settings.openrouter_api_key,
+        "index_type": settings.vector_index_type or "flat",
+        "index_promote_threshold": settings.vector_index_promote_threshold or 100000,
     }
@@ -0,0 +1,345 @@
+"""Full-text index of document content (SQLite FTS5).
+
+Content search used to read the text of the 100 newest documents on every
+query and scan it line by line. This module keeps an inverted index of
+the extracted text of every current document in a SQLite FTS5 database
+under ``FULLTEXT_INDEX_PATH``:
+
+- ``upload_document`` indexes the new document, replacing the archived
+  version's entry; ``delete_document`` removes it,
+- queries are ranked with BM25; query words also match as a prefix
+  ("munka" finds "munkafolyamat") and accents are ignored,
+- matching lines are highlighted with ``**`` markers, like the old scan.
+
+Documents uploaded before the index existed (or after the index file was
+lost) are added by the ``fulltext_sync`` background job, which startup
+enqueues when the index and the documents table disagree.
+"""
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import Document
+
+# Bump when the schema or the tokenizer changes: the index is rebuilt
+INDEX_VERSION = 1
+
+# Documents extracted and indexed per step of the sync job
+SYNC_BATCH_SIZE = 20
+
+# Every query word of at least MIN_PREFIX_LENGTH characters also matches as a
+# prefix. FTS5 keeps a precomputed prefix index for these lengths; without
+# one, a prefix query merges the postings of every word it expands to
+MIN_PREFIX_LENGTH = 3
+PREFIX_INDEX_LENGTHS = "3 4 5 6 7 8 9 10"
+
+# Only the newest matches of a very common word are ranked; the BM25 weight
+# of such a word is close to zero anyway, and ranking every match is slow
+RANK_CANDIDATES = 2000
+
+# Length of the snippet cut from the first matching line
+SNIPPET_CHARS = 160
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _accent_variants() -> Dict[str, str]:
+    # "o" -> "oòóôõöøōŏő…": lowercase letters that lose their accent to the base letter
+    variants: Dict[str, str] = {}
+    for code in range(0xC0, 0x250):
+        char = chr(code)
+        base = unicodedata.normalize("NFD", char)[0]
+        if base != char and base.isascii() and base.isalpha() and char.islower():
+            variants[base] = variants.get(base, base) + char
+    return variants
+
+
+_ACCENT_VARIANTS = _accent_variants()
+_ACCENT_FOLD = {ord(char): base for base, chars in _ACCENT_VARIANTS.items() for char in chars[1:]}
+
+_local = threading.local()
+
+ProgressCallback = Callable[[int, int, str], Awaitable[None]]
+
+
+# ── Connection ──
+
+def _create_schema(conn: sqlite3.Connection):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version != INDEX_VERSION:
+        conn.execute("DROP TABLE IF EXISTS document_text")
+        conn.execute("DROP TABLE IF EXISTS indexed_documents")
+
+    # rowid of document_text = Document.id
+    conn.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS document_text USING fts5("
+        f"content, tokenize = 'unicode61 remove_diacritics 2', prefix = '{PREFIX_INDEX_LENGTHS}')"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS indexed_documents ("
+        "document_id INTEGER PRIMARY KEY, content_hash TEXT, indexed_at REAL)"
+    )
+    conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+    conn.commit()
+
+
+def _connect() -> sqlite3.Connection:
+    """Connection of the calling thread (one per thread and index path)."""
+    path = settings.FULLTEXT_INDEX_PATH
+    cached = getattr(_local, "connection", None)
+    if cached is not None and cached[0] == path:
+        return cached[1]
+    if cached is not None:
+        cached[1].close()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10.0)
+    # WAL: searches are not blocked while an upload writes
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    _create_schema(conn)
+    _local.connection = (path, conn)
+    return conn
+
+
+# ── Updates ──
+
+def index_documents(entries: Iterable[Tuple[int, Optional[str], Optional[str]]]) -> int:
+    """Add or replace documents given as (document_id, content_hash, text).
+
+    Documents without text (unsupported type, extraction error) are
+    recorded with empty content, so the sync job does not retry them.
+    """
+    conn = _connect()
+    now = time.time()
+    count = 0
+    with conn:
+        for document_id, key, text in entries:
+            if not text or text.startswith("[Hiba"):
+                text = ""
+            conn.execute("DELETE FROM document_text WHERE rowid = ?", (document_id,))
+            conn.execute("INSERT INTO document_text (rowid, content) VALUES (?, ?)", (document_id, text))
+            conn.execute(
+                "INSERT OR REPLACE INTO indexed_documents (document_id, content_hash, indexed_at) VALUES (?, ?, ?)",
+                (document_id, key, now),
+            )
+            count += 1
+    return count
+
+
+def index_document(document_id: int, key: Optional[str], text: Optional[str]):
+    """Add or replace one document."""
+    index_documents([(document_id, key, text)])
+
+
+def remove_documents(document_ids: Sequence[int]):
+    """Drop documents from the index (deleted or replaced by a new version)."""
+    if not document_ids:
+        return
+    conn = _connect()
+    with conn:
+        for document_id in document_ids:
+            conn.execute("DELETE FROM document_text WHERE rowid = ?", (document_id,))
+            conn.execute("DELETE FROM indexed_documents WHERE document_id = ?", (document_id,))
+
+
+def remove_document(document_id: int):
+    """Drop one document from the index."""
+    remove_documents([document_id])
+
+
+def indexed_hashes() -> Dict[int, Optional[str]]:
+    """document_id -> content_hash of every indexed document."""
+    return dict(_connect().execute("SELECT document_id, content_hash FROM indexed_documents"))
+
+
+# ── Search ──
+
+def build_match_query(query: str) -> Optional[str]:
+    """FTS5 query for user input: every word must occur, as a word or a prefix.
+
+    Words shorter than ``MIN_PREFIX_LENGTH`` only match whole words. Words
+    are quoted, so FTS5 operators typed by the user (AND, NEAR, ``-``,
+    ``:``) are searched as plain text instead of failing the query.
+    """
+    words = _WORD_RE.findall(query)
+    if not words:
+        return None
+    return " ".join(
+        f'"{word}"*' if len(word) >= MIN_PREFIX_LENGTH else f'"{word}"'
+        for word in words
+    )
+
+
+def _highlight_pattern(query: str) -> "re.Pattern":
+    # Same matching as the index: whole words or prefixes, case and accents ignored
+    words = sorted({word.lower().translate(_ACCENT_FOLD) for word in _WORD_RE.findall(query)}, key=len, reverse=True)
+    alternatives = []
+    for word in words:
+        letters = "".join(
+            f"[{_ACCENT_VARIANTS[char]}]" if char in _ACCENT_VARIANTS else re.escape(char)
+            for char in word
+        )
+        alternatives.append(letters + (r"\w*" if len(word) >= MIN_PREFIX_LENGTH else r"(?!\w)"))
+    return re.compile(r"(?<!\w)(?:" + "|".join(alternatives) + ")", re.IGNORECASE)
+
+
+def _highlighted_lines(text: str, pattern: "re.Pattern", max_matches: int) -> Tuple[List[Dict[str, Any]], int]:
+    """The first ``max_matches`` matching lines (highlighted) and the number of matching lines."""
+    matches = []
+    match_count = 0
+    for line_number, line in enumerate(text.split("\n"), start=1):
+        if not pattern.search(line):
+            continue
+        match_count += 1
+        if len(matches) < max_matches:
+            matches.append({
+                "line_number": line_number,
+                "text": line.strip(),
+                "highlighted_text": pattern.sub(r"**\g<0>**", line).strip(),
+            })
+    return matches, match_count
+
+
+def _snippet(highlighted: str) -> str:
+    if len(highlighted) <= SNIPPET_CHARS:
+        return highlighted
+    start = max(0, highlighted.find("**") - SNIPPET_CHARS // 4)
+    snippet = highlighted[start:start + SNIPPET_CHARS]
+    return ("…" if start else "") + snippet + ("…" if start + SNIPPET_CHARS < len(highlighted) else "")
+
+
+def search(query: str, limit: int = 50, max_matches: int = 10) -> List[Dict[str, Any]]:
+    """Best matching documents for a query, best first.
+
+    Each hit has ``document_id``, ``score`` (BM25, higher is better),
+    ``snippet``, the first ``max_matches`` highlighted ``matches`` (lines)
+    and ``match_count`` (all matching lines).
+    """
+    match_query = build_match_query(query)
+    if match_query is None:
+        return []
+
+    conn = _connect()
+    try:
+        # Rank among the newest RANK_CANDIDATES matches (all of them for selective queries)
+        oldest = conn.execute(
+            "SELECT rowid FROM document_text WHERE document_text MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+            (match_query, RANK_CANDIDATES - 1),
+        ).fetchone()
+        ranked = conn.execute(
+            "SELECT rowid, rank FROM document_text WHERE document_text MATCH ? AND rowid >= ? "
+            "ORDER BY rank LIMIT ?",
+            (match_query, oldest[0] if oldest else 0, limit),
+        ).fetchall()
+        if not ranked:
+            return []
+        # Highlighting runs on the stored text of the top hits only (plain rowid lookups)
+        placeholders = ", ".join("?" * len(ranked))
+        texts = dict(conn.execute(
+            f"SELECT rowid, content FROM document_text WHERE rowid IN ({placeholders})",
+            [document_id for document_id, _ in ranked],
+        ))
+    except sqlite3.OperationalError as e:
+        print(f"[FullTextIndex] Keresési hiba: {e}")
+        return []
+
+    pattern = _highlight_pattern(query)
+    hits = []
+    for document_id, rank in ranked:
+        matches, match_count = _highlighted_lines(texts.get(document_id) or "", pattern, max_matches)
+        hits.append({
+            "document_id": document_id,
+            "score": round(-rank, 4),
+            "snippet": _snippet(matches[0]["highlighted_text"]) if matches else None,
+            "matches": matches,
+            "match_count": match_count,
+        })
+    return hits
+
+
+# ── Sync with the documents table ──
+
+def _current_documents(db: Session) -> Dict[int, Optional[str]]:
+    return dict(db.query(Document.id, Document.content_hash).filter(Document.parent_id.is_(None)).all())
+
+
+def needs_sync(db: Session) -> bool:
+    """Whether the index is missing documents or holds removed ones."""
+    current = db.query(Document.id).filter(Document.parent_id.is_(None)).count()
+    indexed = _connect().execute("SELECT count(*) FROM indexed_documents").fetchone()[0]
+    return current != indexed
+
+
+async def sync_index(db: Session, progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+    """Index current documents that are missing or changed; drop the rest."""
+    from app.services.text_store import get_document_texts
+
+    current = _current_documents(db)
+    indexed = await asyncio.to_thread(indexed_hashes)
+
+    stale = [document_id for document_id in indexed if document_id not in current]
+    await asyncio.to_thread(remove_documents, stale)
+
+    todo = [
+        document_id for document_id, key in current.items()
+        if document_id not in indexed or (key is not None and indexed[document_id] != key)
+    ]
+    done = 0
+    for start in range(0, len(todo), SYNC_BATCH_SIZE):
+        if progress is not None:
+            await progress(done, len(todo), f"Teljes szöveges index: {done}/{len(todo)} dokumentum")
+        batch = db.query(Document).filter(Document.id.in_(todo[start:start + SYNC_BATCH_SIZE])).all()
+        texts = await asyncio.to_thread(get_document_texts, batch, None)
+        # Legacy documents got their content hash while reading the text
+        if db.dirty:
+            db.commit()
+        await asyncio.to_thread(
+            index_documents,
+            [(document.id, document.content_hash, text) for document, (text, _) in zip(batch, texts)],
+        )
+        done += len(batch)
+
+    return {"indexed": done, "removed": len(stale), "total_documents": len(current)}
+
+
+def schedule_sync():
+    """Enqueue a ``fulltext_sync`` job if the index is out of date (FastAPI startup)."""
+    from app.core.database import SessionLocal
+    from app.models.models import BackgroundJob
+    from app.services.job_queue import enqueue_job
+
+    db = SessionLocal()
+    try:
+        pending = db.query(BackgroundJob.id).filter(
+            BackgroundJob.kind == "fulltext_sync",
+            BackgroundJob.status.in_(("queued", "running")),
+        ).first()
+        if pending is None and needs_sync(db):
+            enqueue_job(db, "fulltext_sync")
+    except Exception as e:
+        print(f"[FullTextIndex] Szinkronizálás ütemezése sikertelen: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def get_stats() -> Dict[str, Any]:
+    """Document count and file size of the index (shown in the RAG stats)."""
+    path = settings.FULLTEXT_INDEX_PATH
+    try:
+        documents = _connect().execute("SELECT count(*) FROM indexed_documents").fetchone()[0]
+    except sqlite3.Error:
+        documents = None
+    return {
+        "documents": documents,
+        "size_bytes": os.path.getsize(path) if os.path.exists(path) else 0,
+    }
@@ -0,0 +1,94 @@
+"""Shared, pooled HTTP clients for the AI providers (Ollama, OpenRouter).
+
+Every embedding and chat call borrows the provider's long-lived
+``httpx.AsyncClient`` instead of opening its own, so TCP connections and
+OpenRouter TLS sessions are reused across requests. Each provider has its
+own connection limits and connect timeout; callers pass their read
+timeout per request through ``provider_timeout``.
+
+The clients are opened in the FastAPI lifespan and closed on shutdown.
+Outside the app (scripts, tests) they are created lazily on first use. A
+client is bound to the event loop it was created on and is recreated if
+called from a different loop.
+"""
+import asyncio
+import importlib.util
+from typing import Dict, Tuple
+
+import httpx
+
+from app.core.config import settings
+
+# Per-provider pool configuration
+PROVIDER_POOLS: Dict[str, Dict] = {
+    "ollama": {
+        # Local server: a few parallel requests saturate the GPU anyway
+        "max_connections": settings.OLLAMA_MAX_CONNECTIONS,
+        "connect_timeout": 5.0,
+        "http2": False,  # Ollama only speaks HTTP/1.1
+    },
+    "openrouter": {
+        "max_connections": settings.OPENROUTER_MAX_CONNECTIONS,
+        "connect_timeout": 10.0,
+        "http2": True,
+    },
+}
+DEFAULT_READ_TIMEOUT = 120.0
+
+_clients: Dict[str, Tuple[httpx.AsyncClient, asyncio.AbstractEventLoop]] = {}
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional ``h2`` package (``httpx[http2]``)."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def _create_client(provider: str) -> httpx.AsyncClient:
+    pool = PROVIDER_POOLS[provider]
+    return httpx.AsyncClient(
+        http2=pool["http2"] and http2_available(),
+        limits=httpx.Limits(
+            max_connections=pool["max_connections"],
+            max_keepalive_connections=pool["max_connections"],
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(DEFAULT_READ_TIMEOUT, connect=pool["connect_timeout"]),
+    )
+
+
+def provider_timeout(provider: str, read: float) -> httpx.Timeout:
+    """Per-request timeout: the caller's read timeout with the provider's connect timeout."""
+    return httpx.Timeout(read, connect=PROVIDER_POOLS[provider]["connect_timeout"])
+
+
+def get_http_client(provider: str) -> httpx.AsyncClient:
+    """Pooled client of a provider ("ollama" or "openrouter").
+
+    Must be called from a running event loop. The client must not be
+    closed by the caller.
+    """
+    loop = asyncio.get_running_loop()
+    entry = _clients.get(provider)
+    if entry is not None:
+        client, client_loop = entry
+        if client_loop is loop and not client.is_closed:
+            return client
+    client = _create_client(provider)
+    _clients[provider] = (client, loop)
+    return client
+
+
+async def open_http_clients():
+    """Create the provider clients up front (FastAPI startup)."""
+    for provider in PROVIDER_POOLS:
+        get_http_client(provider)
+
+
+async def close_http_clients():
+    """Close every pooled client created on the current loop (FastAPI shutdown)."""
+    loop = asyncio.get_running_loop()
+    for provider, (client, client_loop) in list(_clients.items()):
+        if client_loop is loop:
+            await client.aclose()
+        del _clients[provider]
+
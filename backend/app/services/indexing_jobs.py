@@ -0,0 +1,169 @@
+"""Background job handlers for the RAG knowledge base and the full-text index.
+
+- ``index_document``: add a document to the index (toggle on)
+- ``remove_document``: drop a document's chunks and vectors (toggle off)
+- ``reindex_all``: rebuild every knowledge base document
+- ``fulltext_sync``: bring the content search index up to date
+
+Each finished job writes an ``AIKnowledgeLog`` entry with the time it
+waited in the queue and the time it ran.
+"""
+from typing import Any, Dict, Optional
+
+from app.models.models import AIKnowledgeLog, Document, DocumentChunk
+from app.routers.websocket_router import broadcast_notification
+from app.services.fulltext_index import sync_index
+from app.services.job_queue import JobContext, JobFailed, register_job_handler
+from app.services.rag_service import (
+    index_document,
+    reindex_all_knowledge_documents,
+    remove_document_from_index,
+)
+
+
+def _log(
+    ctx: JobContext,
+    action: str,
+    status: str,
+    chunks_processed: int = 0,
+    error_message: Optional[str] = None,
+):
+    ctx.db.add(AIKnowledgeLog(
+        document_id=ctx.job.document_id,
+        action=action,
+        chunks_processed=chunks_processed,
+        status=status,
+        error_message=error_message,
+        job_id=ctx.job.id,
+        queue_wait_ms=ctx.queue_wait_ms,
+        run_ms=ctx.run_ms(),
+    ))
+
+
+def _get_document(ctx: JobContext) -> Document:
+    document = ctx.db.query(Document).filter(Document.id == ctx.job.document_id).first()
+    if document is None:
+        raise JobFailed("Dokumentum nem található")
+    return document
+
+
+# ── index_document ──
+
+async def run_index_document(ctx: JobContext) -> Dict[str, Any]:
+    document = _get_document(ctx)
+    if not document.is_knowledge:
+        # Toggled off again while queued; the queued removal follows
+        return {"chunks_created": 0, "skipped": True}
+
+    chunks_created, error = await index_document(document, ctx.db, progress=ctx.progress)
+    if error and chunks_created == 0:
+        raise JobFailed(error)
+
+    _log(ctx, "added", "completed" if not error else "partial", chunks_created, error)
+    ctx.db.commit()
+
+    await broadcast_notification(
+        message=f"'{document.original_filename}' hozzáadva a tudásbázishoz",
+        level="success",
+        title="Dokumentum feldolgozás kész",
+        action_url="/knowledge"
+    )
+    return {"chunks_created": chunks_created, "error": error}
+
+
+async def abort_index_document(ctx: JobContext, status: str, error: Optional[str]):
+    """Take the document back out of the knowledge base (drop any partial index)."""
+    document = ctx.db.query(Document).filter(Document.id == ctx.job.document_id).first()
+    if document is None:
+        return
+
+    document.is_knowledge = False
+    ctx.db.commit()
+    await remove_document_from_index(document.id, ctx.db)
+
+    _log(ctx, "added", status, 0, error)
+    ctx.db.commit()
+
+    if status == "failed":
+        await broadcast_notification(
+            message=f"'{document.original_filename}' feldolgozása sikertelen: {error}",
+            level="error",
+            title="Dokumentum feldolgozás sikertelen",
+            action_url="/knowledge"
+        )
+
+
+# ── remove_document ──
+
+async def run_remove_document(ctx: JobContext) -> Dict[str, Any]:
+    document = _get_document(ctx)
+    await ctx.progress(0, 1, "Eltávolítás az indexből")
+
+    # Get chunk count before removal for logging
+    chunk_count = ctx.db.query(DocumentChunk).filter(DocumentChunk.document_id == document.id).count()
+    await remove_document_from_index(document.id, ctx.db)
+
+    _log(ctx, "removed", "completed", chunk_count)
+    ctx.db.commit()
+
+    await broadcast_notification(
+        message=f"'{document.original_filename}' eltávolítva a tudásbázisból",
+        level="info",
+        title="Dokumentum eltávolítva",
+        action_url="/knowledge"
+    )
+    return {"chunks_removed": chunk_count}
+
+
+async def abort_remove_document(ctx: JobContext, status: str, error: Optional[str]):
+    """A cancelled removal leaves the document in the knowledge base."""
+    document = ctx.db.query(Document).filter(Document.id == ctx.job.document_id).first()
+    if document is not None and status == "cancelled":
+        still_indexed = ctx.db.query(DocumentChunk).filter(DocumentChunk.document_id == document.id).count()
+        if still_indexed:
+            document.is_knowledge = True
+
+    _log(ctx, "removed", status, 0, error)
+    ctx.db.commit()
+
+
+# ── reindex_all ──
+
+async def run_reindex_all(ctx: JobContext) -> Dict[str, Any]:
+    result = await reindex_all_knowledge_documents(ctx.db, progress=ctx.progress)
+
+    _log(
+        ctx,
+        "reindexed",
+        "completed" if not result["failed"] else "partial",
+        result["total_chunks"],
+        "; ".join(result["errors"]) or None,
+    )
+    ctx.db.commit()
+
+    await broadcast_notification(
+        message=f"Újraindexelés kész: {result['successful']}/{result['total_documents']} dokumentum",
+        level="success" if not result["failed"] else "warning",
+        title="Tudásbázis újraindexelve",
+        action_url="/knowledge"
+    )
+    return result
+
+
+async def abort_reindex_all(ctx: JobContext, status: str, error: Optional[str]):
+    # Stops between documents: those done so far stay reindexed
+    _log(ctx, "reindexed", status, 0, error)
+    ctx.db.commit()
+
+
+# ── fulltext_sync ──
+
+async def run_fulltext_sync(ctx: JobContext) -> Dict[str, Any]:
+    # Indexed batches are committed: a cancelled or retried sync continues where it stopped
+    return await sync_index(ctx.db, progress=ctx.progress)
+
+
+register_job_handler("index_document", run_index_document, abort_index_document)
+register_job_handler("remove_document", run_remove_document, abort_remove_document)
+register_job_handler("reindex_all", run_reindex_all, abort_reindex_all)
+register_job_handler("fulltext_sync", run_fulltext_sync)
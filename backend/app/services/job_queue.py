@@ -0,0 +1,590 @@
+"""Persistent background job queue with an asyncio worker pool.
+
+Jobs are rows in the ``background_jobs`` table, so queued work survives a
+restart. Endpoints enqueue a job and return its id at once.
+``JOB_WORKERS`` worker tasks on the app's event loop claim due jobs in id
+order and run the handler registered for the job's ``kind``.
+
+- Two jobs of the same document never run at the same time, and they run
+  in the order they were queued (toggling on then off quickly stays
+  consistent).
+- Handlers report progress through ``JobContext.progress``. It stores the
+  progress, broadcasts a ``job.progress`` WebSocket event and raises
+  ``JobCancelled`` once a cancellation was requested.
+- A handler exception is retried with exponential backoff up to the
+  job's ``max_attempts``; ``JobFailed`` fails the job at once.
+- A running job records the process running it (``worker_id``) and a
+  ``heartbeat_at`` refreshed by that process. A job whose process stopped
+  sending heartbeats for ``STALE_AFTER_SECONDS`` is taken over by another
+  (or the restarted) process: the lost run counts as an attempt, so the
+  job is retried or failed like after an exception, and a job that keeps
+  killing its process cannot loop forever. On a clean shutdown the
+  process puts its own running jobs back in the queue.
+- Long handlers can save a checkpoint (``JobContext.set_checkpoint``)
+  with the work it describes; a retried, requeued (``requeue_job``) or
+  restarted job reads it back and continues from there.
+"""
+import asyncio
+import importlib
+import json
+import os
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import BackgroundJob
+
+JOB_STATUSES = ("queued", "running", "completed", "failed", "cancelled")
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+# Modules that register job handlers (imported before the first job runs)
+HANDLER_MODULES = ("app.services.indexing_jobs", "app.services.email_jobs", "app.services.chat_memory")
+
+# First retry after this many seconds, doubled for every further attempt
+RETRY_BACKOFF_SECONDS = 5.0
+# Idle workers re-check the table this often (due retries, jobs queued by another process)
+POLL_INTERVAL_SECONDS = 5.0
+# Queued jobs inspected per claim attempt
+CLAIM_SCAN_LIMIT = 50
+# Running jobs of this process are marked alive this often
+HEARTBEAT_INTERVAL_SECONDS = 30.0
+# A running job without heartbeat for this long belongs to a dead process
+STALE_AFTER_SECONDS = 120.0
+
+# Owner recorded on the jobs this process runs (unique per process start)
+WORKER_ID = f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:12]}"
+
+
+class JobCancelled(Exception):
+    """Raised by ``JobContext.progress`` when the job was cancelled."""
+
+
+class JobFailed(Exception):
+    """Permanent failure: the job is not retried."""
+
+
+@dataclass
+class JobHandler:
+    run: Callable[["JobContext"], Awaitable[Optional[Dict[str, Any]]]]
+    # Undo side effects after the job was cancelled or failed for good
+    on_abort: Optional[Callable[["JobContext", str, Optional[str]], Awaitable[None]]] = None
+
+
+_handlers: Dict[str, JobHandler] = {}
+_session_factory = SessionLocal
+_workers: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+_wakeup_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def register_job_handler(kind: str, run, on_abort=None):
+    """Register the coroutine that runs jobs of ``kind``."""
+    _handlers[kind] = JobHandler(run=run, on_abort=on_abort)
+
+
+def set_session_factory(factory):
+    """Session factory used by the workers (tests bind it to their engine)."""
+    global _session_factory
+    _session_factory = factory
+
+
+def _load_handlers():
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+
+
+def _elapsed_ms(start: Optional[datetime], end: Optional[datetime]) -> Optional[int]:
+    if start is None or end is None:
+        return None
+    return max(0, int((end - start).total_seconds() * 1000))
+
+
+def job_to_dict(job: BackgroundJob) -> Dict[str, Any]:
+    """JSON-serializable view of a job (API responses and WebSocket events)."""
+    total = job.total or 0
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "document_id": job.document_id,
+        "progress": job.progress or 0,
+        "total": total,
+        "percentage": round((job.progress or 0) / total * 100, 1) if total > 0 else 0.0,
+        "message": job.message,
+        "error": job.error,
+        "result": json.loads(job.result) if job.result else None,
+        "attempts": job.attempts or 0,
+        "max_attempts": job.max_attempts,
+        "cancel_requested": bool(job.cancel_requested),
+        "queue_wait_ms": _elapsed_ms(job.queued_at, job.started_at),
+        "run_ms": _elapsed_ms(job.started_at, job.finished_at),
+        "queued_at": job.queued_at.isoformat() if job.queued_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+async def _broadcast(job: BackgroundJob):
+    from app.routers.websocket_router import broadcast_job_progress
+
+    try:
+        await broadcast_job_progress(job_to_dict(job))
+    except Exception as e:
+        print(f"[JobQueue] Broadcast hiba: {e}")
+
+
+class JobContext:
+    """What a handler gets: the job row, a session, the payload and progress reporting."""
+
+    def __init__(self, job: BackgroundJob, db: Session):
+        self.job = job
+        self.db = db
+        self.payload: Dict[str, Any] = json.loads(job.payload) if job.payload else {}
+        self._started = time.perf_counter()
+
+    @property
+    def queue_wait_ms(self) -> Optional[int]:
+        """Time the job spent in the queue before this attempt started."""
+        return _elapsed_ms(self.job.queued_at, self.job.started_at)
+
+    def run_ms(self) -> int:
+        """Time spent in this attempt so far."""
+        return int((time.perf_counter() - self._started) * 1000)
+
+    @property
+    def checkpoint(self) -> Dict[str, Any]:
+        """Where an earlier run of this job stopped (empty on the first run)."""
+        return json.loads(self.job.checkpoint) if self.job.checkpoint else {}
+
+    def set_checkpoint(self, checkpoint: Dict[str, Any]):
+        """Stage a checkpoint: it is saved by the handler's next commit, with the work it covers."""
+        self.job.checkpoint = json.dumps(checkpoint)
+
+    def cancel_requested(self) -> bool:
+        return bool(
+            self.db.query(BackgroundJob.cancel_requested)
+            .filter(BackgroundJob.id == self.job.id)
+            .scalar()
+        )
+
+    async def progress(self, done: int, total: Optional[int] = None, message: Optional[str] = None):
+        """Store and broadcast progress; raise ``JobCancelled`` if cancellation was requested.
+
+        Handlers should call this only where stopping leaves a consistent
+        state (or where ``on_abort`` cleans up).
+        """
+        self.job.progress = done
+        if total is not None:
+            self.job.total = total
+        if message is not None:
+            self.job.message = message[:500]
+        self.job.heartbeat_at = datetime.utcnow()
+        self.db.commit()
+        await _broadcast(self.job)
+
+        if self.cancel_requested():
+            raise JobCancelled()
+
+
+# ── Queue ──
+
+def enqueue_job(
+    db: Session,
+    kind: str,
+    document_id: Optional[int] = None,
+    payload: Optional[Dict[str, Any]] = None,
+    max_attempts: Optional[int] = None,
+) -> BackgroundJob:
+    """Queue a job and commit (together with any pending changes of ``db``)."""
+    _load_handlers()
+    if kind not in _handlers:
+        raise ValueError(f"Ismeretlen feladattípus: {kind}")
+
+    job = BackgroundJob(
+        kind=kind,
+        status="queued",
+        document_id=document_id,
+        payload=json.dumps(payload) if payload else None,
+        progress=0,
+        total=0,
+        attempts=0,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        cancel_requested=False,
+        queued_at=datetime.utcnow(),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    _notify_workers()
+    return job
+
+
+def requeue_job(db: Session, job: BackgroundJob) -> BackgroundJob:
+    """Queue a finished job again; its checkpoint is kept, so the handler can continue."""
+    job.status = "queued"
+    job.error = None
+    job.result = None
+    job.attempts = 0
+    job.cancel_requested = False
+    job.queued_at = datetime.utcnow()
+    job.run_after = None
+    job.started_at = None
+    job.finished_at = None
+    job.message = "Folytatásra sorba állítva"
+    db.commit()
+    db.refresh(job)
+    _notify_workers()
+    return job
+
+
+def _notify_workers():
+    # Thread-safe: sync endpoints run in the threadpool
+    if _wakeup is not None and _wakeup_loop is not None and not _wakeup_loop.is_closed():
+        _wakeup_loop.call_soon_threadsafe(_wakeup.set)
+
+
+def claim_next_job(db: Session) -> Optional[int]:
+    """Mark the oldest due job as running and return its id (None if nothing is due)."""
+    now = datetime.utcnow()
+    blocked = {
+        doc_id
+        for (doc_id,) in db.query(BackgroundJob.document_id).filter(
+            BackgroundJob.status == "running",
+            BackgroundJob.document_id.isnot(None),
+        )
+    }
+
+    queued = (
+        db.query(BackgroundJob.id, BackgroundJob.document_id, BackgroundJob.run_after)
+        .filter(BackgroundJob.status == "queued")
+        .order_by(BackgroundJob.id)
+        .limit(CLAIM_SCAN_LIMIT)
+        .all()
+    )
+    for job_id, doc_id, run_after in queued:
+        if doc_id is not None and doc_id in blocked:
+            continue
+        if run_after is not None and run_after > now:
+            # Later jobs of the same document wait for this retry
+            if doc_id is not None:
+                blocked.add(doc_id)
+            continue
+
+        # Conditional update: another process may have claimed it meanwhile
+        claimed = (
+            db.query(BackgroundJob)
+            .filter(BackgroundJob.id == job_id, BackgroundJob.status == "queued")
+            .update(
+                {
+                    BackgroundJob.status: "running",
+                    BackgroundJob.started_at: now,
+                    BackgroundJob.attempts: BackgroundJob.attempts + 1,
+                    BackgroundJob.worker_id: WORKER_ID,
+                    BackgroundJob.heartbeat_at: now,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if claimed:
+            return job_id
+
+    return None
+
+
+def touch_running_jobs(db: Session) -> int:
+    """Refresh the heartbeat of the jobs this process is running."""
+    touched = (
+        db.query(BackgroundJob)
+        .filter(BackgroundJob.status == "running", BackgroundJob.worker_id == WORKER_ID)
+        .update({BackgroundJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return touched
+
+
+def _stale_running_filter(now: datetime):
+    # Running, owned by another process, and no sign of life from it lately
+    last_seen = func.coalesce(BackgroundJob.heartbeat_at, BackgroundJob.started_at)
+    return (
+        BackgroundJob.status == "running",
+        or_(BackgroundJob.worker_id.is_(None), BackgroundJob.worker_id != WORKER_ID),
+        or_(last_seen.is_(None), last_seen < now - timedelta(seconds=STALE_AFTER_SECONDS)),
+    )
+
+
+async def requeue_interrupted_jobs(db: Session) -> int:
+    """Take over the jobs of dead processes and retry or fail them; returns their number.
+
+    The lost run keeps its attempt: the job goes through the same
+    retry/fail path as a handler exception.
+    """
+    _load_handlers()
+    now = datetime.utcnow()
+    stale_filter = _stale_running_filter(now)
+    job_ids = [job_id for (job_id,) in db.query(BackgroundJob.id).filter(*stale_filter)]
+
+    count = 0
+    for job_id in job_ids:
+        # Conditional update: another process may be taking it over too
+        taken = (
+            db.query(BackgroundJob)
+            .filter(BackgroundJob.id == job_id, *stale_filter)
+            .update(
+                {BackgroundJob.worker_id: WORKER_ID, BackgroundJob.heartbeat_at: now},
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if not taken:
+            continue
+
+        job = db.get(BackgroundJob, job_id)
+        print(f"[JobQueue] {job.kind} #{job.id} megszakadt ({job.attempts}/{job.max_attempts})")
+        await _retry_or_fail(JobContext(job, db), _handlers.get(job.kind), "A feldolgozó folyamat leállt futás közben")
+        count += 1
+    return count
+
+
+async def _abort(ctx: JobContext, handler: Optional[JobHandler], status: str, error: Optional[str]):
+    job, db = ctx.job, ctx.db
+    if handler is not None and handler.on_abort is not None:
+        try:
+            await handler.on_abort(ctx, status, error)
+        except Exception as e:
+            print(f"[JobQueue] Visszaállítási hiba ({job.kind} #{job.id}): {e}")
+            db.rollback()
+
+    job.status = status
+    job.error = error
+    job.finished_at = datetime.utcnow()
+    if status == "cancelled":
+        job.message = "Megszakítva"
+    db.commit()
+    await _broadcast(job)
+
+
+async def _retry_or_fail(ctx: JobContext, handler: Optional[JobHandler], error: str):
+    """After a lost attempt: cancel, queue a retry with backoff, or fail for good."""
+    job, db = ctx.job, ctx.db
+    attempts = job.attempts or 0
+    if ctx.cancel_requested():
+        await _abort(ctx, handler, "cancelled", None)
+    elif handler is not None and attempts < job.max_attempts:
+        delay = RETRY_BACKOFF_SECONDS * 2 ** max(0, attempts - 1)
+        run_after = datetime.utcnow() + timedelta(seconds=delay)
+        job.status = "queued"
+        job.error = error
+        job.run_after = run_after
+        job.queued_at = run_after
+        job.message = f"Újrapróbálás {delay:.0f} mp múlva"
+        db.commit()
+        await _broadcast(job)
+    else:
+        await _abort(ctx, handler, "failed", error)
+
+
+async def run_job(job_id: int) -> str:
+    """Run one claimed job to its next state; returns the job's new status."""
+    _load_handlers()
+    db = _session_factory()
+    try:
+        job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+        if job is None:
+            return "missing"
+
+        ctx = JobContext(job, db)
+        handler = _handlers.get(job.kind)
+        if handler is None:
+            await _abort(ctx, None, "failed", f"Ismeretlen feladattípus: {job.kind}")
+            return job.status
+
+        await _broadcast(job)
+        try:
+            result = await handler.run(ctx)
+        except JobCancelled:
+            db.rollback()
+            await _abort(ctx, handler, "cancelled", None)
+        except JobFailed as e:
+            db.rollback()
+            await _abort(ctx, handler, "failed", str(e))
+        except Exception as e:
+            db.rollback()
+            print(f"[JobQueue] {job.kind} #{job.id} hiba ({job.attempts}/{job.max_attempts}): {e}")
+            await _retry_or_fail(ctx, handler, str(e))
+        else:
+            job.status = "completed"
+            job.error = None
+            job.result = json.dumps(result) if result is not None else None
+            job.progress = job.total or job.progress
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            await _broadcast(job)
+
+        return job.status
+    finally:
+        db.close()
+
+
+async def cancel_job(db: Session, job: BackgroundJob) -> BackgroundJob:
+    """Cancel a queued job now, or ask a running one to stop at its next progress report."""
+    if job.status == "queued":
+        cancelled = (
+            db.query(BackgroundJob)
+            .filter(BackgroundJob.id == job.id, BackgroundJob.status == "queued")
+            .update({BackgroundJob.status: "cancelled"}, synchronize_session=False)
+        )
+        db.commit()
+        db.refresh(job)
+        if cancelled:
+            _load_handlers()
+            await _abort(JobContext(job, db), _handlers.get(job.kind), "cancelled", None)
+            return job
+
+    if job.status == "running":
+        job.cancel_requested = True
+        job.message = "Megszakítás folyamatban..."
+        db.commit()
+        await _broadcast(job)
+
+    return job
+
+
+async def run_pending_jobs(limit: Optional[int] = None) -> int:
+    """Work off every due job on the current loop without workers (tests, scripts)."""
+    count = 0
+    while limit is None or count < limit:
+        db = _session_factory()
+        try:
+            job_id = claim_next_job(db)
+        finally:
+            db.close()
+        if job_id is None:
+            break
+        await run_job(job_id)
+        count += 1
+    return count
+
+
+# ── Worker pool ──
+
+async def _worker():
+    while True:
+        try:
+            _wakeup.clear()
+            db = _session_factory()
+            try:
+                job_id = claim_next_job(db)
+            finally:
+                db.close()
+
+            if job_id is not None:
+                await run_job(job_id)
+                continue
+
+            try:
+                await asyncio.wait_for(_wakeup.wait(), POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[JobQueue] Worker hiba: {e}")
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+
+async def _heartbeat():
+    """Keep this process's jobs alive and take over the jobs of dead processes."""
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL_SECONDS)
+        try:
+            db = _session_factory()
+            try:
+                touch_running_jobs(db)
+                requeued = await requeue_interrupted_jobs(db)
+            finally:
+                db.close()
+            if requeued:
+                _notify_workers()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[JobQueue] Heartbeat hiba: {e}")
+
+
+def release_running_jobs(db: Session) -> int:
+    """Put the jobs this process was running back in the queue (clean shutdown).
+
+    The stopped run does not count as an attempt: the process stopped it
+    itself, it did not die on it.
+    """
+    jobs = (
+        db.query(BackgroundJob)
+        .filter(BackgroundJob.status == "running", BackgroundJob.worker_id == WORKER_ID)
+        .all()
+    )
+    now = datetime.utcnow()
+    for job in jobs:
+        job.status = "queued"
+        job.attempts = max(0, (job.attempts or 0) - 1)
+        job.queued_at = now
+        job.run_after = None
+        job.started_at = None
+        job.worker_id = None
+        job.heartbeat_at = None
+        job.message = "Leállítás miatt újra sorba állítva"
+    db.commit()
+    return len(jobs)
+
+
+async def start_workers(count: Optional[int] = None):
+    """Take over interrupted jobs and start the worker and heartbeat tasks (FastAPI startup)."""
+    global _wakeup, _wakeup_loop
+    _load_handlers()
+
+    db = _session_factory()
+    try:
+        requeued = await requeue_interrupted_jobs(db)
+        if requeued:
+            print(f"[JobQueue] {requeued} megszakadt feladat átvéve")
+    except Exception as e:
+        print(f"[JobQueue] Nem sikerült a megszakadt feladatok visszaállítása: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+    _wakeup = asyncio.Event()
+    _wakeup_loop = asyncio.get_running_loop()
+    for i in range(count or settings.JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker(), name=f"job-worker-{i}"))
+    _workers.append(asyncio.create_task(_heartbeat(), name="job-heartbeat"))
+
+
+async def stop_workers():
+    """Stop the worker tasks (FastAPI shutdown) and put their running jobs back in the queue."""
+    global _wakeup, _wakeup_loop
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+    db = _session_factory()
+    try:
+        released = release_running_jobs(db)
+        if released:
+            print(f"[JobQueue] {released} futó feladat visszaállítva a sorba")
+    except Exception as e:
+        print(f"[JobQueue] Nem sikerült a futó feladatok visszaállítása: {e}")
+        db.rollback()
+    finally:
+        db.close()
+    _wakeup = None
+    _wakeup_loop = None
@@ -0,0 +1,238 @@
+"""Persistent cache of LLM responses for repeatable requests.
+
+Document summaries, quick guides and idea generation send the same
+request again whenever the user clicks again on unchanged input. Those
+calls go through ``cached_chat_message``: the response is stored in the
+``llm_response_cache`` table under a key made of the provider, the model
+and the SHA-256 hashes of the system prompt and of the messages, and the
+same request is answered from there until the entry expires
+(``LLM_CACHE_TTL_SECONDS``). The table is kept to ``LLM_CACHE_MAX_ENTRIES``
+by dropping expired entries first, then the least recently used ones.
+
+A hit is recorded in ``TokenUsage`` like a request, with the tokens the
+original answer took, ``cost`` 0 and ``cache_hit`` set, so the token
+statistics show what the cache saved. ``bypass_cache`` skips the lookup
+(the fresh answer replaces the stored one). Chat turns are not cached.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import LLMResponseCache
+from app.services.ai_service import chat_with_target, resolve_chat_target, save_token_usage
+
+# Rows deleted in one IN (...) condition
+DELETE_CHUNK_SIZE = 500
+
+# The cached response goes into a TEXT column (64 KB on MySQL)
+MAX_RESPONSE_BYTES = 60000
+
+# Process-wide counters (shown by get_cache_stats)
+_stats = {"hits": 0, "misses": 0, "bypassed": 0, "stored": 0, "expired": 0, "evicted": 0}
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def system_hash(system_prompt: Optional[str]) -> str:
+    """SHA-256 of the system prompt (none and empty hash the same)."""
+    return _sha256(system_prompt or "")
+
+
+def messages_hash(messages: List[Dict[str, Any]]) -> str:
+    """SHA-256 of the messages' roles and contents, in order."""
+    canonical = [{"role": m.get("role", "user"), "content": m.get("content", "")} for m in messages]
+    return _sha256(json.dumps(canonical, ensure_ascii=False, separators=(",", ":")))
+
+
+def cache_key(provider: str, model: str, system_digest: str, messages_digest: str) -> str:
+    """The entry's key: SHA-256 of the provider, model and the two hashes."""
+    return _sha256(json.dumps([provider, model, system_digest, messages_digest]))
+
+
+def get_cached_response(db: Session, key: str) -> Optional[LLMResponseCache]:
+    """The live entry for ``key`` (its use recorded), or None; an expired one is deleted."""
+    try:
+        entry = db.query(LLMResponseCache).filter(LLMResponseCache.key_hash == key).first()
+        if entry is None:
+            return None
+        now = datetime.utcnow()
+        if entry.expires_at is not None and entry.expires_at <= now:
+            db.delete(entry)
+            db.commit()
+            _stats["expired"] += 1
+            return None
+        entry.hit_count = (entry.hit_count or 0) + 1
+        entry.last_used_at = now
+        db.commit()
+        return entry
+    except Exception as e:
+        # A cache failure must not stop the request
+        print(f"[LLMCache] Olvasási hiba: {e}")
+        db.rollback()
+        return None
+
+
+def store_response(
+    db: Session,
+    key: str,
+    target: Dict[str, Any],
+    system_digest: str,
+    messages_digest: str,
+    response_text: str,
+    input_tokens: int,
+    output_tokens: int,
+):
+    """Store (or replace) the response under ``key``, then evict down to the size limit."""
+    if not response_text.strip() or len(response_text.encode("utf-8")) > MAX_RESPONSE_BYTES:
+        return
+
+    now = datetime.utcnow()
+    ttl = settings.LLM_CACHE_TTL_SECONDS
+    values = {
+        "response": response_text,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "hit_count": 0,
+        "last_used_at": now,
+        "expires_at": now + timedelta(seconds=ttl) if ttl > 0 else None,
+    }
+    try:
+        entry = db.query(LLMResponseCache).filter(LLMResponseCache.key_hash == key).first()
+        if entry is not None:  # bypassed or expired meanwhile: the fresh answer wins
+            for name, value in values.items():
+                setattr(entry, name, value)
+            db.commit()
+        else:
+            with db.begin_nested():
+                db.add(LLMResponseCache(
+                    key_hash=key,
+                    provider=target["provider"],
+                    model=target["model"],
+                    system_hash=system_digest,
+                    messages_hash=messages_digest,
+                    **values,
+                ))
+            db.commit()
+        _stats["stored"] += 1
+    except IntegrityError:
+        # A parallel request stored the same key first (the savepoint is rolled back)
+        return
+    except Exception as e:
+        print(f"[LLMCache] Írási hiba: {e}")
+        db.rollback()
+        return
+
+    evict(db)
+
+
+def evict(db: Session):
+    """Delete expired entries, then the least recently used ones above the limit."""
+    try:
+        expired = db.query(LLMResponseCache).filter(
+            LLMResponseCache.expires_at.isnot(None),
+            LLMResponseCache.expires_at <= datetime.utcnow(),
+        ).delete(synchronize_session=False)
+        db.commit()
+        _stats["expired"] += expired
+
+        max_entries = settings.LLM_CACHE_MAX_ENTRIES
+        if max_entries <= 0:
+            return
+        excess = db.query(LLMResponseCache).count() - max_entries
+        if excess <= 0:
+            return
+
+        ids = [
+            row_id for (row_id,) in db.query(LLMResponseCache.id)
+            .order_by(LLMResponseCache.last_used_at, LLMResponseCache.id)
+            .limit(excess)
+            .all()
+        ]
+        for i in range(0, len(ids), DELETE_CHUNK_SIZE):
+            db.query(LLMResponseCache).filter(
+                LLMResponseCache.id.in_(ids[i : i + DELETE_CHUNK_SIZE])
+            ).delete(synchronize_session=False)
+        db.commit()
+        _stats["evicted"] += len(ids)
+
+    except Exception as e:
+        print(f"[LLMCache] Kilakoltatási hiba: {e}")
+        db.rollback()
+
+
+async def cached_chat_message(
+    messages: list,
+    db: Session,
+    system_prompt: Optional[str] = None,
+    bypass_cache: bool = False,
+) -> Tuple[str, int, int]:
+    """``send_chat_message`` answered from the response cache when possible.
+
+    Args:
+        messages: List of message dicts with 'role' and 'content'
+        db: Database session for settings, the cache and token tracking
+        system_prompt: Optional system prompt
+        bypass_cache: Ask the model even if a cached answer exists
+
+    Returns:
+        Tuple of (response_text, input_tokens, output_tokens)
+    """
+    target = resolve_chat_target(db)
+    system_digest = system_hash(system_prompt)
+    messages_digest = messages_hash(messages)
+    key = cache_key(target["provider"], target["model"], system_digest, messages_digest)
+
+    if bypass_cache:
+        _stats["bypassed"] += 1
+    else:
+        entry = get_cached_response(db, key)
+        if entry is not None:
+            _stats["hits"] += 1
+            save_token_usage(
+                db=db,
+                provider=target["provider"],
+                model_name=target["model"],
+                input_tokens=entry.input_tokens or 0,
+                output_tokens=entry.output_tokens or 0,
+                cost=0.0,
+                cache_hit=True,
+            )
+            return entry.response, entry.input_tokens or 0, entry.output_tokens or 0
+        _stats["misses"] += 1
+
+    response_text, input_tokens, output_tokens, cost_usd = await chat_with_target(target, messages, system_prompt)
+    save_token_usage(
+        db=db,
+        provider=target["provider"],
+        model_name=target["model"],
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        cost=cost_usd,
+    )
+    store_response(db, key, target, system_digest, messages_digest, response_text, input_tokens, output_tokens)
+    return response_text, input_tokens, output_tokens
+
+
+def get_cache_stats(db: Session) -> dict:
+    """Hit/miss counters and the size of the cache."""
+    lookups = _stats["hits"] + _stats["misses"]
+    try:
+        entries = db.query(LLMResponseCache).count()
+    except Exception:
+        db.rollback()
+        entries = None
+
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / lookups, 3) if lookups else None,
+        "entries": entries,
+        "max_entries": settings.LLM_CACHE_MAX_ENTRIES,
+        "ttl_seconds": settings.LLM_CACHE_TTL_SECONDS,
+    }
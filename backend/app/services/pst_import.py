@@ -0,0 +1,546 @@
+"""Streaming import of Outlook PST archives.
+
+The archive is parsed in a pool of ``PST_IMPORT_WORKERS`` worker
+processes (see ``pst_parser``): the API process never runs pypff, so its
+event loop stays responsive during a large import, and parsing scales
+with the cores. The workers share out the folder tree and stream
+picklable message records back through a bounded queue; this module is
+the single DB writer.
+
+The import keeps a bounded memory footprint regardless of mailbox size:
+
+- the upload is copied to disk in ``UPLOAD_CHUNK_SIZE`` chunks,
+- workers read messages one at a time and block while the queue is full,
+- attachments are streamed by the workers into the content-addressed
+  blob store (``attachment_store``), so identical files are kept once;
+  the disk space this saves is reported per import.
+
+Messages are ingested in batches of ``PST_IMPORT_BATCH_SIZE``: one query
+finds the batch's Message-IDs already in the database, the new emails and
+their attachments are inserted with one multi-row INSERT each, and every
+batch is committed together with the import's checkpoint, so a crash
+loses at most the batch in progress and a resumed import (the
+``pst_import`` job, see ``email_jobs``) reads only what is left.
+
+Peak resident set sizes are reported in ``PSTImportResult``: the server
+process (``peak_rss_mb``) and the largest worker (``worker_peak_rss_mb``).
+"""
+import asyncio
+import importlib.util
+import multiprocessing
+import os
+import queue as queue_module
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import UploadFile
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import AttachmentBlob, Email, EmailAttachment
+from app.routers.websocket_router import broadcast, broadcast_notification
+from app.schemas.schemas import PSTImportResult
+from app.services.attachment_store import iter_stale_files, remove_blobs
+from app.services.job_queue import JobCancelled
+from app.services.pst_parser import current_rss_bytes, init_worker, parse_unit, plan_units
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Queue items buffered per worker before the workers block
+QUEUE_ITEMS_PER_WORKER = 4
+
+# How often the writer checks for crashed workers while the queue is empty
+QUEUE_POLL_SECONDS = 1.0
+
+# Per-message errors kept in the checkpoint (and reported)
+MAX_CHECKPOINT_ERRORS = 10
+
+# Content hashes looked up in one IN (...) condition by the orphan sweep
+SWEEP_CHUNK_SIZE = 500
+
+
+def _mb(value: Optional[int]) -> Optional[float]:
+    return round(value / (1024 * 1024), 1) if value is not None else None
+
+
+# ── Memory ──
+
+class PeakRSS:
+    """Highest RSS seen across ``sample()`` calls."""
+
+    def __init__(self):
+        self.peak: Optional[int] = None
+        self.sample()
+
+    def sample(self):
+        rss = current_rss_bytes()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    @property
+    def peak_mb(self) -> Optional[float]:
+        return _mb(self.peak)
+
+
+# ── Upload ──
+
+async def save_upload(file: UploadFile, path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> int:
+    """Copy an upload to disk chunk by chunk; returns the number of bytes written."""
+    written = 0
+    with open(path, "wb") as f:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            f.write(chunk)
+            written += len(chunk)
+    return written
+
+
+# ── Writer ──
+
+def _stored_blobs(db: Session, hashes: List[str]) -> set:
+    """The content hashes with an ``AttachmentBlob`` row."""
+    return set(
+        content_hash for (content_hash,) in
+        db.query(AttachmentBlob.content_hash).filter(AttachmentBlob.content_hash.in_(hashes))
+    )
+
+
+def _reference_blobs(db: Session, attachment_rows: List[Dict[str, Any]]) -> int:
+    """Count the new attachments in their blobs' reference counts.
+
+    Returns the bytes the blob store saved: every reference beyond a
+    blob's first would have been a file of its own. Imports may run side
+    by side: a blob another import stored after the lookup below is
+    counted with an increment instead of a second row.
+    """
+    references: Dict[str, int] = {}
+    blobs: Dict[str, Dict[str, Any]] = {}
+    for row in attachment_rows:
+        references[row["content_hash"]] = references.get(row["content_hash"], 0) + 1
+        blobs[row["content_hash"]] = row
+
+    stored = _stored_blobs(db, list(references))
+    saved = 0
+    new_blobs = []
+    increments: Dict[int, List[str]] = {}
+    for content_hash, count in references.items():
+        size = blobs[content_hash]["file_size"]
+        if content_hash in stored:
+            increments.setdefault(count, []).append(content_hash)
+            saved += size * count
+        else:
+            new_blobs.append({
+                "content_hash": content_hash,
+                "file_path": blobs[content_hash]["file_path"],
+                "file_size": size,
+                "ref_count": count,
+            })
+            saved += size * (count - 1)
+
+    if new_blobs:
+        try:
+            with db.begin_nested():
+                db.execute(insert(AttachmentBlob), new_blobs)
+        except IntegrityError:
+            # Stored meanwhile by another import (the savepoint is rolled back): row by row
+            for blob in new_blobs:
+                try:
+                    with db.begin_nested():
+                        db.execute(insert(AttachmentBlob), [blob])
+                except IntegrityError:
+                    increments.setdefault(blob["ref_count"], []).append(blob["content_hash"])
+                    saved += blob["file_size"]
+    # Incremented in SQL, not read-modify-write: imports may run side by side
+    for count, hashes in increments.items():
+        db.execute(
+            update(AttachmentBlob)
+            .where(AttachmentBlob.content_hash.in_(hashes))
+            .values(ref_count=AttachmentBlob.ref_count + count)
+        )
+    return saved
+
+
+def sweep_orphan_blobs(db: Session, root: Optional[str] = None, grace_seconds: Optional[float] = None) -> int:
+    """Delete blob files that no ``AttachmentBlob`` row references, once they are old enough.
+
+    A worker writes (or reuses) a blob before the writer commits its row,
+    possibly in another import running side by side, so a missing row
+    alone does not make a blob an orphan. Only files untouched for
+    ``ATTACHMENT_ORPHAN_GRACE_SECONDS`` are considered (and leftover temp
+    files of crashed workers). Runs as a daily sweep (``scheduler``).
+    Returns the number of files deleted.
+    """
+    root = root or settings.EMAIL_ATTACHMENTS_DIR
+    if grace_seconds is None:
+        grace_seconds = settings.ATTACHMENT_ORPHAN_GRACE_SECONDS
+    if not os.path.isdir(root):
+        return 0
+
+    candidates: Dict[str, str] = {}
+    stale_tmp: List[str] = []
+    for content_hash, path in iter_stale_files(root, grace_seconds):
+        if content_hash is None:
+            stale_tmp.append(path)
+        else:
+            candidates[content_hash] = path
+
+    hashes = list(candidates)
+    orphans = []
+    for i in range(0, len(hashes), SWEEP_CHUNK_SIZE):
+        chunk = hashes[i : i + SWEEP_CHUNK_SIZE]
+        referenced = _stored_blobs(db, chunk)
+        orphans.extend(candidates[content_hash] for content_hash in chunk if content_hash not in referenced)
+
+    remove_blobs(stale_tmp + orphans)
+    return len(stale_tmp) + len(orphans)
+
+
+def ingest_batch(db: Session, records: List[Dict[str, Any]], commit: bool = True) -> Dict[str, Any]:
+    """Insert a batch of ``read_pst_message`` records, skipping duplicates, and commit.
+
+    A constant number of statements per batch instead of a lookup, an
+    insert and a flush per message: the Message-IDs already stored, a
+    multi-row INSERT of the new emails (their ids are read back in one
+    query, as MySQL has no INSERT ... RETURNING), a multi-row INSERT of
+    their attachments and the blob reference counts.
+
+    The blobs of skipped duplicates stay on disk; ``sweep_orphan_blobs``
+    removes them if nothing claims them. With ``commit=False`` the caller
+    commits (together with its checkpoint).
+    """
+    errors = [record["error"] for record in records if record["error"]]
+    message_ids = [record["row"]["message_id"] for record in records]
+    seen = {
+        message_id for (message_id,) in
+        db.query(Email.message_id).filter(Email.message_id.in_(message_ids))
+    }
+
+    new_records = []
+    skipped_records = []
+    for record in records:
+        message_id = record["row"]["message_id"]
+        if message_id in seen:
+            skipped_records.append(record)  # already imported, or repeated within the archive
+            continue
+        seen.add(message_id)
+        new_records.append(record)
+
+    bytes_saved = 0
+    if new_records:
+        db.execute(insert(Email), [record["row"] for record in new_records])
+        email_ids = dict(
+            db.query(Email.message_id, Email.id).filter(
+                Email.message_id.in_([record["row"]["message_id"] for record in new_records])
+            )
+        )
+        attachment_rows = [
+            {**attachment, "email_id": email_ids[record["row"]["message_id"]]}
+            for record in new_records
+            for attachment in record["attachments"]
+        ]
+        if attachment_rows:
+            db.execute(insert(EmailAttachment), attachment_rows)
+            bytes_saved = _reference_blobs(db, attachment_rows)
+
+    if commit:
+        db.commit()
+    return {
+        "imported": len(new_records),
+        "skipped": len(skipped_records),
+        "errors": errors,
+        "bytes_saved": bytes_saved,
+    }
+
+
+# ── Import ──
+
+async def send_progress(event_type: str, data: dict):
+    """Helper to send progress updates."""
+    try:
+        await broadcast(event_type, data)
+    except Exception:
+        pass  # Ignore broadcast errors
+
+
+def _stop_pool(pool: ProcessPoolExecutor):
+    # Workers may be blocked on a full queue after a failure: terminate, don't wait
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def new_checkpoint() -> Dict[str, Any]:
+    """Checkpoint of an import that has not started (JSON-serializable)."""
+    return {
+        "units": None,  # [[folder_path, start, end], ...] once planned
+        "total": 0,
+        "positions": {},  # str(unit_id) -> first message of the unit not imported yet
+        "imported": 0,
+        "skipped": 0,
+        "attachment_bytes_saved": 0,
+        "errors": [],
+    }
+
+
+def checkpoint_complete(checkpoint: Dict[str, Any]) -> bool:
+    """Whether every message of a planned import has been processed."""
+    if checkpoint.get("units") is None:
+        return False
+    positions = checkpoint.get("positions", {})
+    return all(
+        positions.get(str(unit_id), start) >= end
+        for unit_id, (_, start, end) in enumerate(checkpoint["units"])
+    )
+
+
+def _processed(checkpoint: Dict[str, Any]) -> int:
+    positions = checkpoint["positions"]
+    return sum(
+        positions.get(str(unit_id), start) - start
+        for unit_id, (_, start, _end) in enumerate(checkpoint["units"])
+    )
+
+
+def _commit_batch(
+    db: Session,
+    records: List[Dict[str, Any]],
+    positions: Dict[str, int],
+    errors: List[str],
+    checkpoint: Dict[str, Any],
+    on_checkpoint: Optional[Callable[[Dict[str, Any]], None]],
+) -> Dict[str, Any]:
+    """Ingest a batch and advance the checkpoint in the same transaction."""
+    if records:
+        outcome = ingest_batch(db, records, commit=False)
+    else:
+        outcome = {"imported": 0, "skipped": 0, "errors": [], "bytes_saved": 0}
+
+    updated = {
+        **checkpoint,
+        "positions": {**checkpoint["positions"], **positions},
+        "imported": checkpoint["imported"] + outcome["imported"],
+        "skipped": checkpoint["skipped"] + outcome["skipped"],
+        "attachment_bytes_saved": checkpoint["attachment_bytes_saved"] + outcome["bytes_saved"],
+        "errors": (checkpoint["errors"] + errors + outcome["errors"])[:MAX_CHECKPOINT_ERRORS],
+    }
+    if on_checkpoint is not None:
+        on_checkpoint(updated)
+    db.commit()
+    checkpoint.update(updated)
+    return outcome
+
+
+async def process_pst_file(
+    pst_path: str,
+    db: Session,
+    checkpoint: Optional[Dict[str, Any]] = None,
+    on_checkpoint: Optional[Callable[[Dict[str, Any]], None]] = None,
+    progress: Optional[Callable[..., Awaitable[None]]] = None,
+) -> PSTImportResult:
+    """Process a PST file and import emails with deduplication.
+
+    The import is resumable. Every batch commit also advances the
+    checkpoint (see ``new_checkpoint``): the plan of work units and, per
+    unit, the first message not imported yet. ``on_checkpoint`` stages it
+    in ``db`` just before the commit. Given the ``checkpoint`` of an
+    interrupted run, only the rest of each unit is read. The archive is
+    deleted once every unit is done and kept otherwise (``resumable``).
+
+    ``progress(done, total, message)`` is awaited after every batch, in
+    addition to the ``pst_import.progress`` events.
+    """
+    if importlib.util.find_spec("pypff") is None:
+        return PSTImportResult(
+            success=False,
+            total_emails=0,
+            imported=0,
+            skipped=0,
+            errors=["pypff library not installed"]
+        )
+
+    state = {**new_checkpoint(), **(checkpoint or {})}
+    resumed = state["units"] is not None
+    fatal_error: Optional[str] = None
+    memory = PeakRSS()
+    worker_peak: Optional[int] = None
+
+    # Ensure email attachments directory exists
+    os.makedirs(settings.EMAIL_ATTACHMENTS_DIR, exist_ok=True)
+
+    workers = max(1, settings.PST_IMPORT_WORKERS)
+    # spawn: never fork the server process (event loop, DB connections)
+    context = multiprocessing.get_context("spawn")
+    records_queue = context.Queue(maxsize=workers * QUEUE_ITEMS_PER_WORKER)
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=init_worker,
+        initargs=(records_queue,),
+    )
+
+    try:
+        if not resumed:
+            # The folder tree is read in a worker as well
+            units, total = await asyncio.wrap_future(pool.submit(plan_units, pst_path))
+            state["units"] = [[list(folder_path), start, end] for folder_path, start, end in units]
+            state["total"] = total
+        total_emails = state["total"]
+        positions = state["positions"]
+        remaining = [
+            (unit_id, tuple(folder_path), positions.get(str(unit_id), start), end)
+            for unit_id, (folder_path, start, end) in enumerate(state["units"])
+            if positions.get(str(unit_id), start) < end
+        ]
+
+        # Broadcast initial progress
+        await send_progress("pst_import.progress", {
+            "status": "processing",
+            "current": _processed(state),
+            "total": total_emails,
+            "imported": state["imported"],
+            "skipped": state["skipped"],
+            "message": "Resuming import..." if resumed else "Starting import..."
+        })
+
+        futures = [
+            pool.submit(parse_unit, unit_id, pst_path, folder_path, start, end, settings.EMAIL_ATTACHMENTS_DIR)
+            for unit_id, folder_path, start, end in remaining
+        ]
+
+        batch_size = max(1, settings.PST_IMPORT_BATCH_SIZE)
+        batch: List[Dict[str, Any]] = []
+        batch_positions: Dict[str, int] = {}
+        batch_errors: List[str] = []
+
+        async def flush():
+            nonlocal batch, batch_positions, batch_errors
+            records, unit_positions, errors = batch, batch_positions, batch_errors
+            batch, batch_positions, batch_errors = [], {}, []
+            try:
+                await asyncio.to_thread(
+                    _commit_batch, db, records, unit_positions, errors, state, on_checkpoint
+                )
+            except Exception as e:
+                db.rollback()
+                # The checkpoint stays before this batch: a resumed import retries it
+                raise RuntimeError(f"Batch insert error: {str(e)}") from e
+            memory.sample()
+
+            current = _processed(state)
+            message = f"Importing: {records[-1]['subject'][:50]}..." if records else "Importing..."
+            await send_progress("pst_import.progress", {
+                "status": "processing",
+                "current": current,
+                "total": total_emails,
+                "imported": state["imported"],
+                "skipped": state["skipped"],
+                "message": message
+            })
+            if progress is not None:
+                await progress(current, total_emails, message)
+
+        # Records arrive from all workers in any order; write them a batch at a time
+        pending_units = {unit_id for unit_id, _, _, _ in remaining}
+        while pending_units:
+            try:
+                kind, unit_id, payload = await asyncio.to_thread(records_queue.get, True, QUEUE_POLL_SECONDS)
+            except queue_module.Empty:
+                # A worker killed by the OS never reports its unit as done
+                for future in futures:
+                    if future.done() and future.exception() is not None:
+                        raise future.exception()
+                continue
+
+            # Records of a unit arrive in order: its position only moves forward
+            batch_positions[str(unit_id)] = payload["next_index"]
+            if kind == "records":
+                batch.extend(payload["records"])
+                if len(batch) >= batch_size:
+                    await flush()
+            else:
+                pending_units.discard(unit_id)
+                batch_errors.extend(payload["errors"])
+                if payload["peak_rss"] is not None:
+                    worker_peak = max(worker_peak or 0, payload["peak_rss"])
+        if batch or batch_positions:
+            await flush()
+
+        if checkpoint_complete(state):
+            # Broadcast completion
+            await send_progress("pst_import.progress", {
+                "status": "completed",
+                "current": total_emails,
+                "total": total_emails,
+                "imported": state["imported"],
+                "skipped": state["skipped"],
+                "message": f"Import completed: {state['imported']} imported, {state['skipped']} skipped",
+                "attachment_bytes_saved": state["attachment_bytes_saved"],
+            })
+
+            # Send notification for PST import completion
+            if state["imported"] > 0:
+                await broadcast_notification(
+                    message=f"PST import kész: {state['imported']} email importálva",
+                    level="success",
+                    title="PST Import kész",
+                    action_url="/emails"
+                )
+        else:
+            # Folders that could not be read: the archive is kept for a resume
+            await send_progress("pst_import.progress", {
+                "status": "error",
+                "current": _processed(state),
+                "total": total_emails,
+                "imported": state["imported"],
+                "skipped": state["skipped"],
+                "message": "Import incomplete: some folders could not be read"
+            })
+
+    except JobCancelled:
+        raise
+    except Exception as e:
+        db.rollback()
+        fatal_error = f"PST processing error: {str(e) or type(e).__name__}"
+        await send_progress("pst_import.progress", {
+            "status": "error",
+            "current": _processed(state) if state["units"] is not None else 0,
+            "total": state["total"],
+            "imported": state["imported"],
+            "skipped": state["skipped"],
+            "message": f"Error: {str(e)}"
+        })
+
+        # Send error notification
+        await broadcast_notification(
+            message=f"PST import hiba: {str(e)[:100]}",
+            level="error",
+            title="PST Import hiba"
+        )
+    finally:
+        _stop_pool(pool)
+        records_queue.close()
+
+    completed = checkpoint_complete(state)
+    if completed:
+        # Clean up uploaded PST file; an unfinished import keeps it for a resume
+        try:
+            os.remove(pst_path)
+        except Exception:
+            pass
+
+    errors = state["errors"] + ([fatal_error] if fatal_error else [])
+    return PSTImportResult(
+        success=completed and not errors,
+        total_emails=state["total"],
+        imported=state["imported"],
+        skipped=state["skipped"],
+        errors=errors[:10],  # Limit error messages
+        peak_rss_mb=memory.peak_mb,
+        worker_peak_rss_mb=_mb(worker_peak),
+        attachment_bytes_saved=state["attachment_bytes_saved"],
+        resumable=not completed and os.path.exists(pst_path),
+    )
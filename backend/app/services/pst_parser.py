@@ -0,0 +1,276 @@
+"""PST parsing, run in worker processes.
+
+``process_pst_file`` never opens the archive in the API process. It
+plans the work in a worker (``plan_units``: the folder tree split into
+units of at most ``UNIT_MESSAGES`` messages, so one huge folder is still
+shared out) and hands the units to a process pool. Each worker keeps its
+own ``pypff.file`` handle, reads the messages of its unit one at a time
+(``read_pst_message``) and streams picklable records back through a
+bounded queue, ``RECORDS_PER_PUT`` at a time, to the single DB writer in
+the API process.
+
+This module imports only the standard library, pypff and the blob store
+(``attachment_store``), so spawned workers start quickly.
+"""
+import os
+import sys
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.services.attachment_store import write_blob
+
+ATTACHMENT_CHUNK_SIZE = 1024 * 1024
+
+# Messages per work unit (a folder, or a message range of a large folder)
+UNIT_MESSAGES = 2000
+
+# Records per queue item
+RECORDS_PER_PUT = 50
+
+# Set in each worker by init_worker
+_queue = None
+_open_file: Optional[Tuple[str, Any]] = None
+
+FolderPath = Tuple[int, ...]
+
+
+# ── Memory ──
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process (None where it cannot be read)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    # No /proc (macOS): the lifetime peak is the best available figure
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+# ── Folder walk ──
+
+def count_folder_messages(folder) -> int:
+    """Number of messages in a folder tree (reads folder headers only)."""
+    total = 0
+    stack = [folder]
+    while stack:
+        current = stack.pop()
+        total += current.get_number_of_sub_messages()
+        stack.extend(current.get_sub_folder(i) for i in range(current.get_number_of_sub_folders()))
+    return total
+
+
+def iter_folder_messages(folder) -> Iterator:
+    """Yield the messages of a folder and its subfolders one at a time (depth first)."""
+    for i in range(folder.get_number_of_sub_messages()):
+        yield folder.get_sub_message(i)
+
+    for i in range(folder.get_number_of_sub_folders()):
+        yield from iter_folder_messages(folder.get_sub_folder(i))
+
+
+# ── Messages ──
+
+def extract_message_id_from_headers(headers: str) -> Optional[str]:
+    """Extract Message-ID from email headers."""
+    if not headers:
+        return None
+    for line in headers.split('\n'):
+        if line.lower().startswith('message-id:'):
+            return line.split(':', 1)[1].strip()
+    return None
+
+
+def _save_attachment(attachment, attachments_dir: str) -> Optional[Tuple[str, str, int]]:
+    """Copy an attachment into the blob store in chunks; returns (hash, path, size) or None."""
+    return write_blob(attachments_dir, attachment.read_buffer, attachment.get_size(), ATTACHMENT_CHUNK_SIZE)
+
+
+def read_pst_message(message, attachments_dir: str) -> Dict[str, Any]:
+    """Read a PST message into a picklable record: an email row and its saved attachments.
+
+    Attachments are written to the blob store in ``attachments_dir`` here,
+    in the worker; the writer counts the references and deletes the blobs
+    only duplicate messages brought in.
+    """
+    # Get message ID for deduplication
+    message_id = None
+    try:
+        headers = message.get_transport_headers()
+        message_id = extract_message_id_from_headers(headers)
+    except Exception:
+        pass
+
+    # Generate a unique ID if none found
+    if not message_id:
+        message_id = f"pst-import-{uuid.uuid4()}"
+
+    subject = message.subject or ""
+
+    sender = ""
+    try:
+        sender = message.sender_name or ""
+        if message.sender_email_address:
+            sender = f"{sender} <{message.sender_email_address}>" if sender else message.sender_email_address
+    except Exception:
+        pass
+
+    recipients = ""
+    try:
+        recipient_list = []
+        for j in range(message.get_number_of_recipients()):
+            recipient = message.get_recipient(j)
+            if recipient:
+                name = recipient.name or ""
+                email_addr = recipient.email_address or ""
+                if name and email_addr:
+                    recipient_list.append(f"{name} <{email_addr}>")
+                elif email_addr:
+                    recipient_list.append(email_addr)
+                elif name:
+                    recipient_list.append(name)
+        recipients = ", ".join(recipient_list)
+    except Exception:
+        pass
+
+    body = ""
+    try:
+        body = message.plain_text_body or ""
+        if not body:
+            body = message.html_body or ""
+    except Exception:
+        pass
+
+    received_date = None
+    try:
+        received_date = message.delivery_time
+    except Exception:
+        pass
+
+    attachments = []
+    error = None
+    try:
+        for k in range(message.get_number_of_attachments()):
+            attachment = message.get_attachment(k)
+            if not attachment:
+                continue
+            filename = attachment.name or f"attachment_{k}"
+            try:
+                saved = _save_attachment(attachment, attachments_dir)
+                if saved:
+                    content_hash, file_path, file_size = saved
+                    attachments.append({
+                        "filename": filename[:500],
+                        "file_path": file_path,
+                        "file_size": file_size,
+                        "content_type": attachment.mime_type or "application/octet-stream",
+                        "content_hash": content_hash,
+                    })
+            except Exception as e:
+                error = f"Attachment error for '{filename}': {str(e)}"
+    except Exception as e:
+        error = f"Attachment processing error: {str(e)}"
+
+    return {
+        "row": {
+            "message_id": message_id,
+            "subject": subject[:1000] if subject else None,
+            "sender": sender[:500] if sender else None,
+            "recipients": recipients if recipients else None,
+            "body": body if body else None,
+            "received_date": received_date,
+            "importance": "Közepes",
+            "is_read": False,
+        },
+        "subject": subject,
+        "attachments": attachments,
+        "error": error,
+    }
+
+
+# ── Workers ──
+
+def init_worker(queue):
+    """Process pool initializer: the queue the records are sent through."""
+    global _queue
+    _queue = queue
+
+
+def _pst_file(pst_path: str):
+    """This worker's handle of the archive (opened once per worker)."""
+    global _open_file
+    if _open_file is not None and _open_file[0] == pst_path:
+        return _open_file[1]
+    if _open_file is not None:
+        _open_file[1].close()
+
+    import pypff
+    pst_file = pypff.file()
+    pst_file.open(pst_path)
+    _open_file = (pst_path, pst_file)
+    return pst_file
+
+
+def _folder_at(pst_path: str, folder_path: FolderPath):
+    folder = _pst_file(pst_path).get_root_folder()
+    for index in folder_path:
+        folder = folder.get_sub_folder(index)
+    return folder
+
+
+def plan_units(pst_path: str, unit_messages: int = UNIT_MESSAGES) -> Tuple[List[Tuple[FolderPath, int, int]], int]:
+    """Split the folder tree into (folder_path, start, end) message ranges; also returns the total.
+
+    Reads folder headers only.
+    """
+    units = []
+    total = 0
+    stack: List[FolderPath] = [()]
+    while stack:
+        folder_path = stack.pop()
+        folder = _folder_at(pst_path, folder_path)
+        count = folder.get_number_of_sub_messages()
+        total += count
+        for start in range(0, count, unit_messages):
+            units.append((folder_path, start, min(start + unit_messages, count)))
+        stack.extend(folder_path + (i,) for i in reversed(range(folder.get_number_of_sub_folders())))
+    return units, total
+
+
+def parse_unit(unit_id: int, pst_path: str, folder_path: FolderPath, start: int, end: int, attachments_dir: str):
+    """Read messages [start, end) of a folder and put their records on the queue.
+
+    Queue items: ("records", unit_id, {"records": [...], "next_index": i})
+    while reading and a final ("done", unit_id, {"errors": [...],
+    "peak_rss": bytes, "next_index": i}), which is sent even if the unit
+    fails. ``next_index`` is the first message not read yet: a resumed
+    import starts the unit there.
+    """
+    errors: List[str] = []
+    peak_rss = current_rss_bytes()
+    index = start
+    try:
+        folder = _folder_at(pst_path, folder_path)
+        records = []
+        while index < end:
+            try:
+                records.append(read_pst_message(folder.get_sub_message(index), attachments_dir))
+            except Exception as e:
+                errors.append(f"Message processing error: {str(e)}")
+            index += 1
+            if len(records) >= RECORDS_PER_PUT:
+                _queue.put(("records", unit_id, {"records": records, "next_index": index}))
+                records = []
+                peak_rss = max(peak_rss or 0, current_rss_bytes() or 0)
+        if records:
+            _queue.put(("records", unit_id, {"records": records, "next_index": index}))
+    except Exception as e:
+        errors.append(f"PST folder error: {str(e)}")
+    finally:
+        _queue.put(("done", unit_id, {"errors": errors, "peak_rss": peak_rss, "next_index": index}))
@@ -8,14 +8,22 @@ This module provides:
 """
 import os
 import re
+import glob
+import json
+import math
+import time
 import pickle
-from typing import List, Optional, Tuple, Dict, Any
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Dict, Any, Set, Callable, Awaitable
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
 
 from app.models.models import Document, DocumentChunk
 from app.services.embedding_service import (
-    generate_embedding,
     generate_embeddings_batch,
+    generate_query_embedding,
     get_embedding_settings,
 )
 from app.services.embedding_config import get_model_dimension
@@ -30,10 +38,36 @@ FAISS_INDEX_DIR = os.path.join(STORAGE_DIR, "faiss_index")
 # Ensure directories exist
 os.makedirs(FAISS_INDEX_DIR, exist_ok=True)
 
+# Progress callback of the background jobs: (done, total, message)
+ProgressCallback = Callable[[int, Optional[int], Optional[str]], Awaitable[None]]
+
 # Default settings
 MAX_TOKENS_PER_CHUNK = 500
 CHARS_PER_TOKEN_ESTIMATE = 3.5  # Rough estimate for Hungarian/English mixed text
 
+# Compact the FAISS index once this fraction of stored vectors is tombstoned
+TOMBSTONE_COMPACT_RATIO = 0.25
+
+# Write a new FAISS snapshot once the write-ahead log grows past this size
+WAL_CHECKPOINT_BYTES = 64 * 1024 * 1024
+
+# Chunk texts kept in memory next to the index (LRU, ~2 KB each)
+CHUNK_CONTENT_CACHE_SIZE = 20_000
+
+# Vector index tiers (SystemSettings.vector_index_type)
+VECTOR_INDEX_TYPES = ("flat", "ivf", "hnsw")
+DEFAULT_PROMOTE_THRESHOLD = 100_000  # live vectors before leaving the flat index
+
+# IVF: nlist ~ IVF_LISTS_PER_SQRT * sqrt(n), retrained once the corpus outgrows it
+IVF_LISTS_PER_SQRT = 4
+IVF_MIN_POINTS_PER_LIST = 39
+IVF_TRAIN_POINTS_PER_LIST = 64
+IVF_NPROBE = 32
+
+# HNSW graph parameters
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 96
 
 
 def estimate_tokens(text: str) -> int:
@@ -172,51 +206,361 @@ def chunk_text_hybrid(
 
 
 
+def make_vector_id(document_id: int, chunk_index: int) -> int:
+    """Build the stable 64-bit FAISS id of a chunk.
+
+    The document id occupies the high 32 bits and the chunk index the low
+    32 bits, so the owning document can be recovered with ``vector_id >> 32``
+    and the id survives index compaction and reloads.
+    """
+    return (int(document_id) << 32) | (int(chunk_index) & 0xFFFFFFFF)
+
+
 class FAISSIndex:
-    """FAISS index wrapper for document chunks with dimension support."""
+    """FAISS index wrapper for document chunks with dimension support.
+
+    Every vector carries a stable id (see ``make_vector_id``) stored in a
+    position -> id column next to the FAISS index. Removing a document only
+    tombstones its own positions; searches skip tombstones through an
+    ``IDSelector`` and the index is compacted once tombstones exceed
+    ``TOMBSTONE_COMPACT_RATIO`` of the stored vectors.
+
+    Persistence is a numbered snapshot generation plus an append-only
+    write-ahead log:
+
+    - ``index_{dim}.{gen}.faiss``: FAISS index
+    - ``columns_{dim}.{gen}.npy``: structured (id, deleted) column per position,
+      loadable with ``mmap_mode``
+    - ``documents_{dim}.{gen}.json``: document id -> filename
+    - ``wal_{dim}.{gen}.log``: add/remove records since the snapshot
+    - ``manifest_{dim}.json``: current generation, replaced atomically
+
+    Every change is appended to the WAL; a new generation is written once the
+    WAL exceeds ``WAL_CHECKPOINT_BYTES`` or the index is compacted.
+
+    The index starts as an exact ``IndexFlatIP``. Once ``configure`` sets an
+    approximate tier (``ivf`` or ``hnsw``) and the live vector count reaches
+    the promotion threshold, the index is rebuilt in a background thread:
+    live vectors are copied out, the new index is trained and filled without
+    holding the lock, and changes committed meanwhile are replayed onto it
+    before it is swapped in. Approximate indexes are compacted the same way.
+
+    Chunk texts are cached per vector id (LRU, ``CHUNK_CONTENT_CACHE_SIZE``)
+    so search results can be enriched without a database round-trip; an
+    entry is dropped as soon as its vector is removed or replaced.
+    """
 
     def __init__(self, dimension: int = 1024):
         self.index = None
-        self.metadata: List[Dict[str, Any]] = []  # Stores doc_id, chunk_id, etc.
         self.dimension: Optional[int] = dimension
+        self._ids = array("q")  # FAISS position -> vector id
+        self._positions: Dict[int, int] = {}  # live vector id -> FAISS position
+        self._deleted: Set[int] = set()  # tombstoned FAISS positions
+        self._doc_vectors: Dict[int, Set[int]] = {}  # document id -> live vector ids
+        self._doc_filenames: Dict[int, str] = {}
+        self._chunk_contents: "OrderedDict[int, str]" = OrderedDict()
+        self._selector = None
+        self._generation = 0
+        self._lock = threading.RLock()
+        self.index_type: Optional[str] = None  # configured tier, None = keep the loaded one
+        self.promote_threshold = DEFAULT_PROMOTE_THRESHOLD
+        self._rebuild_token = None  # identifies the running background rebuild
+        self._rebuild_backlog: Optional[List[Dict[str, Any]]] = None
+        self._rebuild_thread: Optional[threading.Thread] = None
+        self.tier_stats: Dict[str, Any] = {
+            "rebuilds": 0,
+            "last_rebuild_ms": None,
+            "last_rebuild_error": None,
+        }
+        self.cache_stats: Dict[str, int] = {"hits": 0, "misses": 0}
+        self.io_stats: Dict[str, Any] = {
+            "load_ms": 0.0,
+            "wal_records_replayed": 0,
+            "last_append_ms": None,
+            "last_checkpoint_ms": None,
+            "checkpoints": 0,
+        }
         self._load_index()
 
-    def _index_path(self) -> str:
-        """Get index file path for specific dimension."""
-        return os.path.join(FAISS_INDEX_DIR, f"index_{self.dimension}.faiss")
+    # ── File layout ──
+
+    def _path(self, kind: str, ext: str, generation: Optional[int] = None) -> str:
+        gen = self._generation if generation is None else generation
+        return os.path.join(FAISS_INDEX_DIR, f"{kind}_{self.dimension}.{gen}.{ext}")
+
+    def _manifest_path(self) -> str:
+        return os.path.join(FAISS_INDEX_DIR, f"manifest_{self.dimension}.json")
+
+    def _wal_path(self) -> str:
+        return self._path("wal", "log")
+
+    def _legacy_paths(self) -> Tuple[str, str]:
+        """Single-file index and pickled metadata used before the WAL format."""
+        return (
+            os.path.join(FAISS_INDEX_DIR, f"index_{self.dimension}.faiss"),
+            os.path.join(FAISS_INDEX_DIR, f"metadata_{self.dimension}.pkl"),
+        )
+
+    # ── In-memory state ──
 
-    def _meta_path(self) -> str:
-        """Get metadata file path for specific dimension."""
-        return os.path.join(FAISS_INDEX_DIR, f"metadata_{self.dimension}.pkl")
+    def _clear_state(self):
+        """Drop all in-memory vector bookkeeping."""
+        self._ids = array("q")
+        self._positions = {}
+        self._deleted = set()
+        self._doc_vectors = {}
+        self._doc_filenames = {}
+        self._chunk_contents = OrderedDict()
+        self._selector = None
+
+    def _restore(self, ids, deleted: Set[int], filenames: Dict[int, str]):
+        """Rebuild lookups from a position -> id column and tombstone set."""
+        import numpy as np
+
+        self._clear_state()
+        self._ids.frombytes(np.asarray(ids, dtype=np.int64).tobytes())
+        self._deleted = deleted
+        self._doc_filenames = filenames
+        for pos, vid in enumerate(self._ids):
+            if pos in deleted:
+                continue
+            if vid in self._positions:
+                # Duplicate id: the later vector wins
+                self._deleted.add(self._positions[vid])
+            self._positions[vid] = pos
+        for vid in self._positions:
+            self._doc_vectors.setdefault(vid >> 32, set()).add(vid)
+
+    def get_metadata(self, vector_id: int) -> Optional[Dict[str, Any]]:
+        """Metadata of a live vector, derived from its id."""
+        if vector_id not in self._positions:
+            return None
+        document_id, chunk_index = vector_id >> 32, vector_id & 0xFFFFFFFF
+        return {
+            "document_id": document_id,
+            "chunk_index": chunk_index,
+            "chunk_id": f"doc_{document_id}_chunk_{chunk_index}",
+            "filename": self._doc_filenames.get(document_id),
+        }
+
+    def get_chunk_contents(self, vector_ids: List[int]) -> Dict[int, str]:
+        """Cached chunk texts for the given vector ids (misses are left out)."""
+        with self._lock:
+            found = {}
+            for vid in vector_ids:
+                content = self._chunk_contents.get(vid)
+                if content is None:
+                    self.cache_stats["misses"] += 1
+                    continue
+                self._chunk_contents.move_to_end(vid)
+                found[vid] = content
+                self.cache_stats["hits"] += 1
+            return found
+
+    def cache_chunk_contents(self, contents: Dict[int, str]):
+        """Remember chunk texts of live vectors, evicting the least recently used."""
+        with self._lock:
+            for vid, content in contents.items():
+                if vid in self._positions and content is not None:
+                    self._chunk_contents[vid] = content
+                    self._chunk_contents.move_to_end(vid)
+            while len(self._chunk_contents) > CHUNK_CONTENT_CACHE_SIZE:
+                self._chunk_contents.popitem(last=False)
+
+    # ── Loading ──
 
     def _load_index(self):
-        """Load existing index from disk if available."""
-        index_file = self._index_path()
-        meta_file = self._meta_path()
-
-        if os.path.exists(index_file) and os.path.exists(meta_file):
-            try:
-                import faiss
-                self.index = faiss.read_index(index_file)
-                with open(meta_file, "rb") as f:
-                    self.metadata = pickle.load(f)
-                if self.index.ntotal > 0:
-                    self.dimension = self.index.d
-            except Exception as e:
-                print(f"Error loading FAISS index: {e}")
-                self.index = None
-                self.metadata = []
-
-    def _save_index(self):
-        """Save index to disk."""
-        if self.index is not None:
-            try:
-                import faiss
-                faiss.write_index(self.index, self._index_path())
-                with open(self._meta_path(), "wb") as f:
-                    pickle.dump(self.metadata, f)
-            except Exception as e:
-                print(f"Error saving FAISS index: {e}")
+        """Load the current snapshot and replay the write-ahead log.
+
+        Indexes saved in the single-file pickle format are migrated into a
+        first snapshot generation.
+        """
+        started = time.perf_counter()
+        try:
+            if os.path.exists(self._manifest_path()):
+                self._load_snapshot()
+            elif all(os.path.exists(p) for p in self._legacy_paths()):
+                self._load_legacy()
+                self._checkpoint()
+                for path in self._legacy_paths():
+                    os.remove(path)
+                print(f"[FAISS] Migrated legacy index ({len(self._positions)} vectors) to snapshot + WAL format")
+            self._replay_wal()
+            self._remove_stale_generations()
+        except Exception as e:
+            print(f"Error loading FAISS index: {e}")
+            self.index = None
+            self._clear_state()
+        self.io_stats["load_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    def _load_snapshot(self):
+        import numpy as np
+        import faiss
+
+        with open(self._manifest_path(), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        self._generation = manifest["generation"]
+        self._clear_state()
+        self.index = None
+
+        if manifest.get("has_index"):
+            self.index = faiss.read_index(self._path("index", "faiss"))
+            _ensure_direct_map(self.index)
+            columns = np.load(self._path("columns", "npy"), mmap_mode="r")
+            with open(self._path("documents", "json"), "r", encoding="utf-8") as f:
+                filenames = {int(k): v for k, v in json.load(f).items()}
+            self._restore(
+                columns["id"],
+                set(np.flatnonzero(columns["deleted"]).tolist()),
+                filenames,
+            )
+            if self.index.ntotal > 0:
+                self.dimension = self.index.d
+
+    def _load_legacy(self):
+        """Load the single-file index with its pickled metadata."""
+        import faiss
+
+        index_file, meta_file = self._legacy_paths()
+        self.index = faiss.read_index(index_file)
+        with open(meta_file, "rb") as f:
+            stored = pickle.load(f)
+
+        if isinstance(stored, list):
+            # Positional metadata list
+            metadata = stored
+            ids = [
+                make_vector_id(m.get("document_id", 0), m.get("chunk_index", i))
+                for i, m in enumerate(metadata)
+            ]
+            deleted = set()
+        else:
+            # Id column + metadata dict
+            ids = [int(v) for v in stored["ids"]]
+            deleted = set(stored.get("deleted", ()))
+            metadata = list(stored["metadata"].values())
+
+        filenames = {
+            m["document_id"]: m.get("filename")
+            for m in metadata if m.get("document_id") is not None
+        }
+        self._restore(ids, deleted, filenames)
+
+    def _replay_wal(self):
+        """Apply WAL records written after the snapshot; drop a torn tail."""
+        wal_path = self._wal_path()
+        if not os.path.exists(wal_path):
+            return
+
+        replayed = 0
+        good_offset = 0
+        with open(wal_path, "rb") as f:
+            while True:
+                try:
+                    record = pickle.load(f)
+                except EOFError:
+                    break
+                except Exception:
+                    print(f"[FAISS] Truncating torn WAL record at offset {good_offset}")
+                    break
+                self._apply(record)
+                replayed += 1
+                good_offset = f.tell()
+
+        if good_offset < os.path.getsize(wal_path):
+            with open(wal_path, "r+b") as f:
+                f.truncate(good_offset)
+        self.io_stats["wal_records_replayed"] = replayed
+
+    def _remove_stale_generations(self):
+        """Delete snapshot/WAL files left behind by older or aborted generations."""
+        for kind, ext in (("index", "faiss"), ("columns", "npy"), ("documents", "json"), ("wal", "log")):
+            current = self._path(kind, ext)
+            for path in glob.glob(os.path.join(FAISS_INDEX_DIR, f"{kind}_{self.dimension}.*.{ext}")):
+                if path != current:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    # ── Saving ──
+
+    def _append_wal(self, record: Dict[str, Any]):
+        """Durably append one record to the write-ahead log."""
+        started = time.perf_counter()
+        with open(self._wal_path(), "ab") as f:
+            pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        self.io_stats["last_append_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    def _checkpoint(self):
+        """Write a new snapshot generation and switch the manifest to it."""
+        import numpy as np
+        import faiss
+
+        started = time.perf_counter()
+        generation = self._generation + 1
+        has_index = self.index is not None
+
+        if has_index:
+            faiss.write_index(self.index, self._path("index", "faiss", generation))
+            columns = np.zeros(len(self._ids), dtype=[("id", "<i8"), ("deleted", "?")])
+            columns["id"] = np.frombuffer(self._ids, dtype=np.int64) if self._ids else 0
+            if self._deleted:
+                columns["deleted"][sorted(self._deleted)] = True
+            np.save(self._path("columns", "npy", generation), columns)
+            _write_json_durably(
+                self._path("documents", "json", generation),
+                {str(k): v for k, v in self._doc_filenames.items() if k in self._doc_vectors},
+            )
+            for kind, ext in (("index", "faiss"), ("columns", "npy")):
+                _fsync_file(self._path(kind, ext, generation))
+
+        # The manifest replace is the commit point of the checkpoint
+        manifest_tmp = self._manifest_path() + ".tmp"
+        _write_json_durably(manifest_tmp, {"generation": generation, "has_index": has_index})
+        os.replace(manifest_tmp, self._manifest_path())
+
+        self._generation = generation
+        self._remove_stale_generations()
+        self.io_stats["last_checkpoint_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        self.io_stats["checkpoints"] += 1
+
+    def _commit(self, record: Dict[str, Any]):
+        """Log a change, apply it, and checkpoint when needed."""
+        with self._lock:
+            self._append_wal(record)
+            if self._rebuild_backlog is not None:
+                self._rebuild_backlog.append(record)
+            compacted = self._apply(record)
+            if compacted or os.path.getsize(self._wal_path()) > WAL_CHECKPOINT_BYTES:
+                self._checkpoint()
+            self._maybe_change_tier()
+
+    def checkpoint(self):
+        """Force a snapshot of the current state (truncates the WAL)."""
+        with self._lock:
+            self._checkpoint()
+
+    # ── Changes ──
+
+    def _apply(self, record: Dict[str, Any], compact: bool = True) -> bool:
+        """Apply a WAL record to the in-memory index. Returns True if compacted."""
+        op = record["op"]
+        if op == "add":
+            self._ensure_index(record["vectors"].shape[1])
+            self._tombstone([vid for vid in record["ids"] if vid in self._positions])
+            start = self.index.ntotal
+            self.index.add(record["vectors"])
+            for offset, vid in enumerate(record["ids"]):
+                self._ids.append(vid)
+                self._positions[vid] = start + offset
+                self._doc_vectors.setdefault(vid >> 32, set()).add(vid)
+            self._doc_filenames.update(record["filenames"])
+        elif op == "remove":
+            self._tombstone(record["ids"])
+        return self._maybe_compact() if compact else False
 
     def _ensure_index(self, dimension: int):
         """Ensure index exists with correct dimension."""
@@ -225,7 +569,195 @@ class FAISSIndex:
             # Use IndexFlatIP for inner product (cosine similarity with normalized vectors)
             self.index = faiss.IndexFlatIP(dimension)
             self.dimension = dimension
-            self.metadata = []
+            self._clear_state()
+            self._cancel_rebuild()
+
+    def _tombstone(self, vector_ids: List[int]):
+        """Mark live vectors as deleted without touching the FAISS index."""
+        for vid in vector_ids:
+            pos = self._positions.pop(vid, None)
+            if pos is None:
+                continue
+            self._deleted.add(pos)
+            self._chunk_contents.pop(vid, None)
+            doc_vectors = self._doc_vectors.get(vid >> 32)
+            if doc_vectors is not None:
+                doc_vectors.discard(vid)
+                if not doc_vectors:
+                    del self._doc_vectors[vid >> 32]
+        self._selector = None
+
+    def _maybe_compact(self) -> bool:
+        """Physically drop tombstoned vectors once they exceed the threshold."""
+        import numpy as np
+        import faiss
+
+        if not self._deleted or len(self._deleted) <= TOMBSTONE_COMPACT_RATIO * self.index.ntotal:
+            return False
+
+        kind = _index_kind(self.index)
+        if kind != "flat":
+            # HNSW has no remove_ids and IVF would keep stale position labels,
+            # so approximate indexes are compacted by a background rebuild
+            self._start_rebuild(kind)
+            return False
+
+        self.index.remove_ids(faiss.IDSelectorBatch(np.array(sorted(self._deleted), dtype=np.int64)))
+        self._ids = array("q", (vid for pos, vid in enumerate(self._ids) if pos not in self._deleted))
+        self._positions = {vid: pos for pos, vid in enumerate(self._ids)}
+        self._deleted = set()
+        self._selector = None
+        return True
+
+    def _search_params(self, k: int):
+        """Search parameters for the index tier that skip tombstoned positions."""
+        import numpy as np
+        import faiss
+
+        kwargs = {}
+        if self._deleted:
+            if self._selector is None:
+                self._selector = faiss.IDSelectorNot(
+                    faiss.IDSelectorBatch(np.array(sorted(self._deleted), dtype=np.int64))
+                )
+            kwargs["sel"] = self._selector
+
+        kind = _index_kind(self.index)
+        if kind == "ivf":
+            return faiss.SearchParametersIVF(nprobe=IVF_NPROBE, **kwargs)
+        if kind == "hnsw":
+            return faiss.SearchParametersHNSW(efSearch=max(HNSW_EF_SEARCH, k), **kwargs)
+        return faiss.SearchParameters(**kwargs) if kwargs else None
+
+    # ── Index tiers ──
+
+    def configure(self, index_type: Optional[str], promote_threshold: Optional[int] = None):
+        """Set the target index tier and start a background rebuild if needed.
+
+        Args:
+            index_type: "flat", "ivf" or "hnsw"
+            promote_threshold: Live vectors needed before leaving the flat index
+        """
+        if index_type not in VECTOR_INDEX_TYPES:
+            index_type = "flat"
+        with self._lock:
+            self.index_type = index_type
+            if promote_threshold is not None:
+                self.promote_threshold = max(1, int(promote_threshold))
+            self._maybe_change_tier()
+
+    def _target_tier(self) -> Optional[str]:
+        """Index type the current state should use, or None to keep it."""
+        if self.index_type is None or self.index is None:
+            return None
+        current = _index_kind(self.index)
+        if self.index_type == "flat":
+            return "flat"
+        # Promote once the threshold is reached; never demote back on shrinkage
+        if current != "flat" or len(self._positions) >= self.promote_threshold:
+            return self.index_type
+        return "flat"
+
+    def _maybe_change_tier(self):
+        """Start a rebuild when the tier changes or the IVF lists are outgrown."""
+        import faiss
+
+        target = self._target_tier()
+        if target is None or self._rebuild_token is not None:
+            return
+        current = _index_kind(self.index)
+        if target != current:
+            self._start_rebuild(target)
+        elif current == "ivf":
+            nlist = faiss.extract_index_ivf(self.index).nlist
+            if ivf_list_count(len(self._positions)) >= 2 * nlist:
+                self._start_rebuild("ivf")
+
+    def _start_rebuild(self, index_type: str):
+        """Copy the live vectors and build an ``index_type`` index from them in the background."""
+        import numpy as np
+
+        if self._rebuild_token is not None:
+            return
+
+        positions = np.array(sorted(self._positions.values()), dtype=np.int64)
+        ids = [self._ids[pos] for pos in positions]
+        if len(positions):
+            vectors = self.index.reconstruct_n(0, self.index.ntotal)[positions]
+        else:
+            vectors = np.zeros((0, self.dimension), dtype=np.float32)
+
+        token = object()
+        self._rebuild_token = token
+        self._rebuild_backlog = []
+        self._rebuild_thread = threading.Thread(
+            target=self._run_rebuild,
+            args=(token, index_type, vectors, ids),
+            name=f"faiss-rebuild-{self.dimension}",
+            daemon=True,
+        )
+        self._rebuild_thread.start()
+
+    def _run_rebuild(self, token, index_type: str, vectors, ids: List[int]):
+        """Train and fill the new index, then swap it in and replay the backlog."""
+        started = time.perf_counter()
+        try:
+            index = build_vector_index(index_type, vectors)
+        except Exception as e:
+            print(f"[FAISS] Index rebuild ({index_type}) failed: {e}")
+            with self._lock:
+                self.tier_stats["last_rebuild_error"] = str(e)
+                if self._rebuild_token is token:
+                    self._rebuild_token = None
+                    self._rebuild_backlog = None
+            return
+
+        with self._lock:
+            if self._rebuild_token is not token:
+                return  # Reset or dimension change while building
+            backlog = self._rebuild_backlog
+            self._rebuild_token = None
+            self._rebuild_backlog = None
+
+            self.index = index
+            contents = self._chunk_contents
+            self._restore(ids, set(), dict(self._doc_filenames))
+            for record in backlog:
+                self._apply(record, compact=False)
+            self._chunk_contents = OrderedDict(
+                (vid, content) for vid, content in contents.items() if vid in self._positions
+            )
+            self._maybe_compact()
+            self._checkpoint()
+
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+            self.tier_stats["rebuilds"] += 1
+            self.tier_stats["last_rebuild_ms"] = elapsed_ms
+            self.tier_stats["last_rebuild_error"] = None
+            print(
+                f"[FAISS] Rebuilt {_index_kind(index)} index with {len(self._positions)} vectors "
+                f"in {elapsed_ms} ms ({len(backlog)} changes replayed)"
+            )
+            self._maybe_change_tier()
+
+    def _cancel_rebuild(self):
+        """Discard the result of a running rebuild."""
+        self._rebuild_token = None
+        self._rebuild_backlog = None
+
+    def wait_for_rebuild(self, timeout: Optional[float] = None) -> bool:
+        """Block until background rebuilds finish. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            thread = self._rebuild_thread
+            if thread is None or not thread.is_alive():
+                if self._rebuild_thread is thread:
+                    return True
+                continue
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            thread.join(remaining)
+            if thread.is_alive():
+                return False
 
     def add_embeddings(
         self,
@@ -234,6 +766,10 @@ class FAISSIndex:
     ):
         """Add embeddings to the index.
 
+        Chunks whose (document_id, chunk_index) id is already present are
+        replaced instead of duplicated. A ``content`` key in the metadata
+        seeds the chunk text cache.
+
         Args:
             embeddings: List of embedding vectors
             metadata_list: List of metadata dicts (must match embeddings length)
@@ -250,52 +786,29 @@ class FAISSIndex:
         # Normalize vectors for cosine similarity
         faiss.normalize_L2(vectors)
 
-        # Ensure index exists with correct dimension
-        self._ensure_index(vectors.shape[1])
-
-        # Add to index
-        self.index.add(vectors)
-        self.metadata.extend(metadata_list)
-
-        # Save to disk
-        self._save_index()
+        ids = [
+            make_vector_id(m["document_id"], m.get("chunk_index", i))
+            for i, m in enumerate(metadata_list)
+        ]
+        self._commit({
+            "op": "add",
+            "ids": ids,
+            "vectors": vectors,
+            "filenames": {m["document_id"]: m["filename"] for m in metadata_list if m.get("filename")},
+        })
+        self.cache_chunk_contents({vid: m.get("content") for vid, m in zip(ids, metadata_list)})
 
     def remove_document(self, document_id: int):
         """Remove all chunks for a document from the index."""
-        import numpy as np
-        import faiss
-
-        if self.index is None or self.index.ntotal == 0:
-            return
-
-        # Find indices to keep
-        indices_to_keep = [
-            i for i, m in enumerate(self.metadata)
-            if m.get("document_id") != document_id
-        ]
-
-        if len(indices_to_keep) == len(self.metadata):
-            return  # Nothing to remove
-
-        if not indices_to_keep:
-            # Remove all - reset index
-            self.index = None
-            self.metadata = []
-            self._save_index()
-            return
-
-        # Reconstruct vectors for kept indices
-        vectors = np.zeros((len(indices_to_keep), self.dimension), dtype=np.float32)
-        for new_idx, old_idx in enumerate(indices_to_keep):
-            vectors[new_idx] = self.index.reconstruct(old_idx)
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                return
 
-        # Rebuild index
-        new_index = faiss.IndexFlatIP(self.dimension)
-        new_index.add(vectors)
+            vector_ids = self._doc_vectors.get(document_id)
+            if not vector_ids:
+                return  # Nothing to remove
 
-        self.index = new_index
-        self.metadata = [self.metadata[i] for i in indices_to_keep]
-        self._save_index()
+            self._commit({"op": "remove", "ids": sorted(vector_ids)})
 
     def search(
         self,
@@ -306,39 +819,142 @@ class FAISSIndex:
         import numpy as np
         import faiss
 
-        if self.index is None or self.index.ntotal == 0:
-            return []
-
         # Convert and normalize query
         query = np.array([query_embedding], dtype=np.float32)
         faiss.normalize_L2(query)
 
-        # Search
-        k = min(k, self.index.ntotal)
-        scores, indices = self.index.search(query, k)
+        with self._lock:
+            if self.index is None or not self._positions:
+                return []
 
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx >= 0 and idx < len(self.metadata):
-                results.append((self.metadata[idx], float(score)))
+            # Search
+            k = min(k, len(self._positions))
+            scores, positions = self.index.search(query, k, params=self._search_params(k))
+
+            results = []
+            for score, pos in zip(scores[0], positions[0]):
+                if pos < 0 or pos in self._deleted:
+                    continue
+                meta = self.get_metadata(self._ids[pos])
+                if meta is not None:
+                    results.append((meta, float(score)))
 
         return results
 
     def get_stats(self) -> Dict[str, Any]:
         """Get index statistics."""
-        return {
-            "total_vectors": self.index.ntotal if self.index else 0,
-            "dimension": self.dimension,
-            "documents_indexed": len(set(
-                m.get("document_id") for m in self.metadata
-            )) if self.metadata else 0,
-        }
+        with self._lock:
+            wal_path = self._wal_path()
+            return {
+                "total_vectors": len(self._positions),
+                "deleted_vectors": len(self._deleted),
+                "dimension": self.dimension,
+                "documents_indexed": len(self._doc_vectors),
+                "index_type": _index_kind(self.index) if self.index is not None else None,
+                "chunk_cache": {
+                    **self.cache_stats,
+                    "entries": len(self._chunk_contents),
+                    "capacity": CHUNK_CONTENT_CACHE_SIZE,
+                },
+                "index_tier": {
+                    **self.tier_stats,
+                    "configured_type": self.index_type,
+                    "promote_threshold": self.promote_threshold,
+                    "rebuilding": self._rebuild_token is not None,
+                },
+                "persistence": {
+                    **self.io_stats,
+                    "generation": self._generation,
+                    "wal_bytes": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+                },
+            }
 
     def reset(self):
         """Reset the index completely (for reindexing with new dimension)."""
-        self.index = None
-        self.metadata = []
-        self._save_index()
+        with self._lock:
+            self._cancel_rebuild()
+            self.index = None
+            self._clear_state()
+            self._checkpoint()
+
+
+def _index_kind(index) -> str:
+    """Tier of a FAISS index: "flat", "ivf" or "hnsw"."""
+    import faiss
+
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if faiss.try_extract_index_ivf(index) is not None:
+        return "ivf"
+    return "flat"
+
+
+def _ensure_direct_map(index):
+    """IVF indexes need a direct map so live vectors can be copied out for rebuilds."""
+    import faiss
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+
+
+def ivf_list_count(n_vectors: int) -> int:
+    """Number of IVF lists for a corpus of ``n_vectors``."""
+    by_size = int(IVF_LISTS_PER_SQRT * math.sqrt(max(n_vectors, 1)))
+    return max(1, min(by_size, n_vectors // IVF_MIN_POINTS_PER_LIST))
+
+
+def build_vector_index(index_type: str, vectors):
+    """Build a FAISS inner-product index of the given tier over normalized vectors.
+
+    IVF indexes are trained on a sample of the vectors; an empty corpus
+    always yields a flat index.
+
+    Args:
+        index_type: "flat", "ivf" or "hnsw"
+        vectors: float32 array of shape (n, dimension)
+
+    Returns:
+        The filled FAISS index
+    """
+    import numpy as np
+    import faiss
+
+    n_vectors, dimension = vectors.shape
+    if n_vectors == 0:
+        index_type = "flat"
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif index_type == "ivf":
+        nlist = ivf_list_count(n_vectors)
+        index = faiss.index_factory(dimension, f"IVF{nlist},Flat", faiss.METRIC_INNER_PRODUCT)
+        train_size = nlist * IVF_TRAIN_POINTS_PER_LIST
+        if n_vectors > train_size:
+            sample = np.random.default_rng(0).choice(n_vectors, train_size, replace=False)
+            index.train(vectors[np.sort(sample)])
+        else:
+            index.train(vectors)
+        _ensure_direct_map(index)
+    else:
+        index = faiss.IndexFlatIP(dimension)
+
+    if n_vectors:
+        index.add(vectors)
+    return index
+
+
+def _fsync_file(path: str):
+    with open(path, "rb+") as f:
+        os.fsync(f.fileno())
+
+
+def _write_json_durably(path: str, data: Any):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
 
 
 # Global index instances (per dimension)
@@ -356,6 +972,7 @@ def get_faiss_index(dimension: int = 1024) -> FAISSIndex:
 async def index_document(
     document: Document,
     db: Session,
+    progress: Optional[ProgressCallback] = None,
 ) -> Tuple[int, Optional[str]]:
     """Index a document for RAG.
 
@@ -368,18 +985,25 @@ async def index_document(
     Args:
         document: Document model instance
         db: Database session
+        progress: Optional callback reported before each step (may raise
+            to stop; the document is then left partially indexed)
 
     Returns:
         Tuple of (chunks_created, error_message)
     """
-    from app.routers.documents import extract_document_content
+    from app.services.text_store import get_document_text_async
+
+    async def report(step: int, message: str):
+        if progress is not None:
+            await progress(step, 4, message)
 
     # Get unified embedding settings
     settings = get_embedding_settings(db)
     dimension = settings["dimension"]
 
     # Extract text
-    text_content, _ = extract_document_content(document.file_path, document.file_type)
+    await report(0, "Szöveg kinyerése")
+    text_content, _ = await get_document_text_async(document, db)
 
     if not text_content or text_content.startswith("[Hiba"):
         return 0, f"Nem sikerült kinyerni a szöveget: {text_content}"
@@ -393,13 +1017,16 @@ async def index_document(
         dim_index.remove_document(document.id)
 
     # Chunk the text
+    await report(1, "Darabolás")
     chunks = chunk_text_hybrid(text_content)
 
     if not chunks:
         return 0, "A dokumentum nem tartalmaz feldolgozható szöveget."
 
     # Generate embeddings using unified service
+    await report(2, f"Embedding generálása ({len(chunks)} chunk)")
     embeddings = await generate_embeddings_batch(chunks, db)
+    await report(3, "Mentés az indexbe")
 
     # Store chunks and add to index
     valid_embeddings = []
@@ -422,6 +1049,7 @@ async def index_document(
                 "chunk_index": idx,
                 "chunk_id": chunk.embedding_id,
                 "filename": document.original_filename,
+                "content": chunk_text,
             })
 
     db.commit()
@@ -429,6 +1057,7 @@ async def index_document(
     # Add to FAISS index with correct dimension
     if valid_embeddings:
         faiss_index = get_faiss_index(dimension=dimension)
+        faiss_index.configure(settings["index_type"], settings["index_promote_threshold"])
         faiss_index.add_embeddings(valid_embeddings, valid_metadata)
 
     failed_count = len(chunks) - len(valid_embeddings)
@@ -450,9 +1079,23 @@ async def remove_document_from_index(document_id: int, db: Session):
     db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).delete()
     db.commit()
 
-    # Remove from FAISS index
-    faiss_index = get_faiss_index()
-    faiss_index.remove_document(document_id)
+    remove_document_vectors(document_id, db)
+
+
+def remove_document_vectors(document_id: int, db: Session):
+    """Remove a document's vectors (and cached chunk texts) from the FAISS index.
+
+    Args:
+        document_id: ID of the document to remove
+        db: Database session (for the active embedding settings)
+    """
+    # Active dimension and any loaded variants
+    settings = get_embedding_settings(db)
+    get_faiss_index(dimension=settings["dimension"]).configure(
+        settings["index_type"], settings["index_promote_threshold"]
+    )
+    for dim_index in _faiss_instances.values():
+        dim_index.remove_document(document_id)
 
 
 async def search_similar_chunks(
@@ -474,8 +1117,8 @@ async def search_similar_chunks(
     settings = get_embedding_settings(db)
     dimension = settings["dimension"]
 
-    # Generate query embedding using unified service
-    query_embedding = await generate_embedding(query, db)
+    # Generate query embedding (cached for repeated questions)
+    query_embedding = await generate_query_embedding(query, db)
 
     if not query_embedding:
         return []
@@ -483,50 +1126,84 @@ async def search_similar_chunks(
     # Search in FAISS index with correct dimension
     faiss_index = get_faiss_index(dimension=dimension)
     results = faiss_index.search(query_embedding, k)
+    if not results:
+        return []
 
-    # Enrich with chunk content from database
+    # Chunk texts come from the index-side cache; misses are fetched in one
+    # joined query keyed on (document_id, chunk_index)
+    keys = [(meta["document_id"], meta["chunk_index"]) for meta, _ in results]
+    contents = faiss_index.get_chunk_contents([make_vector_id(*key) for key in keys])
+    filenames = {}
+    missing = [
+        key for (meta, _), key in zip(results, keys)
+        if make_vector_id(*key) not in contents or not meta.get("filename")
+    ]
+    if missing:
+        rows = db.query(
+            DocumentChunk.document_id,
+            DocumentChunk.chunk_index,
+            DocumentChunk.content,
+            Document.original_filename,
+        ).outerjoin(
+            Document, Document.id == DocumentChunk.document_id
+        ).filter(
+            tuple_(DocumentChunk.document_id, DocumentChunk.chunk_index).in_(missing)
+        ).all()
+
+        fetched = {}
+        for doc_id, chunk_index, content, filename in rows:
+            fetched[make_vector_id(doc_id, chunk_index)] = content
+            filenames[doc_id] = filename
+        faiss_index.cache_chunk_contents(fetched)
+        contents.update(fetched)
+
+    # Hits without a stored chunk (e.g. deleted meanwhile) are skipped
     enriched_results = []
-    for metadata, score in results:
-        doc_id = metadata.get("document_id")
-        chunk_index = metadata.get("chunk_index")
-
-        # Get chunk from database
-        chunk = db.query(DocumentChunk).filter(
-            DocumentChunk.document_id == doc_id,
-            DocumentChunk.chunk_index == chunk_index,
-        ).first()
-
-        if chunk:
-            # Get document info
-            document = db.query(Document).filter(Document.id == doc_id).first()
-
-            enriched_results.append({
-                "document_id": doc_id,
-                "document_filename": document.original_filename if document else "Unknown",
-                "chunk_index": chunk_index,
-                "content": chunk.content,
-                "score": score,
-            })
+    for (metadata, score), (doc_id, chunk_index) in zip(results, keys):
+        content = contents.get(make_vector_id(doc_id, chunk_index))
+        if content is None:
+            continue
+        enriched_results.append({
+            "document_id": doc_id,
+            "document_filename": metadata.get("filename") or filenames.get(doc_id) or "Unknown",
+            "chunk_index": chunk_index,
+            "content": content,
+            "score": score,
+        })
 
     return enriched_results
 
 
-async def reindex_all_knowledge_documents(db: Session) -> Dict[str, Any]:
+async def reindex_all_knowledge_documents(
+    db: Session,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
     """Reindex all documents marked as knowledge base.
 
+    Args:
+        db: Database session
+        progress: Optional callback reported before each document (may
+            raise to stop between documents)
+
     Returns:
-        Statistics about the reindexing operation
+        Statistics about the reindexing operation, including throughput
+        (chunks per second)
     """
     documents = db.query(Document).filter(Document.is_knowledge == True).all()
 
     total = len(documents)
     success = 0
     failed = 0
+    total_chunks = 0
     errors = []
+    started = time.perf_counter()
 
-    for doc in documents:
+    for position, doc in enumerate(documents):
+        if progress is not None:
+            await progress(position, total, doc.original_filename)
         try:
             chunks, error = await index_document(doc, db)
+            total_chunks += chunks
             if error:
                 errors.append(f"{doc.original_filename}: {error}")
                 failed += 1
@@ -536,10 +1213,15 @@ async def reindex_all_knowledge_documents(db: Session) -> Dict[str, Any]:
             errors.append(f"{doc.original_filename}: {str(e)}")
             failed += 1
 
+    duration = time.perf_counter() - started
+
     return {
         "total_documents": total,
         "successful": success,
         "failed": failed,
+        "total_chunks": total_chunks,
+        "duration_seconds": round(duration, 2),
+        "chunks_per_second": round(total_chunks / duration, 2) if duration > 0 else 0.0,
         "errors": errors[:10],  # Limit error list
     }
 
@@ -550,6 +1232,10 @@ def get_index_stats(db: Session) -> Dict[str, Any]:
     Returns:
         Dictionary with index statistics
     """
+    from app.services.embedding_cache import get_cache_stats
+    from app.services.fulltext_index import get_stats as get_fulltext_stats
+    from app.services.text_store import get_store_stats
+
     faiss_index = get_faiss_index()
     faiss_stats = faiss_index.get_stats()
 
@@ -561,4 +1247,7 @@ def get_index_stats(db: Session) -> Dict[str, Any]:
         **faiss_stats,
         "total_chunks_in_db": total_chunks,
         "knowledge_base_documents": knowledge_docs,
+        "embedding_cache": get_cache_stats(db),
+        "text_store": get_store_stats(),
+        "fulltext_index": get_fulltext_stats(),
     }
@@ -2,6 +2,7 @@
 
 Runs monthly task generation on the 1st of each month at 00:01.
 Runs audit log cleanup daily at 02:00.
+Runs the orphaned attachment blob sweep daily at 03:00.
 """
 from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -116,6 +117,25 @@ def cleanup_audit_logs_job():
         db.close()
 
 
+def sweep_attachment_blobs_job():
+    """Delete email attachment blobs no attachment references.
+
+    This job runs daily at 03:00 (see ``pst_import.sweep_orphan_blobs``
+    for the grace period that keeps it clear of running imports).
+    """
+    from app.services.pst_import import sweep_orphan_blobs
+
+    db: Session = SessionLocal()
+    try:
+        deleted_count = sweep_orphan_blobs(db)
+        print(f"[Scheduler] Removed {deleted_count} orphaned attachment blobs")
+    except Exception as e:
+        print(f"[Scheduler] Error sweeping attachment blobs: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
 # Create scheduler instance
 scheduler = BackgroundScheduler()
 
@@ -140,9 +160,19 @@ def init_scheduler():
         replace_existing=True,
     )
 
+    # Add job: run daily at 03:00 for the attachment blob sweep
+    scheduler.add_job(
+        sweep_attachment_blobs_job,
+        trigger=CronTrigger(hour=3, minute=0),
+        id="attachment_blob_sweep",
+        name="Remove orphaned attachment blobs",
+        replace_existing=True,
+    )
+
     scheduler.start()
     print("[Scheduler] Started - Monthly task generation scheduled for 1st of each month at 00:01")
     print("[Scheduler] Started - Audit log cleanup scheduled daily at 02:00")
+    print("[Scheduler] Started - Attachment blob sweep scheduled daily at 03:00")
 
 
 def shutdown_scheduler():
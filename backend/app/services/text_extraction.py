@@ -0,0 +1,313 @@
+"""Text extraction from uploaded documents (PDF, DOCX, XLSX, TXT).
+
+Parsing PDF/DOCX/XLSX is CPU-bound, so ``extract_document_content`` runs
+it in a pool of worker processes instead of the API process:
+
+- every file has a deadline (``EXTRACTION_TIMEOUT_SECONDS``); a stuck
+  extraction is stopped by killing the pool's workers,
+- every worker has an address-space cap (``EXTRACTION_MEMORY_LIMIT_MB``),
+  so a pathological file fails with an error instead of exhausting the
+  server's memory,
+- PDFs with more than ``PDF_PAGES_PER_TASK`` pages are split into page
+  ranges that are extracted in parallel.
+
+Failures are returned as "[Hiba ...]" strings, like the extractors always
+did. Async code should call ``extract_document_content_async`` so the
+event loop is not blocked while waiting for the workers.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+# Bump when an extractor's output changes: stored texts of older versions are ignored
+EXTRACTOR_VERSION = 1
+
+# Page range size of a parallel PDF task; smaller PDFs are one task
+PDF_PAGES_PER_TASK = 25
+
+# File types parsed in the worker processes (TXT is a plain read)
+POOLED_TYPES = ("pdf", "docx", "xlsx")
+
+MEMORY_LIMIT_ERROR = "[Hiba: a fájl feldolgozása túllépte a memóriakorlátot]"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_generation = 0
+_pool_lock = threading.Lock()
+
+
+class ExtractionTimeout(Exception):
+    """The extraction did not finish before its deadline."""
+
+
+# ══════════════════════════════════════════
+# Extractors (run inside the worker processes)
+# ══════════════════════════════════════════
+
+def extract_pdf_pages(
+    file_path: str,
+    start: int = 0,
+    end: Optional[int] = None,
+    split_above: Optional[int] = None,
+) -> Tuple[Optional[str], int]:
+    """Extract the text of pages [start, end) of a PDF.
+
+    Returns (text, page_count). If ``split_above`` is given and the PDF has
+    more pages than that, nothing is extracted and text is None, so the
+    caller can fan the page ranges out to several workers.
+    """
+    try:
+        from PyPDF2 import PdfReader
+        reader = PdfReader(file_path)
+        page_count = len(reader.pages)
+        if split_above is not None and page_count > split_above:
+            return None, page_count
+
+        end = page_count if end is None else min(end, page_count)
+        text_parts = []
+        for page_number in range(start, end):
+            text = reader.pages[page_number].extract_text()
+            if text:
+                text_parts.append(text)
+        return "\n\n".join(text_parts), page_count
+    except MemoryError:
+        raise
+    except Exception as e:
+        return f"[Hiba a PDF olvasásakor: {str(e)}]", 0
+
+
+def extract_text_from_pdf(file_path: str) -> str:
+    """Extract text content from a PDF file."""
+    return extract_pdf_pages(file_path)[0]
+
+
+def extract_text_from_docx(file_path: str) -> str:
+    """Extract text content from a DOCX file."""
+    try:
+        from docx import Document as DocxDocument
+        doc = DocxDocument(file_path)
+        paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
+        return "\n\n".join(paragraphs)
+    except MemoryError:
+        raise
+    except Exception as e:
+        return f"[Hiba a DOCX olvasásakor: {str(e)}]"
+
+
+def extract_text_from_xlsx(file_path: str) -> tuple:
+    """Extract content from an XLSX file as both text and table data."""
+    try:
+        from openpyxl import load_workbook
+        wb = load_workbook(file_path, data_only=True)
+
+        text_parts = []
+        all_table_data = []
+
+        for sheet_name in wb.sheetnames:
+            sheet = wb[sheet_name]
+            text_parts.append(f"--- Munkalap: {sheet_name} ---")
+
+            sheet_data = []
+            for row in sheet.iter_rows(values_only=True):
+                row_values = [str(cell) if cell is not None else "" for cell in row]
+                if any(v.strip() for v in row_values):
+                    sheet_data.append(row_values)
+                    text_parts.append("\t".join(row_values))
+
+            if sheet_data:
+                all_table_data.extend(sheet_data)
+
+        return "\n".join(text_parts), all_table_data
+    except MemoryError:
+        raise
+    except Exception as e:
+        return f"[Hiba az XLSX olvasásakor: {str(e)}]", None
+
+
+def extract_text_from_txt(file_path: str) -> str:
+    """Read text content from a TXT file."""
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except UnicodeDecodeError:
+        try:
+            with open(file_path, "r", encoding="latin-1") as f:
+                return f.read()
+        except Exception as e:
+            return f"[Hiba a TXT olvasásakor: {str(e)}]"
+    except Exception as e:
+        return f"[Hiba a TXT olvasásakor: {str(e)}]"
+
+
+def _extract_in_worker(file_path: str, file_type: str) -> tuple:
+    try:
+        if file_type == "docx":
+            return extract_text_from_docx(file_path), None
+        if file_type == "xlsx":
+            return extract_text_from_xlsx(file_path)
+        return None, None
+    except MemoryError:
+        return MEMORY_LIMIT_ERROR, None
+
+
+def _extract_pdf_range_in_worker(file_path: str, start: int, end: Optional[int], split_above: Optional[int]):
+    try:
+        return extract_pdf_pages(file_path, start, end, split_above)
+    except MemoryError:
+        return MEMORY_LIMIT_ERROR, 0
+
+
+def _init_worker(memory_limit_mb: int):
+    if memory_limit_mb <= 0:
+        return
+    try:
+        import resource
+    except ImportError:
+        return  # Windows: no per-process address-space limit
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+# ══════════════════════════════════════════
+# Process pool
+# ══════════════════════════════════════════
+
+def _get_pool() -> Tuple[ProcessPoolExecutor, int]:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, settings.EXTRACTION_WORKERS),
+                # spawn: never fork the API process (event loop, DB connections)
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(settings.EXTRACTION_MEMORY_LIMIT_MB,),
+            )
+        return _pool, _pool_generation
+
+
+def _reset_pool(generation: int):
+    """Kill the workers of a pool generation; the next call starts a fresh pool.
+
+    A running task cannot be interrupted otherwise. Tasks of other callers
+    on the same pool fail with BrokenProcessPool and are resubmitted.
+    """
+    global _pool, _pool_generation
+    with _pool_lock:
+        if _pool is None or generation != _pool_generation:
+            return  # already reset by another caller
+        pool = _pool
+        _pool = None
+        _pool_generation += 1
+
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_tasks(tasks: Sequence[Tuple[Callable, tuple]], deadline: float) -> list:
+    """Run tasks in the pool and return their results in order.
+
+    Raises ExtractionTimeout at the deadline and BrokenProcessPool if a
+    worker died (e.g. killed by the OS).
+    """
+    for attempt in range(2):
+        pool, generation = _get_pool()
+        futures = [pool.submit(fn, *args) for fn, args in tasks]
+        try:
+            return [
+                future.result(timeout=max(0.0, deadline - time.monotonic()))
+                for future in futures
+            ]
+        except FuturesTimeoutError:
+            _reset_pool(generation)
+            raise ExtractionTimeout()
+        except BrokenProcessPool:
+            with _pool_lock:
+                collateral = generation != _pool_generation
+            if collateral and attempt == 0:
+                continue  # another caller's timeout killed our workers
+            _reset_pool(generation)
+            raise
+
+
+def _extract_pdf(file_path: str, deadline: float) -> str:
+    # One task for small PDFs; it reports the page count of large ones
+    text, page_count = _run_tasks(
+        [(_extract_pdf_range_in_worker, (file_path, 0, None, PDF_PAGES_PER_TASK))], deadline
+    )[0]
+    if text is not None:
+        return text
+
+    ranges = [
+        (_extract_pdf_range_in_worker, (file_path, start, start + PDF_PAGES_PER_TASK, None))
+        for start in range(0, page_count, PDF_PAGES_PER_TASK)
+    ]
+    parts = [part for part, _ in _run_tasks(ranges, deadline)]
+    for part in parts:
+        if part.startswith("[Hiba"):
+            return part
+    return "\n\n".join(part for part in parts if part)
+
+
+def shutdown_extraction_pool():
+    """Stop the worker processes (FastAPI shutdown)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ══════════════════════════════════════════
+# Public API
+# ══════════════════════════════════════════
+
+def extract_document_content(file_path: str, file_type: str, timeout: Optional[float] = None) -> tuple:
+    """Extract content from a document based on its type.
+
+    Returns (text_content, table_data) where table_data is only set for XLSX files.
+    Blocks the calling thread until the worker processes are done.
+    """
+    if not file_path or not os.path.exists(file_path):
+        return None, None
+
+    file_type = file_type.lower() if file_type else ""
+
+    if file_type == "txt":
+        return extract_text_from_txt(file_path), None
+    if file_type not in POOLED_TYPES:
+        return None, None
+
+    timeout = timeout or settings.EXTRACTION_TIMEOUT_SECONDS
+    deadline = time.monotonic() + timeout
+    try:
+        if file_type == "pdf":
+            return _extract_pdf(file_path, deadline), None
+        return _run_tasks([(_extract_in_worker, (file_path, file_type))], deadline)[0]
+    except ExtractionTimeout:
+        return f"[Hiba: a szöveg kinyerése túllépte az időkorlátot ({timeout:.0f} mp)]", None
+    except BrokenProcessPool:
+        return "[Hiba: a szövegkinyerő folyamat váratlanul leállt]", None
+
+
+async def extract_document_content_async(
+    file_path: str, file_type: str, timeout: Optional[float] = None
+) -> tuple:
+    """``extract_document_content`` for async code: waits in a thread, not on the event loop."""
+    return await asyncio.to_thread(extract_document_content, file_path, file_type, timeout)
+
+
+def extract_many(items: Sequence[Tuple[str, str]]) -> List[tuple]:
+    """Extract several documents concurrently; results are in input order."""
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, settings.EXTRACTION_WORKERS)) as threads:
+        return list(threads.map(lambda item: extract_document_content(*item), items))
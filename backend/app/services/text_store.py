@@ -0,0 +1,224 @@
+"""Persistent store of extracted document text.
+
+Extraction results (text and, for XLSX, table_data) are saved as JSON
+files under ``EXTRACTED_TEXT_DIR``. Each entry is keyed by the SHA-256 of
+the file content and the extractor version
+(``<hash[:2]>/<hash>.v<EXTRACTOR_VERSION>.json``), so identical files
+share an entry and an extractor change never serves outdated text.
+
+``upload_document`` fills the store once. Preview, content search,
+summarize, RAG indexing and the quick-guide generator read from it and
+only extract again on a miss. Extraction errors are not stored.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import Document
+from app.services.text_extraction import (
+    EXTRACTOR_VERSION,
+    extract_document_content,
+    extract_many,
+)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Process-level counters
+_stats = {"hits": 0, "misses": 0, "stored": 0, "invalidated": 0}
+
+
+# ── Keys ──
+
+def content_hash(data: bytes) -> str:
+    """SHA-256 (hex) of file content already in memory."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(file_path: str) -> Optional[str]:
+    """SHA-256 (hex) of a file on disk, read in chunks (None if unreadable)."""
+    digest = hashlib.sha256()
+    try:
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(settings.EXTRACTED_TEXT_DIR, key[:2], f"{key}.v{EXTRACTOR_VERSION}.json")
+
+
+# ── Read / write ──
+
+def load_text(key: str) -> Optional[Tuple[Optional[str], Optional[list]]]:
+    """Stored (text, table_data) for a content hash, or None on a miss."""
+    try:
+        with open(_entry_path(key), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return entry.get("text"), entry.get("table_data")
+
+
+def save_text(key: str, file_type: str, text: Optional[str], table_data: Optional[list]) -> bool:
+    """Store an extraction result; errors and empty results are skipped."""
+    if text is None or text.startswith("[Hiba"):
+        return False
+
+    path = _entry_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temp file and rename: readers never see a partial entry
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"file_type": file_type, "text": text, "table_data": table_data}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[TextStore] Írási hiba: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+    _stats["stored"] += 1
+    return True
+
+
+def invalidate(key: Optional[str]):
+    """Drop the stored text of a content hash (every extractor version)."""
+    if not key:
+        return
+    directory = os.path.join(settings.EXTRACTED_TEXT_DIR, key[:2])
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.startswith(f"{key}.v"):
+            try:
+                os.remove(os.path.join(directory, name))
+                _stats["invalidated"] += 1
+            except OSError:
+                pass
+
+
+def invalidate_unused(db: Session, key: Optional[str], exclude_id: Optional[int] = None):
+    """Drop the stored text of a hash unless a current document still has that content.
+
+    Called when a file is replaced by a new version or deleted; archived
+    versions are not previewed or searched, so they do not keep an entry.
+    """
+    if not key:
+        return
+    query = db.query(Document.id).filter(
+        Document.content_hash == key,
+        Document.parent_id.is_(None),
+    )
+    if exclude_id is not None:
+        query = query.filter(Document.id != exclude_id)
+    if query.first() is None:
+        invalidate(key)
+
+
+# ── Document text ──
+
+def _ensure_hash(document: Document, db: Optional[Session]) -> Optional[str]:
+    # Documents uploaded before the store existed get their hash on first use
+    if not document.content_hash:
+        key = file_hash(document.file_path) if document.file_path else None
+        if key is None:
+            return None
+        document.content_hash = key
+        if db is not None:
+            db.commit()
+    return document.content_hash
+
+
+def _load_or_extract(key: Optional[str], file_path: str, file_type: Optional[str]) -> tuple:
+    if key is not None:
+        cached = load_text(key)
+        if cached is not None:
+            _stats["hits"] += 1
+            return cached
+
+    _stats["misses"] += 1
+    text, table_data = extract_document_content(file_path, file_type)
+    if key is not None:
+        save_text(key, (file_type or "").lower(), text, table_data)
+    return text, table_data
+
+
+def get_document_text(document: Document, db: Optional[Session] = None) -> tuple:
+    """(text, table_data) of a document: from the store, else extracted and stored."""
+    if not document.file_path or not os.path.exists(document.file_path):
+        return None, None
+
+    key = _ensure_hash(document, db)
+    return _load_or_extract(key, document.file_path, document.file_type)
+
+
+async def get_document_text_async(document: Document, db: Optional[Session] = None) -> tuple:
+    """``get_document_text`` for async code: hashing, reading and extraction run off the event loop."""
+    if not document.file_path or not os.path.exists(document.file_path):
+        return None, None
+
+    key = await asyncio.to_thread(_ensure_hash, document, None)
+    if db is not None and db.is_modified(document):
+        db.commit()
+    return await asyncio.to_thread(_load_or_extract, key, document.file_path, document.file_type)
+
+
+def get_document_texts(documents: Sequence[Document], db: Optional[Session] = None) -> List[tuple]:
+    """(text, table_data) for several documents; misses are extracted concurrently."""
+    results: List[Optional[tuple]] = [None] * len(documents)
+    missing: Dict[int, Optional[str]] = {}
+
+    for position, document in enumerate(documents):
+        if not document.file_path or not os.path.exists(document.file_path):
+            results[position] = (None, None)
+            continue
+        key = _ensure_hash(document, None)
+        cached = load_text(key) if key is not None else None
+        if cached is not None:
+            _stats["hits"] += 1
+            results[position] = cached
+        else:
+            missing[position] = key
+
+    if db is not None and db.dirty:
+        db.commit()
+
+    if missing:
+        _stats["misses"] += len(missing)
+        positions = list(missing)
+        extracted = extract_many([(documents[p].file_path, documents[p].file_type) for p in positions])
+        for position, (text, table_data) in zip(positions, extracted):
+            key = missing[position]
+            if key is not None:
+                save_text(key, (documents[position].file_type or "").lower(), text, table_data)
+            results[position] = (text, table_data)
+
+    return results
+
+
+def get_file_text(file_path: str, file_type: Optional[str]) -> tuple:
+    """(text, table_data) of a file by path, through the store."""
+    if not file_path or not os.path.exists(file_path):
+        return None, None
+
+    return _load_or_extract(file_hash(file_path), file_path, file_type)
+
+
+def get_store_stats() -> dict:
+    """Hit/miss counters of this process (shown in the RAG stats)."""
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / lookups, 3) if lookups else None,
+        "extractor_version": EXTRACTOR_VERSION,
+    }
@@ -0,0 +1,130 @@
+"""Benchmark: chat WebSocket frames and server CPU, per-token vs coalesced frames.
+
+Streams ``--conversations`` concurrent answers of ``--tokens`` tokens each
+from a local stand-in LLM (``--rate`` tokens a second per conversation,
+token lengths like a real tokenizer's) to WebSocket stand-ins, three ways:
+
+- ``before``: the old loop; the provider stream yields JSON strings that
+  the endpoint parses and forwards, one frame per token
+- ``per-token``: ``relay_stream`` without coalescing (what clients that
+  do not ask for it get)
+- ``coalesced``: ``relay_stream`` with ``--interval-ms`` / ``--max-chars``
+
+A frame costs what a server pays for it: a WebSocket frame header and a
+socket write (a thread on the other end reads them). CPU is the event
+loop thread's own time, so the reader does not count.
+
+Usage:
+    python benchmarks/bench_chat_stream.py [--conversations 50] [--tokens 300] [--rate 80]
+        [--interval-ms 30] [--max-chars 64]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.chat_stream import TokenCoalescer, relay_stream
+
+WORDS = ("a", "feladat", "határidő", "dokumentum", "szerint", "kérlek", "ellenőrizd", "és", "havi", "zárás")
+
+
+class SocketSink:
+    """Writes WebSocket text frames to a socket (like the ASGI server does)."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.frames = 0
+
+    async def send_text(self, text: str):
+        payload = text.encode()
+        if len(payload) < 126:
+            header = struct.pack("!BB", 0x81, len(payload))
+        else:
+            header = struct.pack("!BBH", 0x81, 126, len(payload))
+        self.sock.sendall(header + payload)
+        self.frames += 1
+
+
+def drain(sock: socket.socket):
+    while sock.recv(1 << 16):
+        pass
+
+
+def stand_in_tokens(rng: random.Random, count: int):
+    return [(" " if i else "") + rng.choice(WORDS)[: rng.randint(2, 8)] for i in range(count)]
+
+
+async def stand_in_events(tokens, rate: float, as_json: bool):
+    for token in tokens:
+        await asyncio.sleep(1 / rate)
+        event = {"token": token, "done": False}
+        yield json.dumps(event) if as_json else event
+    done = {"done": True, "input_tokens": 500, "output_tokens": len(tokens)}
+    yield json.dumps(done) if as_json else done
+
+
+async def old_relay(chunks, sink: SocketSink):
+    full_response = ""
+    async for chunk in chunks:
+        data = json.loads(chunk)
+        if not data.get("done"):
+            full_response += data.get("token", "")
+        await sink.send_text(chunk)
+    return full_response
+
+
+async def run(mode: str, args, sink: SocketSink):
+    rng = random.Random(7)
+    answers = [stand_in_tokens(rng, args.tokens) for _ in range(args.conversations)]
+    coalescing = {"interval_ms": args.interval_ms, "max_chars": args.max_chars} if mode == "coalesced" else None
+
+    async def conversation(tokens):
+        if mode == "before":
+            return await old_relay(stand_in_events(tokens, args.rate, True), sink)
+        text, _, _, _ = await relay_stream(stand_in_events(tokens, args.rate, False), TokenCoalescer(sink.send_text, coalescing))
+        return text
+
+    texts = await asyncio.gather(*(conversation(tokens) for tokens in answers))
+    assert texts == ["".join(tokens) for tokens in answers]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=300, help="tokens per answer")
+    parser.add_argument("--rate", type=float, default=80, help="stand-in LLM tokens per second per conversation")
+    parser.add_argument("--interval-ms", type=int, default=30)
+    parser.add_argument("--max-chars", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"{args.conversations} conversations x {args.tokens} tokens at {args.rate:.0f} tok/s")
+    print(f"{'mode':>10} {'frames':>8} {'frames/s':>9} {'seconds':>8} {'CPU s':>7} {'CPU ms/1k tok':>13}")
+    for mode in ("before", "per-token", "coalesced"):
+        server, client = socket.socketpair()
+        reader = threading.Thread(target=drain, args=(client,), daemon=True)
+        reader.start()
+        sink = SocketSink(server)
+
+        start, cpu = time.perf_counter(), time.thread_time()
+        asyncio.run(run(mode, args, sink))
+        cpu = time.thread_time() - cpu
+        seconds = time.perf_counter() - start
+        server.close()
+        reader.join()
+        client.close()
+
+        total_tokens = args.conversations * args.tokens
+        print(f"{mode:>10} {sink.frames:>8} {sink.frames / seconds:>9.0f} {seconds:>8.2f} {cpu:>7.2f} "
+              f"{cpu * 1e6 / total_tokens:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Benchmark: input tokens per chat turn with and without the rolling summary.
+
+Holds one ``--turns`` long conversation through the chat endpoint
+(``POST /conversations/{id}/message``), once with the summary off
+(``CHAT_SUMMARY_TRIGGER_MESSAGES=0``, the last ``chat_context_size``
+messages every turn) and once on. Queued summary jobs are run between
+turns, as the workers would. The model is a stand-in answering
+``--answer-words`` words; every request (turns and summaries) records its
+``estimate_tokens`` input and output in ``TokenUsage``, which is where the
+numbers below are read from.
+
+Usage:
+    python benchmarks/bench_chat_summary.py [--turns 40] [--answer-words 120] [--trigger 12] [--keep 4]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import audit_middleware
+from app.core.config import settings
+from app.core.database import Base, get_db
+from app.main import app
+from app.models.models import ChatConversation, TokenUsage
+from app.routers import chat
+from app.services import chat_memory, job_queue
+from app.services.ai_service import estimate_tokens, save_token_usage
+
+WORDS = ("számla", "határidő", "bevallás", "leltár", "jóváhagyás", "ügyfél", "szerződés", "havi", "zárás", "riport")
+
+
+def stand_in(answer_words: int, rng: random.Random):
+    """Stand-ins for the chat turns (``chat_with_target``) and the summaries."""
+    async def chat_with_target(target, messages, system_prompt=None):
+        input_tokens = estimate_tokens((system_prompt or "") + "".join(m["content"] for m in messages))
+        words = 200 if system_prompt == chat_memory.SUMMARY_SYSTEM_PROMPT else answer_words
+        reply = " ".join(rng.choice(WORDS) for _ in range(words))
+        return reply, input_tokens, estimate_tokens(reply), 0.0
+
+    async def send_chat_message_with_provider(messages, db, provider, model_name, system_prompt=None):
+        reply, input_tokens, output_tokens, cost = await chat_with_target(None, messages, system_prompt)
+        save_token_usage(db, "stand-in", "words", input_tokens, output_tokens, cost)
+        return reply, input_tokens, output_tokens
+    return chat_with_target, send_chat_message_with_provider
+
+
+def run(turns: int, trigger: int, answer_words: int):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    audit_middleware.SessionLocal = Session
+    job_queue.set_session_factory(Session)
+    settings.CHAT_SUMMARY_TRIGGER_MESSAGES = trigger
+    chat.chat_with_target, chat_memory.send_chat_message_with_provider = stand_in(answer_words, random.Random(7))
+
+    db = Session()
+    conversation = ChatConversation(title="bench", ai_provider="ollama")
+    db.add(conversation)
+    db.commit()
+    client = TestClient(app)
+    rng = random.Random(11)
+    per_turn = []
+    for turn in range(turns):
+        before = db.query(TokenUsage.id).count()
+        question = " ".join(rng.choice(WORDS) for _ in range(25)) + "?"
+        response = client.post(f"/api/v1/chat/conversations/{conversation.id}/message", json={"content": question})
+        response.raise_for_status()
+        per_turn.append(db.query(TokenUsage).order_by(TokenUsage.id).offset(before).first().input_tokens)
+        asyncio.run(job_queue.run_pending_jobs())
+
+    usage = db.query(TokenUsage).all()
+    total_input = sum(u.input_tokens for u in usage)
+    total_output = sum(u.output_tokens for u in usage)
+    summaries = len(usage) - turns
+    db.close()
+    engine.dispose()
+    return per_turn, total_input, total_output, summaries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--answer-words", type=int, default=120)
+    parser.add_argument("--trigger", type=int, default=12, help="CHAT_SUMMARY_TRIGGER_MESSAGES when on")
+    parser.add_argument("--keep", type=int, default=4, help="CHAT_SUMMARY_KEEP_MESSAGES")
+    args = parser.parse_args()
+    settings.CHAT_SUMMARY_KEEP_MESSAGES = args.keep
+
+    marks = [t for t in (1, 5, 10, 20, 30, 40, 60, 80) if t <= args.turns]
+    print(f"{args.turns} turns, answers of {args.answer_words} words")
+    print(f"{'summary':>8} " + " ".join(f"{'turn ' + str(t):>8}" for t in marks)
+          + f" {'summaries':>9} {'in total':>9} {'out total':>9}")
+    for label, trigger in (("off", 0), ("on", args.trigger)):
+        per_turn, total_input, total_output, summaries = run(args.turns, trigger, args.answer_words)
+        print(f"{label:>8} " + " ".join(f"{per_turn[t - 1]:>8}" for t in marks)
+              + f" {summaries:>9} {total_input:>9} {total_output:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Benchmark: auto-link with and without the embedding pre-match.
+
+Links the labelled synthetic mailbox of ``bench_email_prompt_batching.py``
+to its tasks the way the auto-link endpoint does (``match_tasks``, then
+``suggest_links`` per prompt batch) for a sweep of
+``EMAIL_LINK_MATCH_THRESHOLD`` values; ``off`` sends every email to the
+LLM with the whole task list, like before the pre-match.
+
+Both models are stand-ins: the LLM is the keyword stand-in, answering
+after ``--llm-ms`` plus ``--prefill-ms`` per 1000 prompt tokens, and the
+embedding is an IDF-weighted bag of words (hashed into 512 dimensions),
+so shared boilerplate counts for little, as with a real embedding model.
+It is cruder than a real one: which threshold is right for a real model
+has to be checked with its own similarity scores.
+
+Usage:
+    python benchmarks/bench_email_auto_link.py [--emails 300] [--tasks 40] [--thresholds 0.8,0.6,0.5]
+        [--llm-ms 200] [--prefill-ms 150]
+"""
+import argparse
+import asyncio
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+import zlib
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base
+from app.models.models import Email, TokenUsage
+from app.services import email_linking
+from app.services.ai_service import save_token_usage
+from bench_email_prompt_batching import StandInModel, build_corpus
+
+DIMENSIONS = 512
+
+
+async def bag_of_words_embeddings(texts, db, **kwargs):
+    documents = [Counter(re.findall(r"\w+", text.lower())) for text in texts]
+    df = Counter(word for words in documents for word in words)
+    vectors = []
+    for words in documents:
+        vector = [0.0] * DIMENSIONS
+        for word, count in words.items():
+            vector[zlib.crc32(word.encode()) % DIMENSIONS] += count * math.log(len(texts) / df[word])
+        vectors.append(vector)
+    return vectors
+
+
+async def link_all(db, task_names, prompt_size: int, prematch: bool):
+    available_tasks = [{"id": i, "name": name, "description": ""} for i, name in enumerate(task_names, start=1)]
+    rows = [tuple(row) for row in db.query(Email.id, Email.subject, Email.sender, Email.body).order_by(Email.id)]
+    candidates = await email_linking.match_tasks(db, rows, available_tasks) if prematch else {}
+    matched = sum(1 for row in rows if email_linking.confident_match(candidates.get(row[0], [])))
+    rows = email_linking.prematched_first(rows, candidates)
+    predictions = {}
+    for start in range(0, len(rows), prompt_size):
+        chunk = rows[start:start + prompt_size]
+        outcomes = await email_linking.suggest_links(db, chunk, available_tasks, candidates)
+        for email_id, _, _, _ in chunk:
+            task_id, confidence, _ = outcomes[email_id]
+            predictions[email_id] = task_id - 1 if task_id and confidence >= 0.5 else None
+    return [predictions[email_id] for email_id in sorted(predictions)], matched
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--emails", type=int, default=300)
+    parser.add_argument("--tasks", type=int, default=40)
+    parser.add_argument("--thresholds", default="0.8,0.6,0.5", help="comma-separated EMAIL_LINK_MATCH_THRESHOLD values")
+    parser.add_argument("--llm-ms", type=float, default=200, help="stand-in LLM: time per request")
+    parser.add_argument("--prefill-ms", type=float, default=150, help="stand-in LLM: extra time per 1000 prompt tokens")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    task_names, corpus = build_corpus(args.emails, args.tasks, 0, args.seed)
+    model = StandInModel(task_names, 0.0, 0.0, args.seed)
+
+    async def send_chat_message(messages, db, system_prompt=None):
+        reply, input_tokens, output_tokens, cost = await model.chat(None, messages, system_prompt)
+        await asyncio.sleep((args.llm_ms + args.prefill_ms * input_tokens / 1000) / 1000)
+        save_token_usage(db, "stand-in", "keywords", input_tokens, output_tokens, cost)
+        return reply, input_tokens, output_tokens
+
+    email_linking.send_chat_message = send_chat_message
+    email_linking.generate_embeddings_batch = bag_of_words_embeddings
+    labels = [e["task"] for e in corpus]
+
+    print(f"{args.emails} emails, {args.tasks} tasks, {settings.EMAIL_AI_PROMPT_BATCH_SIZE} emails per LLM request, "
+          f"shortlist {settings.EMAIL_LINK_SHORTLIST_SIZE}")
+    print(f"{'threshold':>9} {'no-LLM':>6} {'requests':>8} {'in tokens':>10} {'seconds':>8} {'accuracy':>8}")
+    modes = [("off", None)] + [(t, float(t)) for t in args.thresholds.split(",")]
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, threshold in modes:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, label + '.db')}")
+            Base.metadata.create_all(engine)
+            db = sessionmaker(bind=engine)()
+            db.add_all(Email(subject=e["subject"], sender=e["sender"], body=e["body"]) for e in corpus)
+            db.commit()
+            if threshold is not None:
+                settings.EMAIL_LINK_MATCH_THRESHOLD = threshold
+
+            start = time.perf_counter()
+            predictions, matched = asyncio.run(link_all(db, task_names, settings.EMAIL_AI_PROMPT_BATCH_SIZE, threshold is not None))
+            seconds = time.perf_counter() - start
+            requests, input_tokens = db.query(func.count(TokenUsage.id), func.sum(TokenUsage.input_tokens)).one()
+            db.close()
+            engine.dispose()
+
+            accuracy = sum(p == l for p, l in zip(predictions, labels)) / len(corpus)
+            print(f"{label:>9} {matched:>6} {requests:>8} {input_tokens or 0:>10} {seconds:>8.1f} {accuracy:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
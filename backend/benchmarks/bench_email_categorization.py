@@ -0,0 +1,97 @@
+"""Benchmark: email categorization throughput by concurrency.
+
+The chat call is replaced by a stand-in that waits ``--latency-ms`` (an
+LLM answer takes about that long and costs the server no CPU), so this
+measures what the engine adds: concurrent calls, batched commits and
+progress events. ``categorize_emails`` categorizes ``--emails`` emails in
+a temporary SQLite database; the ``sequential`` row is the old loop, one
+call and one commit per email. Every call categorizes one email here
+(``EMAIL_AI_PROMPT_BATCH_SIZE=1``); ``bench_email_prompt_batching.py``
+measures multi-email prompts.
+
+A real provider caps the useful concurrency: a local Ollama serves only a
+few requests at a time, OpenRouter's rate limit caps requests per minute.
+
+Usage:
+    python benchmarks/bench_email_categorization.py [--emails 1000] [--latency-ms 200] [--concurrency 1,2,4,8,16]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base
+from app.models.models import Email
+from app.services import email_categorization
+from app.services.email_prompts import email_prompt
+
+
+def stand_in_chat(latency: float):
+    async def chat(target, messages, system_prompt=None):
+        await asyncio.sleep(latency)
+        return '{"importance": "Közepes", "reason": "Rutin levél"}', 300, 20, 0.0
+    return chat
+
+
+async def categorize_sequentially(db):
+    """The categorization before the worker pool: one call and one commit per email."""
+    target = email_categorization.resolve_chat_target(db)
+    for email in db.query(Email).filter(Email.ai_importance_reason.is_(None)).all():
+        response_text, _, _, _ = await email_categorization.chat_with_target(
+            target,
+            [{"role": "user", "content": email_prompt(email.subject, email.sender, email.body, email_categorization.BODY_PROMPT_CHARS)}],
+            system_prompt=email_categorization.CATEGORIZATION_SYSTEM_PROMPT,
+        )
+        email.importance, email.ai_importance_reason = email_categorization.parse_ai_categorization_response(response_text)
+        db.commit()
+
+
+def run(label: str, concurrency: int, emails: int, tmp: str) -> float:
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, label + '.db')}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all(Email(subject=f"Havi riport {i}", sender="konyveles@example.com", body="x" * 3000) for i in range(emails))
+    db.commit()
+
+    settings.OLLAMA_CHAT_CONCURRENCY = concurrency
+    start = time.perf_counter()
+    if label == "sequential":
+        asyncio.run(categorize_sequentially(db))
+    else:
+        result = asyncio.run(email_categorization.categorize_emails(db))
+        assert result["categorized"] == emails, result["errors"]
+    seconds = time.perf_counter() - start
+    db.close()
+    engine.dispose()
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--emails", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="comma-separated worker counts")
+    args = parser.parse_args()
+
+    email_categorization.chat_with_target = stand_in_chat(args.latency_ms / 1000)
+    settings.EMAIL_AI_PROMPT_BATCH_SIZE = 1
+    print(f"{args.emails} emails, {args.latency_ms:.0f} ms per model call, "
+          f"batch size {settings.EMAIL_CATEGORIZE_BATCH_SIZE}, {os.cpu_count()} CPUs")
+    print(f"{'mode':>14} {'seconds':>8} {'emails/min':>11}")
+    modes = [("sequential", 1)] + [(f"concurrency-{n}", n) for n in map(int, args.concurrency.split(","))]
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, concurrency in modes:
+            seconds = run(label, concurrency, args.emails, tmp)
+            print(f"{label:>14} {seconds:>8.1f} {args.emails / seconds * 60:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
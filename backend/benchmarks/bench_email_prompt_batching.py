@@ -0,0 +1,205 @@
+"""Benchmark: multi-email prompts, tokens and accuracy vs one email per request.
+
+Categorizes a labelled synthetic mailbox and suggests task links for it,
+once with one email per request and once with ``--prompt-size`` emails
+per request (``EMAIL_AI_PROMPT_BATCH_SIZE``). Token counts are read back
+from the ``TokenUsage`` rows the runs recorded, like the usage statistics
+page does; accuracy is measured against the labels, agreement against
+the one-email-per-request answers.
+
+The model is a local stand-in by default: a keyword classifier that only
+sees what the prompt contains (a batched prompt carries less of every
+body), counts tokens with ``estimate_tokens``, and with ``--drop-rate`` /
+``--garble-rate`` leaves emails out of batched replies or answers them
+with prose, which exercises the single-email fallback. With
+``--ollama-model`` the runs use a real local Ollama model instead.
+
+Usage:
+    python benchmarks/bench_email_prompt_batching.py [--emails 200] [--tasks 25] [--prompt-size 10]
+        [--late-every 5] [--drop-rate 0.02] [--garble-rate 0.05]
+        [--ollama-model llama3.2] [--ollama-url http://localhost:11434]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base
+from app.models.models import AppSetting, Email, TokenUsage
+from app.services import email_categorization, email_linking
+from app.services.ai_service import estimate_tokens, save_token_usage
+
+KEYWORDS = {
+    "Kritikus": ["azonnal", "leállt a rendszer", "ma lejár a határidő"],
+    "Magas": ["jóváhagyás szükséges", "vezetői döntés", "fontos projekt"],
+    "Közepes": ["tájékoztatásul", "egyeztetés", "heti összefoglaló"],
+    "Alacsony": ["hírlevél", "akciós ajánlat", "leiratkozás"],
+}
+FILLER = "A csatolt anyagokat átnéztük, a részleteket a következő megbeszélésen pontosítjuk. "
+
+
+def build_corpus(emails: int, tasks: int, late_every: int, seed: int):
+    rng = random.Random(seed)
+    task_names = [f"Feladat{i:02d} {rng.choice(['bevallás', 'zárás', 'egyeztetés', 'riport'])}" for i in range(tasks)]
+    corpus = []
+    for i in range(emails):
+        importance = rng.choice(list(KEYWORDS))
+        keyword = rng.choice(KEYWORDS[importance])
+        task = rng.randrange(tasks) if rng.random() < 0.7 else None
+        # Some emails state their urgency late in a long body (past BATCH_BODY_PROMPT_CHARS)
+        lead = FILLER * (17 if late_every and i % late_every == 0 else rng.randint(0, 4))
+        body = f"{lead}Megjegyzés: {keyword}. " + FILLER * rng.randint(1, 6)
+        subject = f"{task_names[task]} – {i}" if task is not None else f"Levél {i}"
+        corpus.append({"subject": subject, "sender": "kollega@example.com", "body": body,
+                       "importance": importance, "task": task})
+    return task_names, corpus
+
+
+class StandInModel:
+    """Keyword rules standing in for the LLM; answers one email or a batch."""
+
+    def __init__(self, task_names, drop_rate: float, garble_rate: float, seed: int):
+        self.task_names = task_names
+        self.drop_rate = drop_rate
+        self.garble_rate = garble_rate
+        self.rng = random.Random(seed)
+
+    def answer(self, text: str, linking: bool) -> dict:
+        lower = text.lower()
+        if linking:
+            for task_id, name in enumerate(self.task_names, start=1):
+                if name.lower() in lower:
+                    return {"task_id": task_id, "task_name": name, "confidence": 0.9, "reason": "Tárgy egyezés"}
+            return {"task_id": None, "confidence": 0.0, "reason": "Nincs egyezés"}
+        for importance, keywords in KEYWORDS.items():
+            if any(k in lower for k in keywords):
+                return {"importance": importance, "reason": "Kulcsszó"}
+        return {"importance": "Közepes", "reason": "Nincs jelzés"}
+
+    async def chat(self, target, messages, system_prompt=None):
+        content = messages[0]["content"]
+        linking = "Elérhető feladatok" in (system_prompt or "")
+        blocks = re.split(r"### Email ID: (\d+)\n", content)
+        if len(blocks) == 1:
+            reply = json.dumps(self.answer(content, linking), ensure_ascii=False)
+        elif self.rng.random() < self.garble_rate:
+            reply = "Az emailek elemzése alapján a következőket javaslom..."
+        else:
+            items = [
+                {"email_id": int(email_id), **self.answer(text, linking)}
+                for email_id, text in zip(blocks[1::2], blocks[2::2])
+                if self.rng.random() >= self.drop_rate
+            ]
+            reply = json.dumps(items, ensure_ascii=False)
+        input_tokens = estimate_tokens((system_prompt or "") + content)
+        return reply, input_tokens, estimate_tokens(reply), 0.0
+
+
+def open_db(tmp: str, name: str, corpus, ollama_model, ollama_url):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, name + '.db')}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all(Email(subject=e["subject"], sender=e["sender"], body=e["body"]) for e in corpus)
+    if ollama_model:
+        db.add_all([
+            AppSetting(key="ai_provider", value="ollama"),
+            AppSetting(key="ollama_model", value=ollama_model),
+            AppSetting(key="ollama_url", value=ollama_url),
+        ])
+    db.commit()
+    return engine, db
+
+
+def usage_totals(db):
+    requests, input_tokens, output_tokens = db.query(
+        func.count(TokenUsage.id), func.sum(TokenUsage.input_tokens), func.sum(TokenUsage.output_tokens)
+    ).one()
+    return requests, input_tokens or 0, output_tokens or 0
+
+
+async def categorize(db):
+    await email_categorization.categorize_emails(db)
+    return [importance for (importance,) in db.query(Email.importance).order_by(Email.id)]
+
+
+async def link(db, task_names, prompt_size: int):
+    available_tasks = [{"id": i, "name": name, "description": ""} for i, name in enumerate(task_names, start=1)]
+    rows = [tuple(row) for row in db.query(Email.id, Email.subject, Email.sender, Email.body).order_by(Email.id)]
+    predictions = []
+    for start in range(0, len(rows), prompt_size):
+        outcomes = await email_linking.suggest_links(db, rows[start:start + prompt_size], available_tasks)
+        for row in rows[start:start + prompt_size]:
+            outcome = outcomes[row[0]]
+            if isinstance(outcome, Exception):
+                predictions.append("error")
+            else:
+                task_id, confidence, _ = outcome
+                predictions.append(task_id - 1 if task_id and confidence >= 0.5 else None)
+    return predictions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=25)
+    parser.add_argument("--prompt-size", type=int, default=10, help="emails per batched request")
+    parser.add_argument("--late-every", type=int, default=5, help="every n-th email states its urgency late in the body (0: none)")
+    parser.add_argument("--drop-rate", type=float, default=0.02, help="stand-in: share of emails left out of a batched reply")
+    parser.add_argument("--garble-rate", type=float, default=0.05, help="stand-in: share of batched replies that are not JSON")
+    parser.add_argument("--ollama-model", help="use this local Ollama model instead of the stand-in")
+    parser.add_argument("--ollama-url", default="http://localhost:11434")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    task_names, corpus = build_corpus(args.emails, args.tasks, args.late_every, args.seed)
+    model = StandInModel(task_names, args.drop_rate, args.garble_rate, args.seed)
+    if not args.ollama_model:
+        email_categorization.chat_with_target = model.chat
+
+        async def send_chat_message(messages, db, system_prompt=None):
+            reply, input_tokens, output_tokens, cost = await model.chat(None, messages, system_prompt)
+            save_token_usage(db, "stand-in", "keywords", input_tokens, output_tokens, cost)
+            return reply, input_tokens, output_tokens
+
+        email_linking.send_chat_message = send_chat_message
+
+    print(f"{args.emails} emails, {args.tasks} tasks, model: {args.ollama_model or 'keyword stand-in'}")
+    print(f"{'feature':>10} {'per req':>7} {'requests':>8} {'in tokens':>10} {'out tokens':>10} "
+          f"{'tok/email':>9} {'accuracy':>8} {'agreement':>9}")
+    labels = {
+        "categorize": [e["importance"] for e in corpus],
+        "link": [e["task"] for e in corpus],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for feature in ("categorize", "link"):
+            baseline = None
+            for prompt_size in (1, args.prompt_size):
+                settings.EMAIL_AI_PROMPT_BATCH_SIZE = prompt_size
+                engine, db = open_db(tmp, f"{feature}-{prompt_size}", corpus, args.ollama_model, args.ollama_url)
+                if feature == "categorize":
+                    predictions = asyncio.run(categorize(db))
+                else:
+                    predictions = asyncio.run(link(db, task_names, prompt_size))
+                requests, input_tokens, output_tokens = usage_totals(db)
+                db.close()
+                engine.dispose()
+
+                baseline = baseline or predictions
+                accuracy = sum(p == l for p, l in zip(predictions, labels[feature])) / len(corpus)
+                agreement = sum(p == b for p, b in zip(predictions, baseline)) / len(corpus)
+                print(f"{feature:>10} {prompt_size:>7} {requests:>8} {input_tokens:>10} {output_tokens:>10} "
+                      f"{(input_tokens + output_tokens) / len(corpus):>9.0f} {accuracy:>8.1%} {agreement:>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Benchmark: FAISS document delete latency as the corpus grows.
+
+Builds synthetic indexes of 10k-100k chunks (50 chunks per document) and
+times ``FAISSIndex.remove_document`` for single documents, including the
+durable WAL append. The median is the tombstone path; the max includes the
+occasional amortized compaction.
+
+Usage:
+    python benchmarks/bench_faiss_delete.py [--dim 384] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.services import rag_service
+from app.services.rag_service import FAISSIndex
+
+CHUNKS_PER_DOC = 50
+CORPUS_SIZES = [10_000, 25_000, 50_000, 100_000]
+
+
+def build_index(total_chunks: int, dim: int) -> FAISSIndex:
+    index = FAISSIndex(dimension=dim)
+    rng = np.random.default_rng(42)
+    for doc_id in range(1, total_chunks // CHUNKS_PER_DOC + 1):
+        vectors = rng.random((CHUNKS_PER_DOC, dim), dtype=np.float32)
+        metadata = [{"document_id": doc_id, "chunk_index": i} for i in range(CHUNKS_PER_DOC)]
+        index.add_embeddings(vectors.tolist(), metadata)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rag_service.FAISS_INDEX_DIR = tmp
+        print(f"{'chunks':>8} {'median ms':>10} {'max ms':>10}")
+        for size in CORPUS_SIZES:
+            index = build_index(size, args.dim)
+            timings = []
+            for doc_id in range(1, args.repeat + 1):
+                start = time.perf_counter()
+                index.remove_document(doc_id)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            print(f"{size:>8} {timings[len(timings) // 2]:>10.3f} {timings[-1]:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
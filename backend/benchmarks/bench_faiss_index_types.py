@@ -0,0 +1,97 @@
+"""Benchmark: recall and query latency of the IVF/HNSW tiers against flat.
+
+Builds each index type with ``build_vector_index`` over a synthetic
+clustered corpus (embeddings of related chunks sit close together) and
+runs single-vector queries the way a chat RAG lookup does. Queries are
+fresh samples from the same mixture; recall@k is measured against the
+exact ``IndexFlatIP`` results.
+
+Usage:
+    python benchmarks/bench_faiss_index_types.py [--size 200000] [--dim 384] [--queries 500] [--k 5] [--clusters 1000] [--spread 2.0]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+import numpy as np
+
+from app.services import rag_service
+from app.services.rag_service import build_vector_index
+
+
+def sample_mixture(centers, count: int, spread: float, rng):
+    labels = rng.integers(0, len(centers), count)
+    noise = rng.standard_normal((count, centers.shape[1]), dtype=np.float32)
+    vectors = centers[labels] + spread * noise
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def search_params(index_type: str, k: int):
+    if index_type == "ivf":
+        return faiss.SearchParametersIVF(nprobe=rag_service.IVF_NPROBE)
+    if index_type == "hnsw":
+        return faiss.SearchParametersHNSW(efSearch=max(rag_service.HNSW_EF_SEARCH, k))
+    return None
+
+
+def run_queries(index, queries, k: int, params):
+    timings = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k, params=params)
+        timings.append((time.perf_counter() - start) * 1000)
+        found[i] = ids[0]
+    timings.sort()
+    return found, timings
+
+
+def recall(found, truth) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--spread", type=float, default=2.0, help="within-cluster noise relative to cluster distance")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    centers = rng.standard_normal((args.clusters, args.dim), dtype=np.float32)
+    vectors = sample_mixture(centers, args.size, args.spread, rng)
+    queries = sample_mixture(centers, args.queries, args.spread, rng)
+
+    print(f"{args.size} vectors, dim {args.dim}, {args.queries} queries, k={args.k}")
+    print(f"{'type':>6} {'build s':>9} {'recall':>8} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8}")
+
+    truth = None
+    flat_p50 = None
+    for index_type in rag_service.VECTOR_INDEX_TYPES:
+        start = time.perf_counter()
+        index = build_vector_index(index_type, vectors)
+        build_s = time.perf_counter() - start
+
+        found, timings = run_queries(index, queries, args.k, search_params(index_type, args.k))
+        p50 = timings[len(timings) // 2]
+        p95 = timings[int(len(timings) * 0.95)]
+        if truth is None:
+            truth, flat_p50 = found, p50
+        print(
+            f"{index_type:>6} {build_s:>9.2f} {recall(found, truth):>8.3f} "
+            f"{p50:>8.3f} {p95:>8.3f} {flat_p50 / p50:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark: content search latency on the full-text index.
+
+Builds a synthetic corpus (Hungarian-like vocabulary with a Zipf-like word
+distribution) in a temporary index and times ``fulltext_index.search``,
+ranking plus snippet and line highlighting of the top 50 hits, for
+common, rare, prefix and multi-word queries. For reference it also times
+the old approach, a case-insensitive line scan, over the same texts held
+in memory (the endpoint used to scan only the 100 newest documents, after
+reading each one from disk).
+
+Usage:
+    python benchmarks/bench_fulltext_search.py [--documents 50000] [--words 300] [--repeat 20]
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services import fulltext_index
+
+STEMS = [
+    "munka", "folyamat", "határidő", "felelős", "jóváhagyás", "melléklet", "számla", "szerződés",
+    "beszerzés", "ajánlat", "ügyfél", "projekt", "feladat", "riport", "költség", "bérszámfejtés",
+    "könyvelés", "adó", "bevallás", "leltár", "raktár", "szállítás", "megrendelés", "teljesítés",
+]
+SUFFIXES = ["", "ok", "ban", "hoz", "ról", "nak", "kezelő", "terv", "lista", "összesítő"]
+
+
+def make_text(rng: random.Random, words: int, vocabulary: list, cum_weights: list) -> str:
+    lines = []
+    chosen = rng.choices(vocabulary, cum_weights=cum_weights, k=words)
+    for start in range(0, words, 12):
+        lines.append(" ".join(chosen[start:start + 12]).capitalize() + ".")
+    return "\n".join(lines)
+
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=50000)
+    parser.add_argument("--words", type=int, default=300, help="words per document")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per query")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = [stem + suffix for stem in STEMS for suffix in SUFFIXES]
+    vocabulary += [f"azonosító{i}" for i in range(20000)]  # long tail: ids, names, numbers
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(vocabulary))))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.FULLTEXT_INDEX_PATH = os.path.join(tmp, "documents.db")
+
+        texts = []
+        start = time.perf_counter()
+        batch = []
+        for document_id in range(1, args.documents + 1):
+            text = make_text(rng, args.words, vocabulary, cum_weights)
+            texts.append(text)
+            batch.append((document_id, None, text))
+            if len(batch) == 1000:
+                fulltext_index.index_documents(batch)
+                batch = []
+        fulltext_index.index_documents(batch)
+        build_s = time.perf_counter() - start
+        size_mb = os.path.getsize(settings.FULLTEXT_INDEX_PATH) / 1024 / 1024
+        print(f"{args.documents} documents x {args.words} words: indexed in {build_s:.1f} s, index {size_mb:.0f} MB")
+
+        start = time.perf_counter()
+        fulltext_index.index_document(args.documents + 1, None, "egy új feltöltés szövege")
+        print(f"incremental upload: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        queries = {
+            "common word": "munka",
+            "rare word": "azonosító15000",
+            "prefix": "jóváhagy",
+            "two words": "szerződés határidő",
+            "no match": "nemlétezőszó",
+        }
+        print(f"{'query':>12} {'hits':>5} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'scan ms':>9}")
+        for label, query in queries.items():
+            hits = fulltext_index.search(query)  # warm the page cache
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                fulltext_index.search(query)
+                timings.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            needle = query.split()[0].lower()
+            sum(1 for text in texts if needle in text.lower())
+            scan_ms = (time.perf_counter() - start) * 1000
+
+            print(
+                f"{label:>12} {len(hits):>5} {statistics.median(timings):>8.2f} "
+                f"{percentile(timings, 0.95):>8.2f} {max(timings):>8.2f} {scan_ms:>9.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
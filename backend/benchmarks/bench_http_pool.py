@@ -0,0 +1,115 @@
+"""Benchmark: per-call httpx clients vs the pooled provider client.
+
+Starts a local stand-in for Ollama's ``/api/embeddings`` endpoint and runs
+a 1,000-chunk indexing pass twice: once opening a new ``AsyncClient`` per
+request (the old behaviour) and once through ``_generate_ollama`` with the
+shared pool from ``app.services.http_clients``. Reports wall time, mean
+per-request latency and the number of TCP connections the server accepted.
+
+The stand-in is plain HTTP on localhost, so the saving shown is only the
+TCP setup; against OpenRouter the TLS handshake per call adds more.
+
+Usage:
+    python benchmarks/bench_http_pool.py [--chunks 1000] [--dim 1024]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from app.services.embedding_service import _generate_ollama
+from app.services.http_clients import close_http_clients
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    accepted = 0
+
+    def get_request(self):
+        self.accepted += 1
+        return super().get_request()
+
+
+def make_handler(dim: int):
+    body = json.dumps({"embedding": [0.01] * dim}).encode()
+
+    class EmbeddingHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return EmbeddingHandler
+
+
+async def per_call_client(url: str, text: str):
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        response = await client.post(f"{url}/api/embeddings", json={"model": "bge-m3", "prompt": text})
+        response.raise_for_status()
+        return response.json().get("embedding")
+
+
+async def pooled_client(url: str, text: str):
+    return await _generate_ollama(text=text, model="bge-m3", ollama_url=url)
+
+
+async def run(call, url: str, chunks: int):
+    timings = []
+    for i in range(chunks):
+        start = time.perf_counter()
+        embedding = await call(url, f"chunk {i}")
+        timings.append((time.perf_counter() - start) * 1000)
+        assert embedding
+    await close_http_clients()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=1024)
+    args = parser.parse_args()
+
+    server = StandInServer(("127.0.0.1", 0), make_handler(args.dim))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"{args.chunks} embedding requests against {url}")
+    print(f"{'client':>10} {'total s':>9} {'mean ms':>9} {'p50 ms':>8} {'connections':>12}")
+    results = {}
+    for name, call in (("per-call", per_call_client), ("pooled", pooled_client)):
+        server.accepted = 0
+        start = time.perf_counter()
+        timings = asyncio.run(run(call, url, args.chunks))
+        total = time.perf_counter() - start
+        mean = sum(timings) / len(timings)
+        results[name] = mean
+        print(
+            f"{name:>10} {total:>9.2f} {mean:>9.3f} "
+            f"{sorted(timings)[len(timings) // 2]:>8.3f} {server.accepted:>12}"
+        )
+
+    saved = results["per-call"] - results["pooled"]
+    print(f"saved per request: {saved:.3f} ms ({saved * args.chunks / 1000:.2f} s per {args.chunks} chunks)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark: repeated document summaries with and without the LLM response cache.
+
+Uploads ``--documents`` text documents and requests their summary
+``--rounds`` times each through the endpoint
+(``POST /documents/{id}/summarize``), the way users click "summarize"
+again on unchanged documents. Once with ``bypass_cache=true`` on every
+request (the old behaviour), once with the cache. The model is a stand-in
+taking ``--latency-ms`` per request, answering 150 words and charging
+OpenRouter-like prices; tokens and cost are read back from ``TokenUsage``.
+
+Usage:
+    python benchmarks/bench_llm_cache.py [--documents 20] [--rounds 3] [--latency-ms 800]
+"""
+import argparse
+import asyncio
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import audit_middleware
+from app.core.database import Base, get_db
+from app.main import app
+from app.models.models import TokenUsage
+from app.services import llm_cache
+from app.services.ai_service import estimate_tokens
+
+WORDS = ("számla", "határidő", "bevallás", "leltár", "jóváhagyás", "ügyfél", "szerződés", "havi", "zárás", "riport")
+PRICE_PER_TOKEN = (0.15e-6, 0.6e-6)
+
+
+def stand_in(latency_ms: float, rng: random.Random):
+    async def chat_with_target(target, messages, system_prompt=None):
+        await asyncio.sleep(latency_ms / 1000)
+        reply = " ".join(rng.choice(WORDS) for _ in range(150))
+        input_tokens = estimate_tokens((system_prompt or "") + "".join(m["content"] for m in messages))
+        output_tokens = estimate_tokens(reply)
+        cost = input_tokens * PRICE_PER_TOKEN[0] + output_tokens * PRICE_PER_TOKEN[1]
+        return reply, input_tokens, output_tokens, cost
+    return chat_with_target
+
+
+def run(documents: int, rounds: int, latency_ms: float, bypass: bool):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    audit_middleware.SessionLocal = Session
+    llm_cache.resolve_chat_target = lambda db: {"provider": "openrouter", "model": "stand-in", "api_key": "k"}
+    llm_cache.chat_with_target = stand_in(latency_ms, random.Random(7))
+
+    client = TestClient(app)
+    rng = random.Random(11)
+    doc_ids = []
+    for i in range(documents):
+        content = " ".join(rng.choice(WORDS) for _ in range(600))
+        files = {"file": (f"bench_{i}.txt", io.BytesIO(content.encode()), "text/plain")}
+        response = client.post("/api/v1/documents/upload", files=files)
+        response.raise_for_status()
+        doc_ids.append(response.json()["id"])
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for doc_id in doc_ids:
+            response = client.post(f"/api/v1/documents/{doc_id}/summarize", params={"bypass_cache": bypass})
+            response.raise_for_status()
+    elapsed = time.perf_counter() - start
+
+    db = Session()
+    usage = db.query(TokenUsage).all()
+    spent = sum(u.input_tokens + u.output_tokens for u in usage if not u.cache_hit)
+    saved = sum(u.input_tokens + u.output_tokens for u in usage if u.cache_hit)
+    cost = sum(u.cost for u in usage)
+    hits = sum(1 for u in usage if u.cache_hit)
+    db.close()
+    engine.dispose()
+    return elapsed, len(usage) - hits, hits, spent, saved, cost
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3, help="summaries requested per document")
+    parser.add_argument("--latency-ms", type=float, default=800, help="stand-in model time per request")
+    args = parser.parse_args()
+
+    print(f"{args.documents} documents x {args.rounds} summaries, {args.latency_ms:.0f} ms per model call")
+    print(f"{'cache':>6} {'seconds':>8} {'calls':>6} {'hits':>5} {'tokens spent':>13} {'tokens saved':>13} {'cost USD':>10}")
+    for label, bypass in (("off", True), ("on", False)):
+        elapsed, calls, hits, spent, saved, cost = run(args.documents, args.rounds, args.latency_ms, bypass)
+        print(f"{label:>6} {elapsed:>8.2f} {calls:>6} {hits:>5} {spent:>13} {saved:>13} {cost:>10.5f}")
+
+
+if __name__ == "__main__":
+    main()
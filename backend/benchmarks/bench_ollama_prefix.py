@@ -0,0 +1,163 @@
+"""Benchmark: time to first token over a multi-turn RAG chat, old vs new Ollama requests.
+
+Runs ``--turns`` turns of one RAG conversation (a new ``--context-tokens``
+document context every turn, ``--think-s`` seconds between turns) three ways:
+
+- ``before``: the old request; ``/api/generate`` with the history
+  flattened into one prompt, the context inside the system prompt and no
+  ``keep_alive``
+- ``chat``: ``stream_ollama_response`` (``/api/chat``) with the messages
+  of ``turn_messages``, keep_alive left at Ollama's default
+- ``chat+keep``: the same with ``OLLAMA_KEEP_ALIVE`` (``--keep-alive``)
+
+The Ollama server is a local stand-in that behaves like one with a single
+slot: it keeps the last prompt's (and answer's) KV cache and evaluates
+only what follows the common prefix (``--prefill-ms`` per 1000 tokens),
+and unloads the model once ``keep_alive`` passes (default 5 minutes),
+after which the next request pays ``--load-ms``. Think time is simulated,
+not slept. Tokens are words.
+
+Usage:
+    python benchmarks/bench_ollama_prefix.py [--turns 8] [--context-tokens 1500] [--think-s 420]
+        [--prefill-ms 500] [--load-ms 1500] [--keep-alive 30m]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from app.core.config import settings
+from app.routers import chat
+
+WORDS = ("számla", "határidő", "bevallás", "leltár", "jóváhagyás", "ügyfél", "szerződés", "havi", "zárás", "riport")
+ANSWER_TOKENS = 120
+
+
+def duration_seconds(value) -> float:
+    if value is None or value == "":
+        return 300.0
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    number, unit = re.fullmatch(r"(\d+)([smh])", value).groups()
+    return int(number) * {"s": 1, "m": 60, "h": 3600}[unit]
+
+
+class StandInOllama:
+    """One loaded model with one KV cache slot."""
+
+    def __init__(self, prefill_ms: float, load_ms: float, rng: random.Random):
+        self.prefill_ms = prefill_ms
+        self.load_ms = load_ms
+        self.rng = rng
+        self.now = 0.0  # simulated clock (think time)
+        self.unload_at = None
+        self.cached = []
+        self.evaluated = []
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if request.url.path == "/api/chat":
+            prompt = " ".join(f"<{m['role']}> {m['content']}" for m in body["messages"]).split()
+        else:
+            prompt = (body.get("system", "") + " " + body["prompt"]).split()
+
+        if self.unload_at is None or self.now > self.unload_at:
+            await asyncio.sleep(self.load_ms / 1000)
+            self.cached = []
+        common = 0
+        for cached, token in zip(self.cached, prompt):
+            if cached != token:
+                break
+            common += 1
+        self.evaluated.append(len(prompt) - common)
+        await asyncio.sleep((len(prompt) - common) * self.prefill_ms / 1e6)
+
+        answer = [self.rng.choice(WORDS) for _ in range(ANSWER_TOKENS)]
+        self.cached = prompt + answer
+        self.unload_at = self.now + duration_seconds(body.get("keep_alive"))
+        key = "message" if request.url.path == "/api/chat" else "response"
+        lines = [
+            {key: {"role": "assistant", "content": " " + t} if key == "message" else " " + t, "done": False}
+            for t in answer
+        ]
+        lines.append({"done": True, "prompt_eval_count": len(prompt) - common, "eval_count": len(answer)})
+        return httpx.Response(200, content="\n".join(json.dumps(line) for line in lines))
+
+
+async def old_stream(client, messages, system_prompt):
+    """The request the chat endpoint used to send (``/api/generate``, flattened prompt)."""
+    prompt = f"System: {system_prompt}\n\n" + "".join(
+        f"{'User' if m['role'] == 'user' else 'Assistant'}: {m['content']}\n" for m in messages
+    )
+    async with client.stream("POST", "http://ollama/api/generate", json={"model": "m", "prompt": prompt, "stream": True}) as response:
+        async for line in response.aiter_lines():
+            data = json.loads(line)
+            yield {"done": True} if data["done"] else {"token": data["response"]}
+
+
+async def conversation(mode: str, args) -> list:
+    rng = random.Random(7)
+    server = StandInOllama(args.prefill_ms, args.load_ms, random.Random(11))
+    client = httpx.AsyncClient(transport=httpx.MockTransport(server.handle))
+    chat.get_http_client = lambda provider: client
+    settings.OLLAMA_KEEP_ALIVE = args.keep_alive if mode == "chat+keep" else ""
+
+    history, ttfts = [], []
+    for turn in range(args.turns):
+        question = " ".join(rng.choice(WORDS) for _ in range(15)) + "?"
+        context = "DOKUMENTUM KONTEXTUS: " + " ".join(rng.choice(WORDS) for _ in range(args.context_tokens))
+        history.append({"role": "user", "content": question})
+        if mode == "before":
+            events = old_stream(client, history, f"{chat.NORMAL_RAG_SYSTEM_PROMPT}\n\n{context}")
+        else:
+            system_prompt = chat.turn_system_prompt(None, True, False)
+            messages = chat.turn_messages(history, context)
+            events = chat.stream_ollama_response(messages, "http://ollama", "m", system_prompt)
+
+        start, first, answer = time.perf_counter(), None, []
+        async for event in events:
+            if event.get("token"):
+                first = first or time.perf_counter()
+                answer.append(event["token"])
+        ttfts.append((first - start, server.evaluated[-1]))
+        history.append({"role": "assistant", "content": "".join(answer)})
+        server.advance(args.think_s)
+    await client.aclose()
+    return ttfts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--context-tokens", type=int, default=1500, help="RAG context per turn")
+    parser.add_argument("--think-s", type=float, default=420, help="simulated time between turns")
+    parser.add_argument("--prefill-ms", type=float, default=500, help="stand-in: prompt evaluation per 1000 tokens")
+    parser.add_argument("--load-ms", type=float, default=1500, help="stand-in: loading the model")
+    parser.add_argument("--keep-alive", default="30m")
+    args = parser.parse_args()
+
+    print(f"{args.turns} turns, {args.context_tokens} context tokens/turn, {args.think_s:.0f} s between turns")
+    print(f"{'mode':>10} {'evaluated tokens per turn':<40} {'TTFT ms per turn':<48} {'median':>7}")
+    for mode in ("before", "chat", "chat+keep"):
+        ttfts = asyncio.run(conversation(mode, args))
+        evaluated = " ".join(f"{e:>4}" for _, e in ttfts)
+        times = " ".join(f"{t * 1000:>5.0f}" for t, _ in ttfts)
+        median = statistics.median(t for t, _ in ttfts[1:]) * 1000
+        print(f"{mode:>10} {evaluated:<40} {times:<48} {median:>7.0f}")
+    print("(median over turns 2..n; the first turn has nothing to reuse)")
+
+
+if __name__ == "__main__":
+    main()
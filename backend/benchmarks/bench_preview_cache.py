@@ -0,0 +1,98 @@
+"""Benchmark: cold vs warm document preview through the extracted-text store.
+
+Builds DOCX and XLSX fixtures (the preview endpoint extracts those; PDFs
+are streamed to the browser) and times the text lookup behind
+``GET /documents/{id}/preview``:
+
+- cold: empty store; the file is extracted in the worker pool and stored,
+- warm: the stored JSON entry is read back (what every preview after the
+  upload does).
+
+Usage:
+    python benchmarks/bench_preview_cache.py [--files 10] [--docx-paragraphs 2000] [--xlsx-rows 20000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services import text_store
+from app.services.text_extraction import extract_many, shutdown_extraction_pool
+
+LINE = "A munkafolyamat dokumentációja: határidők, felelősök, jóváhagyási lépések és mellékletek. "
+
+
+def make_docx(path: str, paragraphs: int, seed: int):
+    from docx import Document
+
+    doc = Document()
+    for i in range(paragraphs):
+        doc.add_paragraph(f"{seed}/{i + 1}. {LINE * 2}")
+    doc.save(path)
+
+
+def make_xlsx(path: str, rows: int, seed: int):
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    sheet = wb.active
+    for i in range(rows):
+        sheet.append([i, f"tétel {seed}/{i}", i * 1.5, "Igen" if i % 2 else "Nem", LINE[:40]])
+    wb.save(path)
+
+
+def time_ms(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=10, help="files per type")
+    parser.add_argument("--docx-paragraphs", type=int, default=2000)
+    parser.add_argument("--xlsx-rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5, help="warm lookups per file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.EXTRACTED_TEXT_DIR = os.path.join(tmp, "extracted_text")
+        documents = {"docx": [], "xlsx": []}
+        for i in range(args.files):
+            path = os.path.join(tmp, f"doc{i}.docx")
+            make_docx(path, args.docx_paragraphs, i)
+            documents["docx"].append(SimpleNamespace(file_path=path, file_type="docx", content_hash=text_store.file_hash(path)))
+            path = os.path.join(tmp, f"sheet{i}.xlsx")
+            make_xlsx(path, args.xlsx_rows, i)
+            documents["xlsx"].append(SimpleNamespace(file_path=path, file_type="xlsx", content_hash=text_store.file_hash(path)))
+
+        # Start the worker processes outside the measurement
+        warmup = os.path.join(tmp, "warmup.docx")
+        make_docx(warmup, 1, -1)
+        extract_many([(warmup, "docx")])
+
+        print(f"{args.files} files per type; docx {args.docx_paragraphs} paragraphs, xlsx {args.xlsx_rows} rows")
+        print(f"{'type':>6} {'cold ms':>10} {'warm ms':>10} {'speedup':>9}")
+        for file_type, docs in documents.items():
+            cold = [time_ms(lambda d=d: text_store.get_document_text(d)) for d in docs]
+            warm = [
+                time_ms(lambda d=d: text_store.get_document_text(d))
+                for d in docs
+                for _ in range(args.repeat)
+            ]
+            cold_ms = sum(cold) / len(cold)
+            warm_ms = sum(warm) / len(warm)
+            print(f"{file_type:>6} {cold_ms:>10.1f} {warm_ms:>10.2f} {cold_ms / warm_ms:>8.0f}x")
+
+        print(f"store: {text_store.get_store_stats()}")
+
+    shutdown_extraction_pool()
+
+
+if __name__ == "__main__":
+    main()
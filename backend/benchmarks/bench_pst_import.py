@@ -0,0 +1,144 @@
+"""Benchmark: peak memory of the PST import, collected list vs streaming walk.
+
+pypff is replaced by synthetic folders whose messages (with a body of
+``--body-kb`` KB) are created on access, like pypff's message objects.
+Each mode runs in a fresh subprocess against a temporary SQLite database
+and reports the peak RSS that ``process_pst_file`` would put in
+``PSTImportResult.peak_rss_mb``:
+
+- collect: the old import, every message object in a list first,
+- stream: ``pst_parser.iter_folder_messages``, messages released batch by batch.
+
+Both write through ``ingest_batch``.
+
+Usage:
+    python benchmarks/bench_pst_import.py [--messages 20000] [--folders 20] [--body-kb 20]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class SyntheticMessage:
+    def __init__(self, key: str, body_kb: int):
+        self.key = key
+        self.subject = f"Havi riport {key}"
+        self.sender_name = "Könyvelés"
+        self.sender_email_address = "konyveles@example.com"
+        self.plain_text_body = (f"{key} " + "x" * 1023) * body_kb
+        self.html_body = None
+        self.delivery_time = None
+
+    def get_transport_headers(self):
+        return f"Message-ID: <{self.key}@bench>\n"
+
+    def get_number_of_recipients(self):
+        return 0
+
+    def get_number_of_attachments(self):
+        return 0
+
+
+class SyntheticFolder:
+    def __init__(self, prefix: str, messages: int, body_kb: int, subfolders=()):
+        self.prefix = prefix
+        self.messages = messages
+        self.body_kb = body_kb
+        self.subfolders = list(subfolders)
+
+    def get_number_of_sub_messages(self):
+        return self.messages
+
+    def get_sub_message(self, index):
+        return SyntheticMessage(f"{self.prefix}-{index}", self.body_kb)
+
+    def get_number_of_sub_folders(self):
+        return len(self.subfolders)
+
+    def get_sub_folder(self, index):
+        return self.subfolders[index]
+
+
+def run_mode(mode: str, messages: int, folders: int, body_kb: int) -> dict:
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.core.config import settings
+    from app.core.database import Base
+    from app.services import pst_import, pst_parser
+
+    tmp = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+
+    per_folder = messages // folders
+    root = SyntheticFolder("root", 0, body_kb, [
+        SyntheticFolder(f"f{i}", per_folder, body_kb) for i in range(folders)
+    ])
+
+    memory = pst_import.PeakRSS()
+    baseline = memory.peak
+    start = time.perf_counter()
+    batch_size = settings.PST_IMPORT_BATCH_SIZE
+    if mode == "collect":
+        def collect(folder):
+            found = [folder.get_sub_message(i) for i in range(folder.get_number_of_sub_messages())]
+            for i in range(folder.get_number_of_sub_folders()):
+                found.extend(collect(folder.get_sub_folder(i)))
+            return found
+
+        all_messages = collect(root)
+        memory.sample()
+        for offset in range(0, len(all_messages), batch_size):
+            pst_import.ingest_batch(db, [pst_parser.read_pst_message(m, tmp) for m in all_messages[offset:offset + batch_size]])
+            memory.sample()
+    else:
+        batch = []
+        for message in pst_parser.iter_folder_messages(root):
+            batch.append(pst_parser.read_pst_message(message, tmp))
+            memory.sample()
+            if len(batch) >= batch_size:
+                pst_import.ingest_batch(db, batch)
+                batch = []
+        if batch:
+            pst_import.ingest_batch(db, batch)
+    return {
+        "seconds": time.perf_counter() - start,
+        "peak_mb": memory.peak_mb,
+        "growth_mb": (memory.peak - baseline) / 1024 / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--folders", type=int, default=20)
+    parser.add_argument("--body-kb", type=int, default=20)
+    parser.add_argument("--mode", choices=["collect", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.messages, args.folders, args.body_kb)))
+        return
+
+    print(f"{args.messages} messages in {args.folders} folders, {args.body_kb} KB bodies")
+    print(f"{'mode':>8} {'seconds':>8} {'peak RSS MB':>12} {'growth MB':>10}")
+    for mode in ("collect", "stream"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--messages", str(args.messages),
+             "--folders", str(args.folders), "--body-kb", str(args.body_kb)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        stats = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:>8} {stats['seconds']:>8.1f} {stats['peak_mb']:>12.0f} {stats['growth_mb']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Benchmark: PST ingestion throughput, per-message statements vs batches.
+
+Feeds synthetic messages (see ``bench_pst_import.py``) into a temporary
+SQLite database and reports messages per second for:
+
+- per-message: the old path, a Message-ID lookup, an INSERT and a flush
+  per email and an INSERT per attachment, committed at the end,
+- batched: ``ingest_batch`` with ``--batch-size`` messages per batch.
+
+Each path imports the corpus into an empty database (fresh) and then
+again (every message a duplicate). SQLite is in-process, so this measures
+statement overhead only; against MySQL every saved statement is also a
+saved network round-trip.
+
+Usage:
+    python benchmarks/bench_pst_ingest.py [--messages 20000] [--attachment-every 5] [--batch-size 500]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base
+from app.models.models import Email, EmailAttachment
+from app.services import pst_import, pst_parser
+from bench_pst_import import SyntheticFolder, SyntheticMessage
+
+
+class SyntheticAttachment:
+    name = "melléklet.txt"
+    mime_type = "text/plain"
+
+    def get_size(self):
+        return 2048
+
+    def read_buffer(self, size):
+        return b"a" * size
+
+
+class MessageWithAttachment(SyntheticMessage):
+    def get_number_of_attachments(self):
+        return 1
+
+    def get_attachment(self, index):
+        return SyntheticAttachment()
+
+
+class Folder(SyntheticFolder):
+    def __init__(self, messages: int, attachment_every: int):
+        super().__init__("ingest", messages, 2)
+        self.attachment_every = attachment_every
+
+    def get_sub_message(self, index):
+        cls = MessageWithAttachment if self.attachment_every and index % self.attachment_every == 0 else SyntheticMessage
+        return cls(f"{self.prefix}-{index}", self.body_kb)
+
+
+def ingest_per_message(db, folder):
+    """The import before batching: one lookup, insert and flush per message."""
+    for message in pst_parser.iter_folder_messages(folder):
+        record = pst_parser.read_pst_message(message, settings.EMAIL_ATTACHMENTS_DIR)
+        row = record["row"]
+        if db.query(Email).filter(Email.message_id == row["message_id"]).first():
+            continue
+        email = Email(**row)
+        db.add(email)
+        db.flush()
+        for attachment in record["attachments"]:
+            db.add(EmailAttachment(email_id=email.id, **attachment))
+    db.commit()
+
+
+def ingest_batched(db, folder, batch_size: int):
+    batch = []
+    for message in pst_parser.iter_folder_messages(folder):
+        batch.append(pst_parser.read_pst_message(message, settings.EMAIL_ATTACHMENTS_DIR))
+        if len(batch) >= batch_size:
+            pst_import.ingest_batch(db, batch)
+            batch = []
+    if batch:
+        pst_import.ingest_batch(db, batch)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--attachment-every", type=int, default=5, help="every n-th message has an attachment (0: none)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    folder = Folder(args.messages, args.attachment_every)
+    paths = {
+        "per-message": lambda db: ingest_per_message(db, folder),
+        "batched": lambda db: ingest_batched(db, folder, args.batch_size),
+    }
+
+    print(f"{args.messages} messages, attachment on every {args.attachment_every}th, batch size {args.batch_size}")
+    print(f"{'path':>12} {'fresh msg/s':>12} {'duplicate msg/s':>16}")
+    for label, ingest in paths.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            settings.EMAIL_ATTACHMENTS_DIR = tmp
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            Base.metadata.create_all(engine)
+            db = sessionmaker(bind=engine)()
+
+            rates = []
+            for _ in range(2):  # fresh, then all duplicates
+                start = time.perf_counter()
+                ingest(db)
+                rates.append(args.messages / (time.perf_counter() - start))
+            assert db.query(Email).count() == args.messages
+            db.close()
+            engine.dispose()
+        print(f"{label:>12} {rates[0]:>12.0f} {rates[1]:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Benchmark: PST import throughput by worker count, and event-loop stalls.
+
+pypff is replaced by a synthetic module (written to a temporary directory
+on ``sys.path``, so spawned workers import it too) whose messages cost
+``--parse-us`` microseconds of CPU each to read, like pypff decoding a
+message. ``process_pst_file`` imports the archive into a temporary
+SQLite database with 1, 2, 4... parser workers; for comparison the
+``in-loop`` row parses in the server process on the event loop, as the
+import did before the worker pool.
+
+While each import runs, a ticker coroutine sleeps ``TICK_MS`` at a time
+and records how late it wakes up: the longest stall is how long an API
+request could have waited.
+
+Throughput only scales with the worker count up to the number of cores
+(``os.cpu_count()`` is printed); the single writer caps it as well.
+
+Usage:
+    python benchmarks/bench_pst_parallel.py [--messages 20000] [--folders 16] [--parse-us 300] [--workers 1,2,4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TICK_MS = 10
+
+SYNTHETIC_PYPFF = '''
+import json
+import time
+
+
+class message:
+    def __init__(self, key, parse_us):
+        deadline = time.perf_counter() + parse_us / 1e6
+        while time.perf_counter() < deadline:
+            pass
+        self.subject = "Havi riport " + key
+        self.sender_name = "Könyvelés"
+        self.sender_email_address = "konyveles@example.com"
+        self.plain_text_body = key + " " + "x" * 2000
+        self.html_body = None
+        self.delivery_time = None
+        self._key = key
+
+    def get_transport_headers(self):
+        return "Message-ID: <" + self._key + "@bench>\\n"
+
+    def get_number_of_recipients(self):
+        return 0
+
+    def get_number_of_attachments(self):
+        return 0
+
+
+class folder:
+    def __init__(self, spec, prefix):
+        self._spec = spec
+        self._prefix = prefix
+
+    def get_number_of_sub_messages(self):
+        return self._spec["messages"]
+
+    def get_sub_message(self, index):
+        return message(self._prefix + "-" + str(index), self._spec["parse_us"])
+
+    def get_number_of_sub_folders(self):
+        return len(self._spec["folders"])
+
+    def get_sub_folder(self, index):
+        return folder(self._spec["folders"][index], self._prefix + "." + str(index))
+
+
+class file:
+    def open(self, path):
+        with open(path) as f:
+            self._spec = json.load(f)
+
+    def get_root_folder(self):
+        return folder(self._spec, "root")
+
+    def close(self):
+        pass
+'''
+
+
+async def ticker(stalls: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_MS / 1000)
+        stalls.append((time.perf_counter() - start) * 1000 - TICK_MS)
+
+
+async def import_in_loop(pst_path: str, db):
+    """The import before the worker pool: pypff read on the event loop."""
+    import pypff
+
+    from app.core.config import settings
+    from app.services import pst_import, pst_parser
+
+    pst_file = pypff.file()
+    pst_file.open(pst_path)
+    batch = []
+    for message in pst_parser.iter_folder_messages(pst_file.get_root_folder()):
+        batch.append(pst_parser.read_pst_message(message, settings.EMAIL_ATTACHMENTS_DIR))
+        if len(batch) >= settings.PST_IMPORT_BATCH_SIZE:
+            pst_import.ingest_batch(db, batch)
+            batch = []
+            await asyncio.sleep(0)  # the progress broadcast
+    if batch:
+        pst_import.ingest_batch(db, batch)
+
+
+async def run(label: str, workers: int, spec: dict, tmp: str) -> dict:
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.core.config import settings
+    from app.core.database import Base
+    from app.services import pst_import
+
+    run_dir = os.path.join(tmp, label)
+    os.makedirs(run_dir)
+    settings.EMAIL_ATTACHMENTS_DIR = run_dir
+    settings.PST_IMPORT_WORKERS = workers
+    engine = create_engine(f"sqlite:///{os.path.join(run_dir, 'bench.db')}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    pst_path = os.path.join(run_dir, "archive.pst")
+    with open(pst_path, "w") as f:
+        json.dump(spec, f)
+
+    stalls = []
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(stalls, stop))
+    start = time.perf_counter()
+    if label == "in-loop":
+        await import_in_loop(pst_path, db)
+        imported = None
+    else:
+        result = await pst_import.process_pst_file(pst_path, db)
+        assert result.success, result.errors
+        imported = result.imported
+    seconds = time.perf_counter() - start
+    stop.set()
+    await tick
+    db.close()
+    engine.dispose()
+
+    stalls.sort()
+    return {
+        "seconds": seconds,
+        "imported": imported,
+        "p99_stall_ms": stalls[int(len(stalls) * 0.99)] if stalls else 0.0,
+        "max_stall_ms": stalls[-1] if stalls else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--folders", type=int, default=16)
+    parser.add_argument("--parse-us", type=int, default=300, help="CPU time to read one message")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    args = parser.parse_args()
+
+    per_folder = args.messages // args.folders
+    spec = {
+        "messages": 0,
+        "parse_us": args.parse_us,
+        "folders": [{"messages": per_folder, "parse_us": args.parse_us, "folders": []} for _ in range(args.folders)],
+    }
+    total = per_folder * args.folders
+
+    print(f"{total} messages in {args.folders} folders, {args.parse_us} us to read each, {os.cpu_count()} CPUs")
+    print(f"{'mode':>10} {'seconds':>8} {'msg/s':>8} {'p99 stall ms':>13} {'max stall ms':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        module_dir = os.path.join(tmp, "synthetic_pypff")
+        os.makedirs(module_dir)
+        with open(os.path.join(module_dir, "pypff.py"), "w", encoding="utf-8") as f:
+            f.write(SYNTHETIC_PYPFF)
+        sys.path.insert(0, module_dir)
+
+        modes = [("in-loop", 0)] + [(f"{n} worker" + ("s" if n > 1 else ""), n) for n in map(int, args.workers.split(","))]
+        for label, workers in modes:
+            stats = asyncio.run(run(label.replace(" ", "-"), workers, spec, tmp))
+            if stats["imported"] is not None:
+                assert stats["imported"] == total
+            print(
+                f"{label:>10} {stats['seconds']:>8.1f} {total / stats['seconds']:>8.0f} "
+                f"{stats['p99_stall_ms']:>13.1f} {stats['max_stall_ms']:>13.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
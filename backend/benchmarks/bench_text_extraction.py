@@ -0,0 +1,166 @@
+"""Benchmark: in-process text extraction vs the extraction process pool.
+
+Generates a mixed corpus (PDF, DOCX, XLSX fixtures) in a temporary
+directory and measures:
+
+- corpus: extracting every file serially in-process (the old behaviour)
+  vs ``extract_many`` over the worker pool,
+- large PDF: one long PDF in-process vs page-parallel in the pool,
+- event loop: the worst delay of a 10 ms ticker while the large PDF is
+  extracted inside an async endpoint, inline vs
+  ``extract_document_content_async``.
+
+Usage:
+    python benchmarks/bench_text_extraction.py [--pdfs 12] [--pdf-pages 20] [--docx 12] [--xlsx 12] [--large-pages 400] [--workers 4]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import text_extraction
+from app.services.text_extraction import (
+    extract_document_content,
+    extract_document_content_async,
+    extract_many,
+    extract_text_from_docx,
+    extract_text_from_pdf,
+    extract_text_from_xlsx,
+    shutdown_extraction_pool,
+)
+
+LINE = "A munkafolyamat dokumentációja: határidők, felelősök, jóváhagyási lépések és mellékletek. "
+
+
+def make_pdf(path: str, pages: int):
+    from reportlab.pdfgen import canvas
+
+    pdf = canvas.Canvas(path)
+    for page in range(pages):
+        y = 760
+        for line in range(40):
+            pdf.drawString(40, y, f"{page + 1}.{line + 1} {LINE[:80]}")
+            y -= 18
+        pdf.showPage()
+    pdf.save()
+
+
+def make_docx(path: str, paragraphs: int):
+    from docx import Document
+
+    doc = Document()
+    for i in range(paragraphs):
+        doc.add_paragraph(f"{i + 1}. {LINE * 3}")
+    doc.save(path)
+
+
+def make_xlsx(path: str, rows: int):
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    sheet = wb.active
+    for i in range(rows):
+        sheet.append([i, f"tétel {i}", i * 1.5, "Igen" if i % 2 else "Nem", LINE[:40]])
+    wb.save(path)
+
+
+def extract_inline(path: str, file_type: str):
+    if file_type == "pdf":
+        return extract_text_from_pdf(path), None
+    if file_type == "docx":
+        return extract_text_from_docx(path), None
+    return extract_text_from_xlsx(path)
+
+
+async def ticker_max_delay(work) -> float:
+    """Run ``work`` next to a 10 ms ticker and return the ticker's worst delay (ms)."""
+    delays = []
+    done = asyncio.Event()
+
+    async def tick():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            delays.append((time.perf_counter() - start) * 1000 - 10)
+
+    ticker = asyncio.create_task(tick())
+    await asyncio.sleep(0.05)
+    await work()
+    done.set()
+    await ticker
+    return max(delays)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdfs", type=int, default=12)
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--docx", type=int, default=12)
+    parser.add_argument("--xlsx", type=int, default=12)
+    parser.add_argument("--large-pages", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    text_extraction.settings.EXTRACTION_WORKERS = args.workers
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = []
+        for i in range(args.pdfs):
+            path = os.path.join(tmp, f"doc{i}.pdf")
+            make_pdf(path, args.pdf_pages)
+            corpus.append((path, "pdf"))
+        for i in range(args.docx):
+            path = os.path.join(tmp, f"doc{i}.docx")
+            make_docx(path, 300)
+            corpus.append((path, "docx"))
+        for i in range(args.xlsx):
+            path = os.path.join(tmp, f"sheet{i}.xlsx")
+            make_xlsx(path, 3000)
+            corpus.append((path, "xlsx"))
+        large = os.path.join(tmp, "large.pdf")
+        make_pdf(large, args.large_pages)
+
+        # Start the workers outside the measurements
+        extract_many(corpus[: args.workers])
+
+        print(f"corpus: {args.pdfs} pdf x {args.pdf_pages} pages, {args.docx} docx, {args.xlsx} xlsx; {args.workers} workers")
+        print(f"{'case':>28} {'in-process s':>13} {'pool s':>8} {'speedup':>8}")
+
+        start = time.perf_counter()
+        inline_results = [extract_inline(path, file_type) for path, file_type in corpus]
+        inline_s = time.perf_counter() - start
+        start = time.perf_counter()
+        pool_results = extract_many(corpus)
+        pool_s = time.perf_counter() - start
+        assert [r[0] for r in inline_results] == [r[0] for r in pool_results]
+        print(f"{'mixed corpus':>28} {inline_s:>13.2f} {pool_s:>8.2f} {inline_s / pool_s:>7.1f}x")
+
+        start = time.perf_counter()
+        inline_text = extract_text_from_pdf(large)
+        inline_s = time.perf_counter() - start
+        start = time.perf_counter()
+        pool_text, _ = extract_document_content(large, "pdf")
+        pool_s = time.perf_counter() - start
+        assert inline_text == pool_text
+        label = f"{args.large_pages}-page pdf"
+        print(f"{label:>28} {inline_s:>13.2f} {pool_s:>8.2f} {inline_s / pool_s:>7.1f}x")
+
+        async def inline_on_loop():
+            extract_text_from_pdf(large)
+
+        async def offloaded():
+            await extract_document_content_async(large, "pdf")
+
+        inline_stall = asyncio.run(ticker_max_delay(inline_on_loop))
+        pool_stall = asyncio.run(ticker_max_delay(offloaded))
+        print(f"{'max event-loop stall (ms)':>28} {inline_stall:>13.0f} {pool_stall:>8.0f}")
+
+    shutdown_extraction_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,7 @@
+import asyncio
+import os
+import tempfile
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -5,8 +9,11 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.main import app as application
+from app.core.config import settings
 from app.core.database import Base, get_db
 import app.models.models  # noqa: F401
+from app.routers import documents
+from app.services import job_queue
 
 engine = create_engine(
     "sqlite:///:memory:",
@@ -27,6 +34,18 @@ def override_get_db():
 
 
 application.dependency_overrides[get_db] = override_get_db
+job_queue.set_session_factory(TestingSessionLocal)
+
+# Fresh storage per run, like the in-memory database: uploads, extracted
+# texts, attachments and the full-text index stay out of the real storage
+STORAGE_ROOT = tempfile.mkdtemp(prefix="test_storage_")
+settings.FULLTEXT_INDEX_PATH = os.path.join(STORAGE_ROOT, "fulltext", "documents.db")
+settings.EXTRACTED_TEXT_DIR = os.path.join(STORAGE_ROOT, "extracted_text")
+settings.UPLOAD_DIR = os.path.join(STORAGE_ROOT, "uploads")
+settings.EMAIL_ATTACHMENTS_DIR = os.path.join(STORAGE_ROOT, "emails")
+documents.STORAGE_DIR = os.path.join(STORAGE_ROOT, "documents")
+documents.VERSIONS_DIR = os.path.join(documents.STORAGE_DIR, "versions")
+os.makedirs(documents.VERSIONS_DIR, exist_ok=True)
 
 
 @pytest.fixture()
@@ -42,3 +61,9 @@ def db_session():
         yield db
     finally:
         db.close()
+
+
+@pytest.fixture()
+def run_jobs():
+    """Work off the queued background jobs (TestClient starts no workers)."""
+    return lambda: asyncio.run(job_queue.run_pending_jobs())
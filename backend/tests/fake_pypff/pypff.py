@@ -0,0 +1,94 @@
+"""Stand-in for pypff in the PST import tests.
+
+A plain module (not a monkeypatched one) so that spawned parser workers can
+import it too: the tests put this directory on ``sys.path``. The "archive"
+is a JSON folder tree::
+
+    {"messages": [{"key": "a", "attachments": [{"name": "x.txt", "data": "..."}]}],
+     "folders": [{"messages": [...], "folders": [...]}]}
+
+A message with ``"exit": true`` kills the process reading it, like a
+parser crash would. The key of every message read is appended to
+``<archive>.reads`` (from any process).
+"""
+import json
+import os
+
+_reads_path = None
+
+
+class attachment:
+    def __init__(self, spec):
+        self.name = spec["name"]
+        self.mime_type = "text/plain"
+        self._data = spec["data"].encode("utf-8")
+        self._offset = 0
+
+    def get_size(self):
+        return len(self._data)
+
+    def read_buffer(self, size):
+        chunk = self._data[self._offset:self._offset + size]
+        self._offset += len(chunk)
+        return chunk
+
+
+class message:
+    def __init__(self, spec):
+        if spec.get("exit"):
+            os._exit(1)
+        with open(_reads_path, "a", encoding="utf-8") as f:
+            f.write(spec["key"] + "\n")
+        self.key = spec["key"]
+        self.subject = f"Tárgy {self.key}"
+        self.sender_name = "Feladó"
+        self.sender_email_address = "felado@example.com"
+        self.plain_text_body = f"Törzs {self.key}"
+        self.html_body = None
+        self.delivery_time = None
+        self._attachments = spec.get("attachments", [])
+
+    def get_transport_headers(self):
+        return f"Subject: x\nMessage-ID: <{self.key}@pst.test>\n"
+
+    def get_number_of_recipients(self):
+        return 0
+
+    def get_number_of_attachments(self):
+        return len(self._attachments)
+
+    def get_attachment(self, index):
+        return attachment(self._attachments[index])
+
+
+class folder:
+    """Creates message objects on access, like pypff does."""
+
+    def __init__(self, spec):
+        self._spec = spec
+
+    def get_number_of_sub_messages(self):
+        return len(self._spec.get("messages", []))
+
+    def get_sub_message(self, index):
+        return message(self._spec["messages"][index])
+
+    def get_number_of_sub_folders(self):
+        return len(self._spec.get("folders", []))
+
+    def get_sub_folder(self, index):
+        return folder(self._spec["folders"][index])
+
+
+class file:
+    def open(self, path):
+        global _reads_path
+        _reads_path = path + ".reads"
+        with open(path, "r", encoding="utf-8") as f:
+            self._root = json.load(f)
+
+    def get_root_folder(self):
+        return folder(self._root)
+
+    def close(self):
+        pass
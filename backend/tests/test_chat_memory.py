@@ -0,0 +1,104 @@
+"""Tests for the rolling chat conversation summary (with a stand-in for the chat call)."""
+import pytest
+
+from app.core.config import settings
+from app.models.models import BackgroundJob, ChatConversation, ChatMessage
+from app.routers import chat
+from app.services import ai_service, chat_memory
+
+
+class FakeChat:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, messages, db, provider, model_name, system_prompt=None):
+        self.calls.append((system_prompt, messages))
+        if system_prompt == chat_memory.SUMMARY_SYSTEM_PROMPT:
+            return f"Összefoglaló #{len(self.calls)}", 500, 50
+        return f"Válasz erre: {messages[-1]['content']}", 100, 10
+
+    async def chat_with_target(self, target, messages, system_prompt=None):
+        return (*await self(messages, None, target["provider"], target["model"], system_prompt), 0.0)
+
+
+@pytest.fixture()
+def conversation(db_session, monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_SUMMARY_TRIGGER_MESSAGES", 6)
+    monkeypatch.setattr(settings, "CHAT_SUMMARY_KEEP_MESSAGES", 2)
+    fake = FakeChat()
+    monkeypatch.setattr(chat, "chat_with_target", fake.chat_with_target)
+    monkeypatch.setattr(chat_memory, "send_chat_message_with_provider", fake)
+    conv = ChatConversation(title="Hosszú beszélgetés", ai_provider="ollama")
+    db_session.add(conv)
+    db_session.commit()
+    yield conv, fake
+    db_session.query(BackgroundJob).filter(BackgroundJob.kind == "summarize_conversation").delete()
+    db_session.query(ChatMessage).filter(ChatMessage.conversation_id == conv.id).delete()
+    db_session.delete(conv)
+    db_session.commit()
+
+
+def ask(client, conv_id, content):
+    response = client.post(f"/api/v1/chat/conversations/{conv_id}/message", json={"content": content})
+    assert response.status_code == 200
+
+
+def test_older_turns_are_replaced_by_the_summary(client, db_session, conversation, run_jobs):
+    conv, fake = conversation
+    for i in range(1, 3):
+        ask(client, conv.id, f"Kérdés {i}")
+    assert db_session.query(BackgroundJob).filter(BackgroundJob.kind == "summarize_conversation").count() == 0
+
+    ask(client, conv.id, "Kérdés 3")  # 6 messages: a summary is due
+    jobs = db_session.query(BackgroundJob).filter(BackgroundJob.kind == "summarize_conversation").all()
+    assert len(jobs) == 1
+    assert chat_memory.schedule_summary(db_session, conv) is None  # already queued
+
+    run_jobs()
+    db_session.refresh(conv)
+    assert conv.summary.startswith("Összefoglaló")
+    summarized = fake.calls[-1][1][0]["content"]
+    assert "Felhasználó: Kérdés 1" in summarized and "Asszisztens: Válasz erre: Kérdés 2" in summarized
+    assert "Kérdés 3" not in summarized
+    # The first two turns are folded in, the newest one stays
+    second_answer = (
+        db_session.query(ChatMessage)
+        .filter(ChatMessage.conversation_id == conv.id, ChatMessage.content == "Válasz erre: Kérdés 2")
+        .one()
+    )
+    assert conv.summary_through_id == second_answer.id
+
+    ask(client, conv.id, "Kérdés 4")
+    system_prompt, messages = fake.calls[-1]
+    assert conv.summary in system_prompt
+    assert [m["content"] for m in messages] == ["Kérdés 3", "Válasz erre: Kérdés 3", "Kérdés 4"]
+
+
+def test_the_summary_is_updated_not_restarted(client, db_session, conversation, run_jobs):
+    conv, fake = conversation
+    for i in range(1, 4):
+        ask(client, conv.id, f"Kérdés {i}")
+    run_jobs()
+    for i in range(4, 6):
+        ask(client, conv.id, f"Kérdés {i}")
+    run_jobs()
+
+    db_session.refresh(conv)
+    summarized = fake.calls[-1][1][0]["content"]
+    assert summarized.startswith("Eddigi összefoglaló:\nÖsszefoglaló")
+    assert "Kérdés 2" not in summarized and "Felhasználó: Kérdés 3" in summarized
+    assert conv.summary == f"Összefoglaló #{len(fake.calls)}"
+
+
+def test_a_turn_reads_the_ai_settings_once(client, conversation, monkeypatch):
+    conv, _ = conversation
+    reads = []
+    real_get_ai_settings = ai_service.get_ai_settings
+
+    def get_ai_settings(db):
+        reads.append(1)
+        return real_get_ai_settings(db)
+
+    monkeypatch.setattr(ai_service, "get_ai_settings", get_ai_settings)
+    ask(client, conv.id, "Kérdés")
+    assert len(reads) == 1
@@ -0,0 +1,163 @@
+"""Tests for the chat WebSocket stream and its frame coalescing (with a stand-in LLM)."""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.core import database
+from app.models.models import ChatConversation, ChatMessage, TokenUsage
+from app.routers import chat
+from app.services import ai_service
+from app.services.chat_stream import TokenCoalescer
+from tests.conftest import TestingSessionLocal
+
+TOKENS = ["Szia", "!", " Miben", " segíthetek", " ma", "?"] * 20
+real_stream_ollama_response = chat.stream_ollama_response
+
+
+async def stand_in_stream(messages, ollama_url, model, system_prompt=None):
+    for token in TOKENS:
+        yield {"token": token, "done": False}
+    yield {"done": True, "input_tokens": 12, "output_tokens": len(TOKENS)}
+
+
+@pytest.fixture()
+def conversation(db_session, monkeypatch):
+    monkeypatch.setattr(database, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(chat, "stream_ollama_response", stand_in_stream)
+    conv = ChatConversation(title="Teszt", ai_provider="ollama")
+    db_session.add(conv)
+    db_session.commit()
+    yield conv.id
+    db_session.query(ChatMessage).filter(ChatMessage.conversation_id == conv.id).delete()
+    db_session.query(TokenUsage).delete()
+    db_session.delete(conv)
+    db_session.commit()
+
+
+def exchange(client, conv_id, message):
+    frames = []
+    with client.websocket_connect(f"/api/v1/chat/conversations/{conv_id}/stream") as ws:
+        ws.send_json(message)
+        while True:
+            frames.append(json.loads(ws.receive_text()))
+            if frames[-1].get("assistant_message_id") or frames[-1].get("error"):
+                return frames
+
+
+def test_stream_sends_a_frame_per_token_by_default(client, conversation):
+    frames = exchange(client, conversation, {"content": "Szia", "use_rag": False})
+
+    assert frames[:len(TOKENS)] == [{"token": t, "done": False} for t in TOKENS]
+    # The provider's done frame, then the final one with the message ids
+    assert frames[len(TOKENS)] == {"done": True, "input_tokens": 12, "output_tokens": len(TOKENS)}
+    assert len(frames) == len(TOKENS) + 2
+    assert frames[-1]["output_tokens"] == len(TOKENS)
+
+
+def test_stream_coalesces_tokens_when_the_client_asks(client, conversation, db_session):
+    frames = exchange(client, conversation, {
+        "content": "Szia", "use_rag": False, "coalesce": {"interval_ms": 1000, "max_chars": 64},
+    })
+
+    assert frames[0] == {"coalesce": {"interval_ms": 1000, "max_chars": 64}}
+    tokens = [f["token"] for f in frames[1:-1]]
+    assert "".join(tokens) == "".join(TOKENS)
+    assert len(tokens) < len(TOKENS) / 5
+    assert all(len(t) >= 64 for t in tokens[:-1])
+    assert frames[-1]["done"] and frames[-1]["input_tokens"] == 12
+
+    saved = db_session.get(ChatMessage, frames[-1]["assistant_message_id"])
+    assert saved.content == "".join(TOKENS)
+
+
+def test_forced_response_is_one_frame_when_coalescing(client, conversation, monkeypatch):
+    async def no_context(query, db, documents_only=False):
+        return "", False, []
+
+    monkeypatch.setattr(chat, "build_rag_context", no_context)
+    frames = exchange(client, conversation, {"content": "Mi a szabály?", "documents_only": True, "coalesce": True})
+
+    assert frames[0] == {"coalesce": {"interval_ms": 30, "max_chars": 64}}
+    assert [f["token"] for f in frames[1:-1]] == [chat.NO_DOCUMENT_FOUND_MESSAGE]
+    assert frames[-1]["assistant_message_id"]
+
+
+def test_stream_resolves_the_target_like_the_other_endpoints(client, conversation, db_session, monkeypatch):
+    ai_settings = {"openrouter_default_model": "default/model"}
+    monkeypatch.setattr(ai_service, "get_ai_settings", lambda db: dict(ai_settings))
+    models = []
+
+    async def stand_in_openrouter(messages, api_key, model, system_prompt=None):
+        models.append((api_key, model))
+        yield {"token": "Rendben", "done": False}
+        yield {"done": True, "input_tokens": 5, "output_tokens": 1}
+
+    monkeypatch.setattr(chat, "stream_openrouter_response", stand_in_openrouter)
+    db_session.get(ChatConversation, conversation).ai_provider = "openrouter"
+    db_session.commit()
+
+    frames = exchange(client, conversation, {"content": "Szia", "use_rag": False})
+    assert frames == [{"error": "OpenRouter API kulcs nincs beállítva."}]
+
+    ai_settings["openrouter_api_key"] = "k"
+    frames = exchange(client, conversation, {"content": "Szia", "use_rag": False})
+    assert frames[-1]["assistant_message_id"]
+    assert models == [("k", "default/model")]
+
+
+def test_coalescer_flushes_after_the_interval():
+    sent = []
+
+    async def send_text(text):
+        sent.append(json.loads(text)["token"])
+
+    async def run():
+        coalescer = TokenCoalescer(send_text, {"interval_ms": 20, "max_chars": 1000})
+        await coalescer.add("a")
+        await coalescer.add("b")
+        await asyncio.sleep(0.06)  # the provider pauses: the buffer goes out anyway
+        await coalescer.add("c")
+        await coalescer.close()
+
+    asyncio.run(run())
+    assert sent == ["ab", "c"]
+
+
+def test_ollama_turns_share_a_stable_prompt_prefix(client, conversation, monkeypatch):
+    requests = []
+
+    def ollama(request):
+        requests.append((request.url.path, json.loads(request.content)))
+        lines = [{"message": {"role": "assistant", "content": t}, "done": False} for t in ("Rendben", ".")]
+        lines.append({"message": {"role": "assistant", "content": ""}, "done": True, "prompt_eval_count": 40, "eval_count": 2})
+        return httpx.Response(200, content="\n".join(json.dumps(line) for line in lines))
+
+    async def rag_context(query, db, documents_only=False):
+        chunks = [{"content": f"Részlet a kérdéshez: {query}", "document_filename": "szabályzat.pdf", "score": 0.9}]
+        return chat.format_rag_context(chunks), True, chunks
+
+    monkeypatch.setattr(chat, "stream_ollama_response", real_stream_ollama_response)
+    monkeypatch.setattr(chat, "get_http_client", lambda provider: httpx.AsyncClient(transport=httpx.MockTransport(ollama)))
+    monkeypatch.setattr(chat, "build_rag_context", rag_context)
+
+    first = exchange(client, conversation, {"content": "Első kérdés", "use_rag": True})
+    second = exchange(client, conversation, {"content": "Második kérdés", "use_rag": True})
+
+    assert [path for path, _ in requests] == ["/api/chat", "/api/chat"]
+    assert all(body["keep_alive"] == "30m" and body["options"]["num_ctx"] == 8192 for _, body in requests)
+    first_messages, second_messages = (body["messages"] for _, body in requests)
+    # The fixed system prompt and the earlier turns open both prompts; the context comes last
+    assert first_messages[0]["role"] == "system" and "Részlet" not in first_messages[0]["content"]
+    assert second_messages[0] == first_messages[0]
+    assert second_messages[1:3] == [
+        {"role": "user", "content": "Első kérdés"},
+        {"role": "assistant", "content": "Rendben."},
+    ]
+    question = second_messages[-1]["content"]
+    assert "Részlet a kérdéshez: Második kérdés" in question and question.endswith("\n\nMásodik kérdés")
+
+    assert first[-1]["input_tokens"] == 40 and first[-1]["output_tokens"] == 2
+    assert isinstance(second[-1]["ttft_ms"], int)
+    assert second[-1]["context"]["context_length"] == 8192 and second[-1]["context"]["rag"] > 0
@@ -0,0 +1,82 @@
+"""Tests for the chat prompt token budget."""
+import asyncio
+
+from app.core.config import settings
+from app.services import context_packer
+from app.services.ai_service import estimate_tokens
+from app.services.context_packer import context_length, pack_context
+
+
+def words(count: int) -> str:
+    return " ".join(["számla"] * count)  # 7 characters a word: 2 tokens
+
+
+def history(turns: int, words_per_message: int):
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"{i}. kérdés " + words(words_per_message)})
+        messages.append({"role": "assistant", "content": f"{i}. válasz " + words(words_per_message)})
+    return messages + [{"role": "user", "content": "Mi a határidő?"}]
+
+
+def chunk(score: float, word_count: int):
+    return {"content": words(word_count), "document_filename": f"doc-{score}.pdf", "score": score}
+
+
+def test_everything_fits_a_large_window():
+    messages = history(3, 20)
+    chunks = [chunk(0.9, 50), chunk(0.5, 50)]
+
+    packed_history, packed_chunks, usage = pack_context(32000, "Rendszer", messages, chunks)
+
+    assert packed_history == messages
+    assert packed_chunks == chunks
+    assert usage["dropped_messages"] == usage["dropped_chunks"] == usage["truncated_chunks"] == 0
+    assert usage["budget"] == 32000 - settings.CHAT_ANSWER_RESERVE_TOKENS
+    assert usage["used"] == usage["system"] + usage["rag"] + usage["history"] <= usage["budget"]
+
+
+def test_lowest_value_items_go_first(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_ANSWER_RESERVE_TOKENS", 500)
+    monkeypatch.setattr(settings, "CHAT_RAG_BUDGET_SHARE", 0.6)
+    messages = history(10, 100)  # ~200 tokens a message
+    chunks = [chunk(0.45, 400), chunk(0.9, 400), chunk(0.6, 400), chunk(0.7, 400)]  # ~800 tokens each
+
+    packed_history, packed_chunks, usage = pack_context(4096, "Rendszer", messages, chunks)
+
+    # The best chunks whole, the next one cut short, the weakest dropped
+    assert [c["score"] for c in packed_chunks] == [0.9, 0.7, 0.6]
+    assert [c.get("truncated", False) for c in packed_chunks] == [False, False, True]
+    assert packed_chunks[2]["content"].endswith("[…]")
+    assert usage["dropped_chunks"] == 1 and usage["truncated_chunks"] == 1
+
+    # The newest messages and the question stay, the oldest are dropped
+    assert packed_history[-1] == messages[-1]
+    assert packed_history == messages[len(messages) - len(packed_history):]
+    assert usage["dropped_messages"] == len(messages) - len(packed_history) > 0
+    assert usage["used"] <= usage["budget"] == 4096 - 500
+    assert usage["rag"] <= int((usage["budget"] - usage["system"] - estimate_tokens("Mi a határidő?") - 4) * 0.6)
+
+
+def test_rag_gets_what_a_short_history_leaves(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_ANSWER_RESERVE_TOKENS", 500)
+    chunks = [chunk(0.9 - i / 100, 300) for i in range(5)]
+
+    _, packed_chunks, usage = pack_context(4096, "Rendszer", history(0, 0), chunks)
+
+    assert len(packed_chunks) == 5 - usage["dropped_chunks"] >= 5 - 1
+    assert usage["rag"] > 0.6 * usage["budget"]
+
+
+def test_context_length_per_provider(monkeypatch):
+    monkeypatch.setattr(settings, "OLLAMA_CONTEXT_LENGTH", 16384)
+    monkeypatch.setattr(context_packer, "get_model_context_length", lambda model: {"big/model": 131072}.get(model))
+
+    async def no_models(api_key):
+        return []
+
+    monkeypatch.setattr(context_packer, "fetch_openrouter_models", no_models)
+
+    assert asyncio.run(context_length({"provider": "ollama", "model": "llama"})) == 16384
+    assert asyncio.run(context_length({"provider": "openrouter", "model": "big/model", "api_key": "k"})) == 131072
+    assert asyncio.run(context_length({"provider": "openrouter", "model": "unknown", "api_key": "k"})) == settings.DEFAULT_CONTEXT_LENGTH
@@ -785,7 +785,7 @@ def test_search_highlights_format(client):
 
 # --- US-017: Knowledge Base Tests ---
 
-def test_toggle_knowledge_creates_chunks(client, db_session):
+def test_toggle_knowledge_creates_chunks(client, db_session, run_jobs):
     """Test that adding a document to knowledge base creates chunks."""
     from app.models.models import DocumentChunk
 
@@ -803,13 +803,15 @@ def test_toggle_knowledge_creates_chunks(client, db_session):
     response = client.post(f"/api/v1/documents/{doc_id}/toggle-knowledge")
     assert response.status_code == 200
     assert response.json()["is_knowledge"] == True
+    assert response.json()["job_id"] is not None
+    run_jobs()
 
     # Check that chunks were created
     chunks = db_session.query(DocumentChunk).filter(DocumentChunk.document_id == doc_id).all()
     assert len(chunks) >= 1
 
 
-def test_toggle_knowledge_deletes_chunks_on_removal(client, db_session):
+def test_toggle_knowledge_deletes_chunks_on_removal(client, db_session, run_jobs):
     """Test that removing a document from knowledge base deletes chunks."""
     from app.models.models import DocumentChunk
 
@@ -823,6 +825,7 @@ def test_toggle_knowledge_deletes_chunks_on_removal(client, db_session):
     response = client.post(f"/api/v1/documents/{doc_id}/toggle-knowledge")
     assert response.status_code == 200
     assert response.json()["is_knowledge"] == True
+    run_jobs()
 
     # Verify chunks were created
     chunks = db_session.query(DocumentChunk).filter(DocumentChunk.document_id == doc_id).all()
@@ -832,13 +835,14 @@ def test_toggle_knowledge_deletes_chunks_on_removal(client, db_session):
     response = client.post(f"/api/v1/documents/{doc_id}/toggle-knowledge")
     assert response.status_code == 200
     assert response.json()["is_knowledge"] == False
+    run_jobs()
 
     # Verify chunks were deleted
     chunks = db_session.query(DocumentChunk).filter(DocumentChunk.document_id == doc_id).all()
     assert len(chunks) == 0
 
 
-def test_toggle_knowledge_with_large_document(client, db_session):
+def test_toggle_knowledge_with_large_document(client, db_session, run_jobs):
     """Test chunking with a larger document creates multiple chunks."""
     from app.models.models import DocumentChunk
 
@@ -851,13 +855,14 @@ def test_toggle_knowledge_with_large_document(client, db_session):
     # Add to knowledge base
     response = client.post(f"/api/v1/documents/{doc_id}/toggle-knowledge")
     assert response.status_code == 200
+    run_jobs()
 
     # Should have multiple chunks
     chunks = db_session.query(DocumentChunk).filter(DocumentChunk.document_id == doc_id).all()
     assert len(chunks) >= 2
 
 
-def test_toggle_knowledge_preserves_chunk_order(client, db_session):
+def test_toggle_knowledge_preserves_chunk_order(client, db_session, run_jobs):
     """Test that chunks are stored in order with correct indices."""
     from app.models.models import DocumentChunk
 
@@ -869,6 +874,7 @@ def test_toggle_knowledge_preserves_chunk_order(client, db_session):
 
     # Add to knowledge base
     client.post(f"/api/v1/documents/{doc_id}/toggle-knowledge")
+    run_jobs()
 
     # Check chunk indices are sequential
     chunks = db_session.query(DocumentChunk).filter(
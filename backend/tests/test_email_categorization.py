@@ -0,0 +1,192 @@
+"""Tests for the concurrent AI email categorization (with a stand-in for the chat call)."""
+import asyncio
+import json
+import re
+
+import httpx
+import pytest
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.models.models import BackgroundJob, Email, TokenUsage
+from app.services import email_categorization
+from app.services.ai_limits import TokenBucket
+from app.services.email_prompts import parse_batch_reply
+from tests.conftest import engine
+
+
+class FakeChat:
+    """Answers like the model would, one email or a batch, after ``delay`` seconds.
+
+    Emails are told apart by subject. ``omit``: left out of batched
+    replies; ``garble``: a batched prompt containing one gets a reply
+    that is no JSON array.
+    """
+
+    def __init__(self, delay: float = 0.002, fail=(), rate_limited=(), omit=(), garble=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.rate_limited = set(rate_limited)
+        self.omit = set(omit)
+        self.garble = set(garble)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    async def __call__(self, target, messages, system_prompt=None):
+        content = messages[0]["content"]
+        batch = re.findall(r"### Email ID: (\d+)\nTárgy: (.*)", content)
+        subjects = [subject for _, subject in batch] or [content.splitlines()[0].removeprefix("Tárgy: ")]
+        self.calls.append(subjects)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        if self.rate_limited & set(subjects):
+            self.rate_limited -= set(subjects)
+            request = httpx.Request("POST", "https://openrouter.test/chat/completions")
+            response = httpx.Response(429, headers={"Retry-After": "0"}, request=request)
+            raise httpx.HTTPStatusError("429 Too Many Requests", request=request, response=response)
+        if self.fail & set(subjects):
+            raise RuntimeError("model unavailable")
+        if not batch:
+            return '{"importance": "Magas", "reason": "Határidő"}', 120, 15, 0.0
+        if self.garble & set(subjects):
+            return "Sajnos nem tudom megállapítani.", 400, 10, 0.0
+        items = [
+            {"email_id": int(email_id), "importance": "Magas", "reason": "Határidő"}
+            for email_id, subject in batch if subject not in self.omit
+        ]
+        return "```json\n" + json.dumps(items, ensure_ascii=False) + "\n```", 400, 15 * len(items), 0.0
+
+
+@pytest.fixture()
+def emails(db_session):
+    created = []
+
+    def create(count: int):
+        rows = [Email(subject=f"Levél {i}", sender="felado@example.com", body="Törzs") for i in range(count)]
+        db_session.add_all(rows)
+        db_session.commit()
+        created.extend(row.id for row in rows)
+        return [row.id for row in rows]
+
+    yield create
+    db_session.query(Email).filter(Email.id.in_(created)).delete(synchronize_session=False)
+    db_session.commit()
+
+
+def test_categorization_job_runs_concurrently_and_commits_in_batches(client, db_session, emails, run_jobs, monkeypatch):
+    monkeypatch.setattr(settings, "OLLAMA_CHAT_CONCURRENCY", 4)
+    monkeypatch.setattr(settings, "EMAIL_CATEGORIZE_BATCH_SIZE", 50)
+    monkeypatch.setattr(settings, "EMAIL_AI_PROMPT_BATCH_SIZE", 10)
+    chat = FakeChat()
+    monkeypatch.setattr(email_categorization, "chat_with_target", chat)
+    ids = emails(120)  # more than the old 50-email ceiling
+    usage_before = db_session.query(TokenUsage).count()
+
+    response = client.post("/api/v1/emails/auto-categorize", params={"email_ids": ids})
+    assert response.status_code == 200
+    job = response.json()
+    assert job["kind"] == "categorize_emails"
+    assert job["status"] == "queued"
+
+    commits = []
+    listener = lambda conn: commits.append(1)
+    event.listen(engine, "commit", listener)
+    try:
+        run_jobs()
+    finally:
+        event.remove(engine, "commit", listener)
+
+    assert len(chat.calls) == 12  # ten emails per request
+    assert sum(len(subjects) for subjects in chat.calls) == 120
+    assert chat.max_in_flight == 4
+    # Three batch commits plus the job's own bookkeeping, not one per email
+    assert len(commits) < 20
+
+    db_session.expire_all()
+    stored = db_session.get(BackgroundJob, job["id"])
+    assert stored.status == "completed"
+    result = client.get(f"/api/v1/jobs/{job['id']}").json()["result"]
+    assert result["categorized"] == 120
+    assert result["success"] is True
+    assert len(result["results"]) == 50
+    assert result["emails_per_minute"] > 0
+
+    categorized = db_session.query(Email).filter(Email.id.in_(ids), Email.importance == "Magas").count()
+    assert categorized == 120
+    assert db_session.query(TokenUsage).count() == usage_before + 12
+
+
+def test_rate_limited_calls_are_retried_and_failures_reported(db_session, emails, monkeypatch):
+    monkeypatch.setattr(settings, "OLLAMA_CHAT_CONCURRENCY", 2)
+    monkeypatch.setattr(settings, "EMAIL_AI_PROMPT_BATCH_SIZE", 1)
+    chat = FakeChat(fail={"Levél 3"}, rate_limited={"Levél 1"})
+    monkeypatch.setattr(email_categorization, "chat_with_target", chat)
+    ids = emails(5)
+
+    progress = []
+
+    async def on_progress(done, total, message):
+        progress.append((done, total))
+
+    result = asyncio.run(email_categorization.categorize_emails(db_session, email_ids=ids, progress=on_progress))
+
+    assert chat.calls.count(["Levél 1"]) == 2
+    assert result["categorized"] == 4
+    assert result["success"] is False
+    assert len(result["errors"]) == 1 and "model unavailable" in result["errors"][0]
+    assert progress[-1] == (5, 5)
+    failed = db_session.query(Email).filter(Email.subject == "Levél 3", Email.id.in_(ids)).one()
+    assert failed.ai_importance_reason is None
+
+
+def test_emails_missing_from_a_batched_reply_are_sent_one_by_one(db_session, emails, monkeypatch):
+    monkeypatch.setattr(settings, "OLLAMA_CHAT_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "EMAIL_AI_PROMPT_BATCH_SIZE", 3)
+    chat = FakeChat(omit={"Levél 1"}, garble={"Levél 4"})
+    monkeypatch.setattr(email_categorization, "chat_with_target", chat)
+    ids = emails(6)
+    usage_before = db_session.query(TokenUsage).count()
+
+    result = asyncio.run(email_categorization.categorize_emails(db_session, email_ids=ids))
+
+    assert chat.calls == [
+        ["Levél 0", "Levél 1", "Levél 2"], ["Levél 1"],  # left out of the reply
+        ["Levél 3", "Levél 4", "Levél 5"], ["Levél 3"], ["Levél 4"], ["Levél 5"],  # unparsable reply
+    ]
+    assert result["categorized"] == 6 and result["success"] is True
+    # One usage row per request: the batched ones count too
+    assert db_session.query(TokenUsage).count() == usage_before + 6
+
+
+def test_parse_batch_reply_keys_items_by_email_id():
+    reply = 'Íme:\n```json\n[{"email_id": "7", "importance": "Magas"}, {"email_id": 9}, {"email_id": 8}, "x"]\n```'
+    assert parse_batch_reply(reply, [7, 8]) == {7: {"email_id": "7", "importance": "Magas"}, 8: {"email_id": 8}}
+    assert parse_batch_reply('{"importance": "Magas"}', [7]) == {}
+
+
+def test_token_bucket_spaces_requests_after_a_burst():
+    now = [0.0]
+
+    async def fake_sleep(seconds):
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=2.0, capacity=3, clock=lambda: now[0], sleep=fake_sleep)
+
+    async def take(n):
+        times = []
+        for _ in range(n):
+            await bucket.acquire()
+            times.append(now[0])
+        return times
+
+    times = asyncio.run(take(5))
+    assert times[:3] == [0.0, 0.0, 0.0]  # the burst
+    assert times[3:] == pytest.approx([0.5, 1.0])
+
+    bucket.penalize(2.0)  # a 429 with Retry-After: 2
+    assert asyncio.run(take(1))[0] == pytest.approx(3.0)
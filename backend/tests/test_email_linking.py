@@ -0,0 +1,146 @@
+"""Tests for AI email-task linking (with a stand-in for the chat call)."""
+import json
+import re
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.models.models import AppSetting, Email, EmailTaskLink, ProcessInstance, ProcessType
+from app.services import email_linking
+from tests.conftest import engine
+
+TASK_NAMES = ("Számlázás", "Bérszámfejtés", "Leltár")
+
+
+async def keyword_embeddings(texts, db, **kwargs):
+    """One dimension per task name: a text is similar to the tasks it mentions."""
+    return [[1.0 if name in text else 0.0 for name in TASK_NAMES] for text in texts]
+
+
+async def no_embeddings(texts, db, **kwargs):
+    raise RuntimeError("embedding provider unavailable")
+
+
+class FakeChat:
+    """Links every email whose subject names a task; a batch gets a JSON array."""
+
+    def __init__(self, tasks, omit=()):
+        self.tasks = tasks  # {task name: process instance id}
+        self.omit = set(omit)
+        self.calls = []
+
+    def answer(self, email_id, subject):
+        for name, task_id in self.tasks.items():
+            if name in subject:
+                return {"email_id": email_id, "task_id": task_id, "confidence": 0.9, "reason": name}
+        return {"email_id": email_id, "task_id": None, "confidence": 0.0, "reason": "Nincs egyezés"}
+
+    async def __call__(self, messages, db, system_prompt=None):
+        content = messages[0]["content"]
+        batch = re.findall(r"### Email ID: (\d+)\nTárgy: (.*)", content)
+        self.calls.append((system_prompt, [subject for _, subject in batch] or [content.splitlines()[0]]))
+        if not batch:
+            answer = self.answer(None, content.splitlines()[0])
+            answer.pop("email_id")
+            return json.dumps(answer, ensure_ascii=False), 100, 20
+        items = [self.answer(int(email_id), subject) for email_id, subject in batch if subject not in self.omit]
+        return json.dumps(items, ensure_ascii=False), 300, 20 * len(items)
+
+
+@pytest.fixture()
+def monthly_tasks(db_session):
+    now = datetime.now()
+    types = [ProcessType(name=name, description=f"{name} havi feladat") for name in TASK_NAMES]
+    db_session.add_all(types)
+    db_session.flush()
+    instances = [ProcessInstance(process_type_id=t.id, year=now.year, month=now.month) for t in types]
+    db_session.add_all(instances)
+    db_session.commit()
+    yield {t.name: i.id for t, i in zip(types, instances)}
+    ids = [i.id for i in instances]
+    db_session.query(EmailTaskLink).filter(EmailTaskLink.process_instance_id.in_(ids)).delete(synchronize_session=False)
+    db_session.query(ProcessInstance).filter(ProcessInstance.id.in_(ids)).delete(synchronize_session=False)
+    db_session.query(ProcessType).filter(ProcessType.id.in_([t.id for t in types])).delete(synchronize_session=False)
+    db_session.commit()
+
+
+def test_auto_link_sends_the_task_list_once_per_batch(client, db_session, monthly_tasks, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_AI_PROMPT_BATCH_SIZE", 10)
+    chat = FakeChat(monthly_tasks, omit={"Bérszámfejtés március"})
+    monkeypatch.setattr(email_linking, "send_chat_message", chat)
+    monkeypatch.setattr(email_linking, "generate_embeddings_batch", no_embeddings)
+    emails = [Email(subject=s, sender="a@example.com", body="...") for s in (
+        "Számlázás február", "Bérszámfejtés március", "Ebéd pénteken",
+    )]
+    db_session.add_all(emails)
+    db_session.commit()
+    ids = [e.id for e in emails]
+
+    try:
+        response = client.post("/api/v1/emails/auto-link", params={"email_ids": ids})
+        assert response.status_code == 200
+        data = response.json()
+    finally:
+        db_session.query(Email).filter(Email.id.in_(ids)).delete(synchronize_session=False)
+        db_session.commit()
+
+    # One batched request; the email missing from its reply is asked about alone
+    assert [subjects for _, subjects in chat.calls] == [
+        ["Számlázás február", "Bérszámfejtés március", "Ebéd pénteken"],
+        ["Tárgy: Bérszámfejtés március"],
+    ]
+    assert "JSON tömbbel" in chat.calls[0][0] and "Számlázás" in chat.calls[0][0]
+    assert data["total_processed"] == 3
+    assert sorted((r["email_id"], r["process_instance_id"]) for r in data["results"]) == [
+        (ids[0], monthly_tasks["Számlázás"]),
+        (ids[1], monthly_tasks["Bérszámfejtés"]),
+    ]
+
+
+def test_clear_embedding_matches_are_linked_without_the_llm(client, db_session, monthly_tasks, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_LINK_SHORTLIST_SIZE", 2)
+    chat = FakeChat(monthly_tasks)
+    monkeypatch.setattr(email_linking, "send_chat_message", chat)
+    monkeypatch.setattr(email_linking, "generate_embeddings_batch", keyword_embeddings)
+    emails = [
+        Email(subject="Számlázás február", sender="a@example.com", body="A számlák mellékelve."),
+        Email(subject="Bérszámfejtés és Számlázás", sender="a@example.com", body="Melyikhez tartozik?"),
+    ]
+    mode = AppSetting(key="email_auto_link_mode", value="auto")
+    db_session.add_all(emails + [mode])
+    db_session.commit()
+    ids = [e.id for e in emails]
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        response = client.post("/api/v1/emails/auto-link", params={"email_ids": ids})
+        assert response.status_code == 200
+        data = response.json()
+        links = {
+            link.email_id: link
+            for link in db_session.query(EmailTaskLink).filter(EmailTaskLink.email_id.in_(ids))
+        }
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+        db_session.delete(mode)
+        db_session.query(Email).filter(Email.id.in_(ids)).delete(synchronize_session=False)
+        db_session.commit()
+
+    # The task types are read in one query, not one per task
+    assert sum("FROM process_instances JOIN process_types" in s for s in statements) == 1
+
+    assert data["matched_by_embedding"] == 1
+    assert links[ids[0]].process_instance_id == monthly_tasks["Számlázás"]
+    assert links[ids[0]].ai_confidence == pytest.approx(1.0)
+
+    # Only the ambiguous email reaches the LLM, with its two best candidates
+    assert len(chat.calls) == 1
+    system_prompt, subjects = chat.calls[0]
+    assert subjects == ["Tárgy: Bérszámfejtés és Számlázás"]
+    assert "Számlázás" in system_prompt and "Bérszámfejtés" in system_prompt
+    assert "Leltár" not in system_prompt
+    assert links[ids[1]].ai_confidence == pytest.approx(0.9)
@@ -0,0 +1,186 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.models.models import EmbeddingCache
+from app.services import embedding_cache, embedding_service
+from app.services.embedding_service import _generate_ollama_batch, generate_embeddings_batch
+
+
+OLLAMA_URL = "http://ollama.test"
+
+
+@pytest.fixture()
+def ollama(monkeypatch):
+    """Route Ollama calls to an in-process handler and record the requests."""
+    requests = []
+    state = {"handler": None}
+
+    def dispatch(request):
+        requests.append((request.url.path, json.loads(request.content)))
+        return state["handler"](request)
+
+    def client(provider):
+        return httpx.AsyncClient(transport=httpx.MockTransport(dispatch))
+
+    monkeypatch.setattr(embedding_service, "get_http_client", client)
+    monkeypatch.setattr(embedding_service, "_ollama_batch_support", {})
+    state["requests"] = requests
+    return state
+
+
+def _vector(text):
+    return [float(len(text)), 1.0]
+
+
+def test_ollama_batch_endpoint_keeps_order(ollama):
+    def handler(request):
+        body = json.loads(request.content)
+        return httpx.Response(200, json={"embeddings": [_vector(t) for t in body["input"]]})
+
+    ollama["handler"] = handler
+    texts = ["a" * n for n in range(1, 8)]
+
+    result = asyncio.run(_generate_ollama_batch(texts, ollama_url=OLLAMA_URL, batch_size=3))
+
+    assert result == [_vector(t) for t in texts]
+    assert [path for path, _ in ollama["requests"]] == ["/api/embed"] * 3
+
+
+def test_ollama_falls_back_to_concurrent_single_requests(ollama):
+    def handler(request):
+        if request.url.path == "/api/embed":
+            return httpx.Response(404, text="404 page not found")
+        prompt = json.loads(request.content)["prompt"]
+        if prompt == "broken":
+            return httpx.Response(500, json={"error": "boom"})
+        return httpx.Response(200, json={"embedding": _vector(prompt)})
+
+    ollama["handler"] = handler
+    texts = ["x", "broken", "yyy", "zz"]
+
+    result = asyncio.run(_generate_ollama_batch(texts, ollama_url=OLLAMA_URL, batch_size=2))
+
+    assert result == [_vector("x"), None, _vector("yyy"), _vector("zz")]
+    # The missing endpoint is remembered per server
+    assert embedding_service._ollama_batch_support == {OLLAMA_URL: False}
+    assert [path for path, _ in ollama["requests"]].count("/api/embed") <= 2
+
+
+def test_failed_batch_is_retried_text_by_text(ollama):
+    def handler(request):
+        if request.url.path == "/api/embed":
+            return httpx.Response(400, json={"error": "input too long"})
+        prompt = json.loads(request.content)["prompt"]
+        return httpx.Response(200, json={"embedding": _vector(prompt)})
+
+    ollama["handler"] = handler
+
+    result = asyncio.run(_generate_ollama_batch(["a", "bb"], ollama_url=OLLAMA_URL))
+
+    assert result == [_vector("a"), _vector("bb")]
+    assert embedding_service._ollama_batch_support == {}
+
+
+def _use_settings(monkeypatch, model):
+    monkeypatch.setattr(embedding_service, "get_embedding_settings", lambda db: {
+        "provider": "ollama",
+        "model": model,
+        "dimension": 2,
+        "ollama_url": OLLAMA_URL,
+        "openrouter_api_key": None,
+    })
+
+
+def _embed_handler(request):
+    body = json.loads(request.content)
+    return httpx.Response(200, json={"embeddings": [_vector(t) for t in body["input"]]})
+
+
+def test_embedding_cache_only_embeds_misses(ollama, db_session, monkeypatch):
+    _use_settings(monkeypatch, "cache-test-model")
+    monkeypatch.setattr(embedding_cache, "_stats", {"hits": 0, "misses": 0, "stored": 0, "evicted": 0})
+    ollama["handler"] = _embed_handler
+
+    first = asyncio.run(generate_embeddings_batch(["alpha", "beta", "  alpha\n"], db_session))
+    assert first == [_vector("alpha"), _vector("beta"), _vector("alpha")]
+    # Whitespace-only differences share one cache key and one provider input
+    assert ollama["requests"] == [("/api/embed", {"model": "cache-test-model", "input": ["alpha", "beta"]})]
+
+    second = asyncio.run(generate_embeddings_batch(["beta", "gamma", "alpha"], db_session))
+    assert second == [_vector("beta"), _vector("gamma"), _vector("alpha")]
+    assert ollama["requests"][1][1]["input"] == ["gamma"]
+
+    stats = embedding_cache.get_cache_stats(db_session)
+    assert (stats["hits"], stats["misses"], stats["stored"]) == (2, 3, 3)
+
+    # The cache is keyed on the model as well
+    _use_settings(monkeypatch, "other-model")
+    asyncio.run(generate_embeddings_batch(["alpha"], db_session))
+    assert ollama["requests"][2][1] == {"model": "other-model", "input": ["alpha"]}
+
+
+def test_embedding_cache_evicts_past_max_entries(ollama, db_session, monkeypatch):
+    _use_settings(monkeypatch, "evict-test-model")
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_EVICTION", "fifo")
+    ollama["handler"] = _embed_handler
+    db_session.query(EmbeddingCache).delete()
+    db_session.commit()
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_MAX_ENTRIES", 2)
+
+    asyncio.run(generate_embeddings_batch(["one"], db_session))
+    asyncio.run(generate_embeddings_batch(["two", "three"], db_session))
+
+    assert db_session.query(EmbeddingCache).count() == 2
+    remaining = asyncio.run(generate_embeddings_batch(["two", "three"], db_session))
+    assert remaining == [_vector("two"), _vector("three")]
+    assert len(ollama["requests"]) == 2
+
+
+@pytest.fixture()
+def query_cache(monkeypatch):
+    """Fresh query-embedding cache with a counting fake provider."""
+    calls = []
+
+    async def fake_embedding(text, db):
+        calls.append(text)
+        return _vector(text)
+
+    monkeypatch.setattr(embedding_service, "generate_embedding", fake_embedding)
+    monkeypatch.setattr(embedding_service, "_query_cache", embedding_service.OrderedDict())
+    monkeypatch.setattr(embedding_service, "_query_cache_settings", None)
+    monkeypatch.setattr(embedding_service, "_query_cache_stats", {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0})
+    return calls
+
+
+def test_query_embedding_cache_hits_and_invalidates(query_cache, monkeypatch):
+    _use_settings(monkeypatch, "query-model")
+    ask = embedding_service.generate_query_embedding
+
+    assert asyncio.run(ask("Hogyan kell számlát rögzíteni?", None)) == _vector("Hogyan kell számlát rögzíteni?")
+    asyncio.run(ask("  Hogyan kell  számlát rögzíteni? ", None))
+    assert query_cache == ["Hogyan kell számlát rögzíteni?"]
+
+    # Switching the embedding model empties the cache
+    _use_settings(monkeypatch, "other-query-model")
+    asyncio.run(ask("Hogyan kell számlát rögzíteni?", None))
+    assert len(query_cache) == 2
+
+    stats = embedding_service.get_query_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 2, 1)
+    assert stats["entries"] == 1
+    assert stats["hit_rate"] == pytest.approx(0.333, abs=1e-3)
+
+
+def test_query_embedding_cache_expires(query_cache, monkeypatch):
+    _use_settings(monkeypatch, "query-model")
+    monkeypatch.setattr(embedding_service, "QUERY_CACHE_TTL_SECONDS", 0)
+
+    asyncio.run(embedding_service.generate_query_embedding("q", None))
+    asyncio.run(embedding_service.generate_query_embedding("q", None))
+
+    assert query_cache == ["q", "q"]
+    assert embedding_service.get_query_cache_stats()["expired"] == 1
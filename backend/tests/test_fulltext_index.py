@@ -0,0 +1,90 @@
+"""Tests for the full-text index behind content search."""
+import io
+
+from app.models.models import Document
+from app.services import fulltext_index
+from app.services.job_queue import enqueue_job
+
+
+def _upload(client, name: str, content: str) -> dict:
+    files = {"file": (name, io.BytesIO(content.encode("utf-8")), "text/plain")}
+    response = client.post("/api/v1/documents/upload", files=files)
+    assert response.status_code == 201
+    return response.json()
+
+
+def _content_search(client, q: str) -> list:
+    response = client.get("/api/v1/documents/search", params={"q": q, "content_search": "true"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_results_are_ranked_and_highlighted(client):
+    # BM25 weighs a word by its rarity: it needs documents without it
+    for i in range(3):
+        _upload(client, f"fts_rank_filler{i}.txt", f"Töltelék dokumentum {i}.")
+    _upload(client, "fts_rank_once.txt", "Egy sor.\nA kvarcóra egyszer szerepel.\nVége.")
+    _upload(client, "fts_rank_often.txt", "kvarcóra kvarcóra\nmásik sor\nkvarcóra ismét")
+
+    results = _content_search(client, "kvarcóra")
+
+    names = [r["original_filename"] for r in results]
+    assert names[:2] == ["fts_rank_often.txt", "fts_rank_once.txt"]
+    assert results[0]["score"] > results[1]["score"]
+    assert results[0]["match_count"] == 2
+    assert [m["line_number"] for m in results[0]["matches"]] == [1, 3]
+    assert results[1]["matches"][0]["highlighted_text"] == "A **kvarcóra** egyszer szerepel."
+    assert "**kvarcóra**" in results[1]["snippet"]
+
+
+def test_prefix_and_accent_insensitive_match(client):
+    _upload(client, "fts_prefix.txt", "A munkafolyamatkezelő jóváhagyása kötelező.")
+
+    for query in ("munkafolyamat", "jovahagyasa", "MUNKAFOLYAMATKEZELŐ kötelező"):
+        names = [r["original_filename"] for r in _content_search(client, query)]
+        assert "fts_prefix.txt" in names, query
+
+
+def test_new_version_replaces_indexed_text(client):
+    _upload(client, "fts_versioned.txt", "régi tartalom zafírkék")
+    doc = _upload(client, "fts_versioned.txt", "új tartalom smaragdzöld")
+
+    assert _content_search(client, "zafírkék") == []
+    results = _content_search(client, "smaragdzöld")
+    assert [r["id"] for r in results] == [doc["id"]]
+
+
+def test_delete_removes_document_from_index(client):
+    doc = _upload(client, "fts_deleted.txt", "törlendő borostyánsárga szöveg")
+    assert [r["id"] for r in _content_search(client, "borostyánsárga")] == [doc["id"]]
+
+    client.delete(f"/api/v1/documents/{doc['id']}")
+
+    assert _content_search(client, "borostyánsárga") == []
+    assert doc["id"] not in fulltext_index.indexed_hashes()
+
+
+def test_query_syntax_is_treated_as_text(client):
+    _upload(client, "fts_syntax.txt", "NEAR AND OR szavak: mind keresendők")
+
+    assert _content_search(client, 'NEAR( "AND" -OR szavak:') != []
+    assert _content_search(client, '"*:-') == []
+
+
+def test_sync_job_indexes_legacy_documents_and_drops_stale(client, db_session, run_jobs, tmp_path):
+    path = tmp_path / "legacy.txt"
+    path.write_text("korábbi feltöltés türkizkék tartalommal", encoding="utf-8")
+    legacy = Document(filename="legacy.txt", original_filename="fts_legacy.txt", file_path=str(path), file_type="txt")
+    db_session.add(legacy)
+    db_session.commit()
+    fulltext_index.index_document(987654, None, "elavult türkizkék bejegyzés")
+
+    enqueue_job(db_session, "fulltext_sync")
+    run_jobs()
+
+    indexed = fulltext_index.indexed_hashes()
+    assert 987654 not in indexed
+    db_session.refresh(legacy)
+    assert indexed[legacy.id] == legacy.content_hash is not None
+    assert [r["id"] for r in _content_search(client, "türkizkék")] == [legacy.id]
+    assert not fulltext_index.needs_sync(db_session)
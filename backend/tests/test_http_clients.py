@@ -0,0 +1,29 @@
+import asyncio
+
+from app.services import http_clients
+from app.services.http_clients import close_http_clients, get_http_client
+
+
+def test_provider_client_is_reused_within_a_loop():
+    async def borrow():
+        first = get_http_client("ollama")
+        second = get_http_client("ollama")
+        other = get_http_client("openrouter")
+        await close_http_clients()
+        return first, second, other
+
+    first, second, other = asyncio.run(borrow())
+    assert first is second
+    assert first is not other
+    assert first.is_closed and other.is_closed
+    assert http_clients._clients == {}
+
+
+def test_provider_client_is_recreated_on_a_new_loop():
+    async def borrow():
+        return get_http_client("ollama")
+
+    first = asyncio.run(borrow())
+    second = asyncio.run(borrow())
+    assert first is not second
+    asyncio.run(close_http_clients())
@@ -0,0 +1,284 @@
+"""Tests for the persistent background job queue and the indexing jobs."""
+import asyncio
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.models import AIKnowledgeLog, BackgroundJob, Document, DocumentChunk
+from app.services import job_queue
+
+
+@pytest.fixture()
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(job_queue, "RETRY_BACKOFF_SECONDS", 0.0)
+
+
+def _upload(client, name: str, content: bytes) -> int:
+    files = {"file": (name, io.BytesIO(content), "text/plain")}
+    response = client.post("/api/v1/documents/upload", files=files)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def _enqueue(db_session, kind: str, **kwargs) -> int:
+    return job_queue.enqueue_job(db_session, kind, **kwargs).id
+
+
+def test_toggle_knowledge_returns_job_and_logs_timings(client, db_session, run_jobs):
+    doc_id = _upload(client, "job_toggle.txt", b"Queued indexing content. Second sentence here.")
+
+    response = client.post(f"/api/v1/documents/{doc_id}/toggle-knowledge")
+    assert response.status_code == 200
+    job_id = response.json()["job_id"]
+    assert response.json()["job_status"] == "queued"
+
+    job = client.get(f"/api/v1/jobs/{job_id}").json()
+    assert job["kind"] == "index_document"
+    assert job["status"] == "queued"
+    assert job["document_id"] == doc_id
+
+    run_jobs()
+
+    job = client.get(f"/api/v1/jobs/{job_id}").json()
+    assert job["status"] == "completed"
+    assert job["attempts"] == 1
+    assert job["result"]["chunks_created"] >= 1
+    assert job["queue_wait_ms"] is not None and job["run_ms"] is not None
+    assert db_session.query(DocumentChunk).filter(DocumentChunk.document_id == doc_id).count() >= 1
+
+    log = db_session.query(AIKnowledgeLog).filter(AIKnowledgeLog.job_id == job_id).one()
+    assert log.action == "added"
+    assert log.queue_wait_ms is not None and log.queue_wait_ms >= 0
+    assert log.run_ms is not None and log.run_ms >= 0
+
+
+def test_cancel_queued_index_job_reverts_flag(client, db_session, run_jobs):
+    doc_id = _upload(client, "job_cancel.txt", b"Content that will never be indexed.")
+    job_id = client.post(f"/api/v1/documents/{doc_id}/toggle-knowledge").json()["job_id"]
+
+    response = client.post(f"/api/v1/jobs/{job_id}/cancel")
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelled"
+
+    run_jobs()
+    db_session.expire_all()
+    assert db_session.get(Document, doc_id).is_knowledge is False
+    assert db_session.query(DocumentChunk).filter(DocumentChunk.document_id == doc_id).count() == 0
+
+    # Finished jobs cannot be cancelled again
+    assert client.post(f"/api/v1/jobs/{job_id}/cancel").status_code == 400
+
+
+def test_cancel_running_job_stops_at_next_progress(db_session, monkeypatch):
+    async def run(ctx):
+        await job_queue.cancel_job(ctx.db, ctx.job)  # as if requested from another request
+        await ctx.progress(1, 2, "step")
+        return {"finished": True}
+
+    aborted = []
+
+    async def on_abort(ctx, status, error):
+        aborted.append(status)
+
+    monkeypatch.setitem(job_queue._handlers, "test_cancel", job_queue.JobHandler(run, on_abort))
+    job_id = _enqueue(db_session, "test_cancel")
+
+    asyncio.run(job_queue.run_pending_jobs())
+
+    db_session.expire_all()
+    job = db_session.get(BackgroundJob, job_id)
+    assert job.status == "cancelled"
+    assert job.result is None
+    assert aborted == ["cancelled"]
+
+
+def test_failed_job_is_retried(db_session, monkeypatch, no_backoff):
+    calls = []
+
+    async def flaky(ctx):
+        calls.append(ctx.job.attempts)
+        if len(calls) == 1:
+            raise RuntimeError("temporary")
+        return {"ok": True}
+
+    monkeypatch.setitem(job_queue._handlers, "test_flaky", job_queue.JobHandler(flaky))
+    job_id = _enqueue(db_session, "test_flaky")
+
+    asyncio.run(job_queue.run_pending_jobs())
+
+    db_session.expire_all()
+    job = db_session.get(BackgroundJob, job_id)
+    assert calls == [1, 2]
+    assert job.status == "completed"
+    assert job.error is None
+
+
+def test_job_fails_after_max_attempts(db_session, monkeypatch, no_backoff):
+    aborted = []
+
+    async def broken(ctx):
+        raise RuntimeError("down")
+
+    async def on_abort(ctx, status, error):
+        aborted.append((status, error))
+
+    monkeypatch.setitem(job_queue._handlers, "test_broken", job_queue.JobHandler(broken, on_abort))
+    job_id = _enqueue(db_session, "test_broken", max_attempts=2)
+
+    asyncio.run(job_queue.run_pending_jobs())
+
+    db_session.expire_all()
+    job = db_session.get(BackgroundJob, job_id)
+    assert job.status == "failed"
+    assert job.attempts == 2
+    assert aborted == [("failed", "down")]
+
+
+def test_jobs_of_same_document_run_in_order(db_session, monkeypatch):
+    async def noop(ctx):
+        return None
+
+    monkeypatch.setitem(job_queue._handlers, "test_noop", job_queue.JobHandler(noop))
+    doc = Document(filename="order.txt", original_filename="order.txt", file_path="/tmp/order.txt")
+    db_session.add(doc)
+    db_session.commit()
+    asyncio.run(job_queue.run_pending_jobs())  # drain leftovers of other tests
+
+    first = _enqueue(db_session, "test_noop", document_id=doc.id)
+    second = _enqueue(db_session, "test_noop", document_id=doc.id)
+    other = _enqueue(db_session, "test_noop")
+
+    assert job_queue.claim_next_job(db_session) == first
+    # The second job of the document waits while the first one runs
+    assert job_queue.claim_next_job(db_session) == other
+    assert job_queue.claim_next_job(db_session) is None
+
+    asyncio.run(job_queue.run_job(first))
+    assert job_queue.claim_next_job(db_session) == second
+    asyncio.run(job_queue.run_job(second))
+    asyncio.run(job_queue.run_job(other))
+
+
+def _orphan(db_session, job_id: int, worker_id: str = "dead-host:1:0", seconds_ago: float = None):
+    """Make a claimed job look like it belongs to another process, silent for ``seconds_ago``."""
+    if seconds_ago is None:
+        seconds_ago = job_queue.STALE_AFTER_SECONDS + 1
+    db_session.query(BackgroundJob).filter(BackgroundJob.id == job_id).update({
+        BackgroundJob.worker_id: worker_id,
+        BackgroundJob.heartbeat_at: datetime.utcnow() - timedelta(seconds=seconds_ago),
+    })
+    db_session.commit()
+
+
+def test_interrupted_jobs_are_requeued_on_start(db_session, monkeypatch, no_backoff):
+    ran = []
+
+    async def record(ctx):
+        ran.append(ctx.job.id)
+        return None
+
+    monkeypatch.setitem(job_queue._handlers, "test_record", job_queue.JobHandler(record))
+    asyncio.run(job_queue.run_pending_jobs())  # drain leftovers of other tests
+
+    job_id = _enqueue(db_session, "test_record")
+    assert job_queue.claim_next_job(db_session) == job_id
+    _orphan(db_session, job_id)  # its process died while running it
+
+    async def restart():
+        await job_queue.start_workers(2)
+        try:
+            for _ in range(200):
+                db_session.expire_all()
+                if db_session.get(BackgroundJob, job_id).status == "completed":
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await job_queue.stop_workers()
+
+    asyncio.run(restart())
+
+    db_session.expire_all()
+    job = db_session.get(BackgroundJob, job_id)
+    assert job.status == "completed"
+    assert job.attempts == 2  # the lost run counts
+    assert job.worker_id == job_queue.WORKER_ID
+    assert ran == [job_id]
+
+
+def test_interrupted_job_fails_after_max_attempts(db_session, monkeypatch):
+    aborted = []
+
+    async def crash(ctx):
+        raise AssertionError("never runs again")
+
+    async def on_abort(ctx, status, error):
+        aborted.append(status)
+
+    monkeypatch.setitem(job_queue._handlers, "test_crash", job_queue.JobHandler(crash, on_abort))
+    asyncio.run(job_queue.run_pending_jobs())
+
+    job_id = _enqueue(db_session, "test_crash", max_attempts=1)
+    assert job_queue.claim_next_job(db_session) == job_id
+    _orphan(db_session, job_id)
+
+    assert asyncio.run(job_queue.requeue_interrupted_jobs(db_session)) == 1
+
+    db_session.expire_all()
+    job = db_session.get(BackgroundJob, job_id)
+    assert (job.status, job.attempts) == ("failed", 1)
+    assert aborted == ["failed"]
+    assert asyncio.run(job_queue.run_pending_jobs()) == 0
+
+
+def test_jobs_of_live_processes_are_not_taken_over(db_session, monkeypatch):
+    async def record(ctx):
+        return None
+
+    monkeypatch.setitem(job_queue._handlers, "test_record", job_queue.JobHandler(record))
+    asyncio.run(job_queue.run_pending_jobs())
+
+    other = _enqueue(db_session, "test_record")
+    own = _enqueue(db_session, "test_record")
+    assert job_queue.claim_next_job(db_session) == other
+    assert job_queue.claim_next_job(db_session) == own
+    _orphan(db_session, other, worker_id="other-host:2:0", seconds_ago=5)
+    # Our own job is alive as long as this process is, however old its heartbeat
+    _orphan(db_session, own, worker_id=job_queue.WORKER_ID)
+
+    assert asyncio.run(job_queue.requeue_interrupted_jobs(db_session)) == 0
+    assert job_queue.touch_running_jobs(db_session) == 1
+
+    db_session.expire_all()
+    assert db_session.get(BackgroundJob, other).status == "running"
+    assert db_session.get(BackgroundJob, own).heartbeat_at > datetime.utcnow() - timedelta(seconds=5)
+
+    # A clean shutdown hands back only this process's job, without using up an attempt
+    assert job_queue.release_running_jobs(db_session) == 1
+    db_session.expire_all()
+    assert (db_session.get(BackgroundJob, own).status, db_session.get(BackgroundJob, own).attempts) == ("queued", 0)
+    assert db_session.get(BackgroundJob, other).status == "running"
+
+    asyncio.run(job_queue.run_pending_jobs())
+    db_session.query(BackgroundJob).filter(BackgroundJob.id == other).update({BackgroundJob.status: "cancelled"})
+    db_session.commit()
+
+
+def test_rag_reindex_queues_job(client, run_jobs):
+    response = client.post("/api/v1/documents/rag/reindex")
+    assert response.status_code == 200
+    job_id = response.json()["job_id"]
+
+    run_jobs()
+
+    job = client.get(f"/api/v1/jobs/{job_id}").json()
+    assert job["kind"] == "reindex_all"
+    assert job["status"] == "completed"
+    assert "total_documents" in job["result"]
+
+    listed = client.get("/api/v1/jobs?kind=reindex_all").json()
+    assert listed[0]["id"] == job_id
+
+
+def test_get_unknown_job_returns_404(client):
+    assert client.get("/api/v1/jobs/999999").status_code == 404
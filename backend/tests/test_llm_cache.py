@@ -0,0 +1,160 @@
+"""Tests for the persistent LLM response cache (with a stand-in for the model)."""
+import asyncio
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.models.models import LLMResponseCache, TokenUsage
+from app.services import llm_cache
+from app.services.llm_cache import cached_chat_message
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, target, messages, system_prompt=None):
+        self.calls += 1
+        return f"Válasz #{self.calls}: {messages[-1]['content'][:40]}", 300, 60, 0.002
+
+
+@pytest.fixture()
+def model(db_session, monkeypatch):
+    fake = FakeModel()
+    target = {"provider": "openrouter", "model": "test/model", "api_key": "k"}
+    monkeypatch.setattr(llm_cache, "resolve_chat_target", lambda db: dict(target))
+    monkeypatch.setattr(llm_cache, "chat_with_target", fake)
+    db_session.query(LLMResponseCache).delete()
+    db_session.commit()
+    first_usage = (db_session.query(TokenUsage.id).order_by(TokenUsage.id.desc()).first() or (0,))[0]
+    yield fake, target, first_usage
+    db_session.query(LLMResponseCache).delete()
+    db_session.commit()
+
+
+def ask(db, content, system_prompt="Rendszer", bypass_cache=False):
+    return asyncio.run(cached_chat_message(
+        [{"role": "user", "content": content}], db, system_prompt=system_prompt, bypass_cache=bypass_cache,
+    ))
+
+
+def usages(db, after_id):
+    return db.query(TokenUsage).filter(TokenUsage.id > after_id).order_by(TokenUsage.id).all()
+
+
+def test_same_request_is_answered_from_the_cache(db_session, model):
+    fake, target, first_usage = model
+
+    first = ask(db_session, "Foglald össze")
+    second = ask(db_session, "Foglald össze")
+
+    assert fake.calls == 1
+    assert second == first == ("Válasz #1: Foglald össze", 300, 60)
+    miss, hit = usages(db_session, first_usage)
+    assert (miss.cost, miss.cache_hit) == (0.002, False)
+    assert (hit.provider, hit.model_name, hit.input_tokens, hit.output_tokens) == ("openrouter", "test/model", 300, 60)
+    assert (hit.cost, hit.cache_hit) == (0.0, True)
+
+    entry = db_session.query(LLMResponseCache).one()
+    assert entry.hit_count == 1
+    assert entry.key_hash == llm_cache.cache_key(
+        "openrouter", "test/model", llm_cache.system_hash("Rendszer"),
+        llm_cache.messages_hash([{"role": "user", "content": "Foglald össze"}]),
+    )
+
+
+def test_any_part_of_the_key_changes_the_answer(db_session, model, monkeypatch):
+    fake, target, _ = model
+    ask(db_session, "Foglald össze")
+    ask(db_session, "Foglald össze!")
+    ask(db_session, "Foglald össze", system_prompt="Másik rendszer")
+    target["model"] = "test/other"
+    ask(db_session, "Foglald össze")
+
+    assert fake.calls == 4
+    assert db_session.query(LLMResponseCache).count() == 4
+
+
+def test_bypass_asks_the_model_and_replaces_the_entry(db_session, model):
+    fake, _, first_usage = model
+    ask(db_session, "Ötletek")
+
+    fresh = ask(db_session, "Ötletek", bypass_cache=True)
+    again = ask(db_session, "Ötletek")
+
+    assert fake.calls == 2
+    assert fresh[0].startswith("Válasz #2") and again == fresh
+    assert [u.cache_hit for u in usages(db_session, first_usage)] == [False, False, True]
+    assert db_session.query(LLMResponseCache).count() == 1
+
+
+def test_expired_entries_are_not_used(db_session, model):
+    fake, _, _ = model
+    ask(db_session, "Útmutató")
+    entry = db_session.query(LLMResponseCache).one()
+    assert entry.expires_at > datetime.utcnow() + timedelta(seconds=settings.LLM_CACHE_TTL_SECONDS - 60)
+
+    entry.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    ask(db_session, "Útmutató")
+
+    assert fake.calls == 2
+    assert db_session.query(LLMResponseCache).one().expires_at > datetime.utcnow()
+
+
+def test_least_recently_used_entries_are_evicted(db_session, model, monkeypatch):
+    fake, _, _ = model
+    monkeypatch.setattr(settings, "LLM_CACHE_MAX_ENTRIES", 2)
+    ask(db_session, "A")
+    ask(db_session, "B")
+    db_session.query(LLMResponseCache).update({LLMResponseCache.last_used_at: datetime.utcnow() - timedelta(hours=1)})
+    db_session.commit()
+    ask(db_session, "A")  # hit: A is now the most recently used
+    ask(db_session, "C")  # over the limit: B goes
+
+    assert fake.calls == 3
+    assert db_session.query(LLMResponseCache).count() == 2
+    ask(db_session, "A")
+    ask(db_session, "B")
+    assert fake.calls == 4
+
+
+def test_summarize_endpoint_uses_the_cache(client, db_session, model):
+    fake, _, _ = model
+    content = "Havi zárás: a számlákat a hónap 5. napjáig kell beküldeni a könyvelőnek."
+    files = {"file": ("cache_summary.txt", io.BytesIO(content.encode()), "text/plain")}
+    doc_id = client.post("/api/v1/documents/upload", files=files).json()["id"]
+
+    first = client.post(f"/api/v1/documents/{doc_id}/summarize")
+    second = client.post(f"/api/v1/documents/{doc_id}/summarize")
+    fresh = client.post(f"/api/v1/documents/{doc_id}/summarize?bypass_cache=true")
+
+    assert first.status_code == second.status_code == fresh.status_code == 200
+    assert second.json()["summary"] == first.json()["summary"]
+    assert fresh.json()["summary"] != first.json()["summary"]
+    assert fake.calls == 2
+
+    cost = client.get("/api/v1/tokens/cost").json()
+    assert cost["cached_requests"] >= 1 and cost["cached_tokens"] >= 360
+
+
+def test_cache_hits_are_not_counted_as_token_usage(client, db_session, model):
+    def totals():
+        daily = client.get("/api/v1/tokens/usage/daily").json()
+        by_model = [m for m in client.get("/api/v1/tokens/usage/by-model").json() if m["model_name"] == "test/model"]
+        cost = client.get("/api/v1/tokens/cost").json()
+        return (
+            sum(d["total_tokens"] for d in daily), sum(d["request_count"] for d in daily),
+            [(m["total_tokens"], m["request_count"]) for m in by_model],
+            (cost["total_tokens"], cost["total_requests"]),
+        ), cost["cached_requests"], cost["cached_tokens"]
+
+    ask(db_session, "Statisztika")
+    before, cached_requests, cached_tokens = totals()
+    ask(db_session, "Statisztika")
+    after, cached_requests_after, cached_tokens_after = totals()
+
+    assert after == before
+    assert (cached_requests_after, cached_tokens_after) == (cached_requests + 1, cached_tokens + 360)
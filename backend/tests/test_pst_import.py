@@ -0,0 +1,368 @@
+"""Tests for the PST import: parser workers and the batched writer (with a stand-in for pypff)."""
+import asyncio
+import hashlib
+import io
+import json
+import os
+import sys
+
+import pytest
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.models.models import AttachmentBlob, BackgroundJob, Email, EmailAttachment
+from app.services import pst_import, pst_parser
+from tests.conftest import engine
+
+
+class FakeAttachment:
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self.mime_type = "text/plain"
+        self._data = data
+        self._offset = 0
+        self.reads = []
+
+    def get_size(self):
+        return len(self._data)
+
+    def read_buffer(self, size):
+        self.reads.append(size)
+        chunk = self._data[self._offset:self._offset + size]
+        self._offset += len(chunk)
+        return chunk
+
+
+class FakeMessage:
+    live = 0
+    max_live = 0
+
+    def __init__(self, key: str, attachments=()):
+        FakeMessage.live += 1
+        FakeMessage.max_live = max(FakeMessage.max_live, FakeMessage.live)
+        self.key = key
+        self.subject = f"Tárgy {key}"
+        self.sender_name = "Feladó"
+        self.sender_email_address = "felado@example.com"
+        self.plain_text_body = f"Törzs {key}"
+        self.html_body = None
+        self.delivery_time = None
+        self._attachments = list(attachments)
+
+    def __del__(self):
+        FakeMessage.live -= 1
+
+    def get_transport_headers(self):
+        return f"Subject: x\nMessage-ID: <{self.key}@pst.test>\n"
+
+    def get_number_of_recipients(self):
+        return 0
+
+    def get_number_of_attachments(self):
+        return len(self._attachments)
+
+    def get_attachment(self, index):
+        return self._attachments[index]
+
+
+class FakeFolder:
+    """Creates message objects on access, like pypff does."""
+
+    def __init__(self, keys=(), subfolders=(), attachments=None):
+        self._keys = list(keys)
+        self._subfolders = list(subfolders)
+        self._attachments = attachments or {}
+
+    def get_number_of_sub_messages(self):
+        return len(self._keys)
+
+    def get_sub_message(self, index):
+        key = self._keys[index]
+        return FakeMessage(key, self._attachments.get(key, ()))
+
+    def get_number_of_sub_folders(self):
+        return len(self._subfolders)
+
+    def get_sub_folder(self, index):
+        return self._subfolders[index]
+
+
+FAKE_PYPFF_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_pypff")
+
+
+@pytest.fixture()
+def fake_pypff(monkeypatch, tmp_path):
+    """Put the JSON-backed pypff stand-in on sys.path, where spawned workers find it too."""
+    monkeypatch.syspath_prepend(FAKE_PYPFF_DIR)
+    monkeypatch.setattr(pst_parser, "_open_file", None)
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(settings, "EMAIL_ATTACHMENTS_DIR", str(tmp_path / "attachments"))
+    monkeypatch.setattr(settings, "PST_IMPORT_WORKERS", 2)
+    yield
+    sys.modules.pop("pypff", None)
+
+
+def _archive(tree: dict) -> io.BytesIO:
+    return io.BytesIO(json.dumps(tree).encode("utf-8"))
+
+
+def _messages(prefix: str, count: int) -> list:
+    return [{"key": f"{prefix}-{i}"} for i in range(count)]
+
+
+def _import(client, run_jobs, tree: dict) -> dict:
+    """Upload an archive, work off the queued import job and return its PSTImportResult."""
+    response = client.post("/api/v1/emails/import-pst", files={"file": ("archive.pst", _archive(tree))})
+    assert response.status_code == 200
+    job = response.json()
+    assert (job["kind"], job["status"]) == ("pst_import", "queued")
+    run_jobs()
+    return client.get(f"/api/v1/emails/import-pst/{job['id']}").json()
+
+
+def test_folder_walk_yields_messages_one_at_a_time():
+    FakeMessage.live = FakeMessage.max_live = 0
+    root = FakeFolder(
+        keys=[f"walk-root-{i}" for i in range(50)],
+        subfolders=[FakeFolder(keys=[f"walk-sub-{i}" for i in range(50)], subfolders=[FakeFolder(keys=["walk-deep"])])],
+    )
+
+    assert pst_parser.count_folder_messages(root) == 101
+    keys = [message.key for message in pst_parser.iter_folder_messages(root)]
+
+    assert keys[0] == "walk-root-0" and keys[-1] == "walk-deep" and len(keys) == 101
+    assert FakeMessage.max_live <= 2
+
+
+def _stored_files(root: str) -> list:
+    return sorted(os.path.join(path, name) for path, _, names in os.walk(root) for name in names)
+
+
+def test_attachments_are_streamed_into_the_blob_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(pst_parser, "ATTACHMENT_CHUNK_SIZE", 4)
+    attachment = FakeAttachment("jegyzet.txt", b"0123456789")
+
+    record = pst_parser.read_pst_message(FakeMessage("chunked", [attachment]), str(tmp_path))
+
+    assert attachment.reads == [4, 4, 2]
+    [saved] = record["attachments"]
+    content_hash = hashlib.sha256(b"0123456789").hexdigest()
+    assert (saved["filename"], saved["file_size"], saved["content_hash"]) == ("jegyzet.txt", 10, content_hash)
+    assert saved["file_path"] == str(tmp_path / content_hash[:2] / content_hash[2:4] / content_hash)
+    with open(saved["file_path"], "rb") as f:
+        assert f.read() == b"0123456789"
+
+    # The same content again: same blob, no second file
+    again = pst_parser.read_pst_message(FakeMessage("chunked-2", [FakeAttachment("masolat.txt", b"0123456789")]), str(tmp_path))
+    assert again["attachments"][0]["file_path"] == saved["file_path"]
+    assert _stored_files(str(tmp_path)) == [saved["file_path"]]
+
+
+def test_plan_splits_the_folder_tree_into_units(fake_pypff, tmp_path):
+    path = tmp_path / "plan.pst"
+    path.write_text(json.dumps({
+        "messages": _messages("plan-root", 2),
+        "folders": [{"messages": _messages("plan-big", 5), "folders": [{"messages": _messages("plan-deep", 1)}]}],
+    }), encoding="utf-8")
+
+    units, total = pst_parser.plan_units(str(path), unit_messages=2)
+
+    assert total == 8
+    assert units == [((), 0, 2), ((0,), 0, 2), ((0,), 2, 4), ((0,), 4, 5), ((0, 0), 0, 1)]
+
+
+def test_import_pst_parses_in_workers_and_reports_peak_rss(client, db_session, fake_pypff, monkeypatch, run_jobs):
+    monkeypatch.setattr(settings, "PST_IMPORT_BATCH_SIZE", 3)
+    monkeypatch.setattr(pst_import, "UPLOAD_CHUNK_SIZE", 100)
+    tree = {
+        "messages": _messages("import-root", 2),
+        "folders": [
+            {"messages": [{"key": "import-att", "attachments": [{"name": "jegyzet.txt", "data": "0123456789"}]}]},
+            {"messages": _messages("import-sub", 4), "folders": [{"messages": _messages("import-deep", 3)}]},
+        ],
+    }
+
+    result = _import(client, run_jobs, tree)
+
+    assert (result["total_emails"], result["imported"], result["skipped"]) == (10, 10, 0)
+    assert result["success"] is True
+    assert result["peak_rss_mb"] > 0
+    assert result["worker_peak_rss_mb"] > 0
+    assert not any(name.endswith(".pst") for name in os.listdir(settings.UPLOAD_DIR))  # archive removed
+
+    email = db_session.query(Email).filter(Email.message_id == "<import-att@pst.test>").one()
+    saved = db_session.query(EmailAttachment).filter(EmailAttachment.email_id == email.id).one()
+    with open(saved.file_path, "rb") as f:
+        assert f.read() == b"0123456789"
+
+    # Importing the same archive again skips every message and keeps no extra attachment files
+    again = _import(client, run_jobs, tree)
+    assert (again["imported"], again["skipped"]) == (0, 10)
+    assert _stored_files(settings.EMAIL_ATTACHMENTS_DIR) == [saved.file_path]
+
+
+def test_identical_attachments_share_one_blob(client, db_session, fake_pypff, run_jobs):
+    report = {"name": "riport.pdf", "data": "havi riport " * 100}
+    tree = {
+        "messages": [{"key": f"blob-{i}", "attachments": [report]} for i in range(3)],
+        "folders": [{"messages": [{"key": "blob-other", "attachments": [{"name": "egyeb.txt", "data": "egyéb"}]}]}],
+    }
+
+    result = _import(client, run_jobs, tree)
+
+    assert result["imported"] == 4
+    assert result["attachment_bytes_saved"] == 2 * len(report["data"])
+    rows = db_session.query(EmailAttachment).filter(EmailAttachment.filename == "riport.pdf").all()
+    assert len(rows) == 3 and len({row.file_path for row in rows}) == 1
+    blob = db_session.query(AttachmentBlob).filter(AttachmentBlob.content_hash == rows[0].content_hash).one()
+    assert (blob.ref_count, blob.file_path) == (3, rows[0].file_path)
+    assert len(_stored_files(settings.EMAIL_ATTACHMENTS_DIR)) == 2
+
+    # Downloads of the shared blob support ranges
+    url = f"/api/v1/emails/{rows[0].email_id}/attachments/{rows[0].id}/download"
+    partial = client.get(url, headers={"Range": "bytes=5-10"})
+    assert partial.status_code == 206
+    assert partial.content == report["data"][5:11].encode()
+    assert partial.headers["content-range"] == f"bytes 5-10/{len(report['data'])}"
+
+
+def _reads(pst_path: str) -> list:
+    with open(pst_path + ".reads", encoding="utf-8") as f:
+        return f.read().split()
+
+
+def test_crashed_import_is_resumed_from_its_checkpoint(client, db_session, fake_pypff, run_jobs):
+    tree = {"folders": [
+        {"messages": _messages("resume-a", 3)},
+        {"messages": _messages("resume-b", 2) + [{"key": "resume-crash", "exit": True}]},
+    ]}
+
+    result = _import(client, run_jobs, tree)
+
+    assert result["success"] is False and result["resumable"] is True
+    assert any(error.startswith("PST processing error") for error in result["errors"])
+    job = db_session.get(BackgroundJob, result["job_id"])
+    assert job.status == "failed"
+    [pst_path] = [os.path.join(settings.UPLOAD_DIR, name) for name in os.listdir(settings.UPLOAD_DIR) if name.endswith(".pst")]
+
+    # The archive is kept; once the crash is gone the import is resumed as a background job
+    del tree["folders"][1]["messages"][2]["exit"]
+    with open(pst_path, "w", encoding="utf-8") as f:
+        json.dump(tree, f)
+    response = client.post(f"/api/v1/emails/import-pst/{job.id}/resume")
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+    run_jobs()
+
+    job = client.get(f"/api/v1/jobs/{job.id}").json()
+    assert job["status"] == "completed"
+    assert job["result"]["success"] is True and job["result"]["total_emails"] == 6
+    assert db_session.query(Email).filter(Email.message_id.like("<resume-%")).count() == 6
+    assert not os.path.exists(pst_path)  # removed once complete
+    assert client.post(f"/api/v1/emails/import-pst/{job['id']}/resume").status_code == 400
+
+
+def test_resumed_import_reads_only_the_rest(db_session, fake_pypff, tmp_path):
+    pst_path = str(tmp_path / "partial.pst")
+    with open(pst_path, "w", encoding="utf-8") as f:
+        json.dump({"folders": [{"messages": _messages("partial-a", 3)}, {"messages": _messages("partial-b", 4)}]}, f)
+    checkpoint = {
+        **pst_import.new_checkpoint(),
+        "units": [[[0], 0, 3], [[1], 0, 4]],
+        "total": 7,
+        "positions": {"0": 3, "1": 2},  # as if partial-a-* and partial-b-0/1 were committed
+        "imported": 5,
+    }
+    saved = []
+
+    result = asyncio.run(pst_import.process_pst_file(pst_path, db_session, checkpoint=checkpoint, on_checkpoint=saved.append))
+
+    assert sorted(_reads(pst_path)) == ["partial-b-2", "partial-b-3"]
+    assert (result.success, result.total_emails, result.imported) == (True, 7, 7)
+    assert saved[-1]["positions"] == {"0": 3, "1": 4}
+    assert pst_import.checkpoint_complete(saved[-1])
+
+
+def test_ingest_batch_uses_constant_statements_and_skips_duplicates(db_session, tmp_path):
+    keys = [f"bulk-{i}" for i in range(40)]
+    attachments = {key: [FakeAttachment(f"{key}.txt", key.encode())] for key in keys[:10]}
+    folder = FakeFolder(keys=keys + ["bulk-0"], attachments=attachments)  # repeated within the archive
+    pst_import.ingest_batch(db_session, [pst_parser.read_pst_message(FakeMessage("bulk-5"), str(tmp_path))])
+
+    records = [pst_parser.read_pst_message(m, str(tmp_path)) for m in pst_parser.iter_folder_messages(folder)]
+    statements = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        outcome = pst_import.ingest_batch(db_session, records)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert (outcome["imported"], outcome["skipped"]) == (39, 2)
+    inserts = [sql for sql in statements if sql.startswith("INSERT")]
+    assert len(inserts) == 3  # emails, attachments, blobs
+    queries = [sql for sql in statements if "SAVEPOINT" not in sql]  # around the blob insert
+    assert len(queries) <= 7
+    assert db_session.query(Email).filter(Email.message_id.like("<bulk-%")).count() == 40
+    saved = db_session.query(EmailAttachment.file_path).filter(EmailAttachment.filename.like("bulk-%")).all()
+    assert len(saved) == 9
+    # Only the duplicate bulk-5 brought its blob in: the sweep deletes it once it is old enough
+    assert pst_import.sweep_orphan_blobs(db_session, str(tmp_path)) == 0
+    assert pst_import.sweep_orphan_blobs(db_session, str(tmp_path), grace_seconds=-1) == 1
+    assert len(_stored_files(str(tmp_path))) == 9
+
+
+def test_blobs_stored_by_a_parallel_import_are_counted_not_inserted(db_session, tmp_path, monkeypatch):
+    shared = FakeAttachment("race.txt", b"shared by two imports")
+    first = [pst_parser.read_pst_message(FakeMessage("race-a", [shared]), str(tmp_path))]
+    pst_import.ingest_batch(db_session, first)
+
+    # The other import committed the blob after this one looked it up
+    monkeypatch.setattr(pst_import, "_stored_blobs", lambda db, hashes: set())
+    own = FakeAttachment("own.txt", b"only in the second import")
+    again = FakeAttachment("race.txt", b"shared by two imports")
+    second = [pst_parser.read_pst_message(FakeMessage("race-b", [again, own]), str(tmp_path))]
+    outcome = pst_import.ingest_batch(db_session, second)
+
+    assert outcome["imported"] == 1
+    assert outcome["bytes_saved"] == len(b"shared by two imports")
+    blobs = dict(db_session.query(AttachmentBlob.content_hash, AttachmentBlob.ref_count).filter(
+        AttachmentBlob.content_hash.in_([
+            hashlib.sha256(b"shared by two imports").hexdigest(),
+            hashlib.sha256(b"only in the second import").hexdigest(),
+        ])
+    ))
+    assert sorted(blobs.values()) == [1, 2]
+
+
+def test_a_blob_claimed_by_a_running_import_survives_the_other_imports_cleanup(db_session, tmp_path):
+    root = str(tmp_path)
+    pst_import.ingest_batch(db_session, [pst_parser.read_pst_message(FakeMessage("claim-dup"), root)])
+
+    # Import A's worker writes the blob; A's writer has not committed it yet
+    record_a = pst_parser.read_pst_message(FakeMessage("claim-a", [FakeAttachment("x.txt", b"claimed")]), root)
+    # Import B's only copy of it came with a duplicate message; B finishes first
+    record_b = pst_parser.read_pst_message(FakeMessage("claim-dup", [FakeAttachment("x.txt", b"claimed")]), root)
+    assert pst_import.ingest_batch(db_session, [record_b])["skipped"] == 1
+    pst_import.sweep_orphan_blobs(db_session, root)
+
+    pst_import.ingest_batch(db_session, [record_a])
+    path = record_a["attachments"][0]["file_path"]
+    assert os.path.exists(path)
+
+    # Old enough and without a row: an orphan; with a row: kept
+    old = os.path.getmtime(path) - settings.ATTACHMENT_ORPHAN_GRACE_SECONDS - 60
+    orphan = pst_parser.read_pst_message(FakeMessage("claim-dup", [FakeAttachment("y.txt", b"orphan")]), root)
+    orphan_path = orphan["attachments"][0]["file_path"]
+    for stale in (path, orphan_path):
+        os.utime(stale, (old, old))
+    assert pst_import.sweep_orphan_blobs(db_session, root) == 1
+    assert os.path.exists(path) and not os.path.exists(orphan_path)
+
+    # A worker reusing a blob claims it again
+    os.utime(path, (old, old))
+    pst_parser.read_pst_message(FakeMessage("claim-c", [FakeAttachment("x.txt", b"claimed")]), root)
+    assert pst_import.sweep_orphan_blobs(db_session, root) == 0
@@ -0,0 +1,324 @@
+import asyncio
+import pickle
+import threading
+
+import numpy as np
+import pytest
+from sqlalchemy import event
+
+from app.models.models import Document, DocumentChunk
+from app.services import rag_service
+from app.services.rag_service import FAISSIndex, make_vector_id
+from tests.conftest import engine
+
+
+DIM = 8
+
+
+@pytest.fixture()
+def faiss_dir(tmp_path, monkeypatch):
+    """Point the FAISS storage directory at a temporary folder."""
+    monkeypatch.setattr(rag_service, "FAISS_INDEX_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _vectors(n, seed=0):
+    return np.random.default_rng(seed).random((n, DIM), dtype=np.float32).tolist()
+
+
+def _meta(document_id, n):
+    return [
+        {
+            "document_id": document_id,
+            "chunk_index": i,
+            "chunk_id": f"doc_{document_id}_chunk_{i}",
+            "filename": f"doc_{document_id}.txt",
+        }
+        for i in range(n)
+    ]
+
+
+def test_make_vector_id_is_stable_and_unique():
+    assert make_vector_id(1, 0) != make_vector_id(0, 1)
+    assert make_vector_id(7, 3) == make_vector_id(7, 3)
+    assert make_vector_id(7, 3) >> 32 == 7
+
+
+def test_remove_document_only_touches_its_vectors(faiss_dir):
+    index = FAISSIndex(dimension=DIM)
+    index.add_embeddings(_vectors(3, seed=1), _meta(1, 3))
+    index.add_embeddings(_vectors(4, seed=2), _meta(2, 4))
+
+    index.remove_document(1)
+
+    assert index.get_stats()["total_vectors"] == 4
+    assert index.get_metadata(make_vector_id(1, 0)) is None
+    assert index.get_stats()["documents_indexed"] == 1
+
+    # Remaining vectors are still searchable by their own content
+    query = _vectors(4, seed=2)[2]
+    meta, score = index.search(query, k=1)[0]
+    assert meta["document_id"] == 2
+    assert meta["chunk_index"] == 2
+    assert score == pytest.approx(1.0, abs=1e-5)
+
+
+def test_add_embeddings_replaces_existing_chunk_ids(faiss_dir):
+    index = FAISSIndex(dimension=DIM)
+    index.add_embeddings(_vectors(2, seed=1), _meta(5, 2))
+    index.add_embeddings(_vectors(2, seed=3), _meta(5, 2))
+
+    assert index.get_stats()["total_vectors"] == 2
+    assert index.get_stats()["documents_indexed"] == 1
+
+
+def test_remove_document_tombstones_until_compaction(faiss_dir):
+    index = FAISSIndex(dimension=DIM)
+    for doc_id in range(1, 11):
+        index.add_embeddings(_vectors(2, seed=doc_id), _meta(doc_id, 2))
+
+    # Below the threshold the vectors are only tombstoned...
+    index.remove_document(3)
+    assert index.index.ntotal == 20
+    assert index.get_stats()["deleted_vectors"] == 2
+    results = index.search(_vectors(2, seed=3)[0], k=20)
+    assert len(results) == 18
+    assert all(meta["document_id"] != 3 for meta, _ in results)
+
+    # ...and physically dropped once the ratio is exceeded
+    for doc_id in (4, 5):
+        index.remove_document(doc_id)
+    assert index.get_stats()["deleted_vectors"] == 0
+    assert index.index.ntotal == 14
+    meta, score = index.search(_vectors(2, seed=9)[1], k=1)[0]
+    assert (meta["document_id"], meta["chunk_index"]) == (9, 1)
+    assert score == pytest.approx(1.0, abs=1e-5)
+
+
+def test_index_round_trips_through_disk(faiss_dir):
+    index = FAISSIndex(dimension=DIM)
+    index.add_embeddings(_vectors(3), _meta(9, 3))
+
+    reloaded = FAISSIndex(dimension=DIM)
+    assert reloaded.get_stats()["total_vectors"] == 3
+    assert reloaded.get_stats()["documents_indexed"] == 1
+    reloaded.remove_document(9)
+    assert reloaded.get_stats()["total_vectors"] == 0
+    assert reloaded.search(_vectors(1)[0], k=3) == []
+
+
+def test_legacy_flat_index_is_migrated(faiss_dir):
+    import faiss
+
+    vectors = np.array(_vectors(3), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    legacy = faiss.IndexFlatIP(DIM)
+    legacy.add(vectors)
+    faiss.write_index(legacy, str(faiss_dir / f"index_{DIM}.faiss"))
+    with open(faiss_dir / f"metadata_{DIM}.pkl", "wb") as f:
+        pickle.dump(_meta(4, 2) + _meta(6, 1), f)
+
+    index = FAISSIndex(dimension=DIM)
+
+    assert index.get_stats()["total_vectors"] == 3
+    assert index.get_metadata(make_vector_id(4, 1))["chunk_index"] == 1
+    meta, _ = index.search(vectors[2].tolist(), k=1)[0]
+    assert meta["document_id"] == 6
+
+    index.remove_document(4)
+    assert index.get_stats()["total_vectors"] == 1
+
+    # The legacy files are replaced by the snapshot + WAL format
+    assert not (faiss_dir / f"metadata_{DIM}.pkl").exists()
+    assert (faiss_dir / f"manifest_{DIM}.json").exists()
+    assert FAISSIndex(dimension=DIM).get_stats()["total_vectors"] == 1
+
+
+def test_changes_survive_restart_through_the_wal(faiss_dir):
+    index = FAISSIndex(dimension=DIM)
+    index.add_embeddings(_vectors(3, seed=1), _meta(1, 3))
+    index.add_embeddings(_vectors(3, seed=2), _meta(2, 3))
+    index.remove_document(1)
+    assert index.get_stats()["persistence"]["checkpoints"] == 1  # compaction only
+
+    reloaded = FAISSIndex(dimension=DIM)
+    stats = reloaded.get_stats()
+    assert stats["total_vectors"] == 3
+    assert stats["documents_indexed"] == 1
+    meta, _ = reloaded.search(_vectors(3, seed=2)[0], k=1)[0]
+    assert meta["document_id"] == 2
+    assert meta["filename"] == "doc_2.txt"
+
+
+def test_torn_wal_tail_is_discarded(faiss_dir):
+    index = FAISSIndex(dimension=DIM)
+    index.checkpoint()
+    index.add_embeddings(_vectors(2, seed=1), _meta(1, 2))
+    wal_path = index._wal_path()
+    with open(wal_path, "ab") as f:
+        f.write(b"\x80\x05partial-record")
+
+    reloaded = FAISSIndex(dimension=DIM)
+    assert reloaded.get_stats()["total_vectors"] == 2
+    assert reloaded.get_stats()["persistence"]["wal_records_replayed"] == 1
+
+
+def test_checkpoint_replaces_wal_with_snapshot(faiss_dir, monkeypatch):
+    monkeypatch.setattr(rag_service, "WAL_CHECKPOINT_BYTES", 0)
+    index = FAISSIndex(dimension=DIM)
+    index.add_embeddings(_vectors(2), _meta(3, 2))
+
+    stats = index.get_stats()["persistence"]
+    assert stats["generation"] == 1
+    assert stats["wal_bytes"] == 0
+    assert sorted(p.name for p in faiss_dir.iterdir()) == [
+        f"columns_{DIM}.1.npy",
+        f"documents_{DIM}.1.json",
+        f"index_{DIM}.1.faiss",
+        f"manifest_{DIM}.json",
+    ]
+
+    reloaded = FAISSIndex(dimension=DIM)
+    assert reloaded.get_metadata(make_vector_id(3, 1))["filename"] == "doc_3.txt"
+
+
+def test_promotes_to_ivf_past_threshold_in_background(faiss_dir):
+    index = FAISSIndex(dimension=DIM)
+    index.configure("ivf", promote_threshold=100)
+    index.add_embeddings(_vectors(60, seed=1), _meta(1, 60))
+    assert index.get_stats()["index_type"] == "flat"
+
+    index.add_embeddings(_vectors(60, seed=2), _meta(2, 60))
+    assert index.wait_for_rebuild(timeout=30)
+
+    stats = index.get_stats()
+    assert stats["index_type"] == "ivf"
+    assert stats["total_vectors"] == 120
+    assert stats["index_tier"]["rebuilds"] == 1
+    meta, score = index.search(_vectors(60, seed=2)[5], k=1)[0]
+    assert (meta["document_id"], meta["chunk_index"]) == (2, 5)
+    assert score == pytest.approx(1.0, abs=1e-5)
+
+    # The promoted tier is part of the snapshot
+    reloaded = FAISSIndex(dimension=DIM)
+    assert reloaded.get_stats()["index_type"] == "ivf"
+    assert reloaded.search(_vectors(60, seed=1)[7], k=1)[0][0]["chunk_index"] == 7
+
+
+def test_changes_during_rebuild_are_replayed(faiss_dir, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    build = rag_service.build_vector_index
+
+    def slow_build(index_type, vectors):
+        started.set()
+        release.wait(30)
+        return build(index_type, vectors)
+
+    monkeypatch.setattr(rag_service, "build_vector_index", slow_build)
+    index = FAISSIndex(dimension=DIM)
+    index.add_embeddings(_vectors(20, seed=1), _meta(1, 20))
+    index.add_embeddings(_vectors(20, seed=2), _meta(2, 20))
+    index.configure("hnsw", promote_threshold=10)
+    assert started.wait(30)
+
+    # Searches and writes keep working on the flat index meanwhile
+    index.remove_document(1)
+    index.add_embeddings(_vectors(5, seed=3), _meta(3, 5))
+    assert index.search(_vectors(5, seed=3)[0], k=1)[0][0]["document_id"] == 3
+    assert index.get_stats()["index_tier"]["rebuilding"]
+
+    release.set()
+    assert index.wait_for_rebuild(timeout=30)
+
+    stats = index.get_stats()
+    assert stats["index_type"] == "hnsw"
+    assert stats["total_vectors"] == 25
+    assert index.get_metadata(make_vector_id(1, 0)) is None
+    assert index.search(_vectors(5, seed=3)[4], k=1)[0][0]["chunk_index"] == 4
+
+
+def test_hnsw_compacts_by_rebuilding(faiss_dir):
+    index = FAISSIndex(dimension=DIM)
+    index.configure("hnsw", promote_threshold=1)
+    for doc in range(4):
+        index.add_embeddings(_vectors(5, seed=doc), _meta(doc, 5))
+    assert index.wait_for_rebuild(timeout=30)
+    assert index.get_stats()["index_type"] == "hnsw"
+
+    index.remove_document(0)
+    index.remove_document(1)
+    assert index.wait_for_rebuild(timeout=30)
+
+    stats = index.get_stats()
+    assert stats["index_type"] == "hnsw"
+    assert stats["deleted_vectors"] == 0
+    assert index.index.ntotal == 10
+    meta, _ = index.search(_vectors(5, seed=3)[2], k=1)[0]
+    assert (meta["document_id"], meta["chunk_index"]) == (3, 2)
+
+
+def test_search_enrichment_uses_one_query_then_cache(faiss_dir, db_session, monkeypatch):
+    docs = []
+    for name in ("a.txt", "b.txt"):
+        doc = Document(filename=name, original_filename=name, file_path=f"/tmp/{name}", is_knowledge=True)
+        db_session.add(doc)
+        db_session.flush()
+        docs.append(doc)
+        for i in range(4):
+            db_session.add(DocumentChunk(document_id=doc.id, chunk_index=i, content=f"{name} chunk {i}"))
+    db_session.commit()
+
+    # An index loaded from disk knows ids and filenames but no chunk texts
+    index = FAISSIndex(dimension=DIM)
+    for seed, doc in enumerate(docs):
+        index.add_embeddings(_vectors(4, seed=seed), _meta(doc.id, 4))
+    query = _vectors(4, seed=1)[2]
+
+    async def fake_embedding(text, db):
+        return query
+
+    monkeypatch.setattr(rag_service, "_faiss_instances", {DIM: index})
+    monkeypatch.setattr(rag_service, "generate_query_embedding", fake_embedding)
+    monkeypatch.setattr(rag_service, "get_embedding_settings", lambda db: {"dimension": DIM})
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        cold = asyncio.run(rag_service.search_similar_chunks("q", db_session, k=8))
+        cold_queries = len(statements)
+        warm = asyncio.run(rag_service.search_similar_chunks("q", db_session, k=8))
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert cold_queries == 1
+    assert len(statements) == cold_queries
+    assert cold == warm
+    assert len(cold) == 8
+    assert cold[0]["document_id"] == docs[1].id
+    assert cold[0]["content"] == "b.txt chunk 2"
+    assert index.get_stats()["chunk_cache"]["entries"] == 8
+
+    # Removing a document evicts its cached texts
+    index.remove_document(docs[1].id)
+    assert index.get_chunk_contents([make_vector_id(docs[1].id, 2)]) == {}
+
+
+def test_debug_endpoints_use_the_active_embedding_dimension(client, faiss_dir, monkeypatch):
+    from app.routers import rag_debug
+
+    monkeypatch.setattr(rag_service, "_faiss_instances", {})
+    monkeypatch.setattr(rag_debug, "get_embedding_settings", lambda db: {"dimension": DIM})
+    index = rag_service.get_faiss_index(dimension=DIM)
+    index.add_embeddings(_vectors(2), _meta(4, 2))
+    assert index.get_stats()["persistence"]["wal_bytes"] > 0
+
+    persistence = client.post("/api/v1/rag-debug/checkpoint").json()
+    status = client.get("/api/v1/rag-debug/status").json()
+
+    assert persistence["wal_bytes"] == 0
+    assert status["faiss_dimension"] == DIM and status["persistence"]["wal_bytes"] == 0
+    assert not any(p.name.startswith("manifest_1024") for p in faiss_dir.iterdir())
@@ -48,3 +48,26 @@ def test_get_all_settings(client):
     data = response.json()
     assert isinstance(data, dict)
     assert "test_key" in data
+
+
+def test_put_vector_index_settings(client):
+    response = client.put(
+        "/api/v1/settings/embedding/vector-index",
+        json={"index_type": "hnsw", "promote_threshold": 50000},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["index_type"] == "hnsw"
+    assert data["promote_threshold"] == 50000
+
+    config = client.get("/api/v1/settings/embedding/config").json()
+    assert config["vector_index_type"] == "hnsw"
+    assert config["vector_index_promote_threshold"] == 50000
+
+
+def test_put_vector_index_settings_rejects_unknown_type(client):
+    response = client.put(
+        "/api/v1/settings/embedding/vector-index",
+        json={"index_type": "lsh"},
+    )
+    assert response.status_code == 400
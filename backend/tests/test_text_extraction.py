@@ -0,0 +1,91 @@
+"""Tests for the process-pool text extraction."""
+import asyncio
+import time
+
+import pytest
+
+from app.services import text_extraction
+from app.services.text_extraction import (
+    ExtractionTimeout,
+    extract_document_content,
+    extract_document_content_async,
+    extract_text_from_pdf,
+)
+
+
+def _make_pdf(path, pages: int):
+    from reportlab.pdfgen import canvas
+
+    pdf = canvas.Canvas(str(path))
+    for page in range(pages):
+        pdf.drawString(72, 720, f"Oldal {page + 1} szovege")
+        pdf.showPage()
+    pdf.save()
+
+
+def test_large_pdf_is_split_into_page_ranges(tmp_path, monkeypatch):
+    path = tmp_path / "long.pdf"
+    _make_pdf(path, 7)
+    monkeypatch.setattr(text_extraction, "PDF_PAGES_PER_TASK", 3)
+
+    text, table_data = extract_document_content(str(path), "pdf")
+
+    assert table_data is None
+    assert text == extract_text_from_pdf(str(path))
+    assert [f"Oldal {n} szovege" in text for n in range(1, 8)] == [True] * 7
+    assert text.index("Oldal 2") < text.index("Oldal 5") < text.index("Oldal 7")
+
+
+def test_docx_and_xlsx_are_extracted_in_workers(tmp_path):
+    from docx import Document as DocxDocument
+    from openpyxl import Workbook
+
+    docx_path = tmp_path / "notes.docx"
+    doc = DocxDocument()
+    doc.add_paragraph("Első bekezdés")
+    doc.add_paragraph("Második bekezdés")
+    doc.save(docx_path)
+
+    xlsx_path = tmp_path / "table.xlsx"
+    wb = Workbook()
+    wb.active.append(["név", "érték"])
+    wb.active.append(["a", 1])
+    wb.save(xlsx_path)
+
+    text, _ = asyncio.run(extract_document_content_async(str(docx_path), "docx"))
+    assert text == "Első bekezdés\n\nMásodik bekezdés"
+
+    text, table_data = extract_document_content(str(xlsx_path), "XLSX")
+    assert "név\térték" in text
+    assert table_data == [["név", "érték"], ["a", "1"]]
+
+
+def test_missing_file_and_unknown_type(tmp_path):
+    assert extract_document_content(str(tmp_path / "nope.pdf"), "pdf") == (None, None)
+    other = tmp_path / "image.png"
+    other.write_bytes(b"\x89PNG")
+    assert extract_document_content(str(other), "png") == (None, None)
+
+
+def test_timeout_kills_stuck_worker_and_pool_recovers(tmp_path):
+    start = time.monotonic()
+    with pytest.raises(ExtractionTimeout):
+        text_extraction._run_tasks([(time.sleep, (30,))], deadline=time.monotonic() + 1.0)
+    assert time.monotonic() - start < 10
+
+    path = tmp_path / "after.pdf"
+    _make_pdf(path, 1)
+    text, _ = extract_document_content(str(path), "pdf")
+    assert "Oldal 1" in text
+
+
+def test_worker_memory_is_capped():
+    limit = text_extraction.settings.EXTRACTION_MEMORY_LIMIT_MB
+    if limit <= 0:
+        pytest.skip("no memory cap configured")
+    pytest.importorskip("resource")
+
+    with pytest.raises(MemoryError):
+        text_extraction._run_tasks(
+            [(bytearray, ((limit + 256) * 1024 * 1024,))], deadline=time.monotonic() + 30
+        )
@@ -0,0 +1,127 @@
+"""Tests for the persistent extracted-text store."""
+import io
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.models.models import Document
+from app.services import text_extraction, text_store
+
+
+@pytest.fixture()
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACTED_TEXT_DIR", str(tmp_path / "extracted_text"))
+    return tmp_path / "extracted_text"
+
+
+def _forbid_extraction(monkeypatch):
+    """Fail the test if anything is extracted again."""
+    def fail(*args, **kwargs):
+        raise AssertionError("extracted instead of served from the store")
+
+    monkeypatch.setattr(text_store, "extract_document_content", fail)
+
+
+def _upload(client, name: str, content: bytes, mime: str = "text/plain") -> dict:
+    response = client.post("/api/v1/documents/upload", files={"file": (name, io.BytesIO(content), mime)})
+    assert response.status_code == 201
+    return response.json()
+
+
+def _entry(key: str) -> str:
+    return text_store._entry_path(key)
+
+
+def _xlsx_bytes() -> bytes:
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    wb.active.append(["termék", "db"])
+    wb.active.append(["alma", 3])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def test_upload_fills_store_and_preview_reuses_it(client, db_session, store_dir, monkeypatch):
+    content = "Tárolt szöveg az előnézethez.".encode("utf-8")
+    doc = _upload(client, "store_preview.txt", content)
+
+    key = text_store.content_hash(content)
+    assert db_session.get(Document, doc["id"]).content_hash == key
+    assert os.path.exists(_entry(key))
+
+    _forbid_extraction(monkeypatch)
+    response = client.get(f"/api/v1/documents/{doc['id']}/preview")
+    assert response.status_code == 200
+    assert response.json()["content"] == "Tárolt szöveg az előnézethez."
+
+
+def test_xlsx_table_data_is_served_from_store(client, store_dir, monkeypatch):
+    doc = _upload(
+        client,
+        "store_table.xlsx",
+        _xlsx_bytes(),
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+    _forbid_extraction(monkeypatch)
+
+    preview = client.get(f"/api/v1/documents/{doc['id']}/preview").json()
+    assert preview["table_data"] == [["termék", "db"], ["alma", "3"]]
+
+
+def test_new_version_invalidates_replaced_text(client, store_dir):
+    old = "Első változat szövege.".encode("utf-8")
+    new = "Második változat szövege.".encode("utf-8")
+    _upload(client, "store_versioned.txt", old)
+    assert os.path.exists(_entry(text_store.content_hash(old)))
+
+    doc = _upload(client, "store_versioned.txt", new)
+
+    assert not os.path.exists(_entry(text_store.content_hash(old)))
+    assert os.path.exists(_entry(text_store.content_hash(new)))
+    preview = client.get(f"/api/v1/documents/{doc['id']}/preview").json()
+    assert preview["content"] == "Második változat szövege."
+
+
+def test_delete_keeps_text_shared_with_other_document(client, store_dir):
+    content = b"Same content in two files."
+    first = _upload(client, "store_shared_a.txt", content)
+    second = _upload(client, "store_shared_b.txt", content)
+    path = _entry(text_store.content_hash(content))
+
+    client.delete(f"/api/v1/documents/{first['id']}")
+    assert os.path.exists(path)
+
+    client.delete(f"/api/v1/documents/{second['id']}")
+    assert not os.path.exists(path)
+
+
+def test_extractor_version_bump_misses(client, db_session, store_dir, monkeypatch):
+    doc = _upload(client, "store_version_bump.txt", b"Version bump content.")
+    document = db_session.get(Document, doc["id"])
+    assert text_store.load_text(document.content_hash) is not None
+
+    monkeypatch.setattr(text_store, "EXTRACTOR_VERSION", text_extraction.EXTRACTOR_VERSION + 1)
+    assert text_store.load_text(document.content_hash) is None
+    assert text_store.get_document_text(document, db_session)[0] == "Version bump content."
+    assert text_store.load_text(document.content_hash) is not None
+
+
+def test_legacy_document_gets_hash_on_first_use(db_session, store_dir, tmp_path):
+    path = tmp_path / "legacy.txt"
+    path.write_text("Legacy text.", encoding="utf-8")
+    document = Document(filename="legacy.txt", original_filename="legacy.txt", file_path=str(path), file_type="txt")
+    db_session.add(document)
+    db_session.commit()
+
+    assert text_store.get_document_text(document, db_session) == ("Legacy text.", None)
+    db_session.expire_all()
+    assert db_session.get(Document, document.id).content_hash == text_store.file_hash(str(path))
+
+
+def test_extraction_errors_are_not_stored(store_dir):
+    assert text_store.save_text("ab" * 32, "pdf", "[Hiba a PDF olvasásakor: broken]", None) is False
+    assert text_store.load_text("ab" * 32) is None
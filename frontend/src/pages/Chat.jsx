@@ -263,6 +263,8 @@ const Chat = () => {
           content: content.trim(),
           use_rag: useRag,
           documents_only: documentsOnly,
+          // Fewer, larger token frames (server defaults: every 30 ms or 64 characters)
+          coalesce: true,
         }));
       };
 
@@ -28,6 +28,7 @@ const Emails = () => {
   const [linkingTask, setLinkingTask] = useState(false);
   const fileInputRef = useRef(null);
   const wsRef = useRef(null);
+  const importPollRef = useRef(null);
 
   // Filter state
   const [filters, setFilters] = useState({
@@ -48,6 +49,7 @@ const Emails = () => {
       if (wsRef.current) {
         wsRef.current.close();
       }
+      clearTimeout(importPollRef.current);
     };
   }, []);
 
@@ -68,16 +70,8 @@ const Emails = () => {
       try {
         const data = JSON.parse(event.data);
         if (data.type === 'pst_import.progress') {
+          // Progress only: the outcome comes from the import job (watchImportJob)
           setImportProgress(data.data);
-
-          if (data.data.status === 'completed') {
-            toast.success(`Import befejezve: ${data.data.imported} email importálva, ${data.data.skipped} kihagyva`);
-            setImporting(false);
-            fetchEmails();
-          } else if (data.data.status === 'error') {
-            toast.error(`Import hiba: ${data.data.message}`);
-            setImporting(false);
-          }
         } else if (data.type === 'email_categorization.progress') {
           setCategorizationProgress(data.data);
 
@@ -202,17 +196,11 @@ const Emails = () => {
     });
 
     try {
-      const response = await api.post('/v1/emails/auto-categorize');
-      if (response.data.success) {
-        toast.success(`Kategorizálás sikeres: ${response.data.categorized} email feldolgozva`);
-      } else if (response.data.errors?.length > 0) {
-        toast.error(`Kategorizálás részben sikeres: ${response.data.errors[0]}`);
-      }
-      fetchEmails();
+      // Runs as a background job: completion arrives as an email_categorization.progress event
+      await api.post('/v1/emails/auto-categorize');
     } catch (error) {
       console.error('Categorization error:', error);
       toast.error('Hiba a kategorizálás során: ' + (error.response?.data?.detail || error.message));
-    } finally {
       setCategorizing(false);
     }
   };
@@ -295,6 +283,34 @@ const Emails = () => {
     }
   };
 
+  // Follow the pst_import background job until it finishes
+  const watchImportJob = (jobId) => {
+    const poll = async () => {
+      try {
+        const { data: job } = await api.get(`/v1/jobs/${jobId}`);
+        if (!['completed', 'failed', 'cancelled'].includes(job.status)) {
+          importPollRef.current = setTimeout(poll, 2000);
+          return;
+        }
+
+        if (job.status === 'completed') {
+          toast.success(`Import befejezve: ${job.result?.imported ?? 0} email importálva, ${job.result?.skipped ?? 0} kihagyva`);
+        } else if (job.status === 'failed') {
+          toast.error(`Import hiba: ${job.error || 'ismeretlen hiba'}`);
+        } else {
+          toast('Import megszakítva', { icon: '🛑' });
+        }
+        setImporting(false);
+        fetchEmails();
+      } catch (error) {
+        console.error('Import job status error:', error);
+        importPollRef.current = setTimeout(poll, 5000);
+      }
+    };
+    clearTimeout(importPollRef.current);
+    importPollRef.current = setTimeout(poll, 1000);
+  };
+
   const handleFileSelect = async (event) => {
     const file = event.target.files?.[0];
     if (!file) return;
@@ -318,17 +334,13 @@ const Emails = () => {
     formData.append('file', file);
 
     try {
+      // Runs as a background job: progress arrives as pst_import.progress events
       const response = await api.post('/v1/emails/import-pst', formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
         },
       });
-
-      if (response.data.success) {
-        toast.success(`Import sikeres: ${response.data.imported} email importálva`);
-      } else if (response.data.errors?.length > 0) {
-        toast.error(`Import részben sikeres: ${response.data.errors[0]}`);
-      }
+      watchImportJob(response.data.id);
     } catch (error) {
       console.error('Import error:', error);
       toast.error('Hiba az import során: ' + (error.response?.data?.detail || error.message));
@@ -511,6 +523,9 @@ const Emails = () => {
               </div>
               <div className="flex gap-4 mt-2 text-sm" style={{ color: 'var(--text-secondary)' }}>
                 <span>Feldolgozva: {categorizationProgress.current}/{categorizationProgress.total}</span>
+                {categorizationProgress.emails_per_minute && (
+                  <span>{categorizationProgress.emails_per_minute} email/perc</span>
+                )}
               </div>
             </div>
           )}
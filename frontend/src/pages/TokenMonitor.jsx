@@ -268,7 +268,7 @@ const TokenMonitor = () => {
         <StatsCard
           title="Osszes Keres"
           value={formatNumber(costData?.total_requests || 0)}
-          subValue={`Atl. $${(costData?.avg_cost_per_request || 0).toFixed(6)}/keres`}
+          subValue={`Atl. $${(costData?.avg_cost_per_request || 0).toFixed(6)}/keres, ${formatNumber(costData?.cached_requests || 0)} cache-bol`}
           icon={Activity}
           color={chartColors.warning}
         />